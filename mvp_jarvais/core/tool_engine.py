@@ -10,6 +10,7 @@ ToolEngine - 工具引擎
 可用工具：
 - web_search: 网络搜索（Brave API）
 - web_fetch: 网页内容获取
+- web_fetch_many: 批量网页获取（并发、去重，按完成顺序流式返回）
 - exec: Shell 命令执行
 - memory_search: 记忆搜索
 - tts: 文本转语音
@@ -20,7 +21,7 @@ import json
 import logging
 import sys
 import os
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, AsyncIterator
 from datetime import datetime
 from enum import Enum
 
@@ -30,13 +31,29 @@ sys.path.insert(0, project_root)
 
 from openclaw_timeout_wrapper import get_wrapper
 
+# OpenClaw 自主 web_fetch 工具（可选；不可用时 web_fetch 使用模拟结果）
+# 追加到 sys.path 末尾：mvp/src 下有 queue 包，放在前面会遮蔽标准库 queue
+openclaw_src = os.path.join(project_root, "openclaw_async_architecture", "mvp", "src")
+if openclaw_src not in sys.path:
+    sys.path.append(openclaw_src)
+try:
+    from tools.web_fetch_self import WebFetchTool
+    WEB_FETCH_AVAILABLE = True
+except ImportError:
+    WebFetchTool = None
+    WEB_FETCH_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# 批量获取的默认并发数（模拟模式）
+WEB_FETCH_MANY_CONCURRENCY = 8
+
 
 class ToolType(Enum):
     """工具类型枚举"""
     WEB_SEARCH = "web_search"
     WEB_FETCH = "web_fetch"
+    WEB_FETCH_MANY = "web_fetch_many"
     EXEC = "exec"
     MEMORY_SEARCH = "memory_search"
     TTS = "tts"
@@ -67,11 +84,15 @@ class ToolEngine:
         self.tool_timeouts = {
             ToolType.WEB_SEARCH: 30,      # 网络搜索：30 秒
             ToolType.WEB_FETCH: 30,       # 网页获取：30 秒
+            ToolType.WEB_FETCH_MANY: 120, # 批量网页获取：120 秒
             ToolType.EXEC: 60,            # Shell 命令：60 秒
             ToolType.MEMORY_SEARCH: 10,   # 记忆搜索：10 秒
             ToolType.TTS: 15,             # TTS: 15 秒
         }
 
+        # 真实网页获取工具（共享连接池和 HTTP 缓存）
+        self.web_fetcher = WebFetchTool() if WEB_FETCH_AVAILABLE else None
+
         # 结果缓存（LRU，最多 100 条）
         self.cache: Dict[str, Any] = {}
         self.cache_max_size = 100
@@ -115,6 +136,8 @@ class ToolEngine:
                 result = await self._web_search(**kwargs)
             elif tool_type == ToolType.WEB_FETCH:
                 result = await self._web_fetch(**kwargs)
+            elif tool_type == ToolType.WEB_FETCH_MANY:
+                result = await self._web_fetch_many(**kwargs)
             elif tool_type == ToolType.EXEC:
                 result = await self._exec(**kwargs)
             elif tool_type == ToolType.MEMORY_SEARCH:
@@ -188,7 +211,7 @@ class ToolEngine:
         Args:
             url: 网页 URL
             extract_mode: 提取模式（"markdown" 或 "text"）
-            **kwargs: 其他参数
+            **kwargs: 其他参数（max_chars 等）
 
         Returns:
             Dict: 网页内容
@@ -197,24 +220,124 @@ class ToolEngine:
 
         timeout = self.tool_timeouts[ToolType.WEB_FETCH]
 
-        # TODO: 集成真实 OpenClaw web_fetch 工具
-        # 目前使用模拟结果
-
-        await asyncio.sleep(0.5)  # 模拟网络延迟
+        if self.web_fetcher is not None:
+            content = await asyncio.wait_for(
+                self.web_fetcher.fetch(url, extract_mode=extract_mode, max_chars=kwargs.get("max_chars")),
+                timeout=timeout
+            )
+            if content is None:
+                raise RuntimeError(f"网页获取失败：{url}")
+        else:
+            # OpenClaw web_fetch 不可用时使用模拟结果
+            await asyncio.sleep(0.5)  # 模拟网络延迟
+            content = f"这是从 {url} 获取的网页内容（模拟）...\n\n# {url}\n\n网页内容摘要..."
 
         result = {
             "status": "success",
             "tool": "web_fetch",
             "url": url,
-            "content": f"这是从 {url} 获取的网页内容（模拟）...\n\n# {url}\n\n网页内容摘要...",
+            "content": content,
             "extract_mode": extract_mode,
-            "length": 500,
+            "length": len(content),
             "timestamp": datetime.now().isoformat()
         }
 
         logger.info(f"✅ 获取完成：{result['length']}字符")
         return result
 
+    async def fetch_many(self, urls: List[str], extract_mode: str = "markdown", **kwargs) -> AsyncIterator[Dict]:
+        """
+        批量网页获取（流式：每个页面获取完成后立即返回）
+
+        重复的 URL 只获取一次；并发数、每主机并发数、robots.txt 和礼貌间隔由
+        OpenClaw WebFetchTool.fetch_many 控制（kwargs 透传：concurrency、per_host、
+        delay、respect_robots、max_chars）。
+
+        使用示例：
+            async for page in engine.fetch_many(urls):
+                print(page["url"], page["status"])
+
+        Args:
+            urls: 网页 URL 列表
+            extract_mode: 提取模式（"markdown" 或 "text"）
+            **kwargs: 其他参数
+
+        Yields:
+            Dict: 单个网页结果（与 web_fetch 格式相同，失败时 status 为 "error"）
+        """
+        logger.info(f"📚 批量获取网页：{len(urls)} 个")
+
+        if self.web_fetcher is not None:
+            async for page in self.web_fetcher.fetch_many(urls, extract_mode=extract_mode, **kwargs):
+                content = page["content"]
+                yield {
+                    "status": "error" if page["error"] else "success",
+                    "tool": "web_fetch",
+                    "url": page["url"],
+                    "final_url": page["final_url"],
+                    "content": content,
+                    "error": page["error"],
+                    "extract_mode": extract_mode,
+                    "length": len(content) if content else 0,
+                    "timestamp": datetime.now().isoformat()
+                }
+            return
+
+        # 模拟模式：去重后并发调用 _web_fetch
+        semaphore = asyncio.Semaphore(kwargs.get("concurrency", WEB_FETCH_MANY_CONCURRENCY))
+
+        async def fetch_one(url: str) -> Dict:
+            async with semaphore:
+                try:
+                    return await self._web_fetch(url, extract_mode)
+                except Exception as e:
+                    return {"status": "error", "tool": "web_fetch", "url": url, "error": str(e),
+                            "timestamp": datetime.now().isoformat()}
+
+        unique = list(dict.fromkeys(url.split("#")[0] for url in urls))
+        tasks = [asyncio.ensure_future(fetch_one(url)) for url in unique]
+        try:
+            for future in asyncio.as_completed(tasks):
+                yield await future
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _web_fetch_many(self, urls: List[str], extract_mode: str = "markdown", **kwargs) -> Dict:
+        """
+        批量网页获取（收集全部结果）
+
+        Args:
+            urls: 网页 URL 列表
+            extract_mode: 提取模式（"markdown" 或 "text"）
+            **kwargs: 其他参数（见 fetch_many）
+
+        Returns:
+            Dict: 各网页结果（按完成顺序）
+        """
+        timeout = self.tool_timeouts[ToolType.WEB_FETCH_MANY]
+        results: List[Dict] = []
+
+        async def collect():
+            async for page in self.fetch_many(urls, extract_mode, **kwargs):
+                results.append(page)
+
+        try:
+            await asyncio.wait_for(collect(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ 批量获取超时（{timeout}秒），已完成 {len(results)} 个")
+
+        errors = sum(1 for page in results if page["status"] == "error")
+        logger.info(f"✅ 批量获取完成：{len(results)} 个，失败 {errors} 个")
+        return {
+            "status": "success",
+            "tool": "web_fetch_many",
+            "results": results,
+            "count": len(results),
+            "errors": errors,
+            "timestamp": datetime.now().isoformat()
+        }
+
     async def _exec(self, command: str, timeout: Optional[int] = None, **kwargs) -> Dict:
         """
         Shell 命令执行
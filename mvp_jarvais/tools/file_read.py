@@ -3,8 +3,10 @@ file_read 工具 - 读取文件内容
 
 功能：
 - 读取文本文件内容
-- 支持指定行范围（offset/limit）
-- 支持大文件分块读取（逐行，不一次性加载）
+- 支持指定行范围（offset/limit）和字节范围（byte_offset/byte_length）
+- 大文件：行偏移索引定位起始行（每个文件版本构建一次），mmap读取，不逐行扫描
+- 分块流式读取（iter_file_chunks）
+- 二进制文件检测、编码自动检测（encoding=None）
 - 返回文件内容和元数据
 
 使用示例：
@@ -19,103 +21,246 @@ print(result["content"])
 result = await file_read("large_file.txt", offset=5, limit=10)
 print(result["read_lines"])  # 10
 
-# 指定编码
+# 读取字节范围
+result = await file_read("huge.log", byte_offset=1024, byte_length=4096)
+
+# 指定编码 / 自动检测
 result = await file_read("chinese_file.txt", encoding="gbk")
+result = await file_read("unknown.txt", encoding=None)
 ```
 """
 
+import asyncio
+import bisect
+import mmap
 import os
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# 行索引：每 _INDEX_STRIDE 字节一个检查点（该位置之前的换行数）
+_INDEX_STRIDE = 256 * 1024
+# 小于此大小的文件整体读入；更大的文件使用索引 + mmap
+_LARGE_FILE_BYTES = 1024 * 1024
+_SNIFF_BYTES = 64 * 1024
+_MAX_CACHED_INDEXES = 64
+
+# 路径 -> (文件版本, 检查点, 换行总数)
+_line_indexes: Dict[str, Tuple[Tuple[int, int, int], List[int], int]] = {}
+
+
+def _detect_encoding(sample: bytes) -> Tuple[Optional[str], bool]:
+    """检测编码，返回 (编码, 是否二进制)"""
+    if sample.startswith(b"\xef\xbb\xbf"):
+        return "utf-8-sig", False
+    if sample.startswith((b"\xff\xfe", b"\xfe\xff")):
+        return "utf-16", False
+    if b"\x00" in sample:
+        return None, True
+    try:
+        sample.decode("utf-8")
+        return "utf-8", False
+    except UnicodeDecodeError as e:
+        # 样本末尾截断的多字节字符不算错误
+        if e.start >= len(sample) - 3 and e.reason == "unexpected end of data":
+            return "utf-8", False
+    try:
+        sample.decode("gb18030")
+        return "gb18030", False
+    except UnicodeDecodeError:
+        return "latin-1", False
+
+
+def _line_index(path: str, st: os.stat_result) -> Tuple[List[int], int]:
+    """获取行索引（按 mtime/size/inode 判断文件版本，变化后重建）"""
+    version = (st.st_mtime_ns, st.st_size, st.st_ino)
+    cached = _line_indexes.get(path)
+    if cached and cached[0] == version:
+        return cached[1], cached[2]
+
+    checkpoints = []
+    newlines = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_INDEX_STRIDE), b""):
+            checkpoints.append(newlines)
+            newlines += block.count(b"\n")
+
+    if len(_line_indexes) >= _MAX_CACHED_INDEXES:
+        _line_indexes.pop(next(iter(_line_indexes)))
+    _line_indexes[path] = (version, checkpoints, newlines)
+    return checkpoints, newlines
+
+
+def _line_start(buf, checkpoints: List[int], newlines: int, line: int) -> int:
+    """第 line 行（0 开始）的起始字节偏移"""
+    if line <= 0:
+        return 0
+    if line > newlines:
+        return len(buf)
+    block = bisect.bisect_left(checkpoints, line) - 1
+    pos = block * _INDEX_STRIDE
+    for _ in range(line - checkpoints[block]):
+        pos = buf.find(b"\n", pos) + 1
+        if not pos:
+            return len(buf)
+    return pos
+
+
+def iter_file_chunks(
+    path: str,
+    chunk_size: int = 1024 * 1024,
+    start: int = 0,
+    end: Optional[int] = None
+) -> Iterator[bytes]:
+    """
+    分块读取文件的字节范围 [start, end)，内存占用不超过 chunk_size
+
+    使用示例：
+        for chunk in iter_file_chunks("huge.log"):
+            process(chunk)
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = None if end is None else max(end - start, 0)
+        while remaining is None or remaining > 0:
+            block = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not block:
+                break
+            if remaining is not None:
+                remaining -= len(block)
+            yield block
+
+
+def _read(
+    abs_path: Path,
+    size_bytes: int,
+    offset: int,
+    limit: Optional[int],
+    byte_offset: Optional[int],
+    byte_length: Optional[int]
+) -> Tuple[bytes, int]:
+    """同步读取，返回 (字节内容, 总行数)；字节范围读取时总行数为 -1"""
+    path = str(abs_path)
+    if size_bytes == 0:
+        return b"", 0
+
+    with open(path, "rb") as f:
+        if byte_offset is not None or byte_length is not None:
+            start = min(byte_offset or 0, size_bytes)
+            length = byte_length if byte_length is not None else size_bytes - start
+            f.seek(start)
+            return f.read(length), -1
+
+        f.seek(size_bytes - 1)
+        trailing_newline = f.read(1) == b"\n"
+        f.seek(0)
+
+        start_line = max(offset - 1, 0)
+        if size_bytes < _LARGE_FILE_BYTES:
+            content = f.read()
+            newlines = content.count(b"\n")
+            begin = _line_start(content, [0], newlines, start_line) if start_line else 0
+            end = _line_start(content, [0], newlines, start_line + limit) if limit else len(content)
+            data = content[begin:end]
+        else:
+            checkpoints, newlines = _line_index(path, os.fstat(f.fileno()))
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                begin = _line_start(buf, checkpoints, newlines, start_line)
+                end = _line_start(buf, checkpoints, newlines, start_line + limit) if limit else len(buf)
+                data = buf[begin:end]
+
+    # 最后一行没有换行符时也算一行
+    return data, newlines + (0 if trailing_newline else 1)
 
 
 async def file_read(
     path: str,
     offset: int = 0,
     limit: Optional[int] = None,
-    encoding: str = 'utf-8'
+    encoding: Optional[str] = 'utf-8',
+    byte_offset: Optional[int] = None,
+    byte_length: Optional[int] = None
 ) -> dict:
     """
     读取文件内容
-    
+
     参数:
         path: 文件路径（相对或绝对）
         offset: 从第几行开始读取（1-indexed，0=从第 1 行开始）
         limit: 读取多少行（None=读取全部）
-        encoding: 文件编码（默认 utf-8）
-    
+        encoding: 文件编码（默认 utf-8，None=自动检测）
+        byte_offset: 字节范围起点（指定后按字节范围读取，忽略 offset/limit）
+        byte_length: 字节范围长度（None=到文件末尾）
+
     返回:
         dict: {
             "content": str,       # 文件内容
-            "total_lines": int,   # 总行数（如果读取全部）
+            "total_lines": int,   # 总行数（字节范围读取时不返回）
             "read_lines": int,    # 实际读取行数
             "size_bytes": int,    # 文件大小
             "path": str,          # 文件路径（绝对路径）
+            "encoding": str,      # 实际使用的编码
             "error": str          # 如果有错误
         }
     """
     # 参数验证
     if not path:
         return {"error": "文件路径不能为空"}
-    
+
     if offset < 0:
         return {"error": "offset 必须 >= 0"}
-    
+
     if limit is not None and limit <= 0:
         return {"error": "limit 必须 > 0 或 None"}
-    
+
+    if byte_offset is not None and byte_offset < 0:
+        return {"error": "byte_offset 必须 >= 0"}
+
+    if byte_length is not None and byte_length <= 0:
+        return {"error": "byte_length 必须 > 0 或 None"}
+
     # 转换为绝对路径
     abs_path = Path(path).resolve()
-    
+
     # 检查文件是否存在
     if not abs_path.exists():
         return {"error": f"文件不存在：{abs_path}"}
-    
+
     # 检查是否是文件（不是目录）
     if not abs_path.is_file():
         return {"error": f"不是文件：{abs_path}"}
-    
+
     # 检查文件大小
     try:
         size_bytes = abs_path.stat().st_size
     except Exception as e:
         return {"error": f"无法获取文件大小：{str(e)}"}
-    
-    # 读取文件内容（逐行读取，支持大文件）
+
     try:
-        lines = []
-        total_lines = 0
-        read_lines = 0
-        reached_limit = False
-        
-        with open(abs_path, 'r', encoding=encoding, errors='replace') as f:
-            for i, line in enumerate(f, 1):
-                total_lines = i
-                
-                # 跳过 offset 之前的行
-                if offset > 0 and i < offset:
-                    continue
-                
-                # 检查是否达到 limit
-                if limit is not None and read_lines >= limit:
-                    reached_limit = True
-                    continue  # 继续读取以统计 total_lines，但不再添加内容
-                
-                lines.append(line)
-                read_lines += 1
-        
-        # 合并内容
-        content = ''.join(lines)
-        
-        return {
+        # 二进制检测 / 编码检测（只读取文件开头）
+        with open(abs_path, "rb") as f:
+            detected, binary = _detect_encoding(f.read(_SNIFF_BYTES))
+        if binary and not (encoding or "").lower().startswith(("utf-16", "utf-32")):
+            return {"error": f"二进制文件，无法按文本读取：{abs_path}"}
+        encoding = encoding or detected
+
+        # 阻塞读取放到线程池，大文件只读取所需范围
+        data, total_lines = await asyncio.get_running_loop().run_in_executor(
+            None, _read, abs_path, size_bytes, offset, limit, byte_offset, byte_length
+        )
+        content = data.decode(encoding, errors='replace')
+
+        result = {
             "content": content,
-            "total_lines": total_lines,
-            "read_lines": read_lines,
+            "read_lines": data.count(b"\n") + (1 if data and not data.endswith(b"\n") else 0),
             "size_bytes": size_bytes,
-            "path": str(abs_path)
+            "path": str(abs_path),
+            "encoding": encoding,
         }
-        
-    except UnicodeDecodeError as e:
+        if total_lines >= 0:
+            result["total_lines"] = total_lines
+        return result
+
+    except LookupError as e:
         return {
             "error": f"编码错误：{str(e)}。尝试使用 'gbk', 'latin-1', 或 'utf-8-sig'"
         }
@@ -132,7 +277,7 @@ async def file_read(
 # 工具元数据（用于 ToolEngine 注册）
 TOOL_METADATA = {
     "name": "file_read",
-    "description": "读取文本文件内容，支持指定行范围和大文件分块读取",
+    "description": "读取文本文件内容，支持指定行范围/字节范围和大文件分段读取",
     "parameters": {
         "type": "object",
         "properties": {
@@ -152,8 +297,18 @@ TOOL_METADATA = {
             },
             "encoding": {
                 "type": "string",
-                "description": "文件编码",
+                "description": "文件编码（None=自动检测）",
                 "default": "utf-8"
+            },
+            "byte_offset": {
+                "type": "integer",
+                "description": "字节范围起点（指定后忽略 offset/limit）",
+                "default": None
+            },
+            "byte_length": {
+                "type": "integer",
+                "description": "字节范围长度（None=到文件末尾）",
+                "default": None
             }
         },
         "required": ["path"]
@@ -166,6 +321,7 @@ TOOL_METADATA = {
             "read_lines": {"type": "integer"},
             "size_bytes": {"type": "integer"},
             "path": {"type": "string"},
+            "encoding": {"type": "string"},
             "error": {"type": "string"}
         }
     }
@@ -243,6 +243,62 @@ class TestFileReadEncoding:
             os.unlink(temp_path)
 
 
+class TestFileReadRanges:
+    """范围读取 / 检测测试"""
+    
+    @pytest.mark.asyncio
+    async def test_byte_range(self):
+        """测试 15：字节范围读取"""
+        with tempfile.NamedTemporaryFile(mode='wb', suffix='.txt', delete=False) as f:
+            f.write(b"0123456789")
+            temp_path = f.name
+        
+        try:
+            result = await file_read(temp_path, byte_offset=3, byte_length=4)
+            
+            assert "error" not in result
+            assert result["content"] == "3456"
+        finally:
+            os.unlink(temp_path)
+    
+    @pytest.mark.asyncio
+    async def test_large_file_line_index(self):
+        """测试 16：超过 1MB 的文件按行索引定位"""
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
+            for i in range(1, 200001):
+                f.write(f"Line {i}\n")
+            temp_path = f.name
+        
+        try:
+            result = await file_read(temp_path, offset=150000, limit=2)
+            
+            assert "error" not in result
+            assert result["content"] == "Line 150000\nLine 150001\n"
+            assert result["total_lines"] == 200000
+        finally:
+            os.unlink(temp_path)
+    
+    @pytest.mark.asyncio
+    async def test_binary_and_auto_encoding(self):
+        """测试 17：二进制文件拒绝读取，encoding=None 自动检测"""
+        with tempfile.NamedTemporaryFile(mode='wb', suffix='.bin', delete=False) as f:
+            f.write(b"\x00\x01\x02" * 10)
+            binary_path = f.name
+        with tempfile.NamedTemporaryFile(mode='wb', suffix='.txt', delete=False) as f:
+            f.write("中文测试".encode('gbk'))
+            gbk_path = f.name
+        
+        try:
+            result = await file_read(binary_path)
+            assert "二进制文件" in result["error"]
+            
+            result = await file_read(gbk_path, encoding=None)
+            assert result["content"] == "中文测试"
+        finally:
+            os.unlink(binary_path)
+            os.unlink(gbk_path)
+
+
 # 运行测试
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])
@@ -3,7 +3,7 @@
 
 import redis
 import sqlite3
-from typing import Optional
+from typing import Iterable, Optional
 from contextlib import contextmanager
 from threading import Lock
 from .config import settings
@@ -54,6 +54,44 @@ class RedisConnectionPool:
             pass
 
 
+def unlink_in_batches(client: redis.Redis, keys: Iterable[str], batch_size: int = 500) -> int:
+    """分批UNLINK（后台释放内存，单条命令耗时有界）
+
+    Args:
+        client: Redis客户端
+        keys: 待删除的key（可为惰性迭代器）
+        batch_size: 每批数量
+
+    Returns:
+        删除的key数量
+    """
+    deleted = 0
+    batch = []
+    for key in keys:
+        batch.append(key)
+        if len(batch) >= batch_size:
+            deleted += client.unlink(*batch)
+            batch = []
+    if batch:
+        deleted += client.unlink(*batch)
+    return deleted
+
+
+def scan_unlink(client: redis.Redis, match: str, count: int = 1000, batch_size: int = 500) -> int:
+    """SCAN匹配的key并分批UNLINK（替代KEYS + DELETE，不阻塞Redis）
+
+    Args:
+        client: Redis客户端
+        match: 匹配模式
+        count: 每次SCAN的提示数量
+        batch_size: 每批UNLINK数量
+
+    Returns:
+        删除的key数量
+    """
+    return unlink_in_batches(client, client.scan_iter(match=match, count=count), batch_size)
+
+
 class SQLiteConnectionPool:
     """SQLite连接池管理器
 
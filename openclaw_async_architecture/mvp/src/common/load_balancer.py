@@ -2,7 +2,9 @@
 from typing import Optional, Dict, Any
 from .multi_model_limiter import MultiModelRateLimiter, get_rate_limiter
 from .task_classifier import TaskClassifier, get_task_classifier
+from .single_flight import SingleFlight
 import json
+import os
 import requests
 
 
@@ -13,12 +15,14 @@ class LoadBalancer:
     整合：
     - TaskClassifier: 根据任务特征选择最优模型
     - MultiModelRateLimiter: 检查并发和RPM限制
+    - SingleFlight: 合并相同的在途请求（节省RPM预算）
     """
 
     def __init__(self):
         # 初始化组件
         self.limiter = get_rate_limiter()
         self.classifier = get_task_classifier()
+        self.single_flight = SingleFlight()
 
         # API配置
         self.api_configs = self._load_api_configs()
@@ -33,7 +37,8 @@ class LoadBalancer:
                 "nvidia2": 0,
                 "siliconflow": 0
             },
-            "failures": 0
+            "failures": 0,
+            "coalesced": 0
         }
 
         print("="*60)
@@ -41,8 +46,11 @@ class LoadBalancer:
         print("="*60)
 
     def _load_api_configs(self) -> Dict:
-        """加载API配置"""
-        config_path = r'C:\Users\10952\.openclaw\workspace\openclaw_async_architecture\API_CONFIG_FINAL.json'
+        """加载API配置（API_CONFIG_PATH可覆盖，如指向Mock服务器的配置）"""
+        config_path = os.getenv(
+            'API_CONFIG_PATH',
+            r'C:\Users\10952\.openclaw\workspace\openclaw_async_architecture\API_CONFIG_FINAL.json'
+        )
         with open(config_path, 'r', encoding='utf-8') as f:
             return json.load(f)['api_configs']
 
@@ -50,6 +58,9 @@ class LoadBalancer:
         """
         智能调用API（自动选择最优模型）
 
+        相同的(prompt, preferred_models)并发调用会被合并：
+        只有第一个调用占用并发/RPM额度并访问上游，其余调用共享其结果
+
         Args:
             prompt: 用户提示词
             preferred_models: 用户优先级（可选）
@@ -60,9 +71,24 @@ class LoadBalancer:
                 "content": str,
                 "model": str,
                 "latency": float,
-                "usage": dict
+                "usage": dict,
+                "coalesced": bool  # 是否共享了其他在途请求的结果
             }
         """
+        key = SingleFlight.make_key(prompt, preferred_models)
+        result, shared = self.single_flight.do(
+            key,
+            lambda: self._call_api_uncoalesced(prompt, preferred_models)
+        )
+
+        if shared:
+            self.request_stats["coalesced"] += 1
+            print(f"[LoadBalancer] 合并在途请求，共享结果（未消耗RPM）")
+
+        return {**result, "coalesced": shared}
+
+    def _call_api_uncoalesced(self, prompt: str, preferred_models: Optional[list] = None) -> Dict[str, Any]:
+        """实际的模型选择和调用（不做请求合并）"""
         # 1. 任务分类
         models_to_try = self.classifier.recommend_model(prompt, preferred_models)
 
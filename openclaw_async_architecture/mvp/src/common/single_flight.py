@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""请求合并（single-flight）- 相同的在途请求只执行一次"""
+
+import hashlib
+import json
+from threading import Event, Lock
+from typing import Any, Callable, Dict, Tuple
+
+
+class _Call:
+    """一次在途调用"""
+
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+
+class SingleFlight:
+    """
+    请求合并器（线程安全）
+
+    同一个key在执行期间，后续调用者不再发起请求，
+    而是等待第一个调用（leader）的结果并共享它。
+    调用完成后key立即释放，不做结果缓存。
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._calls: Dict[str, _Call] = {}
+
+        # 统计
+        self.stats = {
+            "executed": 0,   # 实际执行次数
+            "shared": 0,     # 共享结果次数（节省的上游调用）
+        }
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """
+        生成合并键
+
+        Args:
+            parts: 任意可JSON序列化的参数
+
+        Returns:
+            键（sha256）
+        """
+        key_string = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(key_string.encode('utf-8')).hexdigest()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        执行fn，相同key的并发调用只执行一次
+
+        Args:
+            key: 合并键
+            fn: 实际执行的函数
+
+        Returns:
+            (结果, 是否共享了其他调用的结果)
+
+        Raises:
+            fn抛出的异常（所有等待者都会收到同一个异常）
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.event.wait()
+            with self._lock:
+                self.stats["shared"] += 1
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                self.stats["executed"] += 1
+            call.event.set()
+
+        return call.result, False
+
+    def in_flight(self) -> int:
+        """当前在途调用数"""
+        with self._lock:
+            return len(self._calls)
@@ -1,12 +1,33 @@
 # -*- coding: utf-8 -*-
-"""工具结果缓存 - Phase 2性能优化"""
+"""工具结果缓存 - Phase 2性能优化
+
+两级缓存：
+- L1: 进程内有界缓存（条目数/字节上限，TTL不超过l1_ttl，限制跨Worker的陈旧时间）
+- L2: Redis（所有Worker共享）
+
+失效（不使用KEYS，避免阻塞共享Redis）：
+- 每个工具一个索引ZSET（成员为缓存键，分数为过期时间），写入时顺带清理已过期成员
+- 按工具清空：RENAME索引快照后ZSCAN分批UNLINK
+- 统计：ZCOUNT未过期成员；跨工具的模式失效才退回SCAN
+
+防击穿：
+- 请求合并：同一进程内相同key的并发未命中只计算一次
+- 概率提前刷新（XFetch）：接近过期时按概率让个别调用方提前重算，避免TTL到期瞬间的惊群
+- 负缓存（可选）：失败结果按较短TTL缓存，避免反复重试同一个失败调用
+"""
 
 from abc import ABC, abstractmethod
-from typing import Optional, Any
+from typing import Optional, Any, Awaitable, Callable, Dict, Tuple
+import asyncio
 import hashlib
 import json
+import math
+import random
+import time
+import uuid
 from datetime import datetime, timedelta
-from ..common.connection_pool import redis_pool
+from ..common.connection_pool import redis_pool, unlink_in_batches
+from ..middleware.cache_engine import CacheEngine
 
 
 class BaseCache(ABC):
@@ -35,26 +56,65 @@ class BaseCache(ABC):
 
 class ToolResultCache(BaseCache):
     """
-    工具结果缓存（基于Redis）
+    工具结果缓存（L1进程内 + L2 Redis）
 
     缓存策略：
     - Key: tool_name:hash(input_args)
-    - Value: JSON字符串
+    - Value: JSON字符串（含过期时间和计算耗时，用于提前刷新）
     - TTL: 默认1小时（可配置）
+    - 索引: {prefix}__index__:{tool_name} ZSET，{prefix}__tools__ SET
     """
 
-    def __init__(self, max_size: int = 1000, default_ttl: int = 3600):
+    SCAN_COUNT = 1000  # SCAN/ZSCAN每次提示数量
+    UNLINK_BATCH = 500  # 每批UNLINK数量
+
+    def __init__(
+        self,
+        max_size: int = 1000,
+        default_ttl: int = 3600,
+        redis_client: Optional[Any] = None,
+        l1_ttl: int = 10,
+        l1_max_bytes: int = 32 * 1024 * 1024,
+        early_refresh_beta: float = 1.0,
+        negative_ttl: int = 30
+    ):
         """
         初始化
 
         Args:
-            max_size: 最大缓存条目数（使用LRU淘汰）
+            max_size: L1最大缓存条目数（LRU淘汰）
             default_ttl: 默认TTL（秒）
+            redis_client: Redis客户端（默认使用连接池）
+            l1_ttl: L1最长保留时间（秒），0表示禁用L1
+            l1_max_bytes: L1最大字节数（估算）
+            early_refresh_beta: 提前刷新系数（越大越早刷新，0表示禁用）
+            negative_ttl: 负缓存默认TTL（秒）
         """
-        self.redis_client = redis_pool.client
+        self.redis_client = redis_client if redis_client is not None else redis_pool.client
         self.prefix = "tools:result:"
         self.default_ttl = default_ttl
         self.max_size = max_size
+        self.l1_ttl = l1_ttl
+        self.early_refresh_beta = early_refresh_beta
+        self.negative_ttl = negative_ttl
+
+        # L1: 按工具名分命名空间
+        self._l1 = CacheEngine(max_entries=max_size, max_bytes=l1_max_bytes, default_ttl=l1_ttl)
+
+        # 在途计算：{key: Future}
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        # 统计
+        self.stats = {
+            "l1_hits": 0,
+            "l2_hits": 0,
+            "misses": 0,
+            "computes": 0,
+            "coalesced": 0,
+            "early_refreshes": 0,
+            "negative_hits": 0,
+            "negative_stores": 0,
+        }
 
     def _make_key(self, tool_name: str, args: dict) -> str:
         """生成缓存键
@@ -72,14 +132,118 @@ class ToolResultCache(BaseCache):
         hash_obj = hashlib.md5(normalized_args.encode('utf-8'))
         return f"{self.prefix}{tool_name}:{hash_obj.hexdigest()}"
 
+    def make_key(self, tool_name: str, args: dict) -> str:
+        """生成缓存键（供外部登记/删除单个条目）"""
+        return self._make_key(tool_name, args)
+
+    def _tool_of(self, key: str) -> str:
+        """从缓存键提取工具名（L1命名空间）"""
+        return key[len(self.prefix):].split(":", 1)[0]
+
+    def _index_key(self, tool_name: str) -> str:
+        """工具索引ZSET的键"""
+        return f"{self.prefix}__index__:{tool_name}"
+
+    @property
+    def _tools_key(self) -> str:
+        """已缓存工具名集合的键"""
+        return f"{self.prefix}__tools__"
+
+    # ====== 条目读写（L1 + L2） ======
+
+    def _lookup(self, key: str) -> Tuple[Optional[dict], Optional[str]]:
+        """
+        查找缓存条目（先L1，再L2；L2命中时回填L1）
+
+        Returns:
+            (条目, 来源"l1"/"l2")，未命中返回(None, None)
+        """
+        namespace = self._tool_of(key)
+        if self.l1_ttl > 0:
+            entry = self._l1.get(namespace, key)
+            if entry is not None:
+                return entry, "l1"
+
+        try:
+            cached = self.redis_client.get(key)
+        except Exception:
+            return None, None
+        if not cached:
+            return None, None
+
+        entry = json.loads(cached)
+        self._fill_l1(namespace, key, entry)
+        return entry, "l2"
+
+    def _store(self, key: str, value: Any, ttl: int, delta: float = 0.0, negative: bool = False) -> bool:
+        """写入L2并更新L1"""
+        entry = {
+            "result": value,
+            "timestamp": datetime.now().isoformat(),
+            "expires_at": time.time() + ttl,
+            "delta": delta,
+        }
+        if negative:
+            entry["negative"] = True
+
+        tool_name = self._tool_of(key)
+        self._fill_l1(tool_name, key, entry)
+        try:
+            index = self._index_key(tool_name)
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.setex(key, ttl, json.dumps(entry))
+            pipe.zadd(index, {key: entry["expires_at"]})
+            # 顺带清理已过期成员，索引大小跟随存活条目数
+            pipe.zremrangebyscore(index, "-inf", time.time())
+            pipe.sadd(self._tools_key, tool_name)
+            pipe.execute()
+            return True
+        except Exception:
+            return False
+
+    def _fill_l1(self, namespace: str, key: str, entry: dict):
+        """写入L1（TTL不超过L2剩余时间）"""
+        if self.l1_ttl <= 0:
+            return
+        remaining = entry.get("expires_at", time.time() + self.l1_ttl) - time.time()
+        if remaining > 0:
+            self._l1.set(namespace, key, entry, ttl=min(self.l1_ttl, remaining))
+
+    def _should_refresh_early(self, entry: dict) -> bool:
+        """
+        概率提前刷新（XFetch）
+
+        剩余时间越短、计算越慢，越可能触发刷新：
+        now - delta * beta * ln(rand) >= expires_at
+        """
+        if self.early_refresh_beta <= 0 or entry.get("negative"):
+            return False
+        expires_at = entry.get("expires_at")
+        delta = entry.get("delta", 0.0)
+        if expires_at is None or delta <= 0:
+            return False
+        return time.time() - delta * self.early_refresh_beta * math.log(1.0 - random.random()) >= expires_at
+
+    def _acquire_refresh_lock(self, key: str, entry: dict) -> bool:
+        """
+        跨进程提前刷新锁（SET NX，有效期约为一次计算耗时）
+
+        只有拿到锁的Worker提前重算，其余Worker继续返回未过期的旧值。
+        Redis不可用时视为拿到锁。
+        """
+        lock_ttl = max(1, math.ceil(entry.get("delta", 0.0) * 2))
+        try:
+            return bool(self.redis_client.set(f"{key}:refresh", "1", nx=True, ex=lock_ttl))
+        except Exception:
+            return True
+
+    # ====== 同步接口 ======
+
     def get(self, key: str) -> Optional[Any]:
         """获取缓存"""
         try:
-            cached = self.redis_client.get(key)
-            if cached:
-                data = json.loads(cached)
-                return data.get("result")
-            return None
+            entry, _ = self._lookup(key)
+            return entry.get("result") if entry else None
         except Exception:
             return None
 
@@ -93,14 +257,7 @@ class ToolResultCache(BaseCache):
         try:
             if ttl is None:
                 ttl = self.default_ttl
-
-            data = {
-                "result": value,
-                "timestamp": datetime.now().isoformat()
-            }
-
-            self.redis_client.setex(key, ttl, json.dumps(data))
-            return True
+            return self._store(key, value, ttl)
         except Exception:
             return False
 
@@ -111,8 +268,13 @@ class ToolResultCache(BaseCache):
 
     def delete(self, key: str) -> bool:
         """删除缓存"""
+        tool_name = self._tool_of(key)
+        self._l1.delete(tool_name, key)
         try:
-            self.redis_client.delete(key)
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.unlink(key)
+            pipe.zrem(self._index_key(tool_name), key)
+            pipe.execute()
             return True
         except Exception:
             return False
@@ -122,46 +284,156 @@ class ToolResultCache(BaseCache):
         key = self._make_key(tool_name, args)
         return self.delete(key)
 
+    # ====== 异步接口（合并 + 提前刷新 + 负缓存） ======
+
+    async def get_or_compute(
+        self,
+        tool_name: str,
+        args: dict,
+        compute: Callable[[], Awaitable[Any]],
+        ttl: Optional[int] = None,
+        negative_ttl: Optional[int] = None,
+        is_failure: Optional[Callable[[Any], bool]] = None
+    ) -> Tuple[Any, str]:
+        """
+        读取缓存，未命中时计算并写入
+
+        Args:
+            tool_name: 工具名称
+            args: 工具参数
+            compute: 计算结果的协程函数（结果需可JSON序列化）
+            ttl: 成功结果TTL（秒）
+            negative_ttl: 失败结果TTL（秒），0表示不缓存失败（默认不缓存）
+            is_failure: 判断结果是否为失败的函数（负缓存用）
+
+        Returns:
+            (结果, 来源)：来源为"l1"/"l2"/"compute"/"coalesced"
+        """
+        key = self._make_key(tool_name, args)
+        entry, source = self._lookup(key)
+
+        if entry is not None:
+            if entry.get("negative"):
+                self.stats["negative_hits"] += 1
+                return entry["result"], source
+            if not self._should_refresh_early(entry):
+                self.stats[f"{source}_hits"] += 1
+                return entry["result"], source
+
+        inflight = self._inflight.get(key)
+        if entry is not None and (inflight is not None or not self._acquire_refresh_lock(key, entry)):
+            # 已有调用方（本进程或其他Worker）在刷新，继续使用未过期的旧值
+            self.stats[f"{source}_hits"] += 1
+            return entry["result"], source
+
+        if inflight is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(inflight), "coalesced"
+
+        if entry is not None:
+            self.stats["early_refreshes"] += 1
+        else:
+            self.stats["misses"] += 1
+
+        future = asyncio.get_running_loop().create_future()
+        # 没有等待者时也标记异常已读取，避免"exception was never retrieved"
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        try:
+            start = time.monotonic()
+            result = await compute()
+            delta = time.monotonic() - start
+            self.stats["computes"] += 1
+
+            if is_failure is not None and is_failure(result):
+                negative_ttl = negative_ttl if negative_ttl is not None else 0
+                if negative_ttl > 0:
+                    self._store(key, result, negative_ttl, negative=True)
+                    self.stats["negative_stores"] += 1
+            else:
+                self._store(key, result, ttl or self.default_ttl, delta=delta)
+
+            future.set_result(result)
+            return result, "compute"
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    # ====== 批量操作 ======
+
+    def _purge_tool(self, tool_name: str) -> int:
+        """
+        删除某个工具的全部L2条目
+
+        先把索引RENAME为快照（原子操作，之后的写入进入新索引），
+        再ZSCAN快照分批UNLINK，每条命令耗时有界。
+
+        Returns:
+            删除的缓存数量
+        """
+        snapshot = f"{self._index_key(tool_name)}:purging:{uuid.uuid4().hex}"
+        try:
+            self.redis_client.rename(self._index_key(tool_name), snapshot)
+        except Exception:
+            # 索引不存在
+            return 0
+
+        members = (
+            member for member, _ in
+            self.redis_client.zscan_iter(snapshot, count=self.SCAN_COUNT)
+        )
+        deleted = unlink_in_batches(self.redis_client, members, self.UNLINK_BATCH)
+        self.redis_client.unlink(snapshot)
+        return deleted
+
     def clear(self) -> bool:
         """清空所有工具结果缓存"""
+        self._l1.clear()
         try:
-            keys = self.redis_client.keys(f"{self.prefix}*")
-            if keys:
-                self.redis_client.delete(*keys)
+            for tool_name in self.redis_client.smembers(self._tools_key):
+                self._purge_tool(tool_name)
+            self.redis_client.unlink(self._tools_key)
             return True
         except Exception:
             return False
 
     def clear_by_tool(self, tool_name: str) -> bool:
         """清空指定工具的缓存"""
+        self._l1.invalidate_namespace(tool_name)
         try:
-            keys = self.redis_client.keys(f"{self.prefix}{tool_name}:*")
-            if keys:
-                self.redis_client.delete(*keys)
+            self._purge_tool(tool_name)
             return True
         except Exception:
             return False
 
     def get_stats(self) -> dict:
         """获取缓存统计"""
+        lookups = self.stats["l1_hits"] + self.stats["l2_hits"] + self.stats["misses"]
         stats = {
             "total_keys": 0,
-            "tools": {}
+            "tools": {},
+            "counters": dict(self.stats),
+            "hit_ratio": (self.stats["l1_hits"] + self.stats["l2_hits"]) / lookups if lookups else 0.0,
+            "l1": self._l1.get_stats(),
         }
 
         try:
-            keys = self.redis_client.keys(f"{self.prefix}*")
-            stats["total_keys"] = len(keys)
-
-            # 按工具分组统计
-            for key in keys:
-                # 提取工具名
-                parts = key.split(":")
-                if len(parts) >= 3:
-                    tool_name = parts[2]
-                    if tool_name not in stats["tools"]:
-                        stats["tools"][tool_name] = 0
-                    stats["tools"][tool_name] += 1
+            # 按工具统计未过期条目（每个工具一次ZCOUNT，与总key数无关）
+            tool_names = sorted(self.redis_client.smembers(self._tools_key))
+            now = time.time()
+            pipe = self.redis_client.pipeline(transaction=False)
+            for tool_name in tool_names:
+                pipe.zcount(self._index_key(tool_name), now, "+inf")
+            for tool_name, count in zip(tool_names, pipe.execute()):
+                if count:
+                    stats["tools"][tool_name] = count
+                    stats["total_keys"] += count
 
         except Exception:
             pass
@@ -171,21 +443,65 @@ class ToolResultCache(BaseCache):
     def invalidate_by_pattern(self, pattern: str) -> int:
         """根据模式使缓存失效
 
+        模式以确定的工具名开头时只扫描该工具的索引（"read_file:*"等价于clear_by_tool），
+        工具名含通配符时才退回SCAN整个前缀。
+
         Args:
             pattern: 匹配模式（如 "read_file:*"）
 
         Returns:
             失效的缓存数量
         """
+        tool_name, _, rest = pattern.partition(":")
         try:
-            keys = self.redis_client.keys(f"{self.prefix}{pattern}")
-            if keys:
-                self.redis_client.delete(*keys)
-                return len(keys)
-            return 0
+            if not any(c in tool_name for c in "*?[\\"):
+                self._l1.invalidate_namespace(tool_name)
+                if rest == "*":
+                    return self._purge_tool(tool_name)
+
+                index = self._index_key(tool_name)
+                members = [
+                    member for member, _ in
+                    self.redis_client.zscan_iter(index, match=f"{self.prefix}{pattern}", count=self.SCAN_COUNT)
+                ]
+                for start in range(0, len(members), self.UNLINK_BATCH):
+                    self.redis_client.zrem(index, *members[start:start + self.UNLINK_BATCH])
+                return unlink_in_batches(self.redis_client, members, self.UNLINK_BATCH)
+
+            # 跨工具模式：L1无法按模式匹配，直接清空（只影响本进程的短期副本）
+            self._l1.clear()
+            return self._scan_invalidate(pattern)
         except Exception:
             return 0
 
+    def _scan_invalidate(self, pattern: str) -> int:
+        """SCAN匹配的缓存键分批UNLINK，并从各自工具索引中移除"""
+        deleted = 0
+        batch = []
+        internal = f"{self.prefix}__"
+        keys = self.redis_client.scan_iter(match=f"{self.prefix}{pattern}", count=self.SCAN_COUNT)
+        for key in keys:
+            if key.startswith(internal):
+                continue
+            batch.append(key)
+            if len(batch) >= self.UNLINK_BATCH:
+                deleted += self._unlink_indexed(batch)
+                batch = []
+        if batch:
+            deleted += self._unlink_indexed(batch)
+        return deleted
+
+    def _unlink_indexed(self, keys: list) -> int:
+        """UNLINK一批缓存键并同步索引"""
+        by_tool: Dict[str, list] = {}
+        for key in keys:
+            by_tool.setdefault(self._tool_of(key), []).append(key)
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.unlink(*keys)
+        for tool_name, members in by_tool.items():
+            pipe.zrem(self._index_key(tool_name), *members)
+        return pipe.execute()[0]
+
 
 # 全局单例
 tool_cache = ToolResultCache(max_size=1000, default_ttl=3600)
@@ -9,6 +9,11 @@ Components:
 - middleware_chain: Execution chain manager
 - builtin_middlewares: Built-in middlewares (logging, monitoring, rate limiting)
 - cache_middleware: Result caching middleware
+- cache_engine: Bounded LRU/W-TinyLFU cache with TTL expiry
+- latency_histogram: Fixed-memory windowed latency percentile histograms
+- rate_limiter: GCRA rate limiters (in-process and Redis)
+- log_sink: Non-blocking batched log sink (console/JSONL/SQLite writers)
+- audit_store: Shared audit sink and time-partitioned, queryable SQLite audit store
 
 Usage:
     from src.middleware import MiddlewareChain, LoggingMiddleware, CacheMiddleware
@@ -34,6 +39,7 @@ from .base_middleware import (
     MiddlewareResult,
     ExecutionContext,
     MiddlewareOrder,
+    CONTINUE,
 )
 from .middleware_chain import MiddlewareChain
 from .builtin_middlewares import (
@@ -42,6 +48,11 @@ from .builtin_middlewares import (
     RateLimitMiddleware,
 )
 from .cache_middleware import CacheMiddleware
+from .cache_engine import CacheEngine
+from .rate_limiter import MemoryRateLimiter, RedisRateLimiter
+from .latency_histogram import LogHistogram, WindowedHistogram
+from .log_sink import AsyncLogSink, JsonlFileWriter, SQLiteWriter, create_writer
+from .audit_store import AuditStore, get_audit_store, query_audit, record_audit
 from .config_loader import MiddlewareConfigLoader
 
 __all__ = [
@@ -50,6 +61,7 @@ __all__ = [
     "MiddlewareResult",
     "ExecutionContext",
     "MiddlewareOrder",
+    "CONTINUE",
     # Chain
     "MiddlewareChain",
     # Built-in
@@ -57,6 +69,19 @@ __all__ = [
     "MonitoringMiddleware",
     "RateLimitMiddleware",
     "CacheMiddleware",
+    "CacheEngine",
+    "MemoryRateLimiter",
+    "RedisRateLimiter",
+    "LogHistogram",
+    "WindowedHistogram",
+    "AsyncLogSink",
+    "JsonlFileWriter",
+    "SQLiteWriter",
+    "create_writer",
+    "AuditStore",
+    "get_audit_store",
+    "query_audit",
+    "record_audit",
     "MiddlewareConfigLoader",
 ]
 
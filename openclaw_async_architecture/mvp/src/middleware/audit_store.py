@@ -0,0 +1,450 @@
+"""
+Audit Store
+===========
+
+Single audit trail for tool calls, shared by `security.audit_log`,
+`SecurityMiddleware` and the plugin `SandboxedRuntime`.
+
+Producers call `record_audit()`, which masks sensitive parameters and
+hands a compact record to a non-blocking `AsyncLogSink`; the sink thread
+batches the inserts. With `AUDIT_LOG_PATH` pointing at a `.db`/`.sqlite`
+file the records go to an `AuditStore`:
+
+- append-only SQLite, one table per time partition (`audit_YYYYMMDD`),
+  each indexed by time, tool, user and outcome
+- retention drops whole partitions (no row-level deletes)
+- `query()`/`count()` filter by tool, user, outcome, source and time range,
+  reading only the partitions that overlap the range
+
+Any other `AUDIT_LOG_PATH` is a JSONL file; without it records are
+forwarded to the logger.
+
+Usage:
+    record_audit("error", "read_file", {"path": "a.txt"}, error="Not found", user="u1")
+
+    store = get_audit_store()
+    rows = query_audit(tool="read_file", outcome="error", start=time.time() - 3600)
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from .log_sink import AsyncLogSink, LoggerWriter, LogItem, LogWriter, create_writer
+
+logger = logging.getLogger(__name__)
+
+# Outcomes used by the built-in producers
+AUDIT_OUTCOMES = ("call", "success", "error", "denied")
+
+AUDIT_MASKED_FIELDS: Set[str] = {
+    "password",
+    "api_key",
+    "token",
+    "secret",
+    "key",
+}
+
+MAX_TEXT_CHARS = 1000
+
+# partition name -> (seconds, table name format)
+PARTITIONS = {
+    "hour": (3600, "%Y%m%d%H"),
+    "day": (86400, "%Y%m%d"),
+}
+
+TimeValue = Union[float, int, datetime, None]
+
+
+def mask_sensitive_data(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Mask sensitive values (keys containing password/api_key/token/secret/key).
+
+    Args:
+        data: Original data
+
+    Returns:
+        Masked copy (nested dicts are masked recursively)
+    """
+    masked = {}
+    for key, value in data.items():
+        key_lower = key.lower()
+        if any(field in key_lower for field in AUDIT_MASKED_FIELDS):
+            masked[key] = "***HIDDEN***"
+        elif isinstance(value, dict):
+            masked[key] = mask_sensitive_data(value)
+        else:
+            masked[key] = value
+    return masked
+
+
+def _timestamp(value: TimeValue) -> Optional[float]:
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return value
+
+
+def _compact(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+class AuditStore(LogWriter):
+    """
+    Append-only, time-partitioned SQLite audit store.
+
+    Used as the writer of an AsyncLogSink (`write_batch` runs on the sink
+    thread); `query`/`count` may be called from any thread and use their
+    own read connection.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        partition: str = "day",
+        retention_days: Optional[float] = 30,
+    ):
+        """
+        Args:
+            path: Database file path
+            partition: Partition size ("hour" or "day")
+            retention_days: Drop partitions that ended longer ago than this
+                (None keeps everything)
+        """
+        if partition not in PARTITIONS:
+            raise ValueError(f"Unsupported partition: {partition}")
+        self.path = path
+        self.partition = partition
+        self.partition_seconds, self._name_format = PARTITIONS[partition]
+        self.retention_days = retention_days
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS audit_partitions (
+                name TEXT PRIMARY KEY,
+                start REAL NOT NULL,
+                end REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+        # partition start -> table name
+        self._known: Dict[int, str] = {
+            int(start): name
+            for name, start in self._conn.execute("SELECT name, start FROM audit_partitions")
+        }
+        self.apply_retention()
+
+    # ------------------------------------------------------------------
+    # Writing (sink thread)
+    # ------------------------------------------------------------------
+
+    def write_batch(self, items: List[LogItem]):
+        groups: Dict[int, List[Tuple]] = {}
+        seconds = self.partition_seconds
+        for ts, source, record in items:
+            groups.setdefault(int(ts // seconds) * seconds, []).append((
+                ts,
+                source,
+                record.get("event_type") or record.get("event"),
+                record.get("tool_name") or record.get("tool"),
+                record.get("user"),
+                record.get("duration_ms"),
+                _compact(record.get("params")),
+                record.get("result"),
+                record.get("error"),
+            ))
+
+        with self._lock:
+            created = False
+            with self._conn:
+                for start, rows in groups.items():
+                    table = self._known.get(start)
+                    if table is None:
+                        table = self._create_partition(start)
+                        created = True
+                    self._conn.executemany(
+                        f"INSERT INTO {table} (ts, source, outcome, tool, user, duration_ms, params, result, error) "
+                        f"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        rows
+                    )
+            if created:
+                self._apply_retention_locked(time.time())
+
+    def _create_partition(self, start: int) -> str:
+        table = "audit_" + time.strftime(self._name_format, time.gmtime(start))
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                ts REAL NOT NULL,
+                source TEXT NOT NULL,
+                outcome TEXT,
+                tool TEXT,
+                user TEXT,
+                duration_ms REAL,
+                params TEXT,
+                result TEXT,
+                error TEXT
+            )
+        """)
+        for column in ("ts", "tool, ts", "user, ts", "outcome, ts"):
+            suffix = column.split(",")[0]
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{suffix} ON {table}({column})")
+        self._conn.execute(
+            "INSERT OR REPLACE INTO audit_partitions (name, start, end) VALUES (?, ?, ?)",
+            (table, start, start + self.partition_seconds)
+        )
+        self._known[start] = table
+        return table
+
+    def apply_retention(self, now: Optional[float] = None) -> List[str]:
+        """
+        Drop partitions older than the retention period.
+
+        Returns:
+            Names of the dropped partitions
+        """
+        with self._lock:
+            return self._apply_retention_locked(time.time() if now is None else now)
+
+    def _apply_retention_locked(self, now: float) -> List[str]:
+        if self.retention_days is None:
+            return []
+        cutoff = now - self.retention_days * 86400
+        expired = self._conn.execute(
+            "SELECT name, start FROM audit_partitions WHERE end <= ?", (cutoff,)
+        ).fetchall()
+        with self._conn:
+            for name, start in expired:
+                self._conn.execute(f"DROP TABLE IF EXISTS {name}")
+                self._conn.execute("DELETE FROM audit_partitions WHERE name = ?", (name,))
+                self._known.pop(int(start), None)
+        if expired:
+            logger.info(f"Audit retention dropped {len(expired)} partition(s)")
+        return [name for name, _ in expired]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ------------------------------------------------------------------
+    # Querying (any thread)
+    # ------------------------------------------------------------------
+
+    def partitions(self) -> List[Dict[str, Any]]:
+        """Partitions in time order"""
+        with self._reader() as conn:
+            rows = conn.execute("SELECT name, start, end FROM audit_partitions ORDER BY start").fetchall()
+        return [{"name": name, "start": start, "end": end} for name, start, end in rows]
+
+    def query(
+        self,
+        tool: Optional[str] = None,
+        user: Optional[str] = None,
+        outcome: Optional[str] = None,
+        source: Optional[str] = None,
+        start: TimeValue = None,
+        end: TimeValue = None,
+        limit: Optional[int] = 100,
+        newest_first: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """
+        Query audit records.
+
+        Args:
+            tool: Tool name
+            user: User identifier
+            outcome: "call", "success", "error" or "denied"
+            source: Producer ("audit", "security_middleware", "plugin")
+            start: Earliest timestamp (unix seconds or datetime, inclusive)
+            end: Latest timestamp (exclusive)
+            limit: Maximum records (None for all)
+            newest_first: Sort order
+
+        Returns:
+            Records with timestamp, source, outcome, tool, user,
+            duration_ms, params, result and error
+        """
+        where, args = self._filters(tool, user, outcome, source, start, end)
+        order = "DESC" if newest_first else "ASC"
+        records: List[Dict[str, Any]] = []
+        with self._reader() as conn:
+            for table in self._tables(conn, start, end, newest_first):
+                sql = (f"SELECT ts, source, outcome, tool, user, duration_ms, params, result, error "
+                       f"FROM {table}{where} ORDER BY ts {order}")
+                table_args = list(args)
+                if limit is not None:
+                    sql += " LIMIT ?"
+                    table_args.append(limit - len(records))
+                for ts, src, out, tool_name, user_id, duration, params, result, error in conn.execute(sql, table_args):
+                    records.append({
+                        "timestamp": ts,
+                        "source": src,
+                        "outcome": out,
+                        "tool": tool_name,
+                        "user": user_id,
+                        "duration_ms": duration,
+                        "params": json.loads(params) if params else None,
+                        "result": result,
+                        "error": error,
+                    })
+                if limit is not None and len(records) >= limit:
+                    break
+        return records
+
+    def count(
+        self,
+        tool: Optional[str] = None,
+        user: Optional[str] = None,
+        outcome: Optional[str] = None,
+        source: Optional[str] = None,
+        start: TimeValue = None,
+        end: TimeValue = None,
+    ) -> int:
+        """Count audit records (same filters as query)"""
+        where, args = self._filters(tool, user, outcome, source, start, end)
+        total = 0
+        with self._reader() as conn:
+            for table in self._tables(conn, start, end, True):
+                total += conn.execute(f"SELECT COUNT(*) FROM {table}{where}", args).fetchone()[0]
+        return total
+
+    def _reader(self) -> "closing[sqlite3.Connection]":
+        return closing(sqlite3.connect(self.path, timeout=5.0))
+
+    def _tables(self, conn, start: TimeValue, end: TimeValue, newest_first: bool) -> Iterable[str]:
+        sql = "SELECT name FROM audit_partitions WHERE 1=1"
+        args: List[Any] = []
+        if start is not None:
+            sql += " AND end > ?"
+            args.append(_timestamp(start))
+        if end is not None:
+            sql += " AND start < ?"
+            args.append(_timestamp(end))
+        sql += " ORDER BY start " + ("DESC" if newest_first else "ASC")
+        return [name for (name,) in conn.execute(sql, args).fetchall()]
+
+    @staticmethod
+    def _filters(tool, user, outcome, source, start, end) -> Tuple[str, List[Any]]:
+        clauses = []
+        args: List[Any] = []
+        for column, value in (("tool", tool), ("user", user), ("outcome", outcome), ("source", source)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                args.append(value)
+        if start is not None:
+            clauses.append("ts >= ?")
+            args.append(_timestamp(start))
+        if end is not None:
+            clauses.append("ts < ?")
+            args.append(_timestamp(end))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+
+def create_audit_writer(target: Optional[str]) -> LogWriter:
+    """
+    Create the audit writer from a target spec.
+
+    Args:
+        target: "*.db"/"*.sqlite"/"*.sqlite3" for an AuditStore, None/"" for
+            the logger, anything else as for `create_writer`
+
+    Returns:
+        Writer instance
+    """
+    if not target:
+        return LoggerWriter(logger, prefix="AUDIT: ")
+    if target.endswith((".db", ".sqlite", ".sqlite3")):
+        retention = os.getenv("AUDIT_RETENTION_DAYS")
+        return AuditStore(target, retention_days=float(retention) if retention else 30)
+    return create_writer(target)
+
+
+_audit_sink: Optional[AsyncLogSink] = None
+_audit_lock = threading.Lock()
+
+
+def get_audit_sink() -> AsyncLogSink:
+    """Shared audit sink (created on first use from AUDIT_LOG_PATH)"""
+    global _audit_sink
+    if _audit_sink is None:
+        with _audit_lock:
+            if _audit_sink is None:
+                _audit_sink = AsyncLogSink(create_audit_writer(os.getenv("AUDIT_LOG_PATH")), name="audit-sink")
+    return _audit_sink
+
+
+def set_audit_sink(sink: Optional[AsyncLogSink]):
+    """Replace the shared audit sink (None recreates it from AUDIT_LOG_PATH on next use)"""
+    global _audit_sink
+    _audit_sink = sink
+
+
+def get_audit_store() -> Optional[AuditStore]:
+    """The AuditStore behind the shared sink, or None if records are not stored in SQLite"""
+    writer = get_audit_sink().writer
+    return writer if isinstance(writer, AuditStore) else None
+
+
+def record_audit(
+    event_type: str,
+    tool_name: str,
+    params: Optional[Dict[str, Any]] = None,
+    result: Optional[str] = None,
+    error: Optional[str] = None,
+    user: Optional[str] = None,
+    duration_ms: Optional[float] = None,
+    source: str = "audit",
+) -> bool:
+    """
+    Record one audit event (non-blocking).
+
+    Sensitive parameters are masked and texts truncated here, so secrets
+    never enter the queue; serialization and I/O happen in the sink thread.
+
+    Args:
+        event_type: Outcome ("call", "success", "error", "denied")
+        tool_name: Tool name
+        params: Tool parameters
+        result: Execution result
+        error: Error message
+        user: User identifier
+        duration_ms: Execution time
+        source: Producer name
+
+    Returns:
+        False if the record was dropped (sink full)
+    """
+    return get_audit_sink().emit(source, {
+        "event_type": event_type,
+        "tool_name": tool_name,
+        "params": mask_sensitive_data(params) if params else params,
+        "result": result[:MAX_TEXT_CHARS] if result else None,
+        "error": error[:MAX_TEXT_CHARS] if error else None,
+        "user": user or "unknown",
+        "duration_ms": duration_ms,
+    })
+
+
+def query_audit(**filters) -> List[Dict[str, Any]]:
+    """
+    Flush pending records and query the audit store (filters as AuditStore.query).
+
+    Raises:
+        RuntimeError: Audit records are not stored in SQLite
+    """
+    store = get_audit_store()
+    if store is None:
+        raise RuntimeError("Audit store not configured (set AUDIT_LOG_PATH to a .db file)")
+    get_audit_sink().flush()
+    return store.query(**filters)
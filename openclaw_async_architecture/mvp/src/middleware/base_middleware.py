@@ -12,6 +12,8 @@ from datetime import datetime
 class MiddlewareResult:
     """Result from middleware execution"""
 
+    __slots__ = ("success", "skip_remaining", "modified_params", "modified_result", "error")
+
     def __init__(
         self,
         success: bool = True,
@@ -27,8 +29,42 @@ class MiddlewareResult:
         self.error = error
 
 
+class _ContinueResult(MiddlewareResult):
+    """Immutable "nothing to do, continue" result (shared singleton)"""
+
+    __slots__ = ()
+
+    def __init__(self):
+        for slot in MiddlewareResult.__slots__:
+            object.__setattr__(self, slot, None)
+        object.__setattr__(self, "success", True)
+        object.__setattr__(self, "skip_remaining", False)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CONTINUE is shared and cannot be modified; return a new MiddlewareResult")
+
+    def __repr__(self):
+        return "CONTINUE"
+
+
+# Return this instead of MiddlewareResult() when a middleware has nothing to report
+CONTINUE = _ContinueResult()
+
+
 class ExecutionContext:
-    """Context passed through middleware chain"""
+    """
+    Context passed through middleware chain.
+
+    `metadata` and `middleware_data` are allocated on first use, and the
+    original parameters are only copied when a middleware modifies them.
+    Timing uses monotonic nanoseconds (`start_ns`/`end_ns`).
+    """
+
+    __slots__ = (
+        "tool_name", "parameters", "user_id", "result", "error",
+        "start_ns", "end_ns", "start_time", "end_time",
+        "_original_parameters", "_metadata", "_middleware_data",
+    )
 
     def __init__(
         self,
@@ -39,32 +75,66 @@ class ExecutionContext:
     ):
         self.tool_name = tool_name
         self.parameters = parameters
-        self.original_parameters = parameters.copy()
         self.user_id = user_id
-        self.metadata = metadata or {}
+        self.result: Optional[Any] = None
+        self.error: Optional[str] = None
 
+        # Monotonic timing set by the chain (time.perf_counter_ns)
+        self.start_ns: Optional[int] = None
+        self.end_ns: Optional[int] = None
+        # Wall-clock timing (optional, set by callers that need datetimes)
         self.start_time: Optional[datetime] = None
         self.end_time: Optional[datetime] = None
-        self.result: Optional[Any] = None
-        self.error: Optional[str] = None
 
-        # Middleware-specific data
-        self.middleware_data: Dict[str, Any] = {}
+        self._original_parameters: Optional[Dict[str, Any]] = None
+        self._metadata = metadata
+        self._middleware_data: Optional[Dict[str, Any]] = None
+
+    @property
+    def original_parameters(self) -> Dict[str, Any]:
+        """Parameters as passed in, before any middleware modification"""
+        if self._original_parameters is None:
+            return self.parameters
+        return self._original_parameters
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Metadata dict (allocated on first access)"""
+        if self._metadata is None:
+            self._metadata = {}
+        return self._metadata
+
+    @metadata.setter
+    def metadata(self, value: Dict[str, Any]):
+        self._metadata = value
+
+    @property
+    def middleware_data(self) -> Dict[str, Any]:
+        """Middleware-specific data (allocated on first access)"""
+        if self._middleware_data is None:
+            self._middleware_data = {}
+        return self._middleware_data
 
     @property
     def duration_ms(self) -> Optional[float]:
         """Get execution duration in milliseconds"""
+        if self.start_ns is not None and self.end_ns is not None:
+            return (self.end_ns - self.start_ns) / 1_000_000
         if self.start_time and self.end_time:
             return (self.end_time - self.start_time).total_seconds() * 1000
         return None
 
     def update_params(self, new_params: Dict[str, Any]):
-        """Update parameters (used by middleware)"""
-        self.parameters.update(new_params)
+        """Update parameters (used by middleware); the caller's dict is left untouched"""
+        if self._original_parameters is None:
+            self._original_parameters = self.parameters
+        self.parameters = {**self.parameters, **new_params}
 
     def get_metadata(self, key: str, default: Any = None) -> Any:
         """Get metadata value"""
-        return self.metadata.get(key, default)
+        if self._metadata is None:
+            return default
+        return self._metadata.get(key, default)
 
     def set_metadata(self, key: str, value: Any):
         """Set metadata value"""
@@ -72,7 +142,9 @@ class ExecutionContext:
 
     def get_middleware_data(self, key: str, default: Any = None) -> Any:
         """Get middleware-specific data"""
-        return self.middleware_data.get(key, default)
+        if self._middleware_data is None:
+            return default
+        return self._middleware_data.get(key, default)
 
     def set_middleware_data(self, key: str, value: Any):
         """Set middleware-specific data"""
@@ -89,11 +161,33 @@ class MiddlewareOrder(str, Enum):
 class BaseMiddleware:
     """Base class for all middlewares"""
 
+    # Bumped whenever any middleware's enabled/priority changes, so chains
+    # know to recompile their call sequences
+    _config_version = 0
+
     def __init__(self, name: str, enabled: bool = True, priority: int = 100):
         self.name = name
         self.enabled = enabled
         self.priority = priority  # Lower priority executes first
 
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, value: bool):
+        self._enabled = value
+        BaseMiddleware._config_version += 1
+
+    @property
+    def priority(self) -> int:
+        return self._priority
+
+    @priority.setter
+    def priority(self, value: int):
+        self._priority = value
+        BaseMiddleware._config_version += 1
+
     async def pre_process(self, ctx: ExecutionContext) -> MiddlewareResult:
         """
         Pre-process before tool execution.
@@ -104,7 +198,7 @@ class BaseMiddleware:
         Returns:
             MiddlewareResult (set skip_remaining=True to stop chain)
         """
-        return MiddlewareResult()
+        return CONTINUE
 
     async def post_process(
         self,
@@ -121,7 +215,7 @@ class BaseMiddleware:
         Returns:
             MiddlewareResult (modified_result can be set)
         """
-        return MiddlewareResult()
+        return CONTINUE
 
     async def on_error(
         self,
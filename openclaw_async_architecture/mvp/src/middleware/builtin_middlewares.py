@@ -5,22 +5,33 @@ Built-in Middlewares
 Common middlewares for logging, monitoring, rate limiting, and caching.
 """
 import time
-import json
-from typing import Optional, Dict, Any, List
-from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple, Union, Callable, Sequence
 
 from .base_middleware import (
     BaseMiddleware,
     ExecutionContext,
     MiddlewareResult,
+    CONTINUE,
 )
+from .latency_histogram import (
+    DEFAULT_QUANTILES,
+    DEFAULT_WINDOWS,
+    LogHistogram,
+    LogMapping,
+    WindowedHistogram,
+    prometheus_summary,
+)
+from .log_sink import AsyncLogSink, get_default_sink
+from .rate_limiter import MemoryRateLimiter, RedisRateLimiter
 
 
 class LoggingMiddleware(BaseMiddleware):
     """
     Logging middleware for structured logging.
 
-    Logs all tool executions with context information.
+    Logs all tool executions with context information. Records are
+    handed to a non-blocking AsyncLogSink; serialization and I/O happen
+    on the sink's background thread.
     """
 
     def __init__(
@@ -28,11 +39,23 @@ class LoggingMiddleware(BaseMiddleware):
         name: str = "logging",
         enabled: bool = True,
         log_level: str = "INFO",
-        include_params: bool = True
+        include_params: bool = True,
+        sink: Optional[AsyncLogSink] = None
     ):
+        """
+        Initialize logging middleware.
+
+        Args:
+            name: Middleware name
+            enabled: Whether enabled
+            log_level: Log level label
+            include_params: Include (sanitized) parameters in tool_start records
+            sink: Log sink (default: shared console sink, see LOG_SINK env var)
+        """
         super().__init__(name, enabled, priority=10)
         self.log_level = log_level
         self.include_params = include_params
+        self.sink = sink or get_default_sink()
 
     async def pre_process(self, ctx: ExecutionContext) -> MiddlewareResult:
         """Log before tool execution"""
@@ -40,14 +63,13 @@ class LoggingMiddleware(BaseMiddleware):
             "event": "tool_start",
             "tool": ctx.tool_name,
             "user": ctx.user_id,
-            "timestamp": datetime.now().isoformat(),
         }
 
         if self.include_params:
             log_data["params"] = self._sanitize_params(ctx.parameters)
 
         self._log(log_data)
-        return MiddlewareResult()
+        return CONTINUE
 
     async def post_process(
         self,
@@ -59,7 +81,6 @@ class LoggingMiddleware(BaseMiddleware):
             "event": "tool_end",
             "tool": ctx.tool_name,
             "user": ctx.user_id,
-            "timestamp": datetime.now().isoformat(),
             "duration_ms": ctx.duration_ms,
             "success": ctx.error is None,
         }
@@ -68,7 +89,7 @@ class LoggingMiddleware(BaseMiddleware):
             log_data["error"] = ctx.error
 
         self._log(log_data)
-        return MiddlewareResult()
+        return CONTINUE
 
     async def on_error(
         self,
@@ -80,7 +101,6 @@ class LoggingMiddleware(BaseMiddleware):
             "event": "tool_error",
             "tool": ctx.tool_name,
             "user": ctx.user_id,
-            "timestamp": datetime.now().isoformat(),
             "error": str(error),
             "error_type": type(error).__name__,
         }
@@ -89,8 +109,8 @@ class LoggingMiddleware(BaseMiddleware):
         return MiddlewareResult(success=False, error=str(error))
 
     def _log(self, data: Dict[str, Any]):
-        """Log data to console"""
-        print(f"[{self.name.upper()}] {json.dumps(data, ensure_ascii=False)}")
+        """Enqueue a record (timestamp added by the sink)"""
+        self.sink.emit(self.name, data)
 
     def _sanitize_params(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Remove sensitive data from parameters"""
@@ -110,15 +130,46 @@ class MonitoringMiddleware(BaseMiddleware):
     """
     Monitoring middleware for performance tracking.
 
-    Tracks execution time, error rates, and throughput.
+    Tracks call counts and error rates, plus latency percentiles per tool
+    and per outcome ("success"/"error") over sliding windows (1m/5m/1h by
+    default). Histograms are fixed-memory log-bucketed sketches, so tail
+    latency is reported within 1% without storing samples.
     """
 
-    def __init__(self, name: str = "monitoring", enabled: bool = True):
+    OUTCOMES = ("success", "error")
+
+    def __init__(
+        self,
+        name: str = "monitoring",
+        enabled: bool = True,
+        windows: Optional[Dict[str, Tuple[int, int]]] = None,
+        quantiles: Sequence[float] = DEFAULT_QUANTILES,
+        relative_accuracy: float = 0.01,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Initialize monitoring middleware.
+
+        Args:
+            name: Middleware name
+            enabled: Whether enabled
+            windows: name -> (window_seconds, slots), default 1m/5m/1h
+            quantiles: Quantiles reported by get_percentiles/export
+            relative_accuracy: Max relative error of reported latencies
+            clock: Time source for windows (monotonic seconds)
+        """
         super().__init__(name, enabled)
         self.priority = 20  # Execute after logging
 
+        self.windows = windows or DEFAULT_WINDOWS
+        self.quantiles = tuple(quantiles)
+        self.clock = clock
+        self._mapping = LogMapping(relative_accuracy)
+
         # Statistics
         self._stats: Dict[str, Dict[str, Any]] = {}
+        # (tool_name, outcome) -> histogram of durations in ms
+        self._latency: Dict[Tuple[str, str], WindowedHistogram] = {}
 
     async def post_process(
         self,
@@ -126,11 +177,25 @@ class MonitoringMiddleware(BaseMiddleware):
         tool_result: Any
     ) -> MiddlewareResult:
         """Update statistics after tool execution"""
+        self._record(ctx, "error" if ctx.error else "success")
+        return CONTINUE
+
+    async def on_error(
+        self,
+        ctx: ExecutionContext,
+        error: Exception
+    ) -> MiddlewareResult:
+        """Count failed executions (the error is not handled)"""
+        self._record(ctx, "error")
+        return MiddlewareResult(success=False, error=str(error))
+
+    def _record(self, ctx: ExecutionContext, outcome: str):
         tool_name = ctx.tool_name
 
         # Initialize stats if needed
-        if tool_name not in self._stats:
-            self._stats[tool_name] = {
+        stats = self._stats.get(tool_name)
+        if stats is None:
+            stats = self._stats[tool_name] = {
                 "call_count": 0,
                 "success_count": 0,
                 "error_count": 0,
@@ -139,20 +204,23 @@ class MonitoringMiddleware(BaseMiddleware):
                 "max_duration_ms": 0,
             }
 
-        stats = self._stats[tool_name]
         stats["call_count"] += 1
-
-        if ctx.duration_ms is not None:
-            stats["total_duration_ms"] += ctx.duration_ms
-            stats["min_duration_ms"] = min(stats["min_duration_ms"], ctx.duration_ms)
-            stats["max_duration_ms"] = max(stats["max_duration_ms"], ctx.duration_ms)
-
-        if ctx.error:
-            stats["error_count"] += 1
-        else:
-            stats["success_count"] += 1
-
-        return MiddlewareResult()
+        stats[f"{outcome}_count"] += 1
+
+        duration = ctx.duration_ms
+        if duration is not None:
+            stats["total_duration_ms"] += duration
+            if duration < stats["min_duration_ms"]:
+                stats["min_duration_ms"] = duration
+            if duration > stats["max_duration_ms"]:
+                stats["max_duration_ms"] = duration
+
+            histogram = self._latency.get((tool_name, outcome))
+            if histogram is None:
+                histogram = self._latency[(tool_name, outcome)] = WindowedHistogram(
+                    self.windows, self._mapping, self.clock
+                )
+            histogram.record(duration)
 
     def get_stats(self, tool_name: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -177,20 +245,91 @@ class MonitoringMiddleware(BaseMiddleware):
                     result[tn]["avg_duration_ms"] = st["total_duration_ms"] / st["call_count"]
             return result
 
+    def get_percentiles(
+        self,
+        tool_name: str,
+        outcome: str = "success",
+        window: Optional[str] = "1m"
+    ) -> Dict[str, Any]:
+        """
+        Latency summary for one tool and outcome.
+
+        Args:
+            tool_name: Tool name
+            outcome: "success", "error" or "all" (both merged)
+            window: Window name (e.g. "1m", "5m", "1h") or None/"all" for all time
+
+        Returns:
+            {"count", "mean", "min", "max", "p50", "p90", "p99", "p999"} in ms
+            ({"count": 0} if nothing was recorded)
+        """
+        outcomes = self.OUTCOMES if outcome == "all" else (outcome,)
+        merged = LogHistogram(self._mapping)
+        for oc in outcomes:
+            histogram = self._latency.get((tool_name, oc))
+            if histogram is not None:
+                merged.merge(histogram.histogram(window))
+        return merged.summary(self.quantiles)
+
+    def export(self) -> Dict[str, Any]:
+        """
+        Snapshot of all latency histograms, for publishing by gateways.
+
+        Returns:
+            {"quantiles": [...], "windows": [...],
+             "tools": {tool: {outcome: {window: summary}}}} (durations in ms)
+        """
+        tools: Dict[str, Dict[str, Any]] = {}
+        for (tool_name, outcome), histogram in sorted(self._latency.items()):
+            tools.setdefault(tool_name, {})[outcome] = histogram.summaries(self.quantiles)
+        return {
+            "quantiles": list(self.quantiles),
+            "windows": list(self.windows) + ["all"],
+            "tools": tools,
+        }
+
+    def export_prometheus(
+        self,
+        window: str = "1m",
+        metric: str = "tool_latency_ms"
+    ) -> str:
+        """
+        Latency histograms in Prometheus text format (a summary per tool/outcome).
+
+        Args:
+            window: Window to report
+            metric: Metric name
+        """
+        series = [
+            ({"tool": tool_name, "outcome": outcome, "window": window},
+             histogram.summary(window, self.quantiles))
+            for (tool_name, outcome), histogram in sorted(self._latency.items())
+        ]
+        return prometheus_summary(
+            metric, series, self.quantiles,
+            help_text="Tool execution latency in milliseconds"
+        )
+
     def reset_stats(self, tool_name: Optional[str] = None):
         """Reset statistics"""
         if tool_name:
             if tool_name in self._stats:
                 del self._stats[tool_name]
+            for outcome in self.OUTCOMES:
+                self._latency.pop((tool_name, outcome), None)
         else:
             self._stats.clear()
+            self._latency.clear()
 
 
 class RateLimitMiddleware(BaseMiddleware):
     """
     Rate limiting middleware.
 
-    Limits tool execution rate per user or globally.
+    Limits tool execution rate per user (or globally when there is no
+    user), optionally with tighter per-tool limits. Uses GCRA with one
+    float of state per key; idle keys are forgotten. Pass a Redis
+    limiter to enforce limits across processes.
     """
 
     def __init__(
@@ -198,16 +337,40 @@ class RateLimitMiddleware(BaseMiddleware):
         name: str = "rate_limit",
         enabled: bool = True,
         max_requests: int = 100,
-        window_seconds: int = 60
+        window_seconds: int = 60,
+        tool_limits: Optional[Dict[str, Dict[str, Any]]] = None,
+        limiter: Optional[Union[MemoryRateLimiter, RedisRateLimiter]] = None
     ):
+        """
+        Initialize rate limit middleware.
+
+        Args:
+            name: Middleware name
+            enabled: Whether enabled
+            max_requests: Requests allowed per window per user (all tools)
+            window_seconds: Window length in seconds
+            tool_limits: Per-tool limits per user, e.g.
+                {"web_fetch": {"max_requests": 10, "window_seconds": 60}}
+            limiter: Limiter backend (default: in-process MemoryRateLimiter)
+        """
         super().__init__(name, enabled)
         self.priority = 30  # Execute before logging
 
         self.max_requests = max_requests
         self.window_seconds = window_seconds
+        self.tool_limits: Dict[str, Tuple[int, float]] = {
+            tool: (limit["max_requests"], limit.get("window_seconds", window_seconds))
+            for tool, limit in (tool_limits or {}).items()
+        }
+        self.limiter = limiter if limiter is not None else MemoryRateLimiter()
 
-        # Request history: {user_id: [timestamp1, timestamp2, ...]}
-        self._history: Dict[str, List[float]] = {}
+    def _limits(self, user_key: str, tool_name: str) -> List[Tuple[str, int, float]]:
+        """Limit specs applying to a call"""
+        limits = [(user_key, self.max_requests, self.window_seconds)]
+        tool_limit = self.tool_limits.get(tool_name)
+        if tool_limit is not None:
+            limits.append((f"{user_key}:{tool_name}", tool_limit[0], tool_limit[1]))
+        return limits
 
     async def pre_process(self, ctx: ExecutionContext) -> MiddlewareResult:
         """Check rate limit"""
@@ -215,51 +378,38 @@ class RateLimitMiddleware(BaseMiddleware):
         # If no user_id, use "global" key
         user_key = ctx.user_id or "global"
 
-        now = time.time()
-        window_start = now - self.window_seconds
-
-        # Clean old requests
-        if user_key not in self._history:
-            self._history[user_key] = []
-        self._history[user_key] = [
-            ts for ts in self._history[user_key]
-            if ts > window_start
-        ]
-
-        # Check rate limit
-        if len(self._history[user_key]) >= self.max_requests:
-            return MiddlewareResult(
-                success=False,
-                skip_remaining=True,
-                error=f"Rate limit exceeded: {self.max_requests} requests per {self.window_seconds} seconds"
-            )
+        decision = await self.limiter.acquire(self._limits(user_key, ctx.tool_name))
+        if decision.allowed:
+            return CONTINUE
 
-        # Add current request
-        self._history[user_key].append(now)
-
-        return MiddlewareResult()
+        if decision.denied_key == user_key:
+            max_requests, window = self.max_requests, self.window_seconds
+        else:
+            max_requests, window = self.tool_limits[ctx.tool_name]
+        ctx.set_metadata("retry_after", decision.retry_after)
+        return MiddlewareResult(
+            success=False,
+            skip_remaining=True,
+            error=f"Rate limit exceeded: {max_requests} requests per {window} seconds"
+        )
 
-    def get_remaining_requests(self, user_id: Optional[str] = None) -> int:
+    async def get_remaining_requests(self, user_id: Optional[str] = None, tool_name: Optional[str] = None) -> int:
         """
         Get remaining requests for user.
 
         Args:
             user_id: User ID (None for global)
+            tool_name: Also apply this tool's limit
 
         Returns:
-            Number of remaining requests
+            Number of requests that would be admitted now
         """
         user_key = user_id or "global"
-
-        if user_key not in self._history:
-            return self.max_requests
-
-        now = time.time()
-        window_start = now - self.window_seconds
-
-        recent_count = sum(
-            1 for ts in self._history[user_key]
-            if ts > window_start
-        )
-
-        return max(0, self.max_requests - recent_count)
+        return min([
+            await self.limiter.remaining(key, max_requests, window)
+            for key, max_requests, window in self._limits(user_key, tool_name)
+        ])
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Limiter counters"""
+        return self.limiter.get_stats()
@@ -0,0 +1,378 @@
+"""
+Cache Engine
+============
+
+Bounded in-process cache used by CacheMiddleware.
+
+Features:
+- Max entries and max bytes bounds
+- LRU or W-TinyLFU (window LRU + frequency-gated main LRU) eviction
+- TTL expiry heap, swept periodically (no reliance on lookups to expire)
+- Per-namespace index so a whole tool's entries can be invalidated
+- Hit/miss/eviction/expiration counters
+"""
+import heapq
+import random
+import sys
+import time
+from array import array
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+
+def estimate_size(value: Any, _depth: int = 0) -> int:
+    """
+    Roughly estimate the memory footprint of a value in bytes.
+
+    Walks containers up to a small depth; cheap enough to call per insert.
+    """
+    if isinstance(value, (str, bytes, bytearray)):
+        return sys.getsizeof(value)
+    size = sys.getsizeof(value)
+    if _depth >= 4:
+        return size
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += estimate_size(k, _depth + 1) + estimate_size(v, _depth + 1)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += estimate_size(item, _depth + 1)
+    elif hasattr(value, "__dict__"):
+        size += estimate_size(vars(value), _depth + 1)
+    return size
+
+
+class FrequencySketch:
+    """
+    Count-Min Sketch with periodic aging, used by W-TinyLFU admission.
+
+    Counters saturate at 15 and are halved every `sample_size`
+    increments, keeping the estimate biased towards recent popularity.
+    """
+
+    DEPTH = 4
+    MAX_COUNT = 15
+
+    def __init__(self, capacity: int):
+        # ~8 counters per cached entry keeps collisions from one-off keys low
+        width = 16
+        while width < 8 * capacity:
+            width <<= 1
+        self._mask = width - 1
+        self._table = [array("B", bytes(width)) for _ in range(self.DEPTH)]
+        self._seeds = [random.getrandbits(64) | 1 for _ in range(self.DEPTH)]
+        self._sample_size = 10 * max(capacity, 16)
+        self._additions = 0
+
+    def _indexes(self, key: Hashable):
+        h = hash(key)
+        for row, seed in enumerate(self._seeds):
+            yield row, (((h ^ seed) * 0x9E3779B97F4A7C15) >> 32) & self._mask
+
+    def increment(self, key: Hashable):
+        """Record one access"""
+        for row, index in self._indexes(key):
+            if self._table[row][index] < self.MAX_COUNT:
+                self._table[row][index] += 1
+        self._additions += 1
+        if self._additions >= self._sample_size:
+            self._age()
+
+    def frequency(self, key: Hashable) -> int:
+        """Estimated access count"""
+        return min(self._table[row][index] for row, index in self._indexes(key))
+
+    def _age(self):
+        """Halve all counters"""
+        for row in self._table:
+            for i, count in enumerate(row):
+                if count:
+                    row[i] = count >> 1
+        self._additions //= 2
+
+
+class _Entry:
+    """A cached value"""
+
+    __slots__ = ("value", "expires_at", "size", "namespace")
+
+    def __init__(self, value: Any, expires_at: float, size: int, namespace: str):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+        self.namespace = namespace
+
+
+class CacheEngine:
+    """
+    Bounded, namespaced cache with TTL expiry.
+
+    Keys are `(namespace, key)` pairs. Operations are thread-safe.
+    """
+
+    POLICIES = ("lru", "tinylfu")
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024,
+        default_ttl: float = 3600,
+        policy: str = "lru",
+        window_ratio: float = 0.01,
+        sizeof: Optional[Callable[[Any], int]] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Initialize cache engine.
+
+        Args:
+            max_entries: Maximum number of entries
+            max_bytes: Maximum estimated size of all values
+            default_ttl: Default TTL in seconds
+            policy: "lru" or "tinylfu"
+            window_ratio: W-TinyLFU admission window size (fraction of max_entries)
+            sizeof: Value size estimator (default: estimate_size)
+            clock: Time source (monotonic seconds)
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown cache policy: {policy}")
+        if policy == "tinylfu" and max_entries < 2:
+            # W-TinyLFU needs at least one window slot and one main slot
+            policy = "lru"
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.policy = policy
+        self.sizeof = sizeof or estimate_size
+        self.clock = clock
+
+        self._lock = Lock()
+        # Main segment (LRU order, oldest first)
+        self._main: "OrderedDict[Tuple[str, Hashable], _Entry]" = OrderedDict()
+        # Admission window (W-TinyLFU only)
+        self._window: "OrderedDict[Tuple[str, Hashable], _Entry]" = OrderedDict()
+        self._window_size = (
+            min(max(1, int(max_entries * window_ratio)), max_entries - 1) if policy == "tinylfu" else 0
+        )
+        self._sketch = FrequencySketch(max_entries) if policy == "tinylfu" else None
+
+        # namespace -> keys
+        self._namespaces: Dict[str, Set[Hashable]] = {}
+        # (expires_at, namespace, key) min-heap; stale items are skipped on sweep
+        self._expiry_heap: List[Tuple[float, str, Hashable]] = []
+        self._bytes = 0
+
+        self.stats: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "sets": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "rejections": 0,
+        }
+
+    def get(self, namespace: str, key: Hashable, default: Any = None) -> Any:
+        """
+        Look up a value.
+
+        Args:
+            namespace: Namespace (e.g. tool name)
+            key: Key within namespace
+            default: Returned on miss
+
+        Returns:
+            Cached value or default
+        """
+        full_key = (namespace, key)
+        with self._lock:
+            if self._sketch is not None:
+                self._sketch.increment(full_key)
+
+            segment = self._main if full_key in self._main else self._window
+            entry = segment.get(full_key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return default
+
+            if entry.expires_at <= self.clock():
+                self._remove(full_key)
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                return default
+
+            segment.move_to_end(full_key)
+            self.stats["hits"] += 1
+            return entry.value
+
+    def set(self, namespace: str, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """
+        Store a value.
+
+        Args:
+            namespace: Namespace (e.g. tool name)
+            key: Key within namespace
+            value: Value to cache
+            ttl: TTL in seconds (default: default_ttl)
+        """
+        full_key = (namespace, key)
+        size = self.sizeof(value)
+        expires_at = self.clock() + (self.default_ttl if ttl is None else ttl)
+
+        with self._lock:
+            if size > self.max_bytes:
+                self.stats["rejections"] += 1
+                return
+
+            self._remove(full_key)
+            entry = _Entry(value, expires_at, size, namespace)
+
+            if self.policy == "tinylfu":
+                self._sketch.increment(full_key)
+                self._window[full_key] = entry
+            else:
+                self._main[full_key] = entry
+
+            self._namespaces.setdefault(namespace, set()).add(key)
+            self._bytes += size
+            heapq.heappush(self._expiry_heap, (expires_at, namespace, key))
+            self.stats["sets"] += 1
+
+            self._enforce_bounds()
+
+    def delete(self, namespace: str, key: Hashable) -> bool:
+        """Remove a single entry"""
+        with self._lock:
+            return self._remove((namespace, key))
+
+    def invalidate_namespace(self, namespace: str) -> int:
+        """
+        Remove all entries of a namespace.
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            keys = list(self._namespaces.get(namespace, ()))
+            for key in keys:
+                self._remove((namespace, key))
+            return len(keys)
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._main.clear()
+            self._window.clear()
+            self._namespaces.clear()
+            self._expiry_heap.clear()
+            self._bytes = 0
+
+    def sweep(self) -> int:
+        """
+        Remove expired entries using the expiry heap.
+
+        Returns:
+            Number of entries expired
+        """
+        expired = 0
+        with self._lock:
+            now = self.clock()
+            while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                expires_at, namespace, key = heapq.heappop(self._expiry_heap)
+                full_key = (namespace, key)
+                entry = self._main.get(full_key) or self._window.get(full_key)
+                # Skip heap items left behind by overwritten/removed entries
+                if entry is not None and entry.expires_at == expires_at:
+                    self._remove(full_key)
+                    expired += 1
+
+            # Compact when stale heap items dominate
+            if len(self._expiry_heap) > 2 * len(self) + 64:
+                self._expiry_heap = [
+                    (e.expires_at, ns, k)
+                    for segment in (self._main, self._window)
+                    for (ns, k), e in segment.items()
+                ]
+                heapq.heapify(self._expiry_heap)
+
+            self.stats["expirations"] += expired
+        return expired
+
+    def __len__(self) -> int:
+        return len(self._main) + len(self._window)
+
+    @property
+    def bytes(self) -> int:
+        """Estimated size of cached values"""
+        return self._bytes
+
+    def namespace_size(self, namespace: str) -> int:
+        """Number of entries in a namespace"""
+        return len(self._namespaces.get(namespace, ()))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters plus current size"""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self),
+                "bytes": self._bytes,
+                "namespaces": len(self._namespaces),
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+                "policy": self.policy,
+            }
+
+    def _remove(self, full_key: Tuple[str, Hashable]) -> bool:
+        """Remove entry (lock held)"""
+        entry = self._main.pop(full_key, None)
+        if entry is None:
+            entry = self._window.pop(full_key, None)
+        if entry is None:
+            return False
+
+        self._bytes -= entry.size
+        namespace, key = full_key
+        keys = self._namespaces.get(namespace)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._namespaces[namespace]
+        return True
+
+    def _evict(self, full_key: Tuple[str, Hashable]):
+        """Evict entry (lock held)"""
+        self._remove(full_key)
+        self.stats["evictions"] += 1
+
+    def _over_bounds(self) -> bool:
+        return len(self) > self.max_entries or self._bytes > self.max_bytes
+
+    def _enforce_bounds(self):
+        """Evict until within max_entries/max_bytes (lock held)"""
+        if self.policy == "lru":
+            while self._main and self._over_bounds():
+                self._evict(next(iter(self._main)))
+            return
+
+        # W-TinyLFU: window overflow produces a candidate that must beat
+        # the main segment's LRU victim on frequency to be admitted
+        main_capacity = self.max_entries - self._window_size
+        while len(self._window) > self._window_size:
+            candidate_key, candidate = self._window.popitem(last=False)
+            if not self._main or len(self._main) < main_capacity:
+                self._main[candidate_key] = candidate
+                continue
+            victim_key = next(iter(self._main))
+            if self._sketch.frequency(candidate_key) > self._sketch.frequency(victim_key):
+                self._evict(victim_key)
+                self._main[candidate_key] = candidate
+            else:
+                # Candidate rejected: undo its accounting
+                self._window[candidate_key] = candidate
+                self._evict(candidate_key)
+
+        while self._over_bounds() and (self._main or self._window):
+            segment = self._main if self._main else self._window
+            self._evict(next(iter(segment)))
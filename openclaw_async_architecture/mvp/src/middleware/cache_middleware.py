@@ -5,6 +5,7 @@ Cache Middleware
 Middleware for caching tool results.
 """
 from typing import Optional, Dict, Any
+import asyncio
 import hashlib
 import json
 
@@ -12,23 +13,33 @@ from .base_middleware import (
     BaseMiddleware,
     ExecutionContext,
     MiddlewareResult,
+    CONTINUE,
 )
+from .cache_engine import CacheEngine
+
+# Sentinel distinguishing a cached None from a miss
+_MISS = object()
 
 
 class CacheMiddleware(BaseMiddleware):
     """
     Result caching middleware.
 
-    Caches tool results to improve performance.
+    Caches tool results to improve performance. Entries are namespaced
+    by tool name and bounded by entry count and estimated bytes.
     """
 
     def __init__(
         self,
         name: str = "cache",
         enabled: bool = True,
-        cache_store: Optional[Dict[str, Any]] = None,
+        cache_store: Optional[CacheEngine] = None,
         ttl: int = 3600,
-        cache_key_prefix: str = "tool_cache"
+        cache_key_prefix: str = "tool_cache",
+        max_entries: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024,
+        policy: str = "lru",
+        sweep_interval: float = 60.0
     ):
         """
         Initialize cache middleware.
@@ -36,46 +47,47 @@ class CacheMiddleware(BaseMiddleware):
         Args:
             name: Middleware name
             enabled: Whether enabled
-            cache_store: Cache store (dict by default, can be Redis)
+            cache_store: Cache engine (created from the bounds below by default)
             ttl: TTL in seconds
             cache_key_prefix: Prefix for cache keys
+            max_entries: Maximum cached results
+            max_bytes: Maximum estimated size of cached results
+            policy: Eviction policy ("lru" or "tinylfu")
+            sweep_interval: Seconds between background expiry sweeps
         """
         super().__init__(name, enabled)
         self.priority = 5  # Execute first (highest priority)
 
         self.ttl = ttl
         self.cache_key_prefix = cache_key_prefix
+        self.sweep_interval = sweep_interval
 
-        # Use provided store or default to in-memory dict
-        self._cache = cache_store if cache_store is not None else {}
-        self._timestamps = {}  # Cache timestamps
+        self._cache = cache_store if cache_store is not None else CacheEngine(
+            max_entries=max_entries,
+            max_bytes=max_bytes,
+            default_ttl=ttl,
+            policy=policy,
+        )
+        self._sweeper: Optional[asyncio.Task] = None
 
     async def pre_process(self, ctx: ExecutionContext) -> MiddlewareResult:
         """Check cache before tool execution"""
+        self._ensure_sweeper()
         cache_key = self._generate_cache_key(ctx.tool_name, ctx.parameters)
 
-        # Check if cached
-        if cache_key in self._cache:
-            cached_value, timestamp = self._cache[cache_key], self._timestamps[cache_key]
-
-            # Check TTL
-            from time import time
-            if time() - timestamp < self.ttl:
-                # Cache hit
-                ctx.set_metadata("cache_hit", True)
-                ctx.set_metadata("cache_key", cache_key)
-
-                # Return cached result immediately
-                return MiddlewareResult(
-                    skip_remaining=True,
-                    modified_result=cached_value
-                )
-            else:
-                # Cache expired
-                del self._cache[cache_key]
-                del self._timestamps[cache_key]
-
-        return MiddlewareResult()
+        cached_value = self._cache.get(ctx.tool_name, cache_key, _MISS)
+        if cached_value is not _MISS:
+            # Cache hit
+            ctx.set_metadata("cache_hit", True)
+            ctx.set_metadata("cache_key", cache_key)
+
+            # Return cached result immediately
+            return MiddlewareResult(
+                skip_remaining=True,
+                modified_result=cached_value
+            )
+
+        return CONTINUE
 
     async def post_process(
         self,
@@ -85,16 +97,13 @@ class CacheMiddleware(BaseMiddleware):
         """Cache result after tool execution"""
         # Don't cache if there was an error
         if ctx.error:
-            return MiddlewareResult()
+            return CONTINUE
 
         # Cache the result
         cache_key = self._generate_cache_key(ctx.tool_name, ctx.parameters)
-        self._cache[cache_key] = tool_result
+        self._cache.set(ctx.tool_name, cache_key, tool_result, self.ttl)
 
-        from time import time
-        self._timestamps[cache_key] = time()
-
-        return MiddlewareResult()
+        return CONTINUE
 
     def _generate_cache_key(self, tool_name: str, parameters: Dict[str, Any]) -> str:
         """Generate cache key from tool name and parameters"""
@@ -109,32 +118,62 @@ class CacheMiddleware(BaseMiddleware):
 
         return f"{self.cache_key_prefix}:{key_hash}"
 
-    def invalidate(self, tool_name: Optional[str] = None):
+    def invalidate(self, tool_name: Optional[str] = None) -> int:
         """
         Invalidate cache entries.
 
         Args:
             tool_name: Tool name to invalidate (None for all)
+
+        Returns:
+            Number of entries removed
         """
         if tool_name is None:
             # Invalidate all
+            count = len(self._cache)
             self._cache.clear()
-            self._timestamps.clear()
-        else:
-            # Invalidate specific tool
-            keys_to_delete = [
-                key for key in self._cache
-                if key.startswith(tool_name)
-            ]
-            for key in keys_to_delete:
-                del self._cache[key]
-                del self._timestamps[key]
+            return count
+
+        # Invalidate specific tool (entries are namespaced by tool name)
+        return self._cache.invalidate_namespace(tool_name)
+
+    def sweep_expired(self) -> int:
+        """Remove expired entries now"""
+        return self._cache.sweep()
 
     def get_cache_size(self) -> int:
         """Get current cache size"""
         return len(self._cache)
 
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss/eviction counters and size"""
+        return self._cache.get_stats()
+
     def clear_cache(self):
         """Clear all cache"""
         self._cache.clear()
-        self._timestamps.clear()
+
+    def stop(self):
+        """Stop the background sweeper"""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+
+    def _ensure_sweeper(self):
+        """Start the background expiry sweeper on first use in a running loop"""
+        if self.sweep_interval <= 0:
+            return
+        if self._sweeper is not None and not self._sweeper.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._sweeper = loop.create_task(self._sweep_loop())
+
+    async def _sweep_loop(self):
+        """Periodically expire entries so idle keys don't pin memory"""
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self._cache.sweep()
+
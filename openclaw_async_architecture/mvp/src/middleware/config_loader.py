@@ -11,6 +11,8 @@ import yaml
 
 from .middleware_chain import MiddlewareChain
 from .builtin_middlewares import LoggingMiddleware, MonitoringMiddleware, RateLimitMiddleware
+from .log_sink import AsyncLogSink, create_writer
+from .rate_limiter import RedisRateLimiter
 from .cache_middleware import CacheMiddleware
 
 
@@ -110,12 +112,37 @@ class MiddlewareConfigLoader:
         if middleware_type == "rate_limit":
             params["max_requests"] = config.get("max_requests", 100)
             params["window_seconds"] = config.get("window_seconds", 60)
+            params["tool_limits"] = config.get("tool_limits")
+            if config.get("redis_url"):
+                # Shared limits across processes
+                import redis.asyncio as aioredis
+                params["limiter"] = RedisRateLimiter(
+                    aioredis.from_url(config["redis_url"]),
+                    prefix=config.get("redis_prefix", "ratelimit:"),
+                )
         elif middleware_type == "cache":
             params["ttl"] = config.get("ttl", 3600)
             params["cache_key_prefix"] = config.get("cache_key_prefix", "tool_cache")
+            params["max_entries"] = config.get("max_entries", 10000)
+            params["max_bytes"] = config.get("max_bytes", 64 * 1024 * 1024)
+            params["policy"] = config.get("policy", "lru")
+        elif middleware_type == "monitoring":
+            if config.get("windows"):
+                # {"1m": [60, 6], "5m": [300, 10], ...}
+                params["windows"] = {k: tuple(v) for k, v in config["windows"].items()}
+            if config.get("quantiles"):
+                params["quantiles"] = config["quantiles"]
+            params["relative_accuracy"] = config.get("relative_accuracy", 0.01)
         elif middleware_type == "logging":
             params["log_level"] = config.get("log_level", "INFO")
             params["include_params"] = config.get("include_params", True)
+            if config.get("sink"):
+                # "console", a .jsonl path or a .db/.sqlite path
+                params["sink"] = AsyncLogSink(
+                    create_writer(config["sink"]),
+                    max_queue=config.get("max_queue", 10000),
+                    name=f"log-sink-{params['name']}",
+                )
 
         # Create instance
         try:
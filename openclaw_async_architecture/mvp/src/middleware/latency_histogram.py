@@ -0,0 +1,300 @@
+"""
+Latency Histogram
+=================
+
+Fixed-memory streaming latency histograms used by MonitoringMiddleware.
+
+LogHistogram is DDSketch-style: a value x > 0 falls into bucket
+i = ceil(log(x) / log(gamma)) with gamma = (1 + a) / (1 - a), so any
+quantile is reported within relative error `a` (1% by default). Values
+are clamped to [min_value, max_value], which bounds the number of
+buckets (~1150 for 1µs..3h at 1%); in practice latencies of one tool
+occupy a few dozen.
+
+WindowedHistogram keeps a ring of sub-histograms per window (e.g. 6 x 10s
+for the last minute). Recording touches the current slot of each window;
+querying merges the slots still inside the window, so window edges are
+accurate to one slot width.
+"""
+import math
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_QUANTILES: Tuple[float, ...] = (0.5, 0.9, 0.99, 0.999)
+
+# name -> (window_seconds, slots)
+DEFAULT_WINDOWS: Dict[str, Tuple[int, int]] = {
+    "1m": (60, 6),
+    "5m": (300, 10),
+    "1h": (3600, 12),
+}
+
+
+def quantile_label(q: float) -> str:
+    """Label for a quantile, e.g. 0.5 -> p50, 0.999 -> p999"""
+    return "p" + f"{q * 100:g}".replace(".", "")
+
+
+class LogMapping:
+    """Value <-> bucket index mapping shared by histograms of one accuracy"""
+
+    __slots__ = ("relative_accuracy", "gamma", "_multiplier", "min_value", "max_value",
+                 "max_index")
+
+    def __init__(
+        self,
+        relative_accuracy: float = 0.01,
+        min_value: float = 1e-3,
+        max_value: float = 1e7
+    ):
+        """
+        Args:
+            relative_accuracy: Max relative error of reported quantiles
+            min_value: Smallest distinguishable value (smaller -> zero bucket)
+            max_value: Largest distinguishable value (larger is clamped)
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be in (0, 1)")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._multiplier = 1 / math.log(self.gamma)
+        self.min_value = min_value
+        self.max_value = max_value
+        self.max_index = self.index(max_value)
+
+    def index(self, value: float) -> int:
+        return math.ceil(math.log(value) * self._multiplier)
+
+    def bucket(self, value: float) -> Optional[int]:
+        """Bucket index of a value, None for the zero bucket"""
+        if value < self.min_value:
+            return None
+        if value > self.max_value:
+            return self.max_index
+        return math.ceil(math.log(value) * self._multiplier)
+
+    def value(self, index: int) -> float:
+        """Representative value of a bucket (relative error <= accuracy)"""
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+
+_default_mapping = LogMapping()
+
+
+class LogHistogram:
+    """Mergeable log-bucketed histogram"""
+
+    __slots__ = ("mapping", "counts", "zero_count", "count", "total", "min", "max")
+
+    def __init__(self, mapping: Optional[LogMapping] = None):
+        self.mapping = mapping or _default_mapping
+        self.counts: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def record(self, value: float):
+        """Add one observation"""
+        self.add(self.mapping.bucket(value), value)
+
+    def add(self, bucket: Optional[int], value: float):
+        """Add one observation whose bucket was already computed"""
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if bucket is None:
+            self.zero_count += 1
+        else:
+            counts = self.counts
+            counts[bucket] = counts.get(bucket, 0) + 1
+
+    def merge(self, other: "LogHistogram"):
+        """Add another histogram's observations (same mapping)"""
+        if other.count == 0:
+            return
+        counts = self.counts
+        for index, n in other.counts.items():
+            counts[index] = counts.get(index, 0) + n
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def clear(self):
+        self.counts.clear()
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def quantiles(self, qs: Sequence[float] = DEFAULT_QUANTILES) -> List[Optional[float]]:
+        """Values at the given quantiles (None when empty), one bucket scan"""
+        if self.count == 0:
+            return [None] * len(qs)
+
+        order = sorted(range(len(qs)), key=lambda i: qs[i])
+        results: List[Optional[float]] = [None] * len(qs)
+        buckets = iter(sorted(self.counts.items()))
+        seen = self.zero_count
+        current = self.min if self.zero_count else None
+
+        for i in order:
+            rank = qs[i] * (self.count - 1)
+            while seen <= rank:
+                index, n = next(buckets)
+                seen += n
+                current = self.mapping.value(index)
+            # Representative values can fall slightly outside the observed range
+            results[i] = min(max(current, self.min), self.max)
+        return results
+
+    def quantile(self, q: float) -> Optional[float]:
+        return self.quantiles((q,))[0]
+
+    def summary(self, qs: Sequence[float] = DEFAULT_QUANTILES) -> Dict[str, Any]:
+        """count/mean/min/max plus the requested quantiles"""
+        if self.count == 0:
+            return {"count": 0}
+        result: Dict[str, Any] = {
+            "count": self.count,
+            "mean": self.total / self.count,
+            "min": self.min,
+            "max": self.max,
+        }
+        for q, v in zip(qs, self.quantiles(qs)):
+            result[quantile_label(q)] = v
+        return result
+
+
+class _Ring:
+    """Sliding window made of `slots` sub-histograms"""
+
+    __slots__ = ("slot_seconds", "histograms", "epochs")
+
+    def __init__(self, window_seconds: float, slots: int, mapping: LogMapping):
+        self.slot_seconds = window_seconds / slots
+        self.histograms = [LogHistogram(mapping) for _ in range(slots)]
+        self.epochs = [-1] * slots
+
+    def add(self, bucket: Optional[int], value: float, now: float):
+        epoch = int(now // self.slot_seconds)
+        i = epoch % len(self.epochs)
+        if self.epochs[i] != epoch:
+            self.epochs[i] = epoch
+            self.histograms[i].clear()
+        self.histograms[i].add(bucket, value)
+
+    def merged(self, now: float, mapping: LogMapping) -> LogHistogram:
+        oldest = int(now // self.slot_seconds) - len(self.epochs) + 1
+        result = LogHistogram(mapping)
+        for epoch, histogram in zip(self.epochs, self.histograms):
+            if epoch >= oldest:
+                result.merge(histogram)
+        return result
+
+
+class WindowedHistogram:
+    """
+    Latency histogram over sliding time windows plus an all-time total.
+
+    Memory is fixed per instance: (sum of window slots + 1) histograms,
+    each bounded by the mapping's bucket range.
+    """
+
+    def __init__(
+        self,
+        windows: Optional[Dict[str, Tuple[int, int]]] = None,
+        mapping: Optional[LogMapping] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            windows: name -> (window_seconds, slots), default 1m/5m/1h
+            mapping: Bucket mapping (default 1% relative accuracy)
+            clock: Time source in seconds
+        """
+        self.mapping = mapping or _default_mapping
+        self.clock = clock
+        self._rings = {
+            name: _Ring(seconds, slots, self.mapping)
+            for name, (seconds, slots) in (windows or DEFAULT_WINDOWS).items()
+        }
+        self._ring_list = tuple(self._rings.values())
+        self.total = LogHistogram(self.mapping)
+
+    @property
+    def windows(self) -> List[str]:
+        return list(self._rings)
+
+    def record(self, value: float):
+        bucket = self.mapping.bucket(value)
+        now = self.clock()
+        for ring in self._ring_list:
+            ring.add(bucket, value, now)
+        self.total.add(bucket, value)
+
+    def histogram(self, window: Optional[str] = None) -> LogHistogram:
+        """Merged histogram of a window (None -> all time)"""
+        if window is None or window == "all":
+            return self.total
+        if window not in self._rings:
+            raise ValueError(f"Unknown window: {window} (available: {', '.join(self._rings)})")
+        return self._rings[window].merged(self.clock(), self.mapping)
+
+    def summary(
+        self,
+        window: Optional[str] = None,
+        qs: Sequence[float] = DEFAULT_QUANTILES
+    ) -> Dict[str, Any]:
+        return self.histogram(window).summary(qs)
+
+    def summaries(self, qs: Sequence[float] = DEFAULT_QUANTILES) -> Dict[str, Dict[str, Any]]:
+        """Summary for every window, plus all-time under "all" """
+        result = {name: ring.merged(self.clock(), self.mapping).summary(qs)
+                  for name, ring in self._rings.items()}
+        result["all"] = self.total.summary(qs)
+        return result
+
+
+def prometheus_summary(
+    metric: str,
+    series: Iterable[Tuple[Dict[str, str], Dict[str, Any]]],
+    qs: Sequence[float] = DEFAULT_QUANTILES,
+    help_text: str = ""
+) -> str:
+    """
+    Render summaries in Prometheus text exposition format.
+
+    Args:
+        metric: Metric name
+        series: (labels, summary) pairs; summary as returned by LogHistogram.summary
+        qs: Quantiles present in the summaries
+        help_text: HELP line
+    """
+    def fmt_labels(labels: Dict[str, str]) -> str:
+        return ",".join(
+            '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+            for k, v in labels.items()
+        )
+
+    lines = []
+    if help_text:
+        lines.append(f"# HELP {metric} {help_text}")
+    lines.append(f"# TYPE {metric} summary")
+    for labels, summary in series:
+        base = fmt_labels(labels)
+        count = summary.get("count", 0)
+        for q in qs:
+            value = summary.get(quantile_label(q))
+            if value is not None:
+                lines.append(f'{metric}{{{base},quantile="{q:g}"}} {value:.6g}')
+        lines.append(f"{metric}_sum{{{base}}} {summary.get('mean', 0) * count:.6g}")
+        lines.append(f"{metric}_count{{{base}}} {count}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,382 @@
+"""
+Log Sink
+========
+
+Non-blocking structured log pipeline.
+
+The hot path only appends a compact `(timestamp, source, record)` tuple
+to a bounded in-memory buffer. A background thread drains it in batches,
+serializes and hands the batch to a writer:
+
+- StreamWriter: console (stdout), one `[SOURCE] {json}` line per record
+- LoggerWriter: a `logging.Logger`
+- JsonlFileWriter: JSON lines with size-based rotation (path.1 ... path.N)
+- SQLiteWriter: SQLite table with size-based rotation of the database file
+
+When the buffer is full new records are dropped and counted instead of
+blocking the caller.
+"""
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+import weakref
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+
+# (timestamp, source, record)
+LogItem = Tuple[float, str, Dict[str, Any]]
+
+
+def _to_json(ts: float, source: str, record: Dict[str, Any]) -> str:
+    """Serialize one record (timestamp rendered as ISO 8601)"""
+    data = {"timestamp": datetime.fromtimestamp(ts).isoformat(), "source": source}
+    data.update(record)
+    return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class LogWriter:
+    """Base class for sink writers (called from the sink thread only)"""
+
+    def write_batch(self, items: List[LogItem]):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class StreamWriter(LogWriter):
+    """Write `[SOURCE] {json}` lines to a text stream"""
+
+    def __init__(self, stream: Optional[TextIO] = None):
+        self.stream = stream
+
+    def write_batch(self, items: List[LogItem]):
+        stream = self.stream or sys.stdout
+        stream.write("".join(
+            f"[{source.upper()}] {_to_json(ts, source, record)}\n"
+            for ts, source, record in items
+        ))
+        stream.flush()
+
+
+class LoggerWriter(LogWriter):
+    """Forward records to a logging.Logger"""
+
+    def __init__(self, logger: logging.Logger, level: int = logging.INFO, prefix: str = ""):
+        self.logger = logger
+        self.level = level
+        self.prefix = prefix
+
+    def write_batch(self, items: List[LogItem]):
+        if not self.logger.isEnabledFor(self.level):
+            return
+        for ts, source, record in items:
+            self.logger.log(self.level, f"{self.prefix}{_to_json(ts, source, record)}")
+
+
+class JsonlFileWriter(LogWriter):
+    """Append JSON lines to a file, rotating by size"""
+
+    def __init__(self, path: str, max_bytes: int = 50 * 1024 * 1024, backup_count: int = 5):
+        """
+        Args:
+            path: Log file path
+            max_bytes: Rotate once the file exceeds this size (0 disables rotation)
+            backup_count: Number of rotated files to keep
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write_batch(self, items: List[LogItem]):
+        self._file.write("".join(_to_json(ts, source, record) + "\n" for ts, source, record in items))
+        self._file.flush()
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        self._file.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+        self._file.close()
+
+
+class SQLiteWriter(LogWriter):
+    """
+    Insert records into a SQLite table, rotating the database file by size.
+
+    Columns: id, timestamp (unix seconds), source, event, data (JSON).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        table: str = "logs",
+        max_bytes: int = 100 * 1024 * 1024,
+        backup_count: int = 3
+    ):
+        """
+        Args:
+            path: Database file path
+            table: Table name
+            max_bytes: Rotate once the database exceeds this size (0 disables rotation)
+            backup_count: Number of rotated databases to keep
+        """
+        self.path = path
+        self.table = table
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp REAL NOT NULL,
+                source TEXT NOT NULL,
+                event TEXT,
+                data TEXT NOT NULL
+            )
+        """)
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_ts ON {self.table}(timestamp)")
+        return conn
+
+    def write_batch(self, items: List[LogItem]):
+        rows = [
+            (
+                ts,
+                source,
+                record.get("event") or record.get("event_type"),
+                json.dumps(record, ensure_ascii=False, default=str),
+            )
+            for ts, source, record in items
+        ]
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT INTO {self.table} (timestamp, source, event, data) VALUES (?, ?, ?, ?)",
+                rows
+            )
+        if self.max_bytes and os.path.getsize(self.path) >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self._conn.close()
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._conn = self._connect()
+
+    def close(self):
+        self._conn.close()
+
+
+def create_writer(target: Optional[str]) -> LogWriter:
+    """
+    Create a writer from a target spec.
+
+    Args:
+        target: None/"" or "console" for stdout, "*.db"/"*.sqlite"/"*.sqlite3"
+            for SQLite, anything else is a JSONL file path
+
+    Returns:
+        Writer instance
+    """
+    if not target or target == "console":
+        return StreamWriter()
+    if target.endswith((".db", ".sqlite", ".sqlite3")):
+        return SQLiteWriter(target)
+    return JsonlFileWriter(target)
+
+
+_live_sinks: "weakref.WeakSet[AsyncLogSink]" = weakref.WeakSet()
+
+
+@atexit.register
+def _close_live_sinks():
+    """Flush pending records at interpreter exit"""
+    for sink in list(_live_sinks):
+        sink.close(timeout=2.0)
+
+
+class AsyncLogSink:
+    """
+    Bounded, batched, background-thread log sink.
+
+    `emit()` never blocks and never does I/O; it is safe to call from the
+    event loop and from other threads.
+    """
+
+    def __init__(
+        self,
+        writer: Optional[LogWriter] = None,
+        max_queue: int = 10000,
+        batch_size: int = 256,
+        flush_interval: float = 0.2,
+        name: str = "log-sink"
+    ):
+        """
+        Initialize log sink.
+
+        Args:
+            writer: Destination (default: StreamWriter to stdout)
+            max_queue: Maximum buffered records; newer records are dropped beyond this
+            batch_size: Maximum records per write
+            flush_interval: Maximum seconds a record waits before being written
+            name: Background thread name
+        """
+        self.writer = writer or StreamWriter()
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.name = name
+
+        self._buffer: "deque[LogItem]" = deque()
+        self._wakeup = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+        self.stats: Dict[str, int] = {
+            "emitted": 0,
+            "dropped": 0,
+            "written": 0,
+            "batches": 0,
+            "write_errors": 0,
+        }
+        _live_sinks.add(self)
+
+    def emit(self, source: str, record: Dict[str, Any]) -> bool:
+        """
+        Enqueue a record.
+
+        Args:
+            source: Record source (e.g. middleware name, "audit")
+            record: JSON-serializable dict (serialized later, in the sink thread)
+
+        Returns:
+            False if the record was dropped (buffer full or sink closed)
+        """
+        if self._closed or len(self._buffer) >= self.max_queue:
+            self.stats["dropped"] += 1
+            return False
+        self._buffer.append((time.time(), source, record))
+        self.stats["emitted"] += 1
+        if self._thread is None:
+            self._start()
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Wait until all buffered records are written.
+
+        Returns:
+            True if the buffer drained within the timeout
+        """
+        deadline = time.monotonic() + timeout
+        while self._buffer or not self._idle.is_set():
+            if self._thread is None or not self._thread.is_alive():
+                return not self._buffer
+            self._wakeup.set()
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def close(self, timeout: float = 5.0):
+        """Flush, stop the background thread and close the writer"""
+        if self._closed:
+            return
+        self.flush(timeout)
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters plus current buffer depth"""
+        return {**self.stats, "queued": len(self._buffer), "max_queue": self.max_queue}
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        buffer = self._buffer
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+
+            while buffer:
+                self._idle.clear()
+                batch = []
+                while buffer and len(batch) < self.batch_size:
+                    batch.append(buffer.popleft())
+                try:
+                    self.writer.write_batch(batch)
+                    self.stats["written"] += len(batch)
+                    self.stats["batches"] += 1
+                except Exception as e:
+                    self.stats["write_errors"] += 1
+                    print(f"[AsyncLogSink] {self.name} write failed: {e}", file=sys.stderr)
+            self._idle.set()
+
+            if self._closed:
+                return
+
+
+_default_sink: Optional[AsyncLogSink] = None
+_default_lock = threading.Lock()
+
+
+def get_default_sink() -> AsyncLogSink:
+    """Shared console sink (target from the LOG_SINK env var, default stdout)"""
+    global _default_sink
+    if _default_sink is None:
+        with _default_lock:
+            if _default_sink is None:
+                _default_sink = AsyncLogSink(create_writer(os.getenv("LOG_SINK")), name="log-sink")
+    return _default_sink
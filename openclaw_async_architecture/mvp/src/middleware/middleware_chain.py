@@ -3,9 +3,13 @@ Middleware Chain
 ================
 
 Manages execution of middleware chain.
+
+Enabled middlewares are compiled into per-phase tuples of bound methods
+(skipping hooks a middleware doesn't override), recompiled whenever the
+chain changes or any middleware's enabled/priority changes.
 """
-from typing import List, Optional, Callable, Any, Coroutine
-import asyncio
+from typing import List, Optional, Callable, Any, Coroutine, Tuple
+import time
 import traceback
 
 from .base_middleware import (
@@ -13,8 +17,16 @@ from .base_middleware import (
     ExecutionContext,
     MiddlewareResult,
     MiddlewareOrder,
+    CONTINUE,
 )
 
+_perf_ns = time.perf_counter_ns
+
+
+def _overrides(middleware: BaseMiddleware, hook: str) -> bool:
+    """Whether a middleware overrides a BaseMiddleware hook"""
+    return getattr(type(middleware), hook) is not getattr(BaseMiddleware, hook)
+
 
 class MiddlewareChain:
     """
@@ -22,9 +34,14 @@ class MiddlewareChain:
     """
 
     def __init__(self):
-        self._pre_process_middlewares: List[BaseMiddleware] = []
-        self._post_process_middlewares: List[BaseMiddleware] = []
-        self._on_error_middlewares: List[BaseMiddleware] = []
+        # All middlewares sorted by priority (lower first)
+        self._middlewares: List[BaseMiddleware] = []
+
+        # Compiled call sequences: ((name, bound_hook), ...)
+        self._pre: Tuple[Tuple[str, Callable], ...] = ()
+        self._post: Tuple[Tuple[str, Callable], ...] = ()
+        self._on_error: Tuple[Tuple[str, Callable], ...] = ()
+        self._compiled_version = -1
 
     def add_middleware(self, middleware: BaseMiddleware) -> 'MiddlewareChain':
         """
@@ -39,12 +56,11 @@ class MiddlewareChain:
         if not isinstance(middleware, BaseMiddleware):
             raise TypeError(f"Middleware must inherit from BaseMiddleware, got {type(middleware)}")
 
-        self._pre_process_middlewares.append(middleware)
-        self._post_process_middlewares.append(middleware)
-        self._on_error_middlewares.append(middleware)
+        self._middlewares.append(middleware)
 
         # Sort by priority (lower first)
         self._sort_middlewares()
+        self._compile()
 
         return self
 
@@ -58,20 +74,11 @@ class MiddlewareChain:
         Returns:
             True if removed, False if not found
         """
-        found_before = any(m.name == middleware_name for m in self._pre_process_middlewares)
-
-        self._pre_process_middlewares = [
-            m for m in self._pre_process_middlewares
-            if m.name != middleware_name
-        ]
-        self._post_process_middlewares = [
-            m for m in self._post_process_middlewares
-            if m.name != middleware_name
-        ]
-        self._on_error_middlewares = [
-            m for m in self._on_error_middlewares
-            if m.name != middleware_name
-        ]
+        remaining = [m for m in self._middlewares if m.name != middleware_name]
+        found_before = len(remaining) != len(self._middlewares)
+
+        self._middlewares = remaining
+        self._compile()
 
         return found_before
 
@@ -85,20 +92,21 @@ class MiddlewareChain:
         Returns:
             Middleware instance or None
         """
-        for m in self._pre_process_middlewares:
+        for m in self._middlewares:
             if m.name == middleware_name:
                 return m
         return None
 
     def list_middlewares(self) -> List[str]:
         """List all middleware names"""
-        return [m.name for m in self._pre_process_middlewares]
+        return [m.name for m in self._middlewares]
 
     def enable_middleware(self, middleware_name: str) -> bool:
         """Enable a middleware"""
         middleware = self.get_middleware(middleware_name)
         if middleware:
             middleware.enabled = True
+            self._compile()
             return True
         return False
 
@@ -107,14 +115,28 @@ class MiddlewareChain:
         middleware = self.get_middleware(middleware_name)
         if middleware:
             middleware.enabled = False
+            self._compile()
             return True
         return False
 
     def _sort_middlewares(self):
         """Sort middlewares by priority"""
-        self._pre_process_middlewares.sort(key=lambda m: m.priority)
-        self._post_process_middlewares.sort(key=lambda m: m.priority)
-        self._on_error_middlewares.sort(key=lambda m: m.priority)
+        self._middlewares.sort(key=lambda m: m.priority)
+
+    def _compile(self):
+        """Build the per-phase call sequences from enabled middlewares"""
+        self._sort_middlewares()
+        enabled = [m for m in self._middlewares if m.enabled]
+        self._pre = tuple((m.name, m.pre_process) for m in enabled if _overrides(m, "pre_process"))
+        self._post = tuple((m.name, m.post_process) for m in enabled if _overrides(m, "post_process"))
+        # The default on_error never handles the error, so it can be skipped
+        self._on_error = tuple((m.name, m.on_error) for m in enabled if _overrides(m, "on_error"))
+        self._compiled_version = BaseMiddleware._config_version
+
+    def _ensure_compiled(self):
+        """Recompile if a middleware was enabled/disabled/reprioritized directly"""
+        if self._compiled_version != BaseMiddleware._config_version:
+            self._compile()
 
     async def execute_pre_process(self, ctx: ExecutionContext) -> bool:
         """
@@ -126,12 +148,13 @@ class MiddlewareChain:
         Returns:
             True to continue execution, False to stop
         """
-        for middleware in self._pre_process_middlewares:
-            if not middleware.enabled:
-                continue
+        self._ensure_compiled()
 
+        for name, pre_process in self._pre:
             try:
-                result: MiddlewareResult = await middleware.pre_process(ctx)
+                result: MiddlewareResult = await pre_process(ctx)
+                if result is CONTINUE:
+                    continue
 
                 if result.error:
                     ctx.error = result.error
@@ -152,8 +175,8 @@ class MiddlewareChain:
                     ctx.update_params(result.modified_params)
 
             except Exception as e:
-                ctx.error = f"Pre-process middleware {middleware.name} failed: {e}"
-                print(f"[MiddlewareChain] Pre-process error in {middleware.name}: {e}")
+                ctx.error = f"Pre-process middleware {name} failed: {e}"
+                print(f"[MiddlewareChain] Pre-process error in {name}: {e}")
                 traceback.print_exc()
                 return False
 
@@ -174,14 +197,14 @@ class MiddlewareChain:
         Returns:
             Final result (may be modified by middlewares)
         """
+        self._ensure_compiled()
         result = tool_result
 
-        for middleware in self._post_process_middlewares:
-            if not middleware.enabled:
-                continue
-
+        for name, post_process in self._post:
             try:
-                mr: MiddlewareResult = await middleware.post_process(ctx, result)
+                mr: MiddlewareResult = await post_process(ctx, result)
+                if mr is CONTINUE:
+                    continue
 
                 if mr.modified_result is not None:
                     result = mr.modified_result
@@ -190,8 +213,8 @@ class MiddlewareChain:
                     break
 
             except Exception as e:
-                ctx.error = f"Post-process middleware {middleware.name} failed: {e}"
-                print(f"[MiddlewareChain] Post-process error in {middleware.name}: {e}")
+                ctx.error = f"Post-process middleware {name} failed: {e}"
+                print(f"[MiddlewareChain] Post-process error in {name}: {e}")
                 traceback.print_exc()
 
         return result
@@ -211,14 +234,12 @@ class MiddlewareChain:
         Returns:
             True if error was handled, False to re-raise
         """
+        self._ensure_compiled()
         handled = False
 
-        for middleware in self._on_error_middlewares:
-            if not middleware.enabled:
-                continue
-
+        for name, on_error in self._on_error:
             try:
-                result: MiddlewareResult = await middleware.on_error(ctx, error)
+                result: MiddlewareResult = await on_error(ctx, error)
 
                 if result.success and not result.error:
                     handled = True
@@ -226,7 +247,7 @@ class MiddlewareChain:
                     break
 
             except Exception as e:
-                print(f"[MiddlewareChain] Error handler {middleware.name} itself failed: {e}")
+                print(f"[MiddlewareChain] Error handler {name} itself failed: {e}")
                 traceback.print_exc()
 
         return handled
@@ -246,28 +267,24 @@ class MiddlewareChain:
         Returns:
             Tool result (possibly modified by post-process middlewares)
         """
-        from datetime import datetime
-
         # Pre-process
         continue_execution = await self.execute_pre_process(ctx)
         if not continue_execution:
             # Pre-process stopped (e.g., cache hit or rate limit)
-            # Check if there's a cached result
-            if ctx.result is not None:
-                return ctx.result
-            return None
+            # Return the cached result if there is one
+            return ctx.result
 
         # Execute tool
         try:
-            ctx.start_time = datetime.now()
+            ctx.start_ns = _perf_ns()
 
             result = await tool_func()
 
-            ctx.end_time = datetime.now()
+            ctx.end_ns = _perf_ns()
             ctx.result = result
 
         except Exception as e:
-            ctx.end_time = datetime.now()
+            ctx.end_ns = _perf_ns()
             ctx.error = str(e)
 
             # Error handling
@@ -280,17 +297,16 @@ class MiddlewareChain:
             return None
 
         # Post-process
-        final_result = await self.execute_post_process(ctx, result)
-
-        return final_result
+        if not self._post:
+            return result
+        return await self.execute_post_process(ctx, result)
 
     def clear(self):
         """Clear all middlewares"""
-        self._pre_process_middlewares.clear()
-        self._post_process_middlewares.clear()
-        self._on_error_middlewares.clear()
+        self._middlewares.clear()
+        self._compile()
 
     @property
     def count(self) -> int:
         """Get number of middlewares in chain"""
-        return len(self._pre_process_middlewares)
+        return len(self._middlewares)
@@ -0,0 +1,236 @@
+"""
+Rate Limiter
+============
+
+GCRA (Generic Cell Rate Algorithm) limiters used by RateLimitMiddleware.
+
+A limit of `max_requests` per `window_seconds` becomes an emission
+interval T = window / max_requests and a burst tolerance of one window.
+Each key stores a single float, its theoretical arrival time (TAT):
+
+- allow if  max(TAT, now) + T - now <= window
+- on allow  TAT = max(TAT, now) + T
+
+So up to `max_requests` can burst at once, after which requests are
+admitted at the steady rate. Once TAT <= now a key carries no
+information and can be forgotten.
+
+Backends:
+- MemoryRateLimiter: dict of TATs in LRU order, idle keys evicted
+  incrementally from the front (amortized O(1))
+- RedisRateLimiter: one Lua script per check, Redis server time,
+  keys expire when idle (multi-process enforcement)
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# (key, max_requests, window_seconds)
+LimitSpec = Tuple[str, int, float]
+
+
+class RateLimitDecision:
+    """Outcome of a limiter check"""
+
+    __slots__ = ("allowed", "retry_after", "denied_key")
+
+    def __init__(self, allowed: bool, retry_after: float = 0.0, denied_key: Optional[str] = None):
+        self.allowed = allowed
+        self.retry_after = retry_after
+        self.denied_key = denied_key
+
+
+ALLOWED = RateLimitDecision(True)
+
+
+def _remaining(backlog: float, max_requests: int, window: float) -> int:
+    """Requests admitted now given a key's backlog (TAT - now, same unit as window)"""
+    if max_requests <= 0:
+        return 0
+    interval = window / max_requests
+    return max(0, min(max_requests, int((window - max(backlog, 0)) / interval + 1e-9)))
+
+
+class MemoryRateLimiter:
+    """
+    In-process GCRA limiter.
+
+    Checks of several limits are all-or-nothing: a request denied by one
+    limit does not consume budget from the others.
+    """
+
+    def __init__(
+        self,
+        clock: Callable[[], float] = time.monotonic,
+        evict_batch: int = 16
+    ):
+        """
+        Initialize limiter.
+
+        Args:
+            clock: Time source (monotonic seconds)
+            evict_batch: Max idle keys examined per check
+        """
+        self.clock = clock
+        self.evict_batch = evict_batch
+        # key -> TAT, least recently used first
+        self._tat: "OrderedDict[str, float]" = OrderedDict()
+        self.stats: Dict[str, int] = {"allowed": 0, "denied": 0, "evicted": 0}
+
+    async def acquire(self, limits: Sequence[LimitSpec]) -> RateLimitDecision:
+        """Check and, if all limits allow, consume one request from each"""
+        return self.acquire_sync(limits)
+
+    def acquire_sync(self, limits: Sequence[LimitSpec]) -> RateLimitDecision:
+        """Synchronous acquire"""
+        now = self.clock()
+        tat = self._tat
+        new_tats: List[Tuple[str, float]] = []
+
+        for key, max_requests, window in limits:
+            if max_requests <= 0:
+                # A limit of 0 denies everything
+                self.stats["denied"] += 1
+                return RateLimitDecision(False, window, key)
+            interval = window / max_requests
+            current = tat.get(key, now)
+            if current < now:
+                current = now
+            new_tat = current + interval
+            if new_tat - now > window + 1e-9:
+                self.stats["denied"] += 1
+                self._evict_idle(now)
+                return RateLimitDecision(False, new_tat - window - now, key)
+            new_tats.append((key, new_tat))
+
+        for key, new_tat in new_tats:
+            tat[key] = new_tat
+            tat.move_to_end(key)
+        self.stats["allowed"] += 1
+        self._evict_idle(now)
+        return ALLOWED
+
+    async def remaining(self, key: str, max_requests: int, window: float) -> int:
+        """Requests that would currently be admitted for a key"""
+        return self.remaining_sync(key, max_requests, window)
+
+    def remaining_sync(self, key: str, max_requests: int, window: float) -> int:
+        """Synchronous remaining"""
+        now = self.clock()
+        return _remaining(self._tat.get(key, now) - now, max_requests, window)
+
+    def _evict_idle(self, now: float):
+        """Drop keys whose TAT has passed, oldest-accessed first"""
+        tat = self._tat
+        for _ in range(self.evict_batch):
+            if not tat:
+                return
+            key = next(iter(tat))
+            if tat[key] > now:
+                return
+            del tat[key]
+            self.stats["evicted"] += 1
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "keys": len(self._tat), "backend": "memory"}
+
+
+# KEYS: limit keys; ARGV: n, then (interval_ms, window_ms) per key.
+# Uses server time so all processes share one clock.
+_GCRA_SCRIPT = """
+if redis.replicate_commands then redis.replicate_commands() end
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + tonumber(t[2]) / 1000
+local new_tats = {}
+for i, key in ipairs(KEYS) do
+    local interval = tonumber(ARGV[2 * i])
+    local window = tonumber(ARGV[2 * i + 1])
+    local tat = tonumber(redis.call('GET', key) or now)
+    if tat < now then tat = now end
+    local new_tat = tat + interval
+    if new_tat - now > window then
+        return {0, tostring(new_tat - window - now), i}
+    end
+    new_tats[i] = new_tat
+end
+for i, key in ipairs(KEYS) do
+    local ttl = math.ceil(new_tats[i] - now)
+    redis.call('SET', key, tostring(new_tats[i]), 'PX', ttl)
+end
+return {1, '0', 0}
+"""
+
+# KEYS: one limit key. Returns its backlog (TAT - now) in ms, by server time.
+_BACKLOG_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + tonumber(t[2]) / 1000
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+return tostring(tat - now)
+"""
+
+
+class RedisRateLimiter:
+    """
+    GCRA limiter shared across processes via Redis.
+
+    Each key is a string holding the TAT in milliseconds, expiring
+    exactly when it goes idle. If Redis is unreachable requests are
+    allowed (fail open) and counted as errors.
+    """
+
+    def __init__(self, redis_client: Any, prefix: str = "ratelimit:"):
+        """
+        Initialize limiter.
+
+        Args:
+            redis_client: redis.asyncio client
+            prefix: Key prefix
+        """
+        self.redis = redis_client
+        self.prefix = prefix
+        self._script = redis_client.register_script(_GCRA_SCRIPT)
+        self._backlog_script = redis_client.register_script(_BACKLOG_SCRIPT)
+        self.stats: Dict[str, int] = {"allowed": 0, "denied": 0, "errors": 0}
+
+    async def acquire(self, limits: Sequence[LimitSpec]) -> RateLimitDecision:
+        """Check and, if all limits allow, consume one request from each"""
+        for key, max_requests, window in limits:
+            if max_requests <= 0:
+                # A limit of 0 denies everything
+                self.stats["denied"] += 1
+                return RateLimitDecision(False, window, key)
+
+        keys = [f"{self.prefix}{key}" for key, _, _ in limits]
+        args: List[Any] = [len(limits)]
+        for _, max_requests, window in limits:
+            args.extend((window * 1000 / max_requests, window * 1000))
+
+        try:
+            allowed, retry_ms, index = await self._script(keys=keys, args=args)
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"[RedisRateLimiter] Redis unavailable, allowing request: {e}")
+            return ALLOWED
+        if int(allowed):
+            self.stats["allowed"] += 1
+            return ALLOWED
+        self.stats["denied"] += 1
+        return RateLimitDecision(False, float(retry_ms) / 1000, limits[int(index) - 1][0])
+
+    async def remaining(self, key: str, max_requests: int, window: float) -> int:
+        """Requests that would currently be admitted for a key"""
+        if max_requests <= 0:
+            return 0
+        try:
+            backlog_ms = await self._backlog_script(keys=[f"{self.prefix}{key}"])
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"[RedisRateLimiter] Redis unavailable, reporting full budget: {e}")
+            return max_requests
+        return _remaining(float(backlog_ms), max_requests, window * 1000)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "backend": "redis"}
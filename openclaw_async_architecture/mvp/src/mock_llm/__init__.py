@@ -0,0 +1 @@
+"""Mock LLM package"""
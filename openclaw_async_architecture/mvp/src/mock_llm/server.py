@@ -0,0 +1,372 @@
+"""
+本地Mock LLM服务器（OpenAI兼容）
+用于离线压测完整链路，不依赖NVIDIA/LM Studio/Ollama等真实端点
+
+端点：
+- POST /v1/chat/completions  聊天（支持SSE流式）
+- POST /v1/embeddings        向量（按输入哈希生成，结果稳定）
+- GET  /v1/models            模型列表
+- GET  /mock/stats           请求统计
+- GET/POST /mock/config      查看/修改运行时配置（延迟分布、错误注入）
+
+启动：
+    python -m uvicorn src.mock_llm.server:app --port 9000
+
+环境变量（均可选）：
+    MOCK_LLM_TTFT_MS         首token延迟均值（毫秒，默认200）
+    MOCK_LLM_TPS             每秒输出token数均值（默认50）
+    MOCK_LLM_OUTPUT_TOKENS   每次回复的token数（默认64）
+    MOCK_LLM_DISTRIBUTION    延迟分布：fixed/uniform/lognormal（默认lognormal）
+    MOCK_LLM_ERROR_RATE      500错误注入概率（默认0）
+    MOCK_LLM_429_RATE        429注入概率（默认0）
+    MOCK_LLM_RPM             每分钟请求上限，超出返回429（默认0=不限）
+    MOCK_LLM_SEED            随机种子（可复现）
+"""
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import time
+import uuid
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Deque, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class LatencyDistribution:
+    """延迟分布（单位：秒）"""
+
+    kind: str = "lognormal"    # fixed / uniform / lognormal
+    mean: float = 0.2
+    spread: float = 0.5        # uniform: ±mean*spread；lognormal: sigma
+
+    def sample(self, rng: random.Random) -> float:
+        """采样一个延迟值"""
+        if self.mean <= 0:
+            return 0.0
+        if self.kind == "fixed":
+            return self.mean
+        if self.kind == "uniform":
+            return max(0.0, rng.uniform(self.mean * (1 - self.spread), self.mean * (1 + self.spread)))
+        # lognormal：长尾，均值保持为mean
+        mu = math.log(self.mean) - self.spread ** 2 / 2
+        return rng.lognormvariate(mu, self.spread)
+
+
+@dataclass
+class MockLLMConfig:
+    """Mock服务器配置"""
+
+    ttft: LatencyDistribution = field(default_factory=LatencyDistribution)
+    tokens_per_second: float = 50.0
+    tps_jitter: float = 0.2            # 每次请求的TPS在±20%内波动
+    output_tokens: int = 64            # 未指定max_tokens时的回复长度
+    embedding_latency: LatencyDistribution = field(
+        default_factory=lambda: LatencyDistribution(kind="fixed", mean=0.02)
+    )
+    embedding_dim: int = 1024
+    error_rate: float = 0.0            # 返回500的概率
+    rate_limit_rate: float = 0.0       # 随机返回429的概率
+    rpm_limit: int = 0                 # 真实RPM限制（0=不限）
+    seed: Optional[int] = None
+
+    @classmethod
+    def from_env(cls) -> "MockLLMConfig":
+        """从环境变量创建配置"""
+        seed = os.getenv("MOCK_LLM_SEED")
+        return cls(
+            ttft=LatencyDistribution(
+                kind=os.getenv("MOCK_LLM_DISTRIBUTION", "lognormal"),
+                mean=float(os.getenv("MOCK_LLM_TTFT_MS", "200")) / 1000,
+            ),
+            tokens_per_second=float(os.getenv("MOCK_LLM_TPS", "50")),
+            output_tokens=int(os.getenv("MOCK_LLM_OUTPUT_TOKENS", "64")),
+            error_rate=float(os.getenv("MOCK_LLM_ERROR_RATE", "0")),
+            rate_limit_rate=float(os.getenv("MOCK_LLM_429_RATE", "0")),
+            rpm_limit=int(os.getenv("MOCK_LLM_RPM", "0")),
+            seed=int(seed) if seed else None,
+        )
+
+    def update(self, changes: dict):
+        """按字典更新配置（支持嵌套的ttft/embedding_latency）"""
+        for key, value in changes.items():
+            current = getattr(self, key)
+            if isinstance(current, LatencyDistribution) and isinstance(value, dict):
+                for sub_key, sub_value in value.items():
+                    setattr(current, sub_key, sub_value)
+            else:
+                setattr(self, key, value)
+
+
+# 生成回复用的词表（中英混合，接近真实token分布）
+_WORDS = [
+    "the", "system", "task", "result", "worker", "queue", "data", "model",
+    "async", "stream", "cache", "latency", "任务", "结果", "模型", "数据",
+]
+
+
+def _estimate_tokens(text: str) -> int:
+    """粗略估算token数"""
+    return max(1, len(text) // 4)
+
+
+def _prompt_text(messages: List[dict]) -> str:
+    """拼接消息内容"""
+    return "\n".join(str(m.get("content") or "") for m in messages)
+
+
+def _generate_tokens(prompt: str, count: int) -> List[str]:
+    """按prompt哈希生成确定性的回复token"""
+    digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+    return [
+        ("" if i == 0 else " ") + _WORDS[(digest[i % len(digest)] ^ i) % len(_WORDS)]
+        for i in range(count)
+    ]
+
+
+def _embedding(text: str, dim: int) -> List[float]:
+    """按输入哈希生成确定性的单位向量"""
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    vector = [rng.gauss(0, 1) for _ in range(dim)]
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class MockLLMServer:
+    """Mock LLM服务器状态（配置、随机数、统计）"""
+
+    def __init__(self, config: Optional[MockLLMConfig] = None):
+        self.config = config or MockLLMConfig()
+        self.rng = random.Random(self.config.seed)
+        # 最近60秒的请求时间（RPM限制）
+        self._request_times: Deque[float] = deque()
+
+        # 统计
+        self.stats: Dict[str, int] = {
+            "chat_requests": 0,
+            "stream_requests": 0,
+            "embedding_requests": 0,
+            "injected_errors": 0,
+            "injected_429": 0,
+            "rpm_429": 0,
+            "tokens_generated": 0,
+        }
+
+    def check_failure(self) -> Optional[JSONResponse]:
+        """错误/限流注入，返回None表示正常处理"""
+        now = time.monotonic()
+        if self.config.rpm_limit > 0:
+            while self._request_times and now - self._request_times[0] > 60:
+                self._request_times.popleft()
+            if len(self._request_times) >= self.config.rpm_limit:
+                self.stats["rpm_429"] += 1
+                return self._error(429, "rate_limit_exceeded", "RPM limit reached", retry_after=1)
+            self._request_times.append(now)
+
+        roll = self.rng.random()
+        if roll < self.config.rate_limit_rate:
+            self.stats["injected_429"] += 1
+            return self._error(429, "rate_limit_exceeded", "Injected rate limit", retry_after=1)
+        if roll < self.config.rate_limit_rate + self.config.error_rate:
+            self.stats["injected_errors"] += 1
+            return self._error(500, "server_error", "Injected server error")
+        return None
+
+    def sample_token_interval(self) -> float:
+        """采样本次请求的token间隔（秒）"""
+        if self.config.tokens_per_second <= 0:
+            return 0.0
+        jitter = self.rng.uniform(1 - self.config.tps_jitter, 1 + self.config.tps_jitter)
+        return 1.0 / (self.config.tokens_per_second * jitter)
+
+    @staticmethod
+    def _error(status: int, code: str, message: str, retry_after: Optional[int] = None) -> JSONResponse:
+        """OpenAI格式的错误响应"""
+        headers = {"Retry-After": str(retry_after)} if retry_after else None
+        return JSONResponse(
+            status_code=status,
+            content={"error": {"message": message, "type": code, "code": code}},
+            headers=headers,
+        )
+
+
+def create_app(config: Optional[MockLLMConfig] = None) -> FastAPI:
+    """
+    创建Mock服务器应用
+
+    Args:
+        config: Mock配置（可选，默认从环境变量读取）
+
+    Returns:
+        FastAPI应用
+    """
+    server = MockLLMServer(config or MockLLMConfig.from_env())
+    mock_app = FastAPI(title="OpenClaw Mock LLM", version="1.0.0")
+    mock_app.state.server = server
+
+    @mock_app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        """聊天接口（OpenAI兼容）"""
+        body = await request.json()
+        server.stats["chat_requests"] += 1
+
+        failure = server.check_failure()
+        if failure is not None:
+            return failure
+
+        messages = body.get("messages", [])
+        model = body.get("model", "mock-model")
+        prompt = _prompt_text(messages)
+        count = server.config.output_tokens
+        if body.get("max_tokens"):
+            count = min(count, int(body["max_tokens"]))
+        tokens = _generate_tokens(prompt, count)
+        ttft = server.config.ttft.sample(server.rng)
+        interval = server.sample_token_interval()
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        usage = {
+            "prompt_tokens": _estimate_tokens(prompt),
+            "completion_tokens": len(tokens),
+            "total_tokens": _estimate_tokens(prompt) + len(tokens),
+        }
+        server.stats["tokens_generated"] += len(tokens)
+
+        if not body.get("stream"):
+            await asyncio.sleep(ttft + interval * max(len(tokens) - 1, 0))
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            }
+
+        server.stats["stream_requests"] += 1
+
+        async def event_stream():
+            def chunk(delta: dict, finish_reason: Optional[str] = None) -> str:
+                data = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }
+                return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+            await asyncio.sleep(ttft)
+            yield chunk({"role": "assistant", "content": ""})
+            for i, token in enumerate(tokens):
+                if i:
+                    await asyncio.sleep(interval)
+                yield chunk({"content": token})
+            yield chunk({}, "stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+    @mock_app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        """向量接口（OpenAI兼容）"""
+        body = await request.json()
+        server.stats["embedding_requests"] += 1
+
+        failure = server.check_failure()
+        if failure is not None:
+            return failure
+
+        inputs = body.get("input", "")
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        await asyncio.sleep(server.config.embedding_latency.sample(server.rng))
+
+        total_tokens = sum(_estimate_tokens(text) for text in inputs)
+        return {
+            "object": "list",
+            "model": body.get("model", "mock-embedding"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": _embedding(text, server.config.embedding_dim)}
+                for i, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": total_tokens, "total_tokens": total_tokens},
+        }
+
+    @mock_app.get("/v1/models")
+    async def models():
+        """模型列表"""
+        return {
+            "object": "list",
+            "data": [
+                {"id": "mock-model", "object": "model", "owned_by": "openclaw"},
+                {"id": "mock-embedding", "object": "model", "owned_by": "openclaw"},
+            ],
+        }
+
+    @mock_app.get("/mock/stats")
+    async def mock_stats():
+        """请求统计"""
+        return server.stats
+
+    @mock_app.get("/mock/config")
+    async def get_config():
+        """当前配置"""
+        return asdict(server.config)
+
+    @mock_app.post("/mock/config")
+    async def set_config(changes: dict):
+        """修改运行时配置（如注入错误、调整延迟）"""
+        server.config.update(changes)
+        if "seed" in changes:
+            server.rng = random.Random(server.config.seed)
+        return asdict(server.config)
+
+    return mock_app
+
+
+def write_mock_api_config(base_url: str, source_path: str, target_path: str) -> dict:
+    """
+    把API_CONFIG_FINAL.json中所有提供商的URL改写到Mock服务器
+
+    保留provider名称、模型、并发/RPM等字段，只替换url和api_key
+
+    Args:
+        base_url: Mock服务器地址（如http://127.0.0.1:9000）
+        source_path: 原始配置文件路径
+        target_path: 输出配置文件路径
+
+    Returns:
+        改写后的api_configs
+    """
+    with open(source_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    for config in data["api_configs"].values():
+        endpoint = "embeddings" if config.get("type") == "embeddings" else "chat/completions"
+        config["url"] = f"{base_url.rstrip('/')}/v1/{endpoint}"
+        config["api_key"] = "mock-key"
+
+    with open(target_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+    return data["api_configs"]
+
+
+# 默认应用（配置来自环境变量）
+app = create_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=int(os.getenv("MOCK_LLM_PORT", "9000")))
@@ -11,6 +11,12 @@ import traceback
 from .plugin_metadata import Permission, ParameterSchema
 from .plugin_registry import get_registry
 
+try:
+    from ..middleware.audit_store import record_audit
+except ImportError:
+    # plugin_system imported as a top-level package (src on sys.path)
+    from middleware.audit_store import record_audit
+
 
 class PermissionDeniedError(Exception):
     """Raised when a tool tries to perform a forbidden operation"""
@@ -243,12 +249,16 @@ class SandboxedRuntime:
             return ctx
 
     def _audit_log(self, ctx: ToolExecutionContext, success: bool):
-        """Audit log for tool execution"""
-        status = "SUCCESS" if success else "FAILED"
-        print(f"[Audit] Tool {ctx.tool_name} {status} | Duration: {ctx.duration_ms:.1f}ms | User: {ctx.user_id}")
-
-        if not success and ctx.error:
-            print(f"[Audit]   Error: {ctx.error}")
+        """Audit log for tool execution (shared audit sink, see middleware.audit_store)"""
+        record_audit(
+            "success" if success else "error",
+            ctx.tool_name,
+            ctx.parameters,
+            error=ctx.error,
+            user=ctx.user_id,
+            duration_ms=ctx.duration_ms,
+            source="plugin",
+        )
 
     def execute_code(
         self,
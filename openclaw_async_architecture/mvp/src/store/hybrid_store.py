@@ -4,7 +4,7 @@ import json
 from typing import Optional
 from ..common.config import settings
 from ..common.models import Task
-from ..common.connection_pool import redis_pool, sqlite_pool
+from ..common.connection_pool import redis_pool, sqlite_pool, scan_unlink
 
 
 class HybridTaskStore:
@@ -199,10 +199,8 @@ class HybridTaskStore:
 
         # L1: Redis
         try:
-            # 删除所有缓存任务
-            keys = self.redis_client.keys(f"{self.result_prefix}*")
-            if keys:
-                self.redis_client.delete(*keys)
+            # 删除所有缓存任务（SCAN + 分批UNLINK，不阻塞共享Redis）
+            scan_unlink(self.redis_client, f"{self.result_prefix}*")
         except Exception as e:
             print(f"[L1-Redis] 清空失败: {e}")
             success = False
@@ -4,7 +4,11 @@ V2流式响应模块
 """
 from .stream_server import StreamServer
 from .connection_manager import ConnectionManager
+from .connection_registry import DistributedConnectionManager
 from .llm_stream import StreamChatService, create_streamer
+from .response_cache import StreamResponseCache, CachedStream
+from .single_flight import StreamSingleFlight
+from .session_store import SessionStore, ConversationSession
 from .performance_monitor import (
     PerformanceMetrics,
     PerformanceMonitor,
@@ -14,8 +18,14 @@ from .performance_monitor import (
 __all__ = [
     "StreamServer",
     "ConnectionManager",
+    "DistributedConnectionManager",
     "StreamChatService",
     "create_streamer",
+    "StreamResponseCache",
+    "CachedStream",
+    "StreamSingleFlight",
+    "SessionStore",
+    "ConversationSession",
     "PerformanceMetrics",
     "PerformanceMonitor",
     "PerformanceMonitorContext",
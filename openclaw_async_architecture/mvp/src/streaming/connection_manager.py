@@ -2,7 +2,7 @@
 WebSocket连接管理器
 管理所有活跃的WebSocket连接
 """
-from typing import Dict, Set
+from typing import Dict, Optional, Set, Union
 from asyncio import Queue
 import json
 import logging
@@ -30,7 +30,16 @@ class ConnectionManager:
         # IP连接映射：{ip: set(connection_id)}
         self.ip_connections: Dict[str, Set[str]] = {}
 
-    async def connect(self, connection_id: str, websocket: object, client_ip: str = "unknown"):
+        # 会话连接映射：{session_id: set(connection_id)}
+        self.session_connections: Dict[str, Set[str]] = {}
+
+    async def connect(
+        self,
+        connection_id: str,
+        websocket: object,
+        client_ip: str = "unknown",
+        session_id: Optional[str] = None
+    ):
         """
         添加新连接
 
@@ -38,6 +47,7 @@ class ConnectionManager:
             connection_id: 连接唯一ID
             websocket: WebSocket对象
             client_ip: 客户端IP
+            session_id: 会话ID（可选，用于按会话推送消息）
 
         Raises:
             ConnectionError: 连接限制
@@ -52,21 +62,33 @@ class ConnectionManager:
             logger.warning(f"IP {client_ip} 达到连接数限制: {self.max_per_ip}")
             raise ConnectionError(f"Too many connections from this IP")
 
-        # 添加连接
+        self._add_local(connection_id, websocket, client_ip, session_id)
+
+        logger.info(f"连接已添加: {connection_id} (IP: {client_ip})")
+
+    def _add_local(
+        self,
+        connection_id: str,
+        websocket: object,
+        client_ip: str,
+        session_id: Optional[str]
+    ):
+        """记录本进程的连接"""
         self.active_connections[connection_id] = websocket
         if client_ip not in self.ip_connections:
             self.ip_connections[client_ip] = set()
         self.ip_connections[client_ip].add(connection_id)
+        if session_id:
+            self.session_connections.setdefault(session_id, set()).add(connection_id)
 
-        logger.info(f"连接已添加: {connection_id} (IP: {client_ip})")
-
-    def disconnect(self, connection_id: str, client_ip: str = "unknown"):
+    def disconnect(self, connection_id: str, client_ip: str = "unknown", session_id: Optional[str] = None):
         """
         移除连接
 
         Args:
             connection_id: 连接ID
             client_ip: 客户端IP
+            session_id: 会话ID（可选）
         """
         # 从活跃连接中移除
         if connection_id in self.active_connections:
@@ -78,8 +100,44 @@ class ConnectionManager:
             if not self.ip_connections[client_ip]:
                 del self.ip_connections[client_ip]
 
+        # 从会话连接映射中移除
+        if session_id in self.session_connections:
+            self.session_connections[session_id].discard(connection_id)
+            if not self.session_connections[session_id]:
+                del self.session_connections[session_id]
+
         logger.info(f"连接已移除: {connection_id}")
 
+    async def send_to_session(self, session_id: str, message: Union[str, dict]) -> int:
+        """
+        向会话的所有连接推送消息
+
+        Args:
+            session_id: 会话ID
+            message: 文本或JSON消息
+
+        Returns:
+            送达的连接数
+        """
+        return await self._deliver_local(session_id, message)
+
+    async def _deliver_local(self, session_id: str, message: Union[str, dict]) -> int:
+        """向本进程中会话的连接推送消息"""
+        delivered = 0
+        for connection_id in list(self.session_connections.get(session_id, ())):
+            websocket = self.active_connections.get(connection_id)
+            if websocket is None:
+                continue
+            try:
+                if isinstance(message, dict):
+                    await websocket.send_json(message)
+                else:
+                    await websocket.send_text(message)
+                delivered += 1
+            except Exception as e:
+                logger.warning(f"推送失败 ({connection_id}): {e}")
+        return delivered
+
     def is_connected(self, connection_id: str) -> bool:
         """
         检查连接是否活跃
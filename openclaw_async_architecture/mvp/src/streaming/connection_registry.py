@@ -0,0 +1,338 @@
+"""
+分布式连接注册表
+多个Gateway进程/节点通过Redis共享连接状态
+
+特性：
+- 跨节点的max_connections / max_per_ip限制（Lua脚本原子检查+登记）
+- 心跳续期：连接记录带过期时间，节点崩溃后其连接自动过期，不会永久占用配额
+- 集群统计：所有存活节点及其连接数
+- 跨节点推送：任一节点可向其他节点上的会话推送消息（Redis pub/sub，每个节点一个频道）
+
+Redis数据结构（prefix默认"ws:"）：
+- {prefix}conns            ZSET  connection_id -> 过期时间戳（全局连接）
+- {prefix}ip:{ip}          ZSET  connection_id -> 过期时间戳（单IP连接）
+- {prefix}nodes            ZSET  node_id -> 过期时间戳（存活节点）
+- {prefix}node:{node_id}   STRING 节点信息JSON（带TTL）
+- {prefix}session:{sid}    SET   持有该会话连接的node_id（带TTL）
+- 频道 {prefix}route:{node_id}  推送给该节点的消息
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Dict, Optional, Set, Tuple, Union
+
+from .connection_manager import ConnectionManager
+
+logger = logging.getLogger(__name__)
+
+# 原子检查限制并登记连接
+# KEYS: 全局ZSET, IP ZSET
+# ARGV: 当前时间, 过期时间, connection_id, max_connections, max_per_ip, IP键TTL
+_CONNECT_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[4]) then
+    return 1
+end
+if redis.call('ZCARD', KEYS[2]) >= tonumber(ARGV[5]) then
+    return 2
+end
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[3])
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[6])
+return 0
+"""
+
+
+class DistributedConnectionManager(ConnectionManager):
+    """
+    Redis共享的连接管理器
+
+    本地仍保存WebSocket对象（只能在本进程发送），
+    限制检查、统计和会话路由通过Redis在所有节点间共享。
+    需要redis.asyncio客户端（decode_responses=True）。
+    """
+
+    def __init__(
+        self,
+        redis_client: object,
+        max_connections: int = 1000,
+        max_per_ip: int = 10,
+        node_id: Optional[str] = None,
+        prefix: str = "ws:",
+        heartbeat_interval: float = 10.0,
+        connection_ttl: Optional[float] = None
+    ):
+        """
+        初始化分布式连接管理器
+
+        Args:
+            redis_client: redis.asyncio客户端
+            max_connections: 集群最大连接数
+            max_per_ip: 单个IP在集群中的最大连接数
+            node_id: 节点ID（默认hostname-pid-随机后缀）
+            prefix: Redis键前缀
+            heartbeat_interval: 心跳间隔（秒）
+            connection_ttl: 连接记录有效期（秒，默认3倍心跳间隔）
+        """
+        super().__init__(max_connections=max_connections, max_per_ip=max_per_ip)
+        self.redis = redis_client
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.prefix = prefix
+        self.heartbeat_interval = heartbeat_interval
+        self.connection_ttl = connection_ttl or heartbeat_interval * 3
+
+        # 本地连接的元数据：{connection_id: (client_ip, session_id)}
+        self._local_meta: Dict[str, Tuple[str, Optional[str]]] = {}
+
+        self._connect_script = self.redis.register_script(_CONNECT_SCRIPT)
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._listener_task: Optional[asyncio.Task] = None
+        self._pubsub = None
+        # disconnect()是同步接口，Redis注销放到后台任务
+        self._pending: Set[asyncio.Task] = set()
+
+        # 统计
+        self.stats: Dict[str, int] = {
+            "rejected_global": 0,
+            "rejected_ip": 0,
+            "routed_out": 0,
+            "routed_in": 0,
+        }
+
+    @property
+    def route_channel(self) -> str:
+        """本节点的推送频道"""
+        return f"{self.prefix}route:{self.node_id}"
+
+    async def start(self):
+        """注册节点，启动心跳和推送监听"""
+        await self._heartbeat()
+        self._pubsub = self.redis.pubsub()
+        await self._pubsub.subscribe(self.route_channel)
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+        self._listener_task = asyncio.create_task(self._listen_loop())
+        logger.info(f"[Registry] 节点已注册: {self.node_id}")
+
+    async def stop(self):
+        """注销节点及其所有连接"""
+        for task in (self._heartbeat_task, self._listener_task):
+            if task:
+                task.cancel()
+        self._heartbeat_task = self._listener_task = None
+
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.unsubscribe(self.route_channel)
+                await self._pubsub.close()
+            except Exception as e:
+                logger.warning(f"[Registry] 关闭pubsub失败: {e}")
+            self._pubsub = None
+
+        for connection_id, (client_ip, session_id) in list(self._local_meta.items()):
+            await self._unregister(connection_id, client_ip, session_id)
+        await self.redis.zrem(f"{self.prefix}nodes", self.node_id)
+        await self.redis.delete(f"{self.prefix}node:{self.node_id}")
+        logger.info(f"[Registry] 节点已注销: {self.node_id}")
+
+    async def connect(
+        self,
+        connection_id: str,
+        websocket: object,
+        client_ip: str = "unknown",
+        session_id: Optional[str] = None
+    ):
+        """
+        添加新连接（集群范围检查限制）
+
+        Args:
+            connection_id: 连接唯一ID
+            websocket: WebSocket对象
+            client_ip: 客户端IP
+            session_id: 会话ID（可选）
+
+        Raises:
+            ConnectionError: 连接限制
+        """
+        now = time.time()
+        result = await self._connect_script(
+            keys=[f"{self.prefix}conns", f"{self.prefix}ip:{client_ip}"],
+            args=[
+                now,
+                now + self.connection_ttl,
+                connection_id,
+                self.max_connections,
+                self.max_per_ip,
+                int(self.connection_ttl) + 1,
+            ],
+        )
+        if int(result) == 1:
+            self.stats["rejected_global"] += 1
+            logger.warning(f"达到集群最大连接数限制: {self.max_connections}")
+            raise ConnectionError("Too many connections")
+        if int(result) == 2:
+            self.stats["rejected_ip"] += 1
+            logger.warning(f"IP {client_ip} 达到集群连接数限制: {self.max_per_ip}")
+            raise ConnectionError("Too many connections from this IP")
+
+        self._add_local(connection_id, websocket, client_ip, session_id)
+        self._local_meta[connection_id] = (client_ip, session_id)
+        if session_id:
+            session_key = f"{self.prefix}session:{session_id}"
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.sadd(session_key, self.node_id)
+            pipe.expire(session_key, int(self.connection_ttl) + 1)
+            await pipe.execute()
+
+        logger.info(f"连接已添加: {connection_id} (IP: {client_ip}, 节点: {self.node_id})")
+
+    def disconnect(self, connection_id: str, client_ip: str = "unknown", session_id: Optional[str] = None):
+        """
+        移除连接（本地立即移除，Redis注销在后台完成）
+
+        Args:
+            connection_id: 连接ID
+            client_ip: 客户端IP
+            session_id: 会话ID（可选）
+        """
+        super().disconnect(connection_id, client_ip, session_id)
+        if self._local_meta.pop(connection_id, None) is None:
+            return
+        task = asyncio.create_task(self._unregister(connection_id, client_ip, session_id))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def send_to_session(self, session_id: str, message: Union[str, dict]) -> int:
+        """
+        向会话推送消息（本节点直接发送，其他节点通过pub/sub转发）
+
+        Args:
+            session_id: 会话ID
+            message: 文本或JSON消息
+
+        Returns:
+            本地送达的连接数 + 收到转发的节点数
+        """
+        delivered = await self._deliver_local(session_id, message)
+
+        nodes = await self.redis.smembers(f"{self.prefix}session:{session_id}")
+        payload = json.dumps({"session_id": session_id, "message": message}, ensure_ascii=False)
+        for node_id in nodes:
+            if node_id == self.node_id:
+                continue
+            delivered += await self.redis.publish(f"{self.prefix}route:{node_id}", payload)
+            self.stats["routed_out"] += 1
+        return delivered
+
+    async def get_cluster_stats(self) -> dict:
+        """
+        集群统计（所有存活节点）
+
+        Returns:
+            {"total_connections": int, "nodes": {node_id: 节点信息}}
+        """
+        now = time.time()
+        nodes_key = f"{self.prefix}nodes"
+        conns_key = f"{self.prefix}conns"
+
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zremrangebyscore(nodes_key, "-inf", now)
+        pipe.zrange(nodes_key, 0, -1)
+        pipe.zcount(conns_key, now, "+inf")
+        _, node_ids, total = await pipe.execute()
+
+        nodes = {}
+        if node_ids:
+            infos = await self.redis.mget([f"{self.prefix}node:{n}" for n in node_ids])
+            for node_id, info in zip(node_ids, infos):
+                if info:
+                    nodes[node_id] = json.loads(info)
+
+        return {
+            "node_id": self.node_id,
+            "total_connections": total,
+            "max_connections": self.max_connections,
+            "max_per_ip": self.max_per_ip,
+            "nodes": nodes,
+        }
+
+    async def _unregister(self, connection_id: str, client_ip: str, session_id: Optional[str]):
+        """从Redis注销连接"""
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.zrem(f"{self.prefix}conns", connection_id)
+            pipe.zrem(f"{self.prefix}ip:{client_ip}", connection_id)
+            if session_id and session_id not in self.session_connections:
+                # 本节点已没有该会话的连接
+                pipe.srem(f"{self.prefix}session:{session_id}", self.node_id)
+            await pipe.execute()
+        except Exception as e:
+            # 注销失败时记录会在TTL后自然过期
+            logger.warning(f"[Registry] 注销连接失败 ({connection_id}): {e}")
+
+    async def _heartbeat(self):
+        """续期节点和本地连接的记录"""
+        now = time.time()
+        expires_at = now + self.connection_ttl
+        ttl = int(self.connection_ttl) + 1
+
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zadd(f"{self.prefix}nodes", {self.node_id: expires_at})
+        pipe.set(
+            f"{self.prefix}node:{self.node_id}",
+            json.dumps({
+                "connections": len(self.active_connections),
+                "pid": os.getpid(),
+                "updated_at": now,
+            }),
+            ex=ttl,
+        )
+        if self._local_meta:
+            pipe.zadd(
+                f"{self.prefix}conns",
+                {connection_id: expires_at for connection_id in self._local_meta},
+                xx=True,
+            )
+        by_ip: Dict[str, Dict[str, float]] = {}
+        for connection_id, (client_ip, _) in self._local_meta.items():
+            by_ip.setdefault(client_ip, {})[connection_id] = expires_at
+        for client_ip, members in by_ip.items():
+            pipe.zadd(f"{self.prefix}ip:{client_ip}", members, xx=True)
+            pipe.expire(f"{self.prefix}ip:{client_ip}", ttl)
+        for session_id in self.session_connections:
+            session_key = f"{self.prefix}session:{session_id}"
+            pipe.sadd(session_key, self.node_id)
+            pipe.expire(session_key, ttl)
+        await pipe.execute()
+
+    async def _heartbeat_loop(self):
+        """定期心跳"""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self._heartbeat()
+            except Exception as e:
+                logger.error(f"[Registry] 心跳失败: {e}")
+
+    async def _listen_loop(self):
+        """接收其他节点转发的消息"""
+        while True:
+            try:
+                async for item in self._pubsub.listen():
+                    if item.get("type") != "message":
+                        continue
+                    data = json.loads(item["data"])
+                    self.stats["routed_in"] += 1
+                    await self._deliver_local(data["session_id"], data["message"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[Registry] 推送监听错误: {e}")
+                await asyncio.sleep(1)
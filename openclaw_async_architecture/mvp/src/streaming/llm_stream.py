@@ -13,6 +13,63 @@ logger = logging.getLogger(__name__)
 # 避免循环导入
 if TYPE_CHECKING:
     from .performance_monitor import PerformanceMonitorContext
+    from .response_cache import StreamResponseCache
+    from .single_flight import StreamSingleFlight
+
+# 客户端可以设置的采样参数；model/messages/stream等由服务端决定
+SAMPLING_PARAMS = frozenset({
+    "temperature",
+    "top_p",
+    "top_k",
+    "max_tokens",
+    "stop",
+    "presence_penalty",
+    "frequency_penalty",
+    "repetition_penalty",
+    "seed",
+})
+
+
+def sanitize_params(params: Optional[dict]) -> dict:
+    """
+    只保留白名单中的采样参数
+
+    Args:
+        params: 客户端传入的参数（可能来自WebSocket消息）
+
+    Returns:
+        过滤后的参数（不允许的键被丢弃并记录警告）
+    """
+    if not params:
+        return {}
+    if not isinstance(params, dict):
+        logger.warning(f"忽略无效的采样参数: {type(params).__name__}")
+        return {}
+    kept = {key: value for key, value in params.items() if key in SAMPLING_PARAMS}
+    if len(kept) != len(params):
+        logger.warning(f"忽略不允许的参数: {sorted(set(params) - SAMPLING_PARAMS)}")
+    return kept
+
+
+def build_chat_payload(model: str, messages: list, params: Optional[dict] = None) -> dict:
+    """
+    构造流式请求体（采样参数经过白名单过滤，不能覆盖model/messages/stream）
+
+    Args:
+        model: 模型名称
+        messages: 消息列表
+        params: 采样参数
+
+    Returns:
+        请求体
+    """
+    payload = sanitize_params(params)
+    payload.update({
+        "model": model,
+        "messages": messages,
+        "stream": True  # 启用流式
+    })
+    return payload
 
 
 class BaseLLMStreamer(ABC):
@@ -48,13 +105,19 @@ class BaseLLMStreamer(ABC):
         return self._client
 
     @abstractmethod
-    async def stream_chat(self, messages: list, monitor: 'PerformanceMonitorContext' = None) -> AsyncGenerator[str, None]:
+    async def stream_chat(
+        self,
+        messages: list,
+        monitor: 'PerformanceMonitorContext' = None,
+        params: Optional[dict] = None
+    ) -> AsyncGenerator[str, None]:
         """
         流式聊天
 
         Args:
             messages: 消息列表
             monitor: 性能监控上下文（可选）
+            params: 采样参数（temperature, top_p, max_tokens等，可选）
 
         Yields:
             响应块（文本）
@@ -75,23 +138,25 @@ class BaseLLMStreamer(ABC):
 class OpenAIStreamer(BaseLLMStreamer):
     """OpenAI风格流式调用（NVIDIA, 混元等）"""
 
-    async def stream_chat(self, messages: list, monitor: 'PerformanceMonitorContext' = None) -> AsyncGenerator[str, None]:
+    async def stream_chat(
+        self,
+        messages: list,
+        monitor: 'PerformanceMonitorContext' = None,
+        params: Optional[dict] = None
+    ) -> AsyncGenerator[str, None]:
         """
         OpenAI格式流式调用
 
         Args:
             messages: 消息列表
             monitor: 性能监控上下文（可选）
+            params: 采样参数（temperature, top_p, max_tokens等，可选）
 
         Yields:
             响应块（文本）
         """
         try:
-            payload = {
-                "model": self.model,
-                "messages": messages,
-                "stream": True  # 启用流式
-            }
+            payload = build_chat_payload(self.model, messages, params)
 
             headers = {
                 "Authorization": f"Bearer {self.api_key}",
@@ -149,23 +214,25 @@ class OpenAIStreamer(BaseLLMStreamer):
 class ZhipuStreamer(BaseLLMStreamer):
     """智谱GLM流式调用"""
 
-    async def stream_chat(self, messages: list, monitor: 'PerformanceMonitorContext' = None) -> AsyncGenerator[str, None]:
+    async def stream_chat(
+        self,
+        messages: list,
+        monitor: 'PerformanceMonitorContext' = None,
+        params: Optional[dict] = None
+    ) -> AsyncGenerator[str, None]:
         """
         智谱格式流式调用（incremental=True）
 
         Args:
             messages: 消息列表
             monitor: 性能监控上下文（可选）
+            params: 采样参数（temperature, top_p, max_tokens等，可选）
 
         Yields:
             响应块（文本）
         """
         try:
-            payload = {
-                "model": self.model,
-                "messages": messages,
-                "stream": True  # 智谱也支持stream
-            }
+            payload = build_chat_payload(self.model, messages, params)  # 智谱也支持stream
 
             headers = {
                 "Authorization": f"Bearer {self.api_key}",
@@ -251,16 +318,26 @@ def create_streamer(
 class StreamChatService:
     """流式聊天服务（封装多模型）"""
 
-    def __init__(self, api_configs: dict, use_shared_client: bool = True):
+    def __init__(
+        self,
+        api_configs: dict,
+        use_shared_client: bool = True,
+        response_cache: Optional['StreamResponseCache'] = None,
+        single_flight: Optional['StreamSingleFlight'] = None
+    ):
         """
         初始化流式聊天服务
 
         Args:
             api_configs: API配置字典
             use_shared_client: 是否使用共享HTTP客户端
+            response_cache: 流式响应缓存（可选，None表示不缓存）
+            single_flight: 请求合并器（可选，None表示不合并相同的在途请求）
         """
         self.api_configs = api_configs
         self.use_shared_client = use_shared_client
+        self.response_cache = response_cache
+        self.single_flight = single_flight
         self.active_streamers: dict[str, BaseLLMStreamer] = {}
 
     async def stream_chat(
@@ -268,7 +345,9 @@ class StreamChatService:
         provider: str,
         messages: list,
         enable_monitor: bool = True,
-        is_first_call: bool = True
+        is_first_call: bool = True,
+        params: Optional[dict] = None,
+        use_cache: bool = True
     ) -> AsyncGenerator[str, None]:
         """
         流式聊天
@@ -278,6 +357,8 @@ class StreamChatService:
             messages: 消息列表
             enable_monitor: 是否启用性能监控
             is_first_call: 是否首次调用（冷启动）
+            params: 采样参数（temperature, top_p, max_tokens等，可选）
+            use_cache: 是否使用响应缓存（需配置response_cache）
 
         Yields:
             响应块（文本）
@@ -286,12 +367,68 @@ class StreamChatService:
         if not config:
             raise ValueError(f"未找到provider配置: {provider}")
 
+        # 客户端参数只保留采样参数：不能覆盖model/messages/stream，
+        # 缓存键与实际发送的请求体一致
+        params = sanitize_params(params)
+
+        from .response_cache import make_request_key
+        request_key = None
+        if self.response_cache or self.single_flight:
+            payload = build_chat_payload(config["model"], messages, params)
+            sampling = {key: value for key, value in payload.items() if key in SAMPLING_PARAMS}
+            request_key = make_request_key(provider, payload["model"], payload["messages"], sampling)
+
+        # 响应缓存：命中时直接回放，不访问上游
+        cache_key = None
+        if use_cache and self.response_cache and self.response_cache.is_cacheable(params):
+            cache_key = request_key
+            cached = await self.response_cache.get(cache_key)
+            if cached is not None:
+                logger.debug(f"[StreamCache] 命中 ({provider}): {cache_key[:12]}")
+                async for chunk in self.response_cache.replay(cached):
+                    yield chunk
+                return
+
+        def upstream():
+            return self._stream_upstream(
+                provider, config, messages, enable_monitor, is_first_call, params, cache_key
+            )
+
+        # 请求合并：相同的在途请求共享一个上游流
+        if self.single_flight:
+            async for chunk in self.single_flight.stream(request_key, upstream):
+                yield chunk
+        else:
+            async for chunk in upstream():
+                yield chunk
+
+    async def _stream_upstream(
+        self,
+        provider: str,
+        config: dict,
+        messages: list,
+        enable_monitor: bool,
+        is_first_call: bool,
+        params: Optional[dict],
+        cache_key: Optional[str]
+    ) -> AsyncGenerator[str, None]:
+        """
+        调用上游流式API（含性能监控和缓存写入）
+
+        Yields:
+            响应块（文本）
+        """
         # 创建性能监控上下文
         from .performance_monitor import PerformanceMonitorContext
         monitor = None
         if enable_monitor:
             monitor = PerformanceMonitorContext(provider, is_first_call)
 
+        recorder = None
+        if cache_key is not None:
+            from .response_cache import StreamRecorder
+            recorder = StreamRecorder()
+
         try:
             if monitor:
                 monitor.__enter__()
@@ -309,9 +446,15 @@ class StreamChatService:
             streamer = self.active_streamers[provider]
 
             # 流式调用（传入monitor）
-            async for chunk in streamer.stream_chat(messages, monitor):
+            async for chunk in streamer.stream_chat(messages, monitor, params):
+                if recorder:
+                    recorder.record(chunk)
                 yield chunk
 
+            # 只缓存完整结束的流（异常或客户端中途断开都不会走到这里）
+            if recorder and recorder.chunks:
+                await self.response_cache.set(cache_key, recorder.chunks)
+
         except Exception as e:
             logger.error(f"流式聊天失败 ({provider}): {e}")
             raise
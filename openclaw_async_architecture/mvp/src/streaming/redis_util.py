@@ -0,0 +1,25 @@
+"""
+Redis调用适配
+同一份代码同时支持同步redis客户端和redis.asyncio客户端
+"""
+import asyncio
+from typing import Any
+
+
+async def redis_call(client: Any, method: str, *args) -> Any:
+    """
+    调用Redis方法（兼容同步客户端和redis.asyncio客户端）
+
+    Args:
+        client: Redis客户端
+        method: 方法名（如get/setex/delete）
+        *args: 方法参数
+
+    Returns:
+        方法返回值
+    """
+    func = getattr(client, method)
+    if asyncio.iscoroutinefunction(func):
+        return await func(*args)
+    # 同步客户端放到线程池，避免阻塞事件循环
+    return await asyncio.to_thread(func, *args)
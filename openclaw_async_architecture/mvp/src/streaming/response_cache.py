@@ -0,0 +1,303 @@
+"""
+流式响应缓存模块
+缓存已完成的流式响应（含chunk时序），命中时通过同一个异步生成器回放
+
+两级缓存：
+- L1: 进程内LRU（OrderedDict，TTL + 条目上限）
+- L2: Redis（可选，多个Gateway副本共享）
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import AsyncGenerator, Dict, List, Optional, Tuple
+
+from .redis_util import redis_call
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedStream:
+    """缓存的流式响应"""
+
+    # [(相对请求开始的偏移秒数, chunk文本), ...]
+    chunks: List[Tuple[float, str]] = field(default_factory=list)
+    created_at: float = 0.0           # 写入时间（wall clock）
+    expires_at: float = 0.0           # 过期时间（wall clock）
+
+    @property
+    def text(self) -> str:
+        """完整响应文本"""
+        return "".join(chunk for _, chunk in self.chunks)
+
+    def is_expired(self, now: Optional[float] = None) -> bool:
+        """是否已过期"""
+        return (now or time.time()) >= self.expires_at
+
+    def to_json(self) -> str:
+        """序列化（用于Redis）"""
+        return json.dumps({
+            "chunks": self.chunks,
+            "created_at": self.created_at,
+            "expires_at": self.expires_at,
+        }, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, data: str) -> "CachedStream":
+        """反序列化"""
+        raw = json.loads(data)
+        return cls(
+            chunks=[(float(offset), chunk) for offset, chunk in raw["chunks"]],
+            created_at=raw["created_at"],
+            expires_at=raw["expires_at"],
+        )
+
+
+def normalize_messages(messages: list) -> list:
+    """
+    规范化消息列表（只保留影响输出的字段）
+
+    Args:
+        messages: 消息列表
+
+    Returns:
+        规范化后的消息列表
+    """
+    normalized = []
+    for msg in messages:
+        item = {
+            "role": str(msg.get("role", "user")).lower(),
+            "content": (msg.get("content") or "").strip(),
+        }
+        if msg.get("name"):
+            item["name"] = msg["name"]
+        normalized.append(item)
+    return normalized
+
+
+def make_request_key(
+    provider: str,
+    model: str,
+    messages: list,
+    params: Optional[dict] = None
+) -> str:
+    """
+    生成请求键（响应缓存和请求合并共用）
+
+    Args:
+        provider: API提供商
+        model: 模型名称
+        messages: 消息列表
+        params: 采样参数
+
+    Returns:
+        请求键（sha256）
+    """
+    key_data = {
+        "provider": provider,
+        "model": model,
+        "messages": normalize_messages(messages),
+        "params": params or {},
+    }
+    key_string = json.dumps(key_data, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(key_string.encode("utf-8")).hexdigest()
+
+
+class StreamRecorder:
+    """流式响应录制器（记录每个chunk的相对时间）"""
+
+    def __init__(self):
+        self._start = time.monotonic()
+        self.chunks: List[Tuple[float, str]] = []
+
+    def record(self, chunk: str):
+        """记录一个chunk"""
+        self.chunks.append((time.monotonic() - self._start, chunk))
+
+
+class StreamResponseCache:
+    """
+    流式响应缓存
+
+    缓存键：(provider, model, 规范化消息, 采样参数)
+    默认只缓存确定性请求（temperature=0），避免把随机采样结果固定下来
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl: int = 3600,
+        redis_client: Optional[object] = None,
+        redis_prefix: str = "stream:cache:",
+        deterministic_only: bool = True,
+        replay_speed: float = 0.0
+    ):
+        """
+        初始化流式响应缓存
+
+        Args:
+            max_entries: L1最大条目数（LRU淘汰）
+            ttl: 缓存有效期（秒）
+            redis_client: Redis客户端（可选，同步或redis.asyncio均可）
+            redis_prefix: Redis键前缀
+            deterministic_only: 是否只缓存temperature=0的请求
+            replay_speed: 回放速度（0=立即回放，1.0=按原始时序回放）
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.redis_client = redis_client
+        self.redis_prefix = redis_prefix
+        self.deterministic_only = deterministic_only
+        self.replay_speed = replay_speed
+
+        # L1: {key: CachedStream}（按访问顺序排列）
+        self._entries: "OrderedDict[str, CachedStream]" = OrderedDict()
+
+        # 统计
+        self.stats: Dict[str, int] = {
+            "hits": 0,
+            "l2_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+        }
+
+    def make_key(
+        self,
+        provider: str,
+        model: str,
+        messages: list,
+        params: Optional[dict] = None
+    ) -> str:
+        """
+        生成缓存键
+
+        Args:
+            provider: API提供商
+            model: 模型名称
+            messages: 消息列表
+            params: 采样参数（temperature, top_p, max_tokens等）
+
+        Returns:
+            缓存键（sha256）
+        """
+        return make_request_key(provider, model, messages, params)
+
+    def is_cacheable(self, params: Optional[dict] = None) -> bool:
+        """
+        判断请求是否可缓存
+
+        Args:
+            params: 采样参数
+
+        Returns:
+            是否可缓存
+        """
+        if not self.deterministic_only:
+            return True
+        return (params or {}).get("temperature") == 0
+
+    async def get(self, key: str) -> Optional[CachedStream]:
+        """
+        查询缓存（先L1，再L2）
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            CachedStream或None
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.is_expired():
+                del self._entries[key]
+            else:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry
+
+        if self.redis_client is not None:
+            try:
+                data = await redis_call(self.redis_client, "get", f"{self.redis_prefix}{key}")
+                if data:
+                    entry = CachedStream.from_json(data)
+                    if not entry.is_expired():
+                        self._put_local(key, entry)
+                        self.stats["hits"] += 1
+                        self.stats["l2_hits"] += 1
+                        return entry
+            except Exception as e:
+                logger.warning(f"[StreamCache] Redis读取失败: {e}")
+
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, chunks: List[Tuple[float, str]]) -> CachedStream:
+        """
+        写入缓存（L1 + L2）
+
+        Args:
+            key: 缓存键
+            chunks: [(偏移秒数, chunk), ...]
+
+        Returns:
+            写入的CachedStream
+        """
+        now = time.time()
+        entry = CachedStream(chunks=list(chunks), created_at=now, expires_at=now + self.ttl)
+        self._put_local(key, entry)
+        self.stats["stores"] += 1
+
+        if self.redis_client is not None:
+            try:
+                await redis_call(self.redis_client, "setex", f"{self.redis_prefix}{key}", self.ttl, entry.to_json())
+            except Exception as e:
+                logger.warning(f"[StreamCache] Redis写入失败: {e}")
+
+        return entry
+
+    async def replay(self, entry: CachedStream) -> AsyncGenerator[str, None]:
+        """
+        回放缓存的流式响应
+
+        Args:
+            entry: 缓存条目
+
+        Yields:
+            响应块（文本）
+        """
+        if self.replay_speed <= 0:
+            for _, chunk in entry.chunks:
+                yield chunk
+            return
+
+        start = time.monotonic()
+        for offset, chunk in entry.chunks:
+            delay = offset / self.replay_speed - (time.monotonic() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield chunk
+
+    def invalidate(self, key: str):
+        """删除L1条目（L2按TTL自然过期）"""
+        self._entries.pop(key, None)
+
+    def clear(self):
+        """清空L1缓存"""
+        self._entries.clear()
+
+    def get_size(self) -> int:
+        """L1条目数"""
+        return len(self._entries)
+
+    def _put_local(self, key: str, entry: CachedStream):
+        """写入L1并执行LRU淘汰"""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
@@ -0,0 +1,382 @@
+"""
+会话状态模块
+服务端保存每个session_id的对话历史，客户端只需发送新消息
+
+特性：
+- 环形缓冲（条数上限 + token预算）
+- 超出模型上下文窗口时自动截断/摘要（按块裁剪，保持稳定前缀以复用提供商侧的prompt缓存）
+- 空闲会话溢出到Redis（可选），再次访问时自动加载
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+
+from .redis_util import redis_call
+
+logger = logging.getLogger(__name__)
+
+# 摘要函数：(旧摘要, 被裁掉的消息) -> 新摘要
+Summarizer = Callable[[str, List[dict]], Awaitable[str]]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算token数（无需分词器）
+
+    中日韩字符约1 token/字，其他字符约4字符/token
+
+    Args:
+        text: 文本
+
+    Returns:
+        估算的token数
+    """
+    cjk = sum(1 for ch in text if "⺀" <= ch <= "鿿" or "가" <= ch <= "힯")
+    return cjk + (len(text) - cjk + 3) // 4 + 4  # +4: 每条消息的角色/格式开销
+
+
+class ConversationSession:
+    """单个会话的消息历史"""
+
+    def __init__(
+        self,
+        session_id: str,
+        max_messages: int = 200,
+        system_prompt: Optional[str] = None
+    ):
+        """
+        初始化会话
+
+        Args:
+            session_id: 会话ID
+            max_messages: 最大消息条数（环形缓冲）
+            system_prompt: 系统提示词（可选，作为稳定前缀）
+        """
+        self.session_id = session_id
+        self.system_prompt = system_prompt
+        self.summary = ""
+        # [(message, token数), ...]
+        self.history: Deque[tuple] = deque(maxlen=max_messages)
+        self.history_tokens = 0
+        self.last_active = time.time()
+        self.lock = asyncio.Lock()
+
+    def append(self, role: str, content: str):
+        """
+        追加一条消息
+
+        Args:
+            role: 角色（user/assistant）
+            content: 内容
+        """
+        if len(self.history) == self.history.maxlen:
+            # 环形缓冲即将覆盖最旧的消息
+            self.history_tokens -= self.history[0][1]
+        tokens = estimate_tokens(content)
+        self.history.append(({"role": role, "content": content}, tokens))
+        self.history_tokens += tokens
+        self.last_active = time.time()
+
+    def clear(self):
+        """清空历史（保留系统提示词）"""
+        self.history.clear()
+        self.history_tokens = 0
+        self.summary = ""
+
+    async def build_messages(
+        self,
+        user_message: str,
+        token_budget: int,
+        summarizer: Optional[Summarizer] = None,
+        trim_ratio: float = 0.5
+    ) -> List[dict]:
+        """
+        构建发送给模型的消息列表（必要时先裁剪历史）
+
+        超出预算时一次性裁剪到预算的trim_ratio，而不是每轮裁一条，
+        这样之后多轮请求的前缀保持不变，提供商侧的prompt缓存可以命中
+
+        Args:
+            user_message: 新的用户消息
+            token_budget: 输入token预算
+            summarizer: 摘要函数（可选，None表示直接丢弃被裁掉的消息）
+            trim_ratio: 裁剪后的目标占比
+
+        Returns:
+            消息列表
+        """
+        fixed_tokens = estimate_tokens(user_message)
+        if self.system_prompt:
+            fixed_tokens += estimate_tokens(self.system_prompt)
+
+        if fixed_tokens + estimate_tokens(self.summary) + self.history_tokens > token_budget:
+            target = int(token_budget * trim_ratio) - fixed_tokens
+            dropped = []
+            while self.history and self.history_tokens > max(target, 0):
+                message, tokens = self.history.popleft()
+                self.history_tokens -= tokens
+                dropped.append(message)
+
+            if dropped:
+                if summarizer:
+                    try:
+                        self.summary = await summarizer(self.summary, dropped)
+                    except Exception as e:
+                        logger.warning(f"[Session] 摘要失败，直接截断: {e}")
+                logger.info(f"[Session] {self.session_id} 裁剪{len(dropped)}条历史消息")
+
+            # 摘要本身也不能超预算
+            if fixed_tokens + estimate_tokens(self.summary) + self.history_tokens > token_budget:
+                self.summary = ""
+
+        messages = []
+        if self.system_prompt:
+            messages.append({"role": "system", "content": self.system_prompt})
+        if self.summary:
+            messages.append({"role": "system", "content": f"此前对话摘要：{self.summary}"})
+        messages.extend(message for message, _ in self.history)
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+    def to_json(self) -> str:
+        """序列化（用于Redis溢出）"""
+        return json.dumps({
+            "session_id": self.session_id,
+            "system_prompt": self.system_prompt,
+            "summary": self.summary,
+            "max_messages": self.history.maxlen,
+            "messages": [message for message, _ in self.history],
+            "last_active": self.last_active,
+        }, ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, data: str) -> "ConversationSession":
+        """反序列化"""
+        raw = json.loads(data)
+        session = cls(raw["session_id"], raw["max_messages"], raw.get("system_prompt"))
+        session.summary = raw.get("summary", "")
+        for message in raw["messages"]:
+            session.append(message["role"], message["content"])
+        session.last_active = raw.get("last_active", time.time())
+        return session
+
+
+class SessionStore:
+    """会话存储（进程内 + 可选Redis溢出）"""
+
+    def __init__(
+        self,
+        max_history_tokens: int = 8000,
+        max_messages: int = 200,
+        output_reserve_tokens: int = 2048,
+        idle_ttl: int = 600,
+        redis_client: Optional[object] = None,
+        redis_prefix: str = "stream:session:",
+        redis_ttl: int = 86400,
+        summarizer: Optional[Summarizer] = None,
+        system_prompt: Optional[str] = None
+    ):
+        """
+        初始化会话存储
+
+        Args:
+            max_history_tokens: 每个请求携带的历史token上限（还会受模型上下文窗口限制）
+            max_messages: 每个会话最多保存的消息条数
+            output_reserve_tokens: 为模型输出预留的token数
+            idle_ttl: 会话空闲多久后移出内存（秒）
+            redis_client: Redis客户端（可选，同步或redis.asyncio均可；None表示空闲会话直接丢弃）
+            redis_prefix: Redis键前缀
+            redis_ttl: Redis中会话的保存时间（秒）
+            summarizer: 摘要函数（可选）
+            system_prompt: 新会话的默认系统提示词
+        """
+        self.max_history_tokens = max_history_tokens
+        self.max_messages = max_messages
+        self.output_reserve_tokens = output_reserve_tokens
+        self.idle_ttl = idle_ttl
+        self.redis_client = redis_client
+        self.redis_prefix = redis_prefix
+        self.redis_ttl = redis_ttl
+        self.summarizer = summarizer
+        self.system_prompt = system_prompt
+
+        # 内存中的会话：{session_id: ConversationSession}
+        self._sessions: Dict[str, ConversationSession] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def token_budget(self, context_window: Optional[int] = None) -> int:
+        """
+        计算输入token预算
+
+        Args:
+            context_window: 模型上下文窗口（可选）
+
+        Returns:
+            token预算
+        """
+        if not context_window:
+            return self.max_history_tokens
+        return max(0, min(self.max_history_tokens, context_window - self.output_reserve_tokens))
+
+    async def get(self, session_id: str) -> ConversationSession:
+        """
+        获取会话（内存 → Redis → 新建）
+
+        Args:
+            session_id: 会话ID
+
+        Returns:
+            ConversationSession
+        """
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.last_active = time.time()
+            return session
+
+        if self.redis_client is not None:
+            try:
+                data = await redis_call(self.redis_client, "get", f"{self.redis_prefix}{session_id}")
+                if data:
+                    session = ConversationSession.from_json(data)
+                    session.last_active = time.time()
+                    logger.debug(f"[Session] 从Redis加载会话: {session_id}")
+            except Exception as e:
+                logger.warning(f"[Session] Redis读取失败: {e}")
+
+        if session is None:
+            session = ConversationSession(session_id, self.max_messages, self.system_prompt)
+
+        self._sessions[session_id] = session
+        return session
+
+    async def build_messages(
+        self,
+        session: ConversationSession,
+        user_message: str,
+        context_window: Optional[int] = None
+    ) -> List[dict]:
+        """
+        为会话构建请求消息列表
+
+        Args:
+            session: 会话
+            user_message: 新的用户消息
+            context_window: 模型上下文窗口（可选）
+
+        Returns:
+            消息列表
+        """
+        return await session.build_messages(
+            user_message,
+            self.token_budget(context_window),
+            self.summarizer
+        )
+
+    async def delete(self, session_id: str):
+        """删除会话（内存和Redis）"""
+        self._sessions.pop(session_id, None)
+        if self.redis_client is not None:
+            try:
+                await redis_call(self.redis_client, "delete", f"{self.redis_prefix}{session_id}")
+            except Exception as e:
+                logger.warning(f"[Session] Redis删除失败: {e}")
+
+    async def spill_idle(self) -> int:
+        """
+        把空闲会话移出内存（配置Redis时先写入Redis）
+
+        Returns:
+            移出的会话数
+        """
+        now = time.time()
+        idle = [
+            session for session in self._sessions.values()
+            if now - session.last_active >= self.idle_ttl and not session.lock.locked()
+        ]
+        spilled = 0
+        for session in idle:
+            last_active = session.last_active
+            if self.redis_client is not None:
+                try:
+                    await redis_call(
+                        self.redis_client,
+                        "setex",
+                        f"{self.redis_prefix}{session.session_id}",
+                        self.redis_ttl,
+                        session.to_json()
+                    )
+                except Exception as e:
+                    logger.warning(f"[Session] Redis写入失败，保留在内存: {e}")
+                    continue
+                # 写入期间会话又被访问：写入的是旧快照，保留在内存（下次溢出时覆盖Redis中的副本）
+                if (session.last_active != last_active or session.lock.locked()
+                        or self._sessions.get(session.session_id) is not session):
+                    continue
+            self._sessions.pop(session.session_id, None)
+            spilled += 1
+
+        if spilled:
+            logger.info(f"[Session] 移出{spilled}个空闲会话")
+        return spilled
+
+    def start(self, interval: float = 60.0):
+        """启动后台空闲会话清理任务"""
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_loop(interval))
+
+    async def stop(self):
+        """停止后台任务，并把内存中的会话全部写入Redis"""
+        if self._sweeper:
+            self._sweeper.cancel()
+            self._sweeper = None
+        if self.redis_client is not None:
+            for session in self._sessions.values():
+                session.last_active = 0
+            await self.spill_idle()
+
+    def get_active_count(self) -> int:
+        """内存中的会话数"""
+        return len(self._sessions)
+
+    async def _sweep_loop(self, interval: float):
+        """定期清理空闲会话"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.spill_idle()
+            except Exception as e:
+                logger.error(f"[Session] 清理空闲会话失败: {e}")
+
+
+def make_llm_summarizer(stream_chat_service, provider: str) -> Summarizer:
+    """
+    创建基于LLM的摘要函数
+
+    Args:
+        stream_chat_service: StreamChatService实例
+        provider: 用于生成摘要的API提供商
+
+    Returns:
+        摘要函数
+    """
+    async def summarize(previous_summary: str, dropped: List[dict]) -> str:
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in dropped)
+        prompt = (
+            "请把以下对话压缩成简短摘要，保留事实、决定和未完成的问题。\n"
+            f"已有摘要：{previous_summary or '无'}\n"
+            f"新增对话：\n{transcript}"
+        )
+        chunks = []
+        async for chunk in stream_chat_service.stream_chat(
+            provider,
+            [{"role": "user", "content": prompt}],
+            enable_monitor=False,
+            params={"temperature": 0}
+        ):
+            chunks.append(chunk)
+        return "".join(chunks).strip()
+
+    return summarize
@@ -0,0 +1,122 @@
+"""
+流式请求合并模块（single-flight）
+相同的在途流式请求只访问一次上游，结果扇出给所有订阅者
+
+特性：
+- 上游流由后台任务驱动，首个请求方断开不影响其他订阅者
+- 晚加入的订阅者先回放已缓冲的chunk，再跟随实时chunk
+- 所有订阅者都离开后取消上游流（不浪费RPM）
+"""
+import asyncio
+import logging
+from typing import AsyncGenerator, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _InflightStream:
+    """一个在途的上游流"""
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self.changed = asyncio.Condition()
+
+
+class StreamSingleFlight:
+    """流式请求合并器"""
+
+    def __init__(self):
+        # 在途流：{key: _InflightStream}
+        self._inflight: Dict[str, _InflightStream] = {}
+
+        # 统计
+        self.stats: Dict[str, int] = {
+            "upstream_calls": 0,   # 实际上游调用次数
+            "joined": 0,           # 加入已有流的次数（节省的上游调用）
+        }
+
+    def in_flight(self) -> int:
+        """当前在途流数量"""
+        return len(self._inflight)
+
+    async def stream(
+        self,
+        key: str,
+        upstream: Callable[[], AsyncGenerator[str, None]]
+    ) -> AsyncGenerator[str, None]:
+        """
+        订阅key对应的流（不存在则启动upstream）
+
+        Args:
+            key: 请求键（相同请求必须得到相同的键）
+            upstream: 创建上游流式生成器的函数
+
+        Yields:
+            响应块（文本）
+        """
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = _InflightStream()
+            self._inflight[key] = flight
+            flight.task = asyncio.create_task(self._pump(key, flight, upstream))
+            self.stats["upstream_calls"] += 1
+        else:
+            self.stats["joined"] += 1
+            logger.debug(f"[SingleFlight] 加入在途流: {key[:12]} (已缓冲{len(flight.chunks)}块)")
+
+        flight.subscribers += 1
+        index = 0
+        try:
+            while True:
+                # 先回放已缓冲的chunk
+                while index < len(flight.chunks):
+                    yield flight.chunks[index]
+                    index += 1
+
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+
+                async with flight.changed:
+                    await flight.changed.wait_for(
+                        lambda: index < len(flight.chunks) or flight.done
+                    )
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done and flight.task:
+                # 没有订阅者了，取消上游；立即移除，之后的相同请求不会加入正在取消的流
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+                flight.task.cancel()
+
+    async def _pump(
+        self,
+        key: str,
+        flight: _InflightStream,
+        upstream: Callable[[], AsyncGenerator[str, None]]
+    ):
+        """驱动上游流，把chunk写入缓冲区并通知订阅者"""
+        generator = upstream()
+        try:
+            async for chunk in generator:
+                flight.chunks.append(chunk)
+                async with flight.changed:
+                    flight.changed.notify_all()
+        except asyncio.CancelledError:
+            flight.error = ConnectionAbortedError("上游流已取消")
+            raise
+        except Exception as e:
+            flight.error = e
+        finally:
+            await generator.aclose()
+            flight.done = True
+            # 完成后立即移除，之后的相同请求会重新调用上游（或命中响应缓存）
+            if self._inflight.get(key) is flight:
+                del self._inflight[key]
+            async with flight.changed:
+                flight.changed.notify_all()
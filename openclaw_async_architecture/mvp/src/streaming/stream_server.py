@@ -8,6 +8,7 @@ import logging
 from typing import AsyncGenerator, Optional
 from .connection_manager import ConnectionManager
 from .llm_stream import StreamChatService
+from .session_store import SessionStore
 
 logger = logging.getLogger(__name__)
 
@@ -19,7 +20,8 @@ class StreamServer:
         self,
         connection_manager: ConnectionManager = None,
         stream_chat_service: StreamChatService = None,
-        default_provider: str = "nvidia2"  # 默认使用nvidia2（更快）
+        default_provider: str = "nvidia2",  # 默认使用nvidia2（更快）
+        session_store: Optional[SessionStore] = None
     ):
         """
         初始化流式服务器
@@ -28,10 +30,12 @@ class StreamServer:
             connection_manager: 连接管理器（可选）
             stream_chat_service: 流式聊天服务（可选）
             default_provider: 默认API提供商
+            session_store: 会话存储（可选，None表示每条消息独立，不带历史）
         """
         self.connection_manager = connection_manager or ConnectionManager()
         self.stream_chat_service = stream_chat_service
         self.default_provider = default_provider
+        self.session_store = session_store
 
     def set_stream_chat_service(self, stream_chat_service: StreamChatService):
         """
@@ -42,7 +46,13 @@ class StreamServer:
         """
         self.stream_chat_service = stream_chat_service
 
-    async def handle_connection(self, websocket: object, connection_id: str, client_ip: str = "unknown"):
+    async def handle_connection(
+        self,
+        websocket: object,
+        connection_id: str,
+        client_ip: str = "unknown",
+        session_id: Optional[str] = None
+    ):
         """
         处理WebSocket连接
 
@@ -50,10 +60,11 @@ class StreamServer:
             websocket: WebSocket对象
             connection_id: 连接ID
             client_ip: 客户端IP
+            session_id: 会话ID（可选，配置了session_store时用于保存对话历史）
         """
         try:
             # 添加连接
-            await self.connection_manager.connect(connection_id, websocket, client_ip)
+            await self.connection_manager.connect(connection_id, websocket, client_ip, session_id)
 
             # 处理消息
             async for message in self._receive_messages(websocket):
@@ -64,13 +75,17 @@ class StreamServer:
                     msg_data = json.loads(message)
                     user_message = msg_data.get("message", message)
                     provider = msg_data.get("provider", self.default_provider)
+                    params = msg_data.get("params")
+                    if msg_data.get("reset_session") and self.session_store and session_id:
+                        await self.session_store.delete(session_id)
                 except json.JSONDecodeError:
                     user_message = message
                     provider = self.default_provider
+                    params = None
 
                 # 处理消息并流式响应
                 try:
-                    async for chunk in self._stream_response(user_message, provider):
+                    async for chunk in self._stream_response(user_message, provider, params, session_id):
                         await self._send_chunk(websocket, chunk)
 
                     # 发送完成信号
@@ -86,7 +101,7 @@ class StreamServer:
 
         finally:
             # 断开连接
-            self.connection_manager.disconnect(connection_id, client_ip)
+            self.connection_manager.disconnect(connection_id, client_ip, session_id)
 
     async def _receive_messages(self, websocket: object) -> AsyncGenerator[str, None]:
         """
@@ -108,13 +123,21 @@ class StreamServer:
 
             yield message
 
-    async def _stream_response(self, message: str, provider: str) -> AsyncGenerator[str, None]:
+    async def _stream_response(
+        self,
+        message: str,
+        provider: str,
+        params: Optional[dict] = None,
+        session_id: Optional[str] = None
+    ) -> AsyncGenerator[str, None]:
         """
         流式响应（真实LLM调用）
 
         Args:
             message: 用户消息
             provider: API提供商
+            params: 采样参数（可选，如{"temperature": 0}）
+            session_id: 会话ID（可选，有会话时携带服务端保存的历史）
 
         Yields:
             响应块
@@ -123,12 +146,27 @@ class StreamServer:
         if not self.stream_chat_service:
             raise RuntimeError("StreamChatService未配置")
 
-        # 构建消息列表
-        messages = [{"role": "user", "content": message}]
-
-        # 调用流式LLM
-        async for chunk in self.stream_chat_service.stream_chat(provider, messages):
-            yield chunk
+        if not self.session_store or not session_id:
+            # 无会话：单条消息
+            messages = [{"role": "user", "content": message}]
+            async for chunk in self.stream_chat_service.stream_chat(provider, messages, params=params):
+                yield chunk
+            return
+
+        session = await self.session_store.get(session_id)
+        # 同一会话的多个连接串行处理，保证历史顺序
+        async with session.lock:
+            context_window = self.stream_chat_service.api_configs.get(provider, {}).get("context_window")
+            messages = await self.session_store.build_messages(session, message, context_window)
+
+            chunks = []
+            async for chunk in self.stream_chat_service.stream_chat(provider, messages, params=params):
+                chunks.append(chunk)
+                yield chunk
+
+            # 只有完整的回复才写入历史（中途断开则丢弃这一轮）
+            session.append("user", message)
+            session.append("assistant", "".join(chunks))
 
     async def _send_chunk(self, websocket: object, chunk: str):
         """
@@ -0,0 +1,489 @@
+"""
+后台任务管理器
+ExecTool后台模式的进程登记表
+
+每个后台命令是一个任务（job）：
+- 任务ID，可按ID查询状态、读取输出、终止
+- stdout/stderr合并写入轮转的日志文件（单文件上限 + 备份数，磁盘占用有上限）
+- 超时后杀死整个进程组；进程退出后立即回收（不产生僵尸进程）
+- 资源占用（RSS/CPU，需要psutil，包括子进程）
+- 运行中任务数有上限，已结束任务只保留最近的记录
+- shutdown()终止所有运行中的任务（默认管理器在解释器退出时自动调用）
+
+进程由线程管理（每个任务一个读输出线程 + 一个监控线程），不依赖事件循环，
+同步和异步调用方都可以使用。
+"""
+import atexit
+import logging
+import os
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+# 可选：psutil（资源占用统计和内存上限）
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    psutil = None
+    PSUTIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_RUNNING = 16  # 同时运行的后台任务上限
+DEFAULT_MAX_FINISHED = 100  # 保留的已结束任务记录数
+DEFAULT_JOB_TIMEOUT = 3600  # 后台任务默认超时（秒）
+DEFAULT_LOG_BYTES = 10 * 1024 * 1024  # 单个日志文件上限
+DEFAULT_LOG_BACKUPS = 2  # 轮转保留的备份文件数
+READ_CHUNK_BYTES = 64 * 1024
+
+# 任务状态
+RUNNING = "running"
+EXITED = "exited"
+KILLED = "killed"
+TIMEOUT = "timeout"
+
+
+class RotatingOutput:
+    """按大小轮转的输出文件：path, path.1, ..., path.N（越大越旧）"""
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_LOG_BYTES, backup_count: int = DEFAULT_LOG_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.size = 0
+        self.total_bytes = 0
+        self._file = open(path, "wb")
+
+    def write(self, chunk: bytes):
+        self.total_bytes += len(chunk)
+        while chunk:
+            if self.size >= self.max_bytes:
+                self._rotate()
+            part = chunk[:self.max_bytes - self.size]
+            chunk = chunk[len(part):]
+            self._file.write(part)
+            self.size += len(part)
+        self._file.flush()
+
+    def _rotate(self):
+        self._file.close()
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                src = f"{self.path}.{i}"
+                if os.path.exists(src):
+                    os.replace(src, f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        self._file = open(self.path, "wb")
+        self.size = 0
+
+    def close(self):
+        self._file.close()
+
+    def files(self) -> List[str]:
+        """现存的日志文件（从新到旧）"""
+        paths = [self.path] + [f"{self.path}.{i}" for i in range(1, self.backup_count + 1)]
+        return [p for p in paths if os.path.exists(p)]
+
+    def tail(self, max_bytes: int) -> bytes:
+        """读取最后max_bytes字节（必要时跨越备份文件）"""
+        parts: List[bytes] = []
+        remaining = max_bytes
+        for path in self.files():
+            if remaining <= 0:
+                break
+            try:
+                with open(path, "rb") as f:
+                    f.seek(0, os.SEEK_END)
+                    size = f.tell()
+                    f.seek(max(size - remaining, 0))
+                    data = f.read(remaining)
+            except OSError:
+                continue
+            parts.append(data)
+            remaining -= len(data)
+        return b"".join(reversed(parts))
+
+    def remove(self):
+        for path in self.files():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+@dataclass
+class BackgroundJob:
+    """后台任务记录"""
+    job_id: str
+    command: str
+    pid: int
+    workdir: Optional[str]
+    timeout: Optional[float]
+    log_path: str
+    started_at: float = field(default_factory=time.time)
+    status: str = RUNNING
+    exit_code: Optional[int] = None
+    finished_at: Optional[float] = None
+    reason: Optional[str] = None
+
+    _process: Any = field(default=None, repr=False)
+    _output: Optional[RotatingOutput] = field(default=None, repr=False)
+    _reader: Optional[threading.Thread] = field(default=None, repr=False)
+    _ps: Any = field(default=None, repr=False)
+    _done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def running(self) -> bool:
+        return self.status == RUNNING
+
+    @property
+    def deadline(self) -> Optional[float]:
+        return self.started_at + self.timeout if self.timeout else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        end = self.finished_at or time.time()
+        return {
+            "job_id": self.job_id,
+            "command": self.command,
+            "pid": self.pid,
+            "workdir": self.workdir,
+            "status": self.status,
+            "exit_code": self.exit_code,
+            "reason": self.reason,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed": round(end - self.started_at, 3),
+            "timeout": self.timeout,
+            "log_files": self._output.files() if self._output else [],
+            "output_bytes": self._output.total_bytes if self._output else 0,
+        }
+
+
+class JobManager:
+    """
+    后台任务管理器
+
+    用法：
+        jobs = JobManager()
+        job = jobs.start("python train.py", timeout=600)
+        jobs.status(job.job_id)      # 状态 + 资源占用
+        jobs.read_output(job.job_id) # 最近的输出
+        jobs.kill(job.job_id)
+        jobs.shutdown()
+    """
+
+    def __init__(
+        self,
+        output_dir: Optional[str] = None,
+        max_running: int = DEFAULT_MAX_RUNNING,
+        max_finished: int = DEFAULT_MAX_FINISHED,
+        default_timeout: Optional[float] = DEFAULT_JOB_TIMEOUT,
+        max_log_bytes: int = DEFAULT_LOG_BYTES,
+        log_backups: int = DEFAULT_LOG_BACKUPS,
+        max_rss_bytes: Optional[int] = None,
+        poll_interval: float = 1.0
+    ):
+        """
+        Args:
+            output_dir: 日志目录，None表示系统临时目录下的openclaw_jobs
+            max_running: 同时运行的任务上限，超出时start()抛出RuntimeError
+            max_finished: 保留的已结束任务数，更早的记录和日志被删除
+            default_timeout: 默认超时（秒），None表示不限
+            max_log_bytes: 单个日志文件上限
+            log_backups: 轮转保留的备份文件数
+            max_rss_bytes: 任务（含子进程）内存上限，超出后杀死；需要psutil
+            poll_interval: 监控线程检查超时/内存的间隔（秒）
+        """
+        self.output_dir = output_dir or os.path.join(tempfile.gettempdir(), "openclaw_jobs")
+        self.max_running = max_running
+        self.max_finished = max_finished
+        self.default_timeout = default_timeout
+        self.max_log_bytes = max_log_bytes
+        self.log_backups = log_backups
+        self.max_rss_bytes = max_rss_bytes
+        self.poll_interval = poll_interval
+
+        self._jobs: Dict[str, BackgroundJob] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._monitor: Optional[threading.Thread] = None
+
+        if max_rss_bytes and not PSUTIL_AVAILABLE:
+            logger.warning("[Jobs] psutil未安装，内存上限不生效")
+
+    # ========== 启动 ==========
+
+    def start(
+        self,
+        command: str,
+        workdir: Optional[str] = None,
+        timeout: Optional[float] = None,
+        env: Optional[Dict[str, str]] = None
+    ) -> BackgroundJob:
+        """
+        启动后台命令
+
+        Args:
+            command: Shell命令
+            workdir: 工作目录
+            timeout: 超时（秒），None表示使用default_timeout
+            env: 环境变量（None表示继承）
+
+        Returns:
+            BackgroundJob: 任务记录
+
+        Raises:
+            RuntimeError: 运行中任务数已达上限或管理器已关闭
+        """
+        if self._stop.is_set():
+            raise RuntimeError("后台任务管理器已关闭")
+        with self._lock:
+            running = sum(1 for job in self._jobs.values() if job.running)
+            if running >= self.max_running:
+                raise RuntimeError(f"后台任务数已达上限（{self.max_running}）")
+
+            os.makedirs(self.output_dir, exist_ok=True)
+            job_id = uuid.uuid4().hex[:12]
+            output = RotatingOutput(
+                os.path.join(self.output_dir, f"{job_id}.log"),
+                max_bytes=self.max_log_bytes,
+                backup_count=self.log_backups
+            )
+            try:
+                process = subprocess.Popen(
+                    command,
+                    shell=True,
+                    cwd=workdir,
+                    env=env,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    # 独立进程组：超时/终止时连同子进程一起杀死
+                    start_new_session=(os.name != "nt")
+                )
+            except Exception:
+                output.close()
+                output.remove()
+                raise
+
+            job = BackgroundJob(
+                job_id=job_id,
+                command=command,
+                pid=process.pid,
+                workdir=workdir,
+                timeout=timeout if timeout is not None else self.default_timeout,
+                log_path=output.path,
+                _process=process,
+                _output=output
+            )
+            job._reader = threading.Thread(
+                target=self._read_output, args=(job,), name=f"job-{job_id}", daemon=True
+            )
+            self._jobs[job_id] = job
+            job._reader.start()
+            self._ensure_monitor()
+
+        logger.info(f"[Jobs] 任务已启动: {job_id} pid={job.pid} {command}")
+        return job
+
+    def _read_output(self, job: BackgroundJob):
+        """读输出线程：管道 -> 轮转日志；EOF后回收进程并记录退出码"""
+        process = job._process
+        fd = process.stdout.fileno()
+        try:
+            while True:
+                chunk = os.read(fd, READ_CHUNK_BYTES)
+                if not chunk:
+                    break
+                job._output.write(chunk)
+        except Exception as e:
+            logger.warning(f"[Jobs] 读取任务输出失败 {job.job_id}: {e}")
+        finally:
+            process.stdout.close()
+            exit_code = process.wait()
+            job._output.close()
+            with self._lock:
+                job.exit_code = exit_code
+                job.finished_at = time.time()
+                if job.status == RUNNING:
+                    job.status = EXITED
+            job._done.set()
+            logger.info(f"[Jobs] 任务结束: {job.job_id} status={job.status} exit_code={exit_code}")
+            self._prune()
+
+    # ========== 监控（超时/内存） ==========
+
+    def _ensure_monitor(self):
+        if self._monitor is None or not self._monitor.is_alive():
+            self._monitor = threading.Thread(target=self._watch, name="job-monitor", daemon=True)
+            self._monitor.start()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            now = time.time()
+            with self._lock:
+                running = [job for job in self._jobs.values() if job.running]
+            if not running:
+                # 没有运行中的任务时退出，下次start()重新启动
+                with self._lock:
+                    if not any(job.running for job in self._jobs.values()):
+                        self._monitor = None
+                        return
+                continue
+            for job in running:
+                if job.deadline and now >= job.deadline:
+                    self._terminate(job, TIMEOUT, f"超时（{job.timeout}秒）")
+                elif self.max_rss_bytes and PSUTIL_AVAILABLE:
+                    rss = self._usage(job).get("rss_bytes", 0)
+                    if rss > self.max_rss_bytes:
+                        self._terminate(job, KILLED, f"内存超限（{rss}字节）")
+
+    def _terminate(self, job: BackgroundJob, status: str, reason: str) -> bool:
+        with self._lock:
+            if not job.running:
+                return False
+            job.status = status
+            job.reason = reason
+        try:
+            if os.name != "nt":
+                os.killpg(job.pid, signal.SIGKILL)
+            else:
+                job._process.kill()
+        except (ProcessLookupError, PermissionError):
+            pass
+        logger.warning(f"[Jobs] 任务已终止: {job.job_id} ({reason})")
+        return True
+
+    # ========== 查询 ==========
+
+    def get(self, job_id: str) -> Optional[BackgroundJob]:
+        return self._jobs.get(job_id)
+
+    def list_jobs(self, running_only: bool = False) -> List[Dict[str, Any]]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.to_dict() for job in jobs if job.running or not running_only]
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        任务状态
+
+        Returns:
+            任务信息字典（运行中且安装了psutil时包含resources），
+            任务不存在返回None
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        info = job.to_dict()
+        if job.running and PSUTIL_AVAILABLE:
+            info["resources"] = self._usage(job)
+        return info
+
+    @staticmethod
+    def _usage(job: BackgroundJob) -> Dict[str, Any]:
+        """进程及其子进程的资源占用（psutil）"""
+        try:
+            if job._ps is None:
+                job._ps = psutil.Process(job.pid)
+            procs = [job._ps] + job._ps.children(recursive=True)
+        except psutil.Error:
+            return {}
+        rss = cpu_seconds = cpu_percent = 0.0
+        for proc in procs:
+            try:
+                with proc.oneshot():
+                    rss += proc.memory_info().rss
+                    times = proc.cpu_times()
+                    cpu_seconds += times.user + times.system
+                    # 同一Process对象上的两次调用之间的CPU占用（首次为0）
+                    cpu_percent += proc.cpu_percent(None) if proc is job._ps else 0.0
+            except psutil.Error:
+                continue
+        return {
+            "rss_bytes": int(rss),
+            "cpu_seconds": round(cpu_seconds, 3),
+            "cpu_percent": round(cpu_percent, 1),
+            "num_processes": len(procs),
+        }
+
+    def read_output(self, job_id: str, max_bytes: int = 64 * 1024) -> Optional[str]:
+        """读取任务最近的输出（最后max_bytes字节），任务不存在返回None"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        return job._output.tail(max_bytes).decode("utf-8", errors="replace")
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[int]:
+        """等待任务结束，返回退出码（超时或任务不存在返回None）"""
+        job = self._jobs.get(job_id)
+        if job is None or not job._done.wait(timeout):
+            return None
+        return job.exit_code
+
+    # ========== 终止与清理 ==========
+
+    def kill(self, job_id: str) -> bool:
+        """终止任务（整个进程组），任务不存在或已结束返回False"""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return False
+        return self._terminate(job, KILLED, "手动终止")
+
+    def remove(self, job_id: str) -> bool:
+        """删除已结束任务的记录和日志文件"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.running:
+                return False
+            del self._jobs[job_id]
+        job._output.remove()
+        return True
+
+    def _prune(self):
+        """只保留最近max_finished个已结束任务"""
+        with self._lock:
+            finished = sorted(
+                (job for job in self._jobs.values() if not job.running and job._done.is_set()),
+                key=lambda job: job.finished_at
+            )
+            stale = finished[:max(len(finished) - self.max_finished, 0)]
+            for job in stale:
+                del self._jobs[job.job_id]
+        for job in stale:
+            job._output.remove()
+
+    def shutdown(self, timeout: float = 5.0):
+        """终止所有运行中的任务并等待回收（Worker关闭时调用）"""
+        self._stop.set()
+        with self._lock:
+            running = [job for job in self._jobs.values() if job.running]
+        for job in running:
+            self._terminate(job, KILLED, "管理器关闭")
+        deadline = time.monotonic() + timeout
+        for job in running:
+            job._done.wait(max(deadline - time.monotonic(), 0))
+        if running:
+            logger.info(f"[Jobs] 已终止{len(running)}个后台任务")
+
+
+# ========== 默认管理器 ==========
+
+_default_manager: Optional[JobManager] = None
+_default_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """进程级默认管理器（解释器退出时终止其中的任务）"""
+    global _default_manager
+    with _default_lock:
+        if _default_manager is None:
+            _default_manager = JobManager()
+            atexit.register(_default_manager.shutdown)
+        return _default_manager
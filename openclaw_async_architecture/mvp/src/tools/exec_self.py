@@ -1,16 +1,239 @@
 """
 自主实现的exec工具
 使用asyncio + subprocess，完全自主可控
-支持前台PTY模式和后台模式
+支持前台PTY模式、后台模式和流式模式（逐行产出stdout/stderr）
+
+前台和流式模式的输出内存有上限：每个流保留前max_output_bytes字节，
+超出部分只保留最后tail_lines行（环形缓冲），其余只计数。
+后台模式由JobManager管理（任务ID、轮转日志、状态查询、超时、关闭时清理）。
 """
 import asyncio
 import logging
-from typing import Optional, Tuple, List
+import os
+import signal
+from collections import deque
+from typing import AsyncIterator, Deque, Optional, Tuple, List
 import shlex
 import sys
 
+try:
+    from .exec_jobs import JobManager, get_job_manager
+except ImportError:
+    # 直接运行本文件
+    from exec_jobs import JobManager, get_job_manager
+
 logger = logging.getLogger(__name__)
 
+DEFAULT_MAX_OUTPUT_BYTES = 1024 * 1024  # 每个流最多保留1MB（头部）
+DEFAULT_TAIL_LINES = 200  # 超出上限后保留的末尾行数
+MAX_LINE_BYTES = 64 * 1024  # 超长行按此长度切分
+READ_CHUNK_BYTES = 64 * 1024
+
+
+class CappedOutput:
+    """有上限的输出缓冲：前max_bytes字节 + 之后的最后tail_lines行（同样不超过max_bytes）"""
+
+    __slots__ = ("max_bytes", "head", "head_bytes", "tail", "tail_bytes", "total_bytes")
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_OUTPUT_BYTES, tail_lines: int = DEFAULT_TAIL_LINES):
+        self.max_bytes = max_bytes
+        self.head: List[str] = []
+        self.head_bytes = 0
+        self.tail: Deque[Tuple[str, int]] = deque(maxlen=tail_lines)
+        self.tail_bytes = 0
+        self.total_bytes = 0
+
+    def add(self, line: str, size: int):
+        """追加一行（size为原始字节数）"""
+        self.total_bytes += size
+        if not self.tail and self.head_bytes + size <= self.max_bytes:
+            self.head.append(line)
+            self.head_bytes += size
+            return
+        if len(self.tail) == self.tail.maxlen:
+            self.tail_bytes -= self.tail[0][1]
+        self.tail.append((line, size))
+        self.tail_bytes += size
+        # 末尾缓冲同样不超过max_bytes（防止超长行撑大）
+        while self.tail_bytes > self.max_bytes and len(self.tail) > 1:
+            self.tail_bytes -= self.tail.popleft()[1]
+
+    @property
+    def omitted_bytes(self) -> int:
+        """既不在头部也不在末尾缓冲中的字节数"""
+        return self.total_bytes - self.head_bytes - self.tail_bytes
+
+    def text(self) -> str:
+        head = "".join(self.head)
+        tail = "".join(line for line, _ in self.tail)
+        if self.omitted_bytes:
+            return f"{head}\n... [已省略 {self.omitted_bytes} 字节] ...\n{tail}"
+        return head + tail
+
+
+class ExecStream:
+    """
+    流式执行的命令
+
+    异步迭代产出 (流名称, 行)，流名称为"stdout"或"stderr"；迭代结束后
+    exit_code / stdout / stderr / timed_out / error 可用。提前退出迭代
+    （break或aclose）会终止进程。
+
+    用法：
+        stream = ExecTool().stream("make -j8")
+        async for name, line in stream:
+            print(name, line, end="")
+        print(stream.exit_code, stream.stdout[-200:])
+    """
+
+    def __init__(
+        self,
+        command: str,
+        timeout: float,
+        workdir: Optional[str] = None,
+        max_output_bytes: int = DEFAULT_MAX_OUTPUT_BYTES,
+        tail_lines: int = DEFAULT_TAIL_LINES
+    ):
+        """
+        Args:
+            command: Shell命令
+            timeout: 超时时间（秒），超时后杀死整个进程组
+            workdir: 工作目录
+            max_output_bytes: 每个流在结果中保留的头部字节数
+            tail_lines: 超出上限后保留的末尾行数
+        """
+        self.command = command
+        self.timeout = timeout
+        self.workdir = workdir
+        self.pid: Optional[int] = None
+        self.exit_code: Optional[int] = None
+        self.timed_out = False
+        self.error: Optional[str] = None
+        self._stdout = CappedOutput(max_output_bytes, tail_lines)
+        self._stderr = CappedOutput(max_output_bytes, tail_lines)
+
+    @property
+    def stdout(self) -> str:
+        return self._stdout.text()
+
+    @property
+    def stderr(self) -> str:
+        return self._stderr.text()
+
+    @property
+    def truncated(self) -> bool:
+        return bool(self._stdout.omitted_bytes or self._stderr.omitted_bytes)
+
+    def __aiter__(self) -> AsyncIterator[Tuple[str, str]]:
+        return self._run()
+
+    async def _run(self) -> AsyncIterator[Tuple[str, str]]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        try:
+            process = await asyncio.create_subprocess_shell(
+                self.command,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=self.workdir,
+                # 独立进程组，超时时连同shell的子进程一起杀死
+                start_new_session=(os.name != "nt")
+            )
+        except Exception as e:
+            self.exit_code = -1
+            self.error = str(e)
+            return
+        self.pid = process.pid
+
+        # 有界队列：消费者慢时暂停读取管道（背压），内存不随输出增长
+        queue: asyncio.Queue = asyncio.Queue(maxsize=256)
+        pumps = [
+            asyncio.create_task(self._pump(process.stdout, "stdout", self._stdout, queue)),
+            asyncio.create_task(self._pump(process.stderr, "stderr", self._stderr, queue)),
+        ]
+        try:
+            open_streams = len(pumps)
+            while open_streams:
+                # 每次迭代都检查：输出不断且消费者在行间await时队列永远非空
+                if loop.time() >= deadline:
+                    raise asyncio.TimeoutError
+                if queue.empty():
+                    item = await asyncio.wait_for(queue.get(), max(deadline - loop.time(), 0))
+                else:
+                    item = queue.get_nowait()
+                if item is None:
+                    open_streams -= 1
+                    continue
+                yield item
+            await asyncio.wait_for(process.wait(), max(deadline - loop.time(), 0))
+            self.exit_code = process.returncode or 0
+        except asyncio.TimeoutError:
+            self.timed_out = True
+            self.exit_code = -1
+            self.error = f"命令超时（{self.timeout}秒），已终止"
+            logger.error(f"[Exec] 命令超时（{self.timeout}秒），已终止")
+        finally:
+            for pump in pumps:
+                pump.cancel()
+            if process.returncode is None:
+                await _kill_process(process)
+
+    @staticmethod
+    async def _pump(
+        reader: asyncio.StreamReader,
+        name: str,
+        output: CappedOutput,
+        queue: asyncio.Queue
+    ):
+        """按行读取管道（超长行切分），写入缓冲并转发给消费者"""
+        async def emit(raw: bytes):
+            line = raw.decode("utf-8", errors="replace")
+            output.add(line, len(raw))
+            await queue.put((name, line))
+
+        partial = b""
+        try:
+            while True:
+                chunk = await reader.read(READ_CHUNK_BYTES)
+                if not chunk:
+                    break
+                lines = (partial + chunk).split(b"\n")
+                partial = lines.pop()
+                for raw in lines:
+                    await emit(raw + b"\n")
+                while len(partial) >= MAX_LINE_BYTES:
+                    await emit(partial[:MAX_LINE_BYTES])
+                    partial = partial[MAX_LINE_BYTES:]
+            if partial:
+                await emit(partial)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"[Exec] 读取{name}失败: {e}")
+        await queue.put(None)
+
+
+async def _kill_process(process: asyncio.subprocess.Process):
+    """杀死进程（POSIX下杀死整个进程组）并回收"""
+    try:
+        if os.name != "nt":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+    async def drain(reader: Optional[asyncio.StreamReader]):
+        # 读取器因背压暂停时管道读不到EOF，process.wait()不会返回
+        if reader is not None:
+            while await reader.read(READ_CHUNK_BYTES):
+                pass
+
+    try:
+        await asyncio.wait_for(asyncio.gather(drain(process.stdout), drain(process.stderr), process.wait()), 5)
+    except Exception:
+        pass
+
 
 class ExecTool:
     """自主实现的exec工具，完全独立于OpenClaw"""
@@ -19,7 +242,10 @@ class ExecTool:
         self,
         default_timeout: int = 30,
         workdir: Optional[str] = None,
-        use_pty: bool = False
+        use_pty: bool = False,
+        max_output_bytes: int = DEFAULT_MAX_OUTPUT_BYTES,
+        tail_lines: int = DEFAULT_TAIL_LINES,
+        job_manager: Optional[JobManager] = None
     ):
         """
         初始化
@@ -28,10 +254,48 @@ class ExecTool:
             default_timeout: 默认超时时间（秒）
             workdir: 工作目录
             use_pty: 是否使用PTY（伪终端）
+            max_output_bytes: 每个流保留的最大字节数（头部）
+            tail_lines: 超出上限后保留的末尾行数
+            job_manager: 后台任务管理器，None表示使用进程级默认管理器
         """
         self.default_timeout = default_timeout
         self.workdir = workdir
         self.use_pty = use_pty
+        self.max_output_bytes = max_output_bytes
+        self.tail_lines = tail_lines
+        self._job_manager = job_manager
+
+    @property
+    def jobs(self) -> JobManager:
+        """后台任务管理器（查询状态/读取输出/终止）"""
+        if self._job_manager is None:
+            self._job_manager = get_job_manager()
+        return self._job_manager
+
+    def stream(
+        self,
+        command: str,
+        timeout: Optional[int] = None,
+        workdir: Optional[str] = None
+    ) -> ExecStream:
+        """
+        流式执行Shell命令（逐行产出stdout/stderr）
+
+        Args:
+            command: 要执行的命令
+            timeout: 超时时间（秒），None表示使用默认值
+            workdir: 工作目录，None表示使用默认值
+
+        Returns:
+            ExecStream: 异步迭代产出 (流名称, 行)，结束后可读取exit_code等
+        """
+        return ExecStream(
+            command.strip(),
+            timeout=timeout or self.default_timeout,
+            workdir=workdir or self.workdir,
+            max_output_bytes=self.max_output_bytes,
+            tail_lines=self.tail_lines
+        )
 
     async def execute(
         self,
@@ -47,6 +311,7 @@ class ExecTool:
         Args:
             command: 要执行的命令
             timeout: 超时时间（秒），None表示使用默认值
+                （后台模式下None表示使用任务管理器的默认超时）
             background: 是否后台运行
             capture_output: 是否捕获输出
             workdir: 工作目录，None表示使用默认值
@@ -67,7 +332,7 @@ class ExecTool:
 
         if background:
             # 后台模式（不等待完成，立即返回）
-            return await self._execute_background(cmd, actual_workdir)
+            return await self._execute_background(cmd, actual_workdir, timeout)
         else:
             # 前台模式（等待完成）
             return await self._execute_foreground(
@@ -86,43 +351,44 @@ class ExecTool:
     ) -> Tuple[int, str, str]:
         """
         前台执行命令（等待完成）
+
+        捕获输出时基于ExecStream，输出内存有上限（超出部分省略中间）
         """
+        if capture_output:
+            stream = ExecStream(
+                command,
+                timeout=timeout,
+                workdir=workdir,
+                max_output_bytes=self.max_output_bytes,
+                tail_lines=self.tail_lines
+            )
+            async for _ in stream:
+                pass
+
+            if stream.timed_out:
+                return -1, stream.stdout, stream.error
+            if stream.error:
+                logger.error(f"[Exec] 执行失败: {stream.error}")
+                return -1, "", stream.error
+
+            logger.info(f"[Exec] 命令完成: exit_code={stream.exit_code}")
+            return stream.exit_code, stream.stdout, stream.stderr
+
         try:
-            # 创建子进程
+            # 不捕获输出：子进程直接继承控制台
             process = await asyncio.create_subprocess_shell(
                 command,
-                stdout=asyncio.subprocess.PIPE if capture_output else None,
-                stderr=asyncio.subprocess.PIPE if capture_output else None,
-                cwd=workdir
+                cwd=workdir,
+                start_new_session=(os.name != "nt")
             )
 
-            # 等待完成（带超时）
             try:
-                stdout, stderr = await asyncio.wait_for(
-                    process.communicate(),
-                    timeout=timeout
-                )
-
-                # 解码输出
-                stdout_text = stdout.decode('utf-8', errors='replace') if stdout else ""
-                stderr_text = stderr.decode('utf-8', errors='replace') if stderr else ""
-
+                await asyncio.wait_for(process.wait(), timeout=timeout)
                 logger.info(f"[Exec] 命令完成: exit_code={process.returncode}")
-
-                return (
-                    process.returncode or 0,
-                    stdout_text,
-                    stderr_text
-                )
+                return process.returncode or 0, "", ""
 
             except asyncio.TimeoutError:
-                # 超时，终止进程
-                try:
-                    process.kill()
-                    await process.wait()
-                except:
-                    pass
-
+                await _kill_process(process)
                 logger.error(f"[Exec] 命令超时（{timeout}秒），已终止")
                 return -1, "", f"命令超时（{timeout}秒），已终止"
 
@@ -133,26 +399,24 @@ class ExecTool:
     async def _execute_background(
         self,
         command: str,
-        workdir: Optional[str]
+        workdir: Optional[str],
+        timeout: Optional[int] = None
     ) -> Tuple[int, str, str]:
         """
         后台执行命令（不等待完成）
+
+        由任务管理器登记，输出写入轮转日志；返回的stdout包含任务ID，
+        之后通过 self.jobs.status / read_output / kill 查询和控制。
         """
         try:
-            # 创建子进程
-            process = await asyncio.create_subprocess_shell(
-                command,
-                stdout=None,  # 不捕获输出
-                stderr=None,
-                cwd=workdir
-            )
+            job = self.jobs.start(command, workdir=workdir, timeout=timeout)
 
-            logger.info(f"[Exec] 命令已启动（后台）: pid={process.pid}")
+            logger.info(f"[Exec] 命令已启动（后台）: job={job.job_id} pid={job.pid}")
 
             # 立即返回
             return (
                 0,
-                f"命令已在后台启动 (PID: {process.pid})",
+                f"命令已在后台启动 (任务ID: {job.job_id}, PID: {job.pid})",
                 ""
             )
 
@@ -0,0 +1,361 @@
+"""
+HTML正文提取 - SAX式单遍扫描，输出简化markdown或纯文本
+
+- 分词：一个正则依次查找标签/注释，之间的内容为文本；属性只在需要时（链接、role/hidden）解析；
+  script/style/title的内容按原始文本整段跳过，不逐个分词
+- 标题（#）、列表（- / 1.）、链接（[文本](URL)）、代码块（```）、表格行（|分隔）
+- 跳过script/style/noscript/template/svg等，以及导航、页脚、侧栏等模板内容
+- 支持增量喂入（标签/注释/实体跨块时保留到下一块）；输出达到max_chars后停止解析
+"""
+import re
+from html import unescape
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+
+# 内容整体跳过的元素
+SKIP_TAGS = frozenset({
+    "script", "style", "noscript", "template", "svg", "math", "canvas", "iframe",
+    "object", "nav", "footer", "aside", "form", "button", "select", "dialog",
+})
+# 整体跳过的ARIA角色（导航、页眉、页脚等模板内容）
+SKIP_ROLES = frozenset({"navigation", "banner", "contentinfo", "complementary", "search", "menu", "dialog"})
+# 段落级元素（前后换行）
+BLOCK_TAGS = frozenset({
+    "p", "div", "section", "article", "main", "header", "blockquote", "figure", "figcaption",
+    "dl", "dt", "dd", "table", "thead", "tbody", "tfoot", "details", "summary", "address",
+    "hr", "ul", "ol", "center", "body", "html",
+})
+HEADING_TAGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+VOID_TAGS = frozenset({
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr",
+})
+
+# 内容为原始文本的元素（内容中的"<"不是标签）
+RAW_TAGS = frozenset({"script", "style", "title", "textarea", "xmp"})
+
+FEED_CHUNK_CHARS = 64 * 1024  # 分块喂入，每块之后检查是否已达上限
+_WHITESPACE = re.compile(r"\s+")
+# 标签（组1：结束标记，组2：标签名，组3：属性文本）、注释、doctype/处理指令
+# 只有紧跟在"="后的引号才开始属性值，且属性值不跨越">"（不成对的引号不会吞掉后面的正文）；
+# 标签总在下一个">"处结束，因此只在最后一个">"之前查找（末尾没有">"时不会逐个"<"扫描到底）
+_TOKEN = re.compile(
+    r"""<(?:(/?)([A-Za-z][A-Za-z0-9:-]*)((?:[^>"'=]+|=(?:\s*"[^">]*"|\s*'[^'>]*')?|["'])*)>"""
+    r"""|!--.*?-->|![^>]*>|\?[^>]*>)""",
+    re.DOTALL
+)
+_ATTR = re.compile(r"""([^\s=/>"']+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?""")
+_RAW_END = {tag: re.compile(rf"</{tag}\s*>", re.IGNORECASE) for tag in RAW_TAGS}
+
+
+def _parse_attrs(text: str) -> Dict[str, str]:
+    attrs = {}
+    for m in _ATTR.finditer(text):
+        value = m.group(2) if m.group(2) is not None else m.group(3) if m.group(3) is not None else m.group(4)
+        attrs[m.group(1).lower()] = unescape(value) if value else ""
+    return attrs
+
+
+class MarkdownExtractor:
+    """
+    HTML -> markdown/纯文本（增量：可多次feed，done后忽略后续输入）
+
+    使用示例：
+        extractor = MarkdownExtractor(max_chars=10000)
+        for chunk in chunks:
+            if extractor.feed(chunk):
+                break
+        extractor.close()
+        text = extractor.result()
+    """
+
+    def __init__(self, max_chars: Optional[int] = None, markdown: bool = True, base_url: Optional[str] = None):
+        """
+        Args:
+            max_chars: 输出字符上限，None表示不限
+            markdown: False时输出纯文本（保留换行，不加markdown标记）
+            base_url: 相对链接的基准URL
+        """
+        self.max_chars = max_chars
+        self.markdown = markdown
+        self.base_url = base_url
+        self.title = ""
+        self.done = False
+        self.truncated = False
+        self._out: List[str] = []
+        self._chars = 0
+        self._newlines = 2  # 输出末尾连续换行数（开头视为段落边界）
+        self._space = False  # 下一段文本前是否要补一个空格
+        self._skip_tag: Optional[str] = None
+        self._skip_depth = 0
+        self._pending = ""  # 未处理完的输入（跨块的标签/注释/原始文本）
+        self._raw: Optional[str] = None  # 当前所在的原始文本元素
+        self._pre = 0
+        self._lists: List[List] = []  # [标签, 序号]
+        self._links: List[Tuple[int, str]] = []  # (链接开始时的输出位置, href)
+
+    # ---------- 输出 ----------
+
+    def _emit(self, text: str):
+        self._out.append(text)
+        self._chars += len(text)
+        self._newlines = 0
+        if self.max_chars is not None and self._chars >= self.max_chars:
+            self.done = True
+            self.truncated = True
+
+    def _break(self, count: int = 2):
+        """确保输出末尾至少有count个换行"""
+        if count > self._newlines:
+            self._out.append("\n" * (count - self._newlines))
+            self._chars += count - self._newlines
+            self._newlines = count
+        self._space = False
+
+    def _text(self, data: str):
+        if self._pre:
+            self._emit(data)
+            self._newlines = len(data) - len(data.rstrip("\n"))
+            return
+        collapsed = _WHITESPACE.sub(" ", data)
+        if not collapsed.strip():
+            if collapsed:
+                self._space = True
+            return
+        if collapsed[0] == " ":
+            self._space = True
+        if self._space and not self._newlines:
+            self._emit(" ")
+        self._emit(collapsed.strip())
+        self._space = collapsed[-1] == " "
+
+    # ---------- 标签处理 ----------
+
+    def _skipped(self, tag: str, attr_text: str) -> bool:
+        if tag in SKIP_TAGS:
+            return True
+        if "role" not in attr_text and "hidden" not in attr_text:
+            return False
+        attrs = _parse_attrs(attr_text)
+        return (attrs.get("role") or "").lower() in SKIP_ROLES \
+            or attrs.get("aria-hidden") == "true" or "hidden" in attrs
+
+    def _start(self, tag: str, attr_text: str):
+        if self._skip_tag is not None:
+            if tag == self._skip_tag:
+                self._skip_depth += 1
+            return
+        if self._skipped(tag, attr_text):
+            if tag not in VOID_TAGS:
+                self._skip_tag, self._skip_depth = tag, 1
+            return
+
+        if tag in HEADING_TAGS:
+            self._break(2)
+            if self.markdown:
+                self._emit("#" * HEADING_TAGS[tag] + " ")
+        elif tag == "br":
+            self._break(1)
+        elif tag == "li":
+            self._break(1)
+            indent = "  " * max(len(self._lists) - 1, 0)
+            if self._lists and self._lists[-1][0] == "ol":
+                self._lists[-1][1] += 1
+                marker = f"{self._lists[-1][1]}. "
+            else:
+                marker = "- "
+            self._emit(indent + marker if self.markdown else indent)
+        elif tag in ("ul", "ol"):
+            self._break(1 if self._lists else 2)
+            self._lists.append([tag, 0])
+        elif tag == "pre":
+            self._break(2)
+            if self.markdown:
+                self._emit("```")
+                self._break(1)
+            self._pre += 1
+        elif tag == "code" and not self._pre:
+            if self._space and not self._newlines:
+                self._emit(" ")
+                self._space = False
+            if self.markdown:
+                self._emit("`")
+        elif tag == "a":
+            href = _parse_attrs(attr_text).get("href", "") if "href" in attr_text else ""
+            if self._space and not self._newlines:
+                self._emit(" ")
+                self._space = False
+            self._links.append((len(self._out), href))
+        elif tag == "tr":
+            self._break(1)
+        elif tag in ("td", "th"):
+            if self._newlines == 0:
+                self._emit(" | ")
+                self._space = False
+        elif tag in BLOCK_TAGS:
+            self._break(2)
+
+    def _end(self, tag: str):
+        if self._skip_tag is not None:
+            if tag == self._skip_tag:
+                self._skip_depth -= 1
+                if self._skip_depth == 0:
+                    self._skip_tag = None
+            return
+        if tag in HEADING_TAGS:
+            self._break(2)
+        elif tag == "li":
+            self._break(1)
+        elif tag in ("ul", "ol"):
+            if self._lists and self._lists[-1][0] == tag:
+                self._lists.pop()
+            self._break(1 if self._lists else 2)
+        elif tag == "pre":
+            if self._pre:
+                self._pre -= 1
+                if self.markdown:
+                    self._break(1)
+                    self._emit("```")
+                self._break(2)
+        elif tag == "code" and not self._pre:
+            if self.markdown:
+                self._emit("`")
+        elif tag == "a":
+            self._close_link()
+        elif tag in BLOCK_TAGS:
+            self._break(2)
+
+    def _close_link(self):
+        if not self._links:
+            return
+        start, href = self._links.pop()
+        if not self.markdown or not href or href.startswith(("#", "javascript:", "mailto:")):
+            return
+        text = "".join(self._out[start:]).strip()
+        if not text or "\n" in text:
+            return
+        if self.base_url:
+            href = urljoin(self.base_url, href.strip())
+        removed = sum(len(part) for part in self._out[start:])
+        del self._out[start:]
+        self._chars -= removed
+        self._emit(f"[{text}]({href})")
+
+    def _data(self, data: str):
+        if self._skip_tag is not None or not data:
+            return
+        self._text(unescape(data) if "&" in data else data)
+
+    # ---------- 分词 ----------
+
+    def _parse(self, final: bool):
+        buf = self._pending
+        size = len(buf)
+        if not final:
+            # 未结束的注释留到下一块（否则注释里的内容会被当作标签）
+            comment = buf.rfind("<!--")
+            if comment >= 0 and buf.find("-->", comment + 4) < 0:
+                size = comment
+        tag_end = buf.rfind(">", 0, size) + 1  # 标签/注释只可能在此之前结束
+        pos = 0
+        while pos < size and not self.done:
+            if self._raw is not None:
+                m = _RAW_END[self._raw].search(buf, pos, size)
+                if m is None and not final:
+                    if self._raw in ("script", "style"):
+                        pos = max(pos, size - 16)  # 内容丢弃，只保留可能跨块的结束标签
+                    break
+                end = m.start() if m else size
+                tag, self._raw = self._raw, None
+                if tag == "title":
+                    if self._skip_tag is None:
+                        self.title += unescape(buf[pos:end])
+                elif tag not in ("script", "style"):
+                    self._data(buf[pos:end])
+                    self._end(tag)
+                pos = m.end() if m else size
+                continue
+
+            m = _TOKEN.search(buf, pos, tag_end) if pos < tag_end else None
+            if m is None:
+                end = size
+                if not final:
+                    # 末尾可能是跨块的标签或字符实体，留到下一块
+                    lt = buf.rfind("<", pos, size)
+                    amp = buf.rfind("&", max(pos, size - 32), size)
+                    if lt >= 0:
+                        end = lt
+                    elif amp >= 0 and ";" not in buf[amp:size]:
+                        end = amp
+                self._data(buf[pos:end])
+                pos = end
+                break
+
+            if m.start() > pos:
+                self._data(buf[pos:m.start()])
+            pos = m.end()
+            tag = m.group(2)
+            if tag is None:
+                continue  # 注释、doctype
+            tag = tag.lower()
+            if m.group(1):
+                self._end(tag)
+                continue
+            attr_text = m.group(3)
+            if tag == "title" or tag == "script" or tag == "style":
+                self._raw = tag
+            else:
+                self._start(tag, attr_text)
+                if tag in RAW_TAGS:
+                    self._raw = tag
+            if attr_text.endswith("/") and tag not in VOID_TAGS:
+                self._raw = None
+                self._end(tag)
+        self._pending = "" if self.done else buf[pos:]
+
+    # ---------- 接口 ----------
+
+    def feed(self, data: str) -> bool:
+        """喂入一段HTML，返回是否已达到max_chars（达到后不再需要继续喂入）"""
+        if not self.done:
+            self._pending += data
+            self._parse(final=False)
+        return self.done
+
+    def close(self):
+        """输入结束，处理剩余内容"""
+        if not self.done and self._pending:
+            self._parse(final=True)
+
+    def result(self) -> str:
+        """当前输出（超出max_chars的部分截掉）"""
+        text = "".join(self._out).strip()
+        if self.max_chars is not None and len(text) > self.max_chars:
+            text = text[:self.max_chars]
+        return text
+
+
+def extract(
+    html: str,
+    max_chars: Optional[int] = None,
+    markdown: bool = True,
+    base_url: Optional[str] = None
+) -> Tuple[str, bool]:
+    """
+    提取HTML正文
+
+    Args:
+        html: HTML文本
+        max_chars: 输出字符上限（达到后停止解析）
+        markdown: True输出markdown，False输出纯文本
+        base_url: 相对链接的基准URL
+
+    Returns:
+        (文本, 是否因max_chars截断)
+    """
+    extractor = MarkdownExtractor(max_chars=max_chars, markdown=markdown, base_url=base_url)
+    for start in range(0, len(html), FEED_CHUNK_CHARS):
+        if extractor.feed(html[start:start + FEED_CHUNK_CHARS]):
+            break
+    else:
+        extractor.close()
+    return extractor.result(), extractor.truncated
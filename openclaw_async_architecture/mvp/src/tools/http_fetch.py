@@ -0,0 +1,451 @@
+"""
+HTTP抓取 - 共享连接池、按主机并发限制、磁盘HTTP缓存
+
+- HttpFetcher：每个事件循环一个共享httpx.AsyncClient（Keep-Alive连接复用），
+  每个主机的并发请求数有上限；响应体流式下载，达到字节上限后停止
+- HttpCache：SQLite缓存（响应头 + 响应体），遵循Cache-Control/Expires，
+  过期后用ETag/Last-Modified发送条件请求，304时直接复用缓存内容；
+  默认位于临时目录下当前用户私有的目录（0700）
+"""
+import asyncio
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import stat
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+DEFAULT_PER_HOST = 4  # 每个主机同时进行的请求数
+DEFAULT_MAX_CONNECTIONS = 32
+DEFAULT_CACHE_BYTES = 200 * 1024 * 1024  # 缓存响应体总大小上限
+HEURISTIC_MAX_AGE = 24 * 3600  # 只有Last-Modified时的启发式新鲜期上限
+
+# 缓存中保留的响应头
+_CACHED_HEADERS = ("content-type", "etag", "last-modified", "cache-control", "expires", "date", "vary")
+
+
+def _parse_http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def _cache_control(headers) -> Dict[str, Optional[str]]:
+    directives = {}
+    for part in headers.get("cache-control", "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"') or None
+    return directives
+
+
+def freshness(headers, now: Optional[float] = None) -> Tuple[bool, float]:
+    """
+    根据响应头计算缓存策略
+
+    Returns:
+        (是否可以存入缓存, 过期时间戳)；过期时间 <= now 表示每次使用前都要重新验证
+    """
+    now = time.time() if now is None else now
+    directives = _cache_control(headers)
+    if "no-store" in directives or headers.get("vary", "").strip() == "*":
+        return False, now
+
+    validators = bool(headers.get("etag") or headers.get("last-modified"))
+    if "no-cache" in directives:
+        return validators, now
+
+    max_age = directives.get("max-age")
+    if max_age is not None and max_age.isdigit():
+        try:
+            age = int(headers.get("age", 0))
+        except ValueError:
+            age = 0
+        return True, now + max(int(max_age) - age, 0)
+
+    date = _parse_http_date(headers.get("date")) or now
+    expires = _parse_http_date(headers.get("expires"))
+    if "expires" in headers:
+        # 无法解析的Expires视为已过期
+        return validators or (expires or 0) > date, now + ((expires or 0) - date)
+
+    last_modified = _parse_http_date(headers.get("last-modified"))
+    if last_modified is not None:
+        return True, now + min(max(date - last_modified, 0) / 10, HEURISTIC_MAX_AGE)
+    return validators, now
+
+
+@dataclass
+class FetchResult:
+    """抓取结果"""
+    url: str  # 最终URL（跟随重定向后）
+    status: int
+    headers: Dict[str, str]
+    content: bytes
+    truncated: bool = False  # 响应体是否因字节上限被截断
+    cache: str = "miss"  # miss / hit / revalidated
+    skipped: bool = False  # Content-Type不在允许列表中，未下载响应体
+
+    @property
+    def content_type(self) -> str:
+        return self.headers.get("content-type", "").lower()
+
+    @property
+    def encoding(self) -> str:
+        for part in self.content_type.split(";")[1:]:
+            name, _, value = part.strip().partition("=")
+            if name == "charset" and value:
+                return value.strip('"')
+        return "utf-8"
+
+    def text(self) -> str:
+        try:
+            return self.content.decode(self.encoding, errors="ignore")
+        except LookupError:
+            return self.content.decode("utf-8", errors="ignore")
+
+
+def _type_allowed(result: FetchResult, content_types: Optional[Sequence[str]]) -> bool:
+    """Content-Type是否在允许列表中（子串匹配，None表示不限）"""
+    return content_types is None or any(t in result.content_type for t in content_types)
+
+
+def _skip_body(result: FetchResult) -> FetchResult:
+    """Content-Type不允许：丢弃响应体，标记为skipped"""
+    result.content = b""
+    result.truncated = False
+    result.skipped = True
+    return result
+
+
+def _default_cache_path() -> str:
+    """
+    默认缓存路径：临时目录下当前用户私有的目录（0700）
+
+    缓存命中时不发请求，目录若被其他用户预先创建就能植入响应，因此拒绝使用不属于当前用户的目录
+    """
+    if not hasattr(os, "getuid"):
+        # Windows的临时目录本身按用户隔离
+        return os.path.join(tempfile.gettempdir(), "openclaw_http_cache", "cache.sqlite")
+    directory = os.path.join(tempfile.gettempdir(), f"openclaw_http_cache-{os.getuid()}")
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        raise PermissionError(f"HTTP缓存目录不属于当前用户: {directory}")
+    if info.st_mode & 0o077:
+        os.chmod(directory, 0o700)
+    return os.path.join(directory, "cache.sqlite")
+
+
+@dataclass
+class CachedResponse:
+    """缓存条目"""
+    url: str
+    final_url: str
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+    truncated: bool
+    stored_at: float
+    expires_at: float
+
+    def covers(self, max_bytes: Optional[int]) -> bool:
+        """缓存的响应体是否足够满足本次请求"""
+        return not self.truncated or (max_bytes is not None and len(self.body) >= max_bytes)
+
+    def to_result(self, cache: str, max_bytes: Optional[int]) -> FetchResult:
+        body = self.body if max_bytes is None else self.body[:max_bytes]
+        return FetchResult(
+            url=self.final_url,
+            status=self.status,
+            headers=dict(self.headers),
+            content=body,
+            truncated=self.truncated or len(body) < len(self.body),
+            cache=cache
+        )
+
+
+class HttpCache:
+    """SQLite HTTP缓存（线程安全，超出大小上限时淘汰最久未访问的条目）"""
+
+    def __init__(self, path: Optional[str] = None, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.path = path or _default_cache_path()
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " url TEXT PRIMARY KEY, final_url TEXT, status INTEGER, headers TEXT, body BLOB,"
+            " truncated INTEGER, stored_at REAL, expires_at REAL, accessed_at REAL, size INTEGER)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT final_url, status, headers, body, truncated, stored_at, expires_at"
+                " FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (time.time(), url))
+        final_url, status, headers, body, truncated, stored_at, expires_at = row
+        return CachedResponse(url, final_url, status, json.loads(headers), body, bool(truncated), stored_at, expires_at)
+
+    def put(self, entry: CachedResponse):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (entry.url, entry.final_url, entry.status, json.dumps(entry.headers), entry.body,
+                 int(entry.truncated), entry.stored_at, entry.expires_at, now, len(entry.body))
+            )
+            self._evict()
+
+    def refresh(self, url: str, headers: Dict[str, str], expires_at: float):
+        """304之后更新响应头和过期时间"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE responses SET headers = ?, expires_at = ?, accessed_at = ? WHERE url = ?",
+                (json.dumps(headers), expires_at, time.time(), url)
+            )
+
+    def delete(self, url: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, size in self._conn.execute(
+            "SELECT url, size FROM responses ORDER BY accessed_at"
+        ).fetchall():
+            self._conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            count, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {"entries": count, "bytes": size, "max_bytes": self.max_bytes, "path": self.path}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class HttpFetcher:
+    """共享HTTP抓取器（连接复用 + 按主机限流 + HTTP缓存）"""
+
+    def __init__(
+        self,
+        cache: Optional[HttpCache] = None,
+        per_host: int = DEFAULT_PER_HOST,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        timeout: float = 10.0,
+        user_agent: str = DEFAULT_USER_AGENT,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        """
+        Args:
+            cache: HTTP缓存，None表示不缓存
+            per_host: 每个主机的并发请求上限
+            max_connections: 连接池总连接数上限
+            timeout: 默认超时（秒）
+            user_agent: User-Agent请求头
+            transport: 自定义传输层（测试用）
+        """
+        self.cache = cache
+        self.per_host = per_host
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self._transport = transport
+        # AsyncClient和Semaphore都绑定事件循环，循环变化时重建
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.stats = {"requests": 0, "hits": 0, "revalidated": 0, "misses": 0, "bytes_downloaded": 0}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """当前事件循环的共享客户端"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._loop = loop
+            self._host_semaphores = {}
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                follow_redirects=True,
+                headers={"User-Agent": self.user_agent},
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=30.0
+                ),
+                transport=self._transport
+            )
+        return self._client
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc.lower()
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._host_semaphores[host] = asyncio.Semaphore(self.per_host)
+        return semaphore
+
+    async def _run_sync(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def fetch(
+        self,
+        url: str,
+        max_bytes: Optional[int] = None,
+        content_types: Optional[Sequence[str]] = None,
+        use_cache: bool = True,
+        timeout: Optional[float] = None
+    ) -> FetchResult:
+        """
+        GET请求
+
+        Args:
+            url: 目标URL
+            max_bytes: 响应体字节上限（流式下载，达到后停止），None表示不限
+            content_types: 允许的Content-Type（子串匹配），不匹配时不下载响应体
+            use_cache: 是否使用HTTP缓存
+            timeout: 本次请求的超时（秒）
+
+        Returns:
+            FetchResult
+
+        Raises:
+            httpx.HTTPError: 请求失败或状态码非2xx
+        """
+        client = self.client
+        cache = self.cache if use_cache else None
+        entry = await self._run_sync(cache.get, url) if cache else None
+        if entry is not None and not entry.covers(max_bytes):
+            entry = None  # 缓存的是截断的响应体，不够用，重新完整请求
+
+        if entry is not None and entry.expires_at > time.time():
+            self.stats["hits"] += 1
+            result = entry.to_result("hit", max_bytes)
+            # 缓存条目可能由不限类型的请求写入，同样要检查Content-Type
+            return result if _type_allowed(result, content_types) else _skip_body(result)
+
+        headers = {}
+        if entry is not None:
+            if entry.headers.get("etag"):
+                headers["If-None-Match"] = entry.headers["etag"]
+            if entry.headers.get("last-modified"):
+                headers["If-Modified-Since"] = entry.headers["last-modified"]
+
+        self.stats["requests"] += 1
+        async with self._host_semaphore(url):
+            async with client.stream(
+                "GET", url, headers=headers,
+                timeout=self.timeout if timeout is None else timeout
+            ) as response:
+                if response.status_code == 304 and entry is not None:
+                    merged = {**entry.headers, **_stored_headers(response.headers)}
+                    _, expires_at = freshness(response.headers)
+                    entry.headers, entry.expires_at = merged, expires_at
+                    await self._run_sync(cache.refresh, url, merged, expires_at)
+                    self.stats["revalidated"] += 1
+                    result = entry.to_result("revalidated", max_bytes)
+                    return result if _type_allowed(result, content_types) else _skip_body(result)
+
+                response.raise_for_status()
+                result = FetchResult(
+                    url=str(response.url),
+                    status=response.status_code,
+                    headers=_stored_headers(response.headers),
+                    content=b""
+                )
+                if not _type_allowed(result, content_types):
+                    return _skip_body(result)
+
+                chunks = []
+                received = 0
+                async for chunk in response.aiter_bytes():
+                    chunks.append(chunk)
+                    received += len(chunk)
+                    if max_bytes is not None and received >= max_bytes:
+                        result.truncated = True
+                        break
+                body = b"".join(chunks)
+                if max_bytes is not None and len(body) > max_bytes:
+                    body = body[:max_bytes]
+                result.content = body
+                self.stats["misses"] += 1
+                self.stats["bytes_downloaded"] += received
+
+        if cache is not None and result.status == 200:
+            storable, expires_at = freshness(response.headers)
+            if storable:
+                await self._run_sync(cache.put, CachedResponse(
+                    url, result.url, result.status, result.headers, result.content,
+                    result.truncated, time.time(), expires_at
+                ))
+        return result
+
+    async def aclose(self):
+        """关闭共享客户端（须在创建它的事件循环中调用）"""
+        if self._client is not None:
+            if self._loop is asyncio.get_running_loop():
+                await self._client.aclose()
+            self._client = None
+            self._loop = None
+
+    def get_stats(self) -> dict:
+        stats = dict(self.stats)
+        if self.cache is not None:
+            stats["cache"] = self.cache.get_stats()
+        return stats
+
+
+def _stored_headers(headers) -> Dict[str, str]:
+    return {name: headers[name] for name in _CACHED_HEADERS if name in headers}
+
+
+_fetcher: Optional[HttpFetcher] = None
+
+
+def get_http_fetcher() -> HttpFetcher:
+    """进程级默认抓取器（带磁盘缓存；缓存不可用时不缓存）"""
+    global _fetcher
+    if _fetcher is None:
+        try:
+            cache = HttpCache()
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"[WebFetch] HTTP缓存不可用: {e}")
+            cache = None
+        _fetcher = HttpFetcher(cache=cache)
+        if cache is not None:
+            atexit.register(cache.close)
+    return _fetcher
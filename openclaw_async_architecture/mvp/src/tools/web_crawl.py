@@ -0,0 +1,123 @@
+"""
+多URL抓取调度 - URL规范化去重、robots.txt、按主机礼貌间隔
+
+- canonicalize_url：小写scheme/host、去掉默认端口和#片段、查询参数排序、去掉utm_*等跟踪参数
+- RobotsCache：每个主机的robots.txt只取一次（经HttpFetcher，同样走HTTP缓存），
+  提供can_fetch和Crawl-delay
+- HostScheduler：同一主机相邻两次请求的开始时间至少间隔delay秒
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from urllib.robotparser import RobotFileParser
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 8  # 全局同时进行的抓取数
+DEFAULT_PER_HOST = 2  # 每个主机同时进行的抓取数
+DEFAULT_HOST_DELAY = 0.2  # 同一主机相邻请求的最小间隔（秒）
+MAX_CRAWL_DELAY = 10.0  # robots.txt中Crawl-delay的上限（秒）
+ROBOTS_MAX_BYTES = 512 * 1024
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+_TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid")
+
+
+def canonicalize_url(url: str) -> Optional[str]:
+    """
+    规范化URL（用于去重）
+
+    Returns:
+        规范化后的URL；不是http(s)绝对URL时返回None
+    """
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in _DEFAULT_PORTS or not parts.hostname:
+        return None
+    host = parts.hostname.lower()
+    if ":" in host:
+        host = f"[{host}]"
+    if port and port != _DEFAULT_PORTS[scheme]:
+        host = f"{host}:{port}"
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(_TRACKING_PARAMS)
+    ))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+def host_of(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+class RobotsCache:
+    """robots.txt缓存（每个主机一个解析器；并发请求同一主机时只抓取一次）"""
+
+    def __init__(self, fetcher, user_agent: Optional[str] = None):
+        """
+        Args:
+            fetcher: HttpFetcher
+            user_agent: 匹配robots规则用的User-Agent，None表示使用fetcher的
+        """
+        self.fetcher = fetcher
+        self.user_agent = user_agent or fetcher.user_agent
+        self._parsers: Dict[str, "asyncio.Future[RobotFileParser]"] = {}
+
+    async def get(self, url: str) -> RobotFileParser:
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc.lower()}"
+        future = self._parsers.get(origin)
+        if future is None:
+            future = self._parsers[origin] = asyncio.ensure_future(self._load(origin))
+        return await asyncio.shield(future)
+
+    async def _load(self, origin: str) -> RobotFileParser:
+        parser = RobotFileParser(f"{origin}/robots.txt")
+        try:
+            response = await self.fetcher.fetch(parser.url, max_bytes=ROBOTS_MAX_BYTES)
+            parser.parse(response.text().splitlines())
+        except httpx.HTTPStatusError as e:
+            # 与RobotFileParser.read一致：401/403视为全部禁止，其他错误视为全部允许
+            if e.response.status_code in (401, 403):
+                parser.disallow_all = True
+            else:
+                parser.allow_all = True
+        except httpx.HTTPError as e:
+            logger.warning(f"[WebFetch] robots.txt获取失败，按允许处理: {origin} ({e})")
+            parser.allow_all = True
+        parser.modified()
+        return parser
+
+    async def can_fetch(self, url: str) -> Tuple[bool, Optional[float]]:
+        """
+        Returns:
+            (是否允许抓取, Crawl-delay秒数或None)
+        """
+        parser = await self.get(url)
+        delay = parser.crawl_delay(self.user_agent)
+        return parser.can_fetch(self.user_agent, url), float(delay) if delay is not None else None
+
+
+class HostScheduler:
+    """按主机的礼貌间隔：预约下一次请求的开始时间"""
+
+    def __init__(self, delay: float = DEFAULT_HOST_DELAY):
+        self.delay = delay
+        self._next: Dict[str, float] = {}
+
+    async def wait(self, host: str, delay: Optional[float] = None):
+        """等到该主机允许下一次请求（delay为None时使用默认间隔）"""
+        delay = self.delay if delay is None else min(max(delay, self.delay), MAX_CRAWL_DELAY)
+        now = time.monotonic()
+        start = max(now, self._next.get(host, now))
+        self._next[host] = start + delay
+        if start > now:
+            await asyncio.sleep(start - now)
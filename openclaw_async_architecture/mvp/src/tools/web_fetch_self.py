@@ -1,15 +1,39 @@
 """
 自主实现的web_fetch工具
 使用httpx + BeautifulSoup，完全自主可控
+
+请求经共享的HttpFetcher发出：连接复用、按主机限流、HTTP缓存（304/新鲜缓存不重新下载）
+fetch_many：多个URL并发抓取（全局/按主机并发上限、robots.txt、礼貌间隔、规范化URL去重），
+按完成顺序流式产出结果
 """
+import asyncio
 import httpx
 import logging
-from typing import Optional, Dict
+import time
+from typing import AsyncIterator, Dict, Iterable, Optional, Tuple
 from urllib.parse import urlparse
-import re
+
+try:
+    from .html_extract import extract
+    from .http_fetch import FetchResult, HttpFetcher, get_http_fetcher
+    from .web_crawl import (
+        DEFAULT_CONCURRENCY, DEFAULT_HOST_DELAY, DEFAULT_PER_HOST,
+        HostScheduler, RobotsCache, canonicalize_url, host_of
+    )
+except ImportError:
+    from tools.html_extract import extract
+    from tools.http_fetch import FetchResult, HttpFetcher, get_http_fetcher
+    from tools.web_crawl import (
+        DEFAULT_CONCURRENCY, DEFAULT_HOST_DELAY, DEFAULT_PER_HOST,
+        HostScheduler, RobotsCache, canonicalize_url, host_of
+    )
 
 logger = logging.getLogger(__name__)
 
+# 下载字节上限 = max_chars × 此倍数（HTML标记远多于正文），且不超过MAX_DOWNLOAD_BYTES
+RAW_BYTES_PER_CHAR = 64
+MAX_DOWNLOAD_BYTES = 5 * 1024 * 1024
+
 
 class WebFetchTool:
     """自主实现的web_fetch，完全独立于OpenClaw"""
@@ -18,7 +42,8 @@ class WebFetchTool:
         self,
         timeout: float = 10.0,
         max_chars: int = 10000,
-        extract_mode: str = "markdown"
+        extract_mode: str = "markdown",
+        fetcher: Optional[HttpFetcher] = None
     ):
         """
         初始化
@@ -27,10 +52,12 @@ class WebFetchTool:
             timeout: 超时时间（秒）
             max_chars: 最大字符数
             extract_mode: 提取模式（"markdown"或"text"）
+            fetcher: HTTP抓取器，None表示使用进程级共享抓取器
         """
         self.timeout = timeout
         self.max_chars = max_chars
         self.extract_mode = extract_mode
+        self._fetcher = fetcher
 
         # 支持的MIME类型
         self.text_mime_types = [
@@ -43,6 +70,12 @@ class WebFetchTool:
             "application/xhtml+xml"
         ]
 
+    @property
+    def fetcher(self) -> HttpFetcher:
+        if self._fetcher is None:
+            self._fetcher = get_http_fetcher()
+        return self._fetcher
+
     async def fetch(
         self,
         url: str,
@@ -77,37 +110,9 @@ class WebFetchTool:
         chars_limit = max_chars or self.max_chars
 
         try:
-            # 发送HTTP请求
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                headers = {
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-                }
-
-                response = await client.get(url, headers=headers, follow_redirects=True)
-                response.raise_for_status()
-
-                # 检查Content-Type
-                content_type = response.headers.get("content-type", "").lower()
-                if not any(mime in content_type for mime in self.text_mime_types):
-                    logger.warning(f"[WebFetch] 不支持的Content-Type: {content_type}")
-                    return f"URL返回非文本内容: {content_type}"
-
-                # 提取内容
-                content = await response.aread()
-                text = content.decode('utf-8', errors='ignore')
-
-                # 根据模式提取
-                if mode == "text":
-                    result = self._extract_text(text)
-                else:
-                    result = self._extract_html(text)
-
-                # 限制长度
-                if len(result) > chars_limit:
-                    result = result[:chars_limit] + "\n...[截断]"
-
-                logger.info(f"[WebFetch] 抓取成功: url={url}, 长度={len(result)}")
-                return result
+            result, response = await self._fetch_page(url, mode, chars_limit)
+            logger.info(f"[WebFetch] 抓取成功: url={url}, 长度={len(result)}, 缓存={response.cache}")
+            return result
 
         except httpx.TimeoutException:
             logger.error(f"[WebFetch] 请求超时: {url}")
@@ -119,9 +124,139 @@ class WebFetchTool:
             logger.error(f"[WebFetch] 抓取失败: {e}")
             return None
 
+    async def _fetch_page(self, url: str, mode: str, chars_limit: int) -> Tuple[str, FetchResult]:
+        """
+        抓取并提取单个页面
+
+        Returns:
+            (提取的文本, 抓取结果)
+
+        Raises:
+            httpx.HTTPError: 请求失败
+        """
+        # 流式下载，达到字节上限后停止；未过期的缓存不发请求，过期的发条件请求
+        response = await self.fetcher.fetch(
+            url,
+            max_bytes=min(chars_limit * RAW_BYTES_PER_CHAR, MAX_DOWNLOAD_BYTES),
+            content_types=self.text_mime_types,
+            timeout=self.timeout
+        )
+
+        # 检查Content-Type
+        if response.skipped:
+            logger.warning(f"[WebFetch] 不支持的Content-Type: {response.content_type}")
+            return f"URL返回非文本内容: {response.content_type}", response
+
+        # 提取内容（HTML单遍解析，达到字数上限即停止）
+        text = response.text()
+        if "html" in response.content_type or "xml" in response.content_type:
+            result, truncated = extract(
+                text,
+                max_chars=chars_limit,
+                markdown=mode != "text",
+                base_url=response.url
+            )
+        else:
+            result, truncated = text[:chars_limit].strip(), len(text) > chars_limit
+
+        # 限制长度
+        if truncated or response.truncated:
+            result = result + "\n...[截断]"
+        return result, response
+
+    async def fetch_many(
+        self,
+        urls: Iterable[str],
+        extract_mode: Optional[str] = None,
+        max_chars: Optional[int] = None,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        per_host: int = DEFAULT_PER_HOST,
+        delay: float = DEFAULT_HOST_DELAY,
+        respect_robots: bool = True
+    ) -> AsyncIterator[Dict]:
+        """
+        并发抓取多个URL，按完成顺序流式产出结果
+
+        规范化后相同的URL只抓取一次；同一主机的请求受per_host并发上限和
+        礼貌间隔（delay与robots.txt Crawl-delay取大者）约束。
+
+        Args:
+            urls: URL列表
+            extract_mode: 提取模式（"markdown"或"text"）
+            max_chars: 每个页面的最大字符数
+            concurrency: 全局并发上限
+            per_host: 每个主机的并发上限
+            delay: 同一主机相邻请求的最小间隔（秒）
+            respect_robots: 是否遵守robots.txt
+
+        Yields:
+            {"url", "final_url", "status", "content", "error", "cache", "elapsed"}，
+            失败时content为None、error为错误信息
+        """
+        mode = extract_mode or self.extract_mode
+        chars_limit = max_chars or self.max_chars
+        robots = RobotsCache(self.fetcher) if respect_robots else None
+        scheduler = HostScheduler(delay)
+        global_slots = asyncio.Semaphore(concurrency)
+        host_slots: Dict[str, asyncio.Semaphore] = {}
+
+        def failed(url: str, error: str, status: Optional[int] = None, started: Optional[float] = None) -> Dict:
+            return {
+                "url": url, "final_url": None, "status": status, "content": None, "error": error,
+                "cache": None, "elapsed": round(time.monotonic() - started, 3) if started else 0.0
+            }
+
+        async def fetch_one(url: str, canonical: str) -> Dict:
+            host = host_of(canonical)
+            slot = host_slots.get(host)
+            if slot is None:
+                slot = host_slots[host] = asyncio.Semaphore(per_host)
+            started = time.monotonic()
+            async with slot:
+                try:
+                    crawl_delay = None
+                    if robots is not None:
+                        allowed, crawl_delay = await robots.can_fetch(canonical)
+                        if not allowed:
+                            return failed(url, "robots.txt禁止抓取", started=started)
+                    await scheduler.wait(host, crawl_delay)
+                    async with global_slots:
+                        content, response = await self._fetch_page(url, mode, chars_limit)
+                except httpx.TimeoutException:
+                    return failed(url, "请求超时", started=started)
+                except httpx.HTTPStatusError as e:
+                    return failed(url, f"HTTP错误: {e.response.status_code}", e.response.status_code, started)
+                except Exception as e:
+                    return failed(url, f"抓取失败: {e}", started=started)
+            return {
+                "url": url, "final_url": response.url, "status": response.status, "content": content,
+                "error": None, "cache": response.cache, "elapsed": round(time.monotonic() - started, 3)
+            }
+
+        invalid = []
+        tasks = []
+        seen = set()
+        for url in urls:
+            canonical = canonicalize_url(url) if url else None
+            if canonical is None:
+                invalid.append(failed(url, f"无效的URL: {url}"))
+            elif canonical not in seen:
+                seen.add(canonical)
+                tasks.append(asyncio.ensure_future(fetch_one(url, canonical)))
+
+        logger.info(f"[WebFetch] 批量抓取: {len(tasks)}个URL（去重后），{len(invalid)}个无效")
+        try:
+            for result in invalid:
+                yield result
+            for future in asyncio.as_completed(tasks):
+                yield await future
+        finally:
+            for task in tasks:
+                task.cancel()
+
     def _extract_text(self, html: str) -> str:
         """
-        提取纯文本
+        提取纯文本（段落之间换行）
 
         Args:
             html: HTML内容
@@ -129,22 +264,11 @@ class WebFetchTool:
         Returns:
             纯文本
         """
-        # 移除脚本和样式
-        html = re.sub(r'<script[^>]*>.*?</script>', '', html, flags=re.IGNORECASE | re.DOTALL)
-        html = re.sub(r'<style[^>]*>.*?</style>', '', html, flags=re.IGNORECASE | re.DOTALL)
-
-        # 移除HTML标签
-        html = re.sub(r'<[^>]+>', '', html)
-
-        # 清理空白
-        html = re.sub(r'\s+', ' ', html)
-        html = html.strip()
-
-        return html
+        return extract(html, markdown=False)[0]
 
     def _extract_html(self, html: str) -> str:
         """
-        提取HTML内容（简化markdown）
+        提取HTML内容（简化markdown：标题、列表、链接、代码块）
 
         Args:
             html: HTML内容
@@ -152,20 +276,7 @@ class WebFetchTool:
         Returns:
             简化的markdown文本
         """
-        # 移除脚本和样式
-        html = re.sub(r'<script[^>]*>.*?</script>', '', html, flags=re.IGNORECASE | re.DOTALL)
-        html = re.sub(r'<style[^>]*>.*?</style>', '', html, flags=re.IGNORECASE | re.DOTALL)
-
-        # 提取主要文本（简化处理）
-        lines = [
-            self._extract_text(line)
-            for line in html.split('\n')
-        ]
-
-        # 过滤空行
-        lines = [line for line in lines if line.strip()]
-
-        return '\n'.join(lines)
+        return extract(html)[0]
 
     def sync_fetch(
         self,
@@ -204,6 +315,30 @@ async def web_fetch(
     return await tool.fetch(url)
 
 
+async def web_fetch_many(
+    urls: Iterable[str],
+    extract_mode: str = "markdown",
+    max_chars: int = 10000,
+    **kwargs
+) -> AsyncIterator[Dict]:
+    """
+    web_fetch批量版便捷函数（按完成顺序流式产出）
+
+    使用示例：
+        async for page in web_fetch_many(urls):
+            print(page["url"], page["error"] or len(page["content"]))
+
+    Args:
+        urls: URL列表
+        extract_mode: 提取模式
+        max_chars: 每个页面的最大字符数
+        **kwargs: 传给WebFetchTool.fetch_many（concurrency、per_host、delay、respect_robots）
+    """
+    tool = WebFetchTool(extract_mode=extract_mode, max_chars=max_chars)
+    async for result in tool.fetch_many(urls, **kwargs):
+        yield result
+
+
 # 测试
 if __name__ == "__main__":
     import sys
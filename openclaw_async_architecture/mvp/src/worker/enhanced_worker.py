@@ -3,8 +3,10 @@ import httpx
 import sqlite3
 import asyncio
 import sys
+import tempfile
+import time
 from pathlib import Path
-from typing import Optional
+from typing import Awaitable, Callable, List, Optional
 
 # 添加路径
 project_root = Path(__file__).parent.parent.parent
@@ -25,7 +27,11 @@ except ImportError:
     from common.models import Task
 
 # 导入自主exec工具（本地路径）
-from tools.exec_self import execute
+from tools.exec_self import ExecTool, execute
+from tools.exec_jobs import JobManager
+
+# 进度回调：(任务, 新输出行) -> None，按progress_interval批量调用
+ProgressCallback = Callable[[Task, List[str]], Awaitable[None]]
 
 
 class EnhancedV2Worker:
@@ -38,8 +44,25 @@ class EnhancedV2Worker:
     - ✅ 任务队列支持
     """
 
-    def __init__(self, worker_id: str = "worker-1"):
+    def __init__(
+        self,
+        worker_id: str = "worker-1",
+        on_progress: Optional[ProgressCallback] = None,
+        progress_interval: float = 0.5
+    ):
+        """
+        Args:
+            worker_id: Worker ID
+            on_progress: 命令任务的进度回调（流式转发输出行到任务存储/流），
+                例如 lambda task, lines: store_update(task.id, "".join(lines))
+            progress_interval: 进度回调的最小间隔（秒），期间的输出行合并为一批
+        """
         self.worker_id = worker_id
+        self.on_progress = on_progress
+        self.progress_interval = progress_interval
+
+        # 后台命令由本Worker的任务管理器登记，close()时全部终止
+        self.jobs = JobManager(output_dir=str(Path(tempfile.gettempdir()) / "openclaw_jobs" / worker_id))
 
         # V1 Gateway配置
         self.v1_url = settings.v1_gateway_url
@@ -189,12 +212,20 @@ class EnhancedV2Worker:
 
             print(f"[Worker {self.worker_id}] 使用自主exec: {command}")
 
-            # 调用自主exec
-            exit_code, stdout, stderr = await execute(
-                command=command,
-                timeout=timeout,
-                background=background
-            )
+            if background:
+                # 后台执行：登记到任务管理器，任务ID写入metadata供之后查询
+                job = self.jobs.start(command, timeout=task.metadata.get("timeout"))
+                task.metadata["job_id"] = job.job_id
+                exit_code, stdout, stderr = 0, f"命令已在后台启动 (任务ID: {job.job_id}, PID: {job.pid})", ""
+            elif self.on_progress:
+                # 流式执行，边执行边转发输出
+                exit_code, stdout, stderr = await self._stream_self_exec(task, command, timeout)
+            else:
+                # 调用自主exec
+                exit_code, stdout, stderr = await execute(
+                    command=command,
+                    timeout=timeout
+                )
 
             if exit_code == 0:
                 result = stdout
@@ -208,6 +239,32 @@ class EnhancedV2Worker:
             print(f"[Worker {self.worker_id}] 自主exec执行失败: {e}")
             raise
 
+    async def _stream_self_exec(self, task: Task, command: str, timeout: int):
+        """流式执行命令，按progress_interval批量回调新输出行"""
+        stream = ExecTool(default_timeout=timeout).stream(command)
+        pending: List[str] = []
+        last_flush = time.monotonic()
+
+        async def flush():
+            nonlocal pending, last_flush
+            batch, pending = pending, []
+            last_flush = time.monotonic()
+            try:
+                await self.on_progress(task, batch)
+            except Exception as e:
+                print(f"[Worker {self.worker_id}] 进度回调失败: {e}")
+
+        async for name, line in stream:
+            pending.append(line if name == "stdout" else f"[stderr] {line}")
+            if time.monotonic() - last_flush >= self.progress_interval:
+                await flush()
+        if pending:
+            await flush()
+
+        if stream.error and not stream.timed_out:
+            return -1, "", stream.error
+        return stream.exit_code, stream.stdout, stream.error or stream.stderr
+
     async def _execute_via_v1(self, task: Task) -> str:
         """使用V1 Gateway API执行任务"""
         # 构建HTTP请求
@@ -268,7 +325,8 @@ class EnhancedV2Worker:
             print(f"[Worker {self.worker_id}] SQLite保存失败: {e}")
 
     async def close(self):
-        """关闭HTTP客户端"""
+        """关闭HTTP客户端，终止后台任务"""
+        self.jobs.shutdown()
         if self.client:
             await self.client.aclose()
         if self.sqlite_conn:
@@ -58,10 +58,12 @@ class BaseTool(ABC):
         """
         pass
 
-    @abstractmethod
     def validate_input(self, input_data: Dict[str, Any]) -> bool:
         """
-        验证输入数据
+        验证输入数据（可选）
+
+        字段和类型由input_schema校验；只有schema表达不了的约束才需要覆盖此方法。
+        未覆盖时ToolManager跳过此步骤，只做一次schema校验。
 
         Args:
             input_data: 输入数据（字典格式）
@@ -69,7 +71,7 @@ class BaseTool(ABC):
         Returns:
             bool: 是否验证通过
         """
-        pass
+        return True
 
     def get_tool_info(self) -> Dict[str, str]:
         """
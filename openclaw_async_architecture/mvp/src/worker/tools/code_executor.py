@@ -3,18 +3,16 @@
 执行Python代码，带安全限制
 
 安全限制：
-- 超时保护
+- 超时保护（超时杀死沙箱进程）
 - 危险函数限制
 - 异常捕获
-- 有限的命名空间
+- 进程隔离（预启动的沙箱进程池，内存/CPU限制）
 """
 
-import asyncio
-import sys
-import io
-import traceback
-from typing import Dict, Any
+import time
+from typing import Optional
 from .base_tool import BaseTool, ToolInput, ToolOutput
+from .python_sandbox import SandboxError, SandboxPool, SandboxTimeout, get_sandbox_pool
 from .security import validate_python_code
 
 
@@ -34,29 +32,42 @@ class ExecPythonTool(BaseTool):
 
     特性：
     - 超时保护
-    - 输出捕获（stdout和stderr）
+    - 输出捕获（stdout和stderr，每次调用独立，有上限）
     - 异常捕获
-    - 有限的命名空间
+    - 独立的沙箱进程（预热，常用模块已导入）
 
     安全措施：
-    - 默认超时10秒
-    - 禁止修改系统环境
-    - 独立的exec全局命名空间
+    - 默认超时10秒，超时杀死沙箱进程组
+    - 内存（RLIMIT_AS）和CPU时间（RLIMIT_CPU）限制
+    - 沙箱执行一定次数后回收
     """
 
     name = "exec_python"
     description = "执行Python代码（超时10秒，可捕获输出）"
     input_schema = ExecPythonInput
 
+    def __init__(self, pool: Optional[SandboxPool] = None):
+        """
+        Args:
+            pool: 沙箱进程池，None表示使用进程级默认池
+        """
+        self._pool = pool
+
+    @property
+    def pool(self) -> SandboxPool:
+        if self._pool is None:
+            self._pool = get_sandbox_pool()
+        return self._pool
+
     async def execute(self, input_data: ExecPythonInput) -> ToolOutput:
         """
         执行Python代码
 
         安全检查流程：
         1. 使用安全框架验证代码
-        2. 创建独立的exec命名空间
-        3. 创建输出捕获
-        4. 带超时执行代码
+        2. 从沙箱池取出沙箱
+        3. 沙箱内执行并捕获输出
+        4. 超时杀死沙箱
         5. 捕获异常
 
         Args:
@@ -76,98 +87,51 @@ class ExecPythonTool(BaseTool):
                 metadata={"code_length": len(input_data.code)}
             )
 
-        # 保存原始标准输出
-        old_stdout = sys.stdout
-        old_stderr = sys.stderr
-
-        # 创建输出捕获
-        if input_data.capture_output:
-            stdout_capture = io.StringIO()
-            stderr_capture = io.StringIO()
-            sys.stdout = stdout_capture
-            sys.stderr = stderr_capture
-
+        start = time.perf_counter()
         try:
-            # 创建exec全局命名空间
-            # 限制为安全的内置函数
-            exec_globals = {
-                "__name__": "__main__",
-                "__builtins__": __builtins__,
-                # 可以添加更多安全的内置模块
-                "print": print,
-            }
-
-            # 超时执行
-            try:
-                await asyncio.wait_for(
-                    asyncio.to_thread(
-                        lambda: exec(input_data.code, exec_globals)
-                    ),
-                    timeout=input_data.timeout
-                )
-
-                if input_data.capture_output:
-                    stdout_text = stdout_capture.getvalue()
-                    stderr_text = stderr_capture.getvalue()
-                else:
-                    stdout_text = ""
-                    stderr_text = ""
-
-                return ToolOutput(
-                    success=True,
-                    data={
-                        "stdout": stdout_text,
-                        "stderr": stderr_text
-                    },
-                    metadata={
-                        "timeout": input_data.timeout,
-                        "code_length": len(input_data.code)
-                    }
-                )
-
-            except asyncio.TimeoutError:
-                return ToolOutput(
-                    success=False,
-                    error=f"代码执行超时（{input_data.timeout}秒）",
-                    metadata={"timeout": input_data.timeout}
-                )
-
-        except Exception as e:
-            # 捕获异常
-            error_msg = traceback.format_exc()
-
-            if input_data.capture_output:
-                stderr_text = stderr_capture.getvalue()
-            else:
-                stderr_text = ""
-
+            result = await self.pool.run(
+                input_data.code,
+                timeout=input_data.timeout,
+                capture_output=input_data.capture_output
+            )
+        except SandboxTimeout:
+            return ToolOutput(
+                success=False,
+                error=f"代码执行超时（{input_data.timeout}秒）",
+                metadata={"timeout": input_data.timeout}
+            )
+        except (SandboxError, RuntimeError) as e:
             return ToolOutput(
                 success=False,
                 error=f"代码执行失败: {str(e)}",
-                data={
-                    "stdout": stdout_capture.getvalue() if input_data.capture_output else "",
-                    "stderr": error_msg + "\n" + stderr_text
-                },
-                metadata={
-                    "timeout": input_data.timeout,
-                    "exception": type(e).__name__
-                }
+                metadata={"timeout": input_data.timeout}
             )
 
-        finally:
-            # 恢复标准输出
-            if input_data.capture_output:
-                sys.stdout = old_stdout
-                sys.stderr = old_stderr
-
-    def validate_input(self, input_data: Dict[str, Any]) -> bool:
-        """
-        验证输入
+        metadata = {
+            "timeout": input_data.timeout,
+            "code_length": len(input_data.code),
+            "execution_time": round(time.perf_counter() - start, 3),
+            "cpu_time": result["cpu_time"],
+            "truncated": result["truncated"],
+            "sandbox_pid": result["pid"]
+        }
 
-        Args:
-            input_data: 输入数据
+        if result["ok"]:
+            return ToolOutput(
+                success=True,
+                data={
+                    "stdout": result["stdout"],
+                    "stderr": result["stderr"]
+                },
+                metadata=metadata
+            )
 
-        Returns:
-            bool: 是否验证通过
-        """
-        return "code" in input_data and isinstance(input_data["code"], str)
+        return ToolOutput(
+            success=False,
+            error=f"代码执行失败: {result['error']}",
+            data={
+                "stdout": result["stdout"],
+                "stderr": (result["traceback"] or "") + "\n" + result["stderr"]
+            },
+            metadata={**metadata, "exception": result["exception"]}
+        )
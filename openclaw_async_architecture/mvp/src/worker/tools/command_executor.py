@@ -8,12 +8,16 @@
 - 超时保护
 """
 
-import asyncio
 import time
-from typing import Dict, Any
 from .base_tool import BaseTool, ToolInput, ToolOutput
 from .security import validate_command, with_timeout
 
+try:
+    from ...tools.exec_self import DEFAULT_MAX_OUTPUT_BYTES, DEFAULT_TAIL_LINES, ExecStream
+except ImportError:
+    # 直接导入（src在sys.path中）
+    from tools.exec_self import DEFAULT_MAX_OUTPUT_BYTES, DEFAULT_TAIL_LINES, ExecStream
+
 
 # ========== 输入Schema ==========
 
@@ -66,14 +70,19 @@ class ExecCommandTool(BaseTool):
     特性：
     - 白名单机制
     - 危险命令检测
-    - 超时保护
-    - stdout和stderr捕获
+    - 超时保护（杀死整个进程组）
+    - stdout和stderr捕获（有上限：保留头部和末尾行）
+    - 流式模式（stream）
     """
 
     name = "exec_command"
     description = "执行系统命令（白名单限制，超时30秒）"
     input_schema = ExecCommandInput
 
+    # 每个流在结果中保留的输出上限
+    max_output_bytes = DEFAULT_MAX_OUTPUT_BYTES
+    tail_lines = DEFAULT_TAIL_LINES
+
     async def execute(self, input_data: ExecCommandInput) -> ToolOutput:
         """
         执行命令
@@ -90,9 +99,9 @@ class ExecCommandTool(BaseTool):
             ToolOutput: 执行结果
         """
 
-        # 安全检查：使用统一的安全框架
+        # 安全检查（stream内使用统一的安全框架）+ 执行命令（流式读取，输出内存有上限）
         try:
-            validate_command(input_data.command)
+            stream = self.stream(input_data)
         except (ValueError, PermissionError) as e:
             return ToolOutput(
                 success=False,
@@ -100,71 +109,68 @@ class ExecCommandTool(BaseTool):
                 metadata={"command": input_data.command}
             )
 
-        # 执行命令
-        try:
-            process = await asyncio.create_subprocess_shell(
-                input_data.command,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                cwd=input_data.cwd
-            )
+        start = time.perf_counter()
+        async for _ in stream:
+            pass
+        execution_time = time.perf_counter() - start
 
-            try:
-                # 使用asyncio超时
-                stdout, stderr = await asyncio.wait_for(
-                    process.communicate(),
-                    timeout=input_data.timeout
-                )
-
-                stdout_text = stdout.decode('utf-8', errors='replace')
-                stderr_text = stderr.decode('utf-8', errors='replace')
-
-                return ToolOutput(
-                    success=process.returncode == 0,
-                    data={
-                        "stdout": stdout_text,
-                        "stderr": stderr_text,
-                        "exit_code": process.returncode
-                    },
-                    metadata={
-                        "command": input_data.command,
-                        "timeout": input_data.timeout,
-                        "cwd": input_data.cwd or "当前目录",
-                        "execution_time": None  # TODO: 添加计时
-                    }
-                )
-            except asyncio.TimeoutError:
-                # 超时，杀死进程
-                process.kill()
-                await process.wait()
-
-                return ToolOutput(
-                    success=False,
-                    error=f"命令执行超时（{input_data.timeout}秒）",
-                    metadata={
-                        "command": input_data.command,
-                        "timeout": input_data.timeout
-                    }
-                )
-
-        except Exception as e:
+        if stream.timed_out:
             return ToolOutput(
                 success=False,
-                error=f"命令执行失败: {str(e)}",
+                error=f"命令执行超时（{input_data.timeout}秒）",
+                data={"stdout": stream.stdout, "stderr": stream.stderr, "exit_code": None},
+                metadata={
+                    "command": input_data.command,
+                    "timeout": input_data.timeout
+                }
+            )
+        if stream.error:
+            return ToolOutput(
+                success=False,
+                error=f"命令执行失败: {stream.error}",
                 metadata={"command": input_data.command}
             )
 
-    def validate_input(self, input_data: Dict[str, Any]) -> bool:
+        return ToolOutput(
+            success=stream.exit_code == 0,
+            data={
+                "stdout": stream.stdout,
+                "stderr": stream.stderr,
+                "exit_code": stream.exit_code
+            },
+            metadata={
+                "command": input_data.command,
+                "timeout": input_data.timeout,
+                "cwd": input_data.cwd or "当前目录",
+                "execution_time": round(execution_time, 3),
+                "truncated": stream.truncated
+            }
+        )
+
+    def stream(self, input_data: ExecCommandInput) -> ExecStream:
         """
-        验证输入
+        流式执行命令：异步迭代产出 (流名称, 行)
+
+        与execute相同，先使用安全框架验证命令。
 
         Args:
-            input_data: 输入数据
+            input_data: 命令输入
 
         Returns:
-            bool: 是否验证通过
+            ExecStream: 结束后可读取exit_code/stdout/stderr（有上限）
+
+        Raises:
+            PermissionError: 命令不在白名单中
+            ValueError: 命令为空、参数不允许或包含危险模式
         """
-        return "command" in input_data and isinstance(input_data["command"], str)
+        validate_command(input_data.command)
+        return ExecStream(
+            input_data.command,
+            timeout=input_data.timeout,
+            workdir=input_data.cwd,
+            max_output_bytes=self.max_output_bytes,
+            tail_lines=self.tail_lines
+        )
 
     def _check_command_safety(self, command: str) -> dict:
         """
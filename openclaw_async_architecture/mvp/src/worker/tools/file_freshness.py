@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+"""文件新鲜度标记 - 文件系统工具缓存失效
+
+缓存键中加入文件的新鲜度标记，文件变化后自然落到新的键上：
+- 默认：mtime_ns + size + inode（一次stat，微秒级）
+- 可选：内容哈希（xxhash，未安装时使用blake2b），应对mtime精度不足或被还原的情况
+
+可选的FileCacheWatcher（watchdog，Linux下基于inotify）在被监视路径变化时
+主动删除对应缓存条目，避免旧版本占用缓存空间。
+"""
+
+import asyncio
+import hashlib
+import os
+from threading import Lock
+from typing import Callable, Dict, Iterable, Optional, Set
+
+# 可选：xxhash（比blake2b快数倍）
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    xxhash = None
+    XXHASH_AVAILABLE = False
+
+# 可选：watchdog（inotify/FSEvents/ReadDirectoryChangesW）
+WATCHDOG_AVAILABLE = False
+ObserverClass = None
+EventHandlerClass = object
+
+try:
+    from watchdog.observers import Observer as ObserverClass
+    from watchdog.events import FileSystemEventHandler as EventHandlerClass
+    WATCHDOG_AVAILABLE = True
+except Exception:
+    pass
+
+# 文件不存在时的标记（文件出现后键随之变化）
+MISSING = "missing"
+
+_HASH_CHUNK = 1024 * 1024
+
+
+def stat_token(path: str) -> str:
+    """
+    基于stat的新鲜度标记
+
+    Args:
+        path: 文件或目录路径
+
+    Returns:
+        "mtime_ns-size-inode"，路径不存在时返回MISSING
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return MISSING
+    return f"{st.st_mtime_ns}-{st.st_size}-{st.st_ino}"
+
+
+def content_hash(path: str) -> Optional[str]:
+    """
+    计算文件内容哈希（分块读取）
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        十六进制摘要，非普通文件或读取失败返回None
+    """
+    if not os.path.isfile(path):
+        return None
+    hasher = xxhash.xxh3_64() if XXHASH_AVAILABLE else hashlib.blake2b(digest_size=8)
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+                hasher.update(chunk)
+    except OSError:
+        return None
+    return hasher.hexdigest()
+
+
+async def freshness_token(path: str, with_content_hash: bool = False) -> str:
+    """
+    获取路径的新鲜度标记
+
+    Args:
+        path: 文件或目录路径
+        with_content_hash: 是否附加内容哈希（在线程池中计算）
+
+    Returns:
+        新鲜度标记
+    """
+    token = stat_token(path)
+    if with_content_hash and token != MISSING:
+        digest = await asyncio.get_running_loop().run_in_executor(None, content_hash, path)
+        if digest:
+            token = f"{token}-{digest}"
+    return token
+
+
+# 只读访问产生的事件（watchdog 4+），不代表内容变化
+_READ_ONLY_EVENTS = frozenset({"opened", "closed_no_write"})
+
+
+class _ChangeHandler(EventHandlerClass):
+    """watchdog事件 → 失效回调"""
+
+    def __init__(self, watcher: "FileCacheWatcher"):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.event_type in _READ_ONLY_EVENTS:
+            return
+        self.watcher.invalidate_path(event.src_path)
+        dest_path = getattr(event, "dest_path", None)
+        if dest_path:
+            self.watcher.invalidate_path(dest_path)
+
+
+class FileCacheWatcher:
+    """
+    监视目录变化并主动删除相关缓存条目
+
+    ToolManager缓存文件系统工具结果时调用track()登记 路径 → 缓存键；
+    路径（或其所在目录的列表）变化时调用evict删除这些键。
+    """
+
+    def __init__(self, evict: Callable[[str], object]):
+        """
+        初始化
+
+        Args:
+            evict: 删除单个缓存键的函数
+        """
+        self.evict = evict
+        self._roots: Set[str] = set()
+        self._keys: Dict[str, Set[str]] = {}
+        self._lock = Lock()
+        self._observer = None
+        self.stats = {"events": 0, "evicted": 0}
+
+    @property
+    def is_available(self) -> bool:
+        """watchdog是否可用"""
+        return WATCHDOG_AVAILABLE
+
+    @property
+    def is_running(self) -> bool:
+        return self._observer is not None
+
+    def start(self, paths: Iterable[str]) -> bool:
+        """
+        开始监视（递归）
+
+        Args:
+            paths: 需要监视的目录
+
+        Returns:
+            是否启动成功
+        """
+        if not WATCHDOG_AVAILABLE:
+            print("[FileCacheWatcher] watchdog未安装，主动失效已禁用（仍依赖新鲜度标记）")
+            return False
+        if self._observer is not None:
+            return False
+
+        observer = ObserverClass()
+        handler = _ChangeHandler(self)
+        for path in paths:
+            root = os.path.realpath(path)
+            if os.path.isdir(root):
+                observer.schedule(handler, root, recursive=True)
+                self._roots.add(root)
+        if not self._roots:
+            return False
+
+        observer.daemon = True
+        observer.start()
+        self._observer = observer
+        print(f"[FileCacheWatcher] 监视中: {sorted(self._roots)}")
+        return True
+
+    def stop(self):
+        """停止监视"""
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+        self._roots.clear()
+        with self._lock:
+            self._keys.clear()
+
+    def is_watched(self, path: str) -> bool:
+        """路径是否在监视范围内"""
+        real = os.path.realpath(path)
+        return any(real == root or real.startswith(root + os.sep) for root in self._roots)
+
+    def track(self, path: str, key: str):
+        """
+        登记缓存键（仅监视范围内的路径）
+
+        Args:
+            path: 工具参数中的路径
+            key: 缓存键
+        """
+        if self._observer is None or not self.is_watched(path):
+            return
+        with self._lock:
+            self._keys.setdefault(os.path.realpath(path), set()).add(key)
+
+    def invalidate_path(self, path: str) -> int:
+        """
+        删除路径本身及其父目录（目录列表）的缓存
+
+        Args:
+            path: 发生变化的路径
+
+        Returns:
+            删除的缓存键数量
+        """
+        real = os.path.realpath(path)
+        with self._lock:
+            self.stats["events"] += 1
+            keys = self._keys.pop(real, set()) | self._keys.pop(os.path.dirname(real), set())
+
+        for key in keys:
+            self.evict(key)
+        self.stats["evicted"] += len(keys)
+        return len(keys)
+
+    def get_stats(self) -> dict:
+        """获取统计"""
+        with self._lock:
+            tracked = sum(len(keys) for keys in self._keys.values())
+        return {
+            **self.stats,
+            "running": self._observer is not None,
+            "roots": sorted(self._roots),
+            "tracked_keys": tracked,
+        }
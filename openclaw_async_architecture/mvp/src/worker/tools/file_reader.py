@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""大文件读取 - 字节范围/行范围读取
+
+- 行偏移索引：每INDEX_STRIDE字节记录一个检查点（该位置之前的换行数），
+  每个文件版本（stat_token）只构建一次并持久化到索引目录；按行读取时从
+  最近的检查点开始查找，不必从文件头逐行扫描
+- 大文件（>= MMAP_THRESHOLD）用mmap读取，查找换行不复制数据，只有被访问的页进入内存
+- iter_chunks：分块流式读取
+- detect_encoding：BOM、NUL字节/控制字符判断二进制，否则依次尝试utf-8/gb18030
+
+行索引按字节b"\\n"定位，适用于ASCII兼容编码（utf-8、gbk等）。
+"""
+
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+from collections import OrderedDict
+from contextlib import nullcontext
+from threading import Lock
+from typing import Iterator, List, Optional, Tuple
+
+from .file_freshness import MISSING, stat_token
+
+INDEX_STRIDE = 256 * 1024  # 检查点间隔（字节）
+INDEX_MIN_BYTES = 1024 * 1024  # 小于此大小的文件按行读取时直接整体读入
+MMAP_THRESHOLD = INDEX_MIN_BYTES
+DEFAULT_CHUNK_BYTES = 1024 * 1024
+SNIFF_BYTES = 64 * 1024
+
+_BOMS = (
+    (b"\xef\xbb\xbf", "utf-8-sig"),
+    (b"\xff\xfe", "utf-16"),
+    (b"\xfe\xff", "utf-16"),
+)
+# 文本中常见的控制字符（\t \n \r \f \b ESC）以外的C0字符视为二进制特征
+_TEXT_CONTROL = bytes([7, 8, 9, 10, 12, 13, 27])
+_BINARY_CHARS = bytes(set(range(32)) - set(_TEXT_CONTROL))
+
+
+class BinaryFileError(ValueError):
+    """二进制文件不能按文本读取"""
+
+
+def detect_encoding(sample: bytes) -> Tuple[Optional[str], bool]:
+    """
+    检测编码
+
+    Args:
+        sample: 文件开头的字节（一般取SNIFF_BYTES）
+
+    Returns:
+        (编码, 是否二进制)；二进制时编码为None
+    """
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding, False
+    if b"\x00" in sample:
+        return None, True
+    if sample and len(sample.translate(None, _BINARY_CHARS)) < len(sample) * 0.7:
+        return None, True
+    try:
+        sample.decode("utf-8")
+        return "utf-8", False
+    except UnicodeDecodeError as e:
+        # 样本末尾截断的多字节字符不算错误
+        if e.start >= len(sample) - 3 and e.reason == "unexpected end of data":
+            return "utf-8", False
+    try:
+        sample.decode("gb18030")
+        return "gb18030", False
+    except UnicodeDecodeError:
+        return "latin-1", False
+
+
+def sniff(path: str) -> Tuple[Optional[str], bool]:
+    """读取文件开头并检测编码"""
+    with open(path, "rb") as f:
+        return detect_encoding(f.read(SNIFF_BYTES))
+
+
+class LineIndex:
+    """稀疏行偏移索引：checkpoints[i] = 偏移 i*stride 之前的换行数"""
+
+    __slots__ = ("token", "size", "stride", "checkpoints", "newlines", "total_lines")
+
+    def __init__(self, token: str, size: int, stride: int, checkpoints: List[int], newlines: int, total_lines: int):
+        self.token = token
+        self.size = size
+        self.stride = stride
+        self.checkpoints = checkpoints
+        self.newlines = newlines
+        self.total_lines = total_lines
+
+    @classmethod
+    def build(cls, path: str, token: str, stride: int = INDEX_STRIDE) -> "LineIndex":
+        """扫描一遍文件（分块计数换行，C速度）"""
+        checkpoints = []
+        newlines = 0
+        size = 0
+        last = b""
+        with open(path, "rb") as f:
+            while True:
+                block = f.read(stride)
+                if not block:
+                    break
+                checkpoints.append(newlines)
+                newlines += block.count(b"\n")
+                size += len(block)
+                last = block[-1:]
+        total_lines = newlines + (1 if size and last != b"\n" else 0)
+        return cls(token, size, stride, checkpoints, newlines, total_lines)
+
+    @classmethod
+    def from_bytes(cls, content: bytes) -> "LineIndex":
+        """内存中内容的索引（单个检查点）"""
+        newlines = content.count(b"\n")
+        total_lines = newlines + (1 if content and not content.endswith(b"\n") else 0)
+        return cls("", len(content), max(len(content), 1), [0], newlines, total_lines)
+
+    def to_dict(self) -> dict:
+        return {
+            "token": self.token, "size": self.size, "stride": self.stride,
+            "checkpoints": self.checkpoints, "newlines": self.newlines, "total_lines": self.total_lines,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LineIndex":
+        return cls(
+            data["token"], data["size"], data["stride"],
+            data["checkpoints"], data["newlines"], data["total_lines"],
+        )
+
+    def line_start(self, buf, line: int) -> int:
+        """
+        第line行（0开始）的起始字节偏移
+
+        Args:
+            buf: 文件内容（bytes或mmap，支持find）
+            line: 行号，>= total_lines时返回文件大小
+        """
+        if line <= 0:
+            return 0
+        if line > self.newlines:
+            return self.size
+        # 第line个换行之后即为该行开头；从该换行所在块的检查点开始查找
+        block = bisect.bisect_left(self.checkpoints, line) - 1
+        pos = block * self.stride
+        for _ in range(line - self.checkpoints[block]):
+            pos = buf.find(b"\n", pos) + 1
+            if not pos:
+                # 索引构建后文件被截断
+                return len(buf)
+        return pos
+
+
+class LineIndexStore:
+    """行索引缓存：进程内LRU + 磁盘持久化（按路径哈希存放，按stat_token校验版本）"""
+
+    def __init__(self, index_dir: Optional[str] = None, max_entries: int = 64):
+        self.index_dir = index_dir or os.path.join(tempfile.gettempdir(), "openclaw_line_index")
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, LineIndex]" = OrderedDict()
+        self._lock = Lock()
+        self.stats = {"built": 0, "loaded": 0, "hits": 0}
+
+    def _index_path(self, path: str) -> str:
+        digest = hashlib.blake2b(path.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+        return os.path.join(self.index_dir, f"{digest}.json")
+
+    def get(self, path: str) -> LineIndex:
+        """获取文件当前版本的索引（必要时构建）"""
+        path = os.path.realpath(path)
+        token = stat_token(path)
+        if token == MISSING:
+            raise FileNotFoundError(path)
+
+        with self._lock:
+            index = self._memory.get(path)
+            if index is not None and index.token == token:
+                self._memory.move_to_end(path)
+                self.stats["hits"] += 1
+                return index
+
+        index = self._load(path, token)
+        if index is None:
+            index = LineIndex.build(path, token)
+            self.stats["built"] += 1
+            self._save(path, index)
+
+        with self._lock:
+            self._memory[path] = index
+            self._memory.move_to_end(path)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+        return index
+
+    def _load(self, path: str, token: str) -> Optional[LineIndex]:
+        try:
+            with open(self._index_path(path), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("path") != path or data.get("token") != token:
+            return None
+        self.stats["loaded"] += 1
+        return LineIndex.from_dict(data)
+
+    def _save(self, path: str, index: LineIndex):
+        try:
+            os.makedirs(self.index_dir, exist_ok=True)
+            target = self._index_path(path)
+            tmp = f"{target}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"path": path, **index.to_dict()}, f)
+            os.replace(tmp, target)
+        except OSError:
+            pass
+
+
+# 默认索引缓存
+line_indexes = LineIndexStore()
+
+
+class _MappedFile:
+    """只读mmap视图（支持find和切片，只有被访问的页进入内存）"""
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+
+    def __enter__(self):
+        return self._mmap
+
+    def __exit__(self, *exc):
+        self._mmap.close()
+        self._file.close()
+
+
+def read_range(path: str, offset: int, length: int) -> bytes:
+    """读取字节范围 [offset, offset+length)"""
+    size = os.path.getsize(path)
+    offset = max(0, min(offset, size))
+    length = max(0, min(length, size - offset))
+    if size >= MMAP_THRESHOLD:
+        with _MappedFile(path) as buf:
+            return buf[offset:offset + length]
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+def read_lines(
+    path: str,
+    start: int = 0,
+    limit: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    store: Optional[LineIndexStore] = None
+) -> Tuple[bytes, dict]:
+    """
+    读取行范围
+
+    Args:
+        path: 文件路径
+        start: 起始行（0开始）
+        limit: 行数，None表示到文件末尾
+        max_bytes: 返回字节上限（在行边界截断；单行超限时按字节截断）
+        store: 索引缓存，None表示使用默认缓存
+
+    Returns:
+        (字节内容, 信息)，信息包含total_lines、read_lines、byte_range、truncated
+    """
+    size = os.path.getsize(path)
+    if size < INDEX_MIN_BYTES:
+        # 小文件：整体读入，临时索引（单个检查点）不持久化
+        with open(path, "rb") as f:
+            content = f.read()
+        index = LineIndex.from_bytes(content)
+        view = nullcontext(content)
+    else:
+        index = (store or line_indexes).get(path)
+        view = _MappedFile(path)
+
+    with view as buf:
+        begin = index.line_start(buf, start)
+        end = index.line_start(buf, start + limit) if limit is not None else index.size
+        if max_bytes is not None and end - begin > max_bytes:
+            end = begin + max_bytes + 1  # 多读1字节，以便判断是否正好在行尾
+        data = buf[begin:end]
+
+    truncated = False
+    if max_bytes is not None and len(data) > max_bytes:
+        cut = data.rfind(b"\n", 0, max_bytes) + 1
+        data = data[:cut or max_bytes]
+        truncated = True
+
+    read = data.count(b"\n") + (1 if data and not data.endswith(b"\n") else 0)
+    return data, {
+        "total_lines": index.total_lines,
+        "start_line": start,
+        "read_lines": read,
+        "byte_range": [begin, begin + len(data)],
+        "truncated": truncated,
+    }
+
+
+def iter_chunks(
+    path: str,
+    chunk_size: int = DEFAULT_CHUNK_BYTES,
+    start: int = 0,
+    end: Optional[int] = None
+) -> Iterator[bytes]:
+    """分块读取字节范围 [start, end)，内存占用不超过chunk_size"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = None if end is None else max(end - start, 0)
+        while remaining is None or remaining > 0:
+            block = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not block:
+                break
+            if remaining is not None:
+                remaining -= len(block)
+            yield block
@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""目录遍历与搜索 - 基于os.scandir
+
+- scandir复用DirEntry中的类型信息（Linux下来自d_type，无需额外系统调用），
+  需要大小/修改时间时每个条目最多一次stat（Windows下stat也来自目录读取）
+- walk：递归遍历，支持深度/条目数上限和忽略模式，不跟随符号链接目录
+- glob：路径模式（"**/*.py"、"src/*/test_?.py"），无"**"时按模式深度剪枝
+- grep：内容搜索，多个文件并行读取（线程池），匹配结果以异步迭代流式产出；
+  不读取符号链接（链接目标可能在允许目录之外）
+"""
+
+import asyncio
+import fnmatch
+import os
+import re
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Pattern, Tuple
+
+# 递归遍历时默认忽略的目录/文件名
+DEFAULT_IGNORE = (
+    ".git", ".hg", ".svn", "node_modules", "__pycache__", ".venv", "venv",
+    ".mypy_cache", ".pytest_cache", ".tox", ".idea",
+)
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_MATCHES = 200
+DEFAULT_MAX_FILE_BYTES = 10 * 1024 * 1024  # grep只搜索文件的前N字节
+DEFAULT_GREP_CONCURRENCY = 8
+GREP_BATCH_FILES = 64  # 每个线程池任务搜索的文件数（减少调度开销）
+MAX_LINE_CHARS = 500  # grep结果中单行文本的最大长度
+_BINARY_SNIFF = 8192
+
+
+def compile_ignore(patterns: Optional[Iterable[str]]) -> Optional[Pattern]:
+    """把fnmatch模式列表编译为一个正则（按名称匹配）"""
+    patterns = list(patterns or ())
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{fnmatch.translate(p)})" for p in patterns))
+
+
+def compile_glob(pattern: str) -> Pattern:
+    """
+    把路径模式编译为正则（匹配以"/"分隔的相对路径）
+
+    "**/"匹配任意层目录（包括零层），"*"和"?"不跨越"/"，支持[...]字符类。
+    """
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 2:]:
+            end = pattern.index("]", i + 2)
+            body = pattern[i + 1:end]
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            out.append(f"[{body.replace(chr(92), chr(92) * 2)}]")
+            i = end + 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return re.compile("".join(out) + r"\Z")
+
+
+def entry_info(entry: os.DirEntry, rel: Optional[str] = None, with_stat: bool = True) -> dict:
+    """DirEntry -> 条目信息（type不额外stat；size/modified一次stat）"""
+    try:
+        is_dir = entry.is_dir()
+        info = {"name": entry.name, "type": "dir" if is_dir else "file"}
+        if with_stat:
+            st = entry.stat()
+            info["size"] = 0 if is_dir else st.st_size
+            info["modified"] = st.st_mtime
+    except OSError:
+        info = {"name": entry.name, "type": "unknown"}
+        if with_stat:
+            info.update(size=0, modified=0)
+    if rel is not None:
+        info["path"] = rel
+    return info
+
+
+def list_directory(path: str, with_stat: bool = True) -> List[dict]:
+    """
+    列出单个目录（按名称排序）
+
+    Raises:
+        FileNotFoundError / NotADirectoryError
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"目录不存在: {path}")
+    if not os.path.isdir(path):
+        raise NotADirectoryError(f"不是目录: {path}")
+    with os.scandir(path) as it:
+        entries = [entry_info(entry, with_stat=with_stat) for entry in it]
+    entries.sort(key=lambda x: x["name"])
+    return entries
+
+
+def iter_tree(
+    root: str,
+    max_depth: Optional[int] = None,
+    ignore: Optional[Iterable[str]] = DEFAULT_IGNORE
+) -> Iterator[Tuple[str, os.DirEntry, int]]:
+    """
+    递归遍历（深度优先，目录内按名称排序），产出 (相对路径, DirEntry, 深度)
+
+    Args:
+        root: 根目录
+        max_depth: 最大深度（根目录的直接子项为1），None表示不限
+        ignore: 忽略的名称模式（fnmatch），匹配的目录不再进入
+    """
+    ignored = compile_ignore(ignore)
+    stack = [(root, "", 1)]
+    while stack:
+        directory, prefix, depth = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            if ignored is not None and ignored.match(entry.name):
+                continue
+            rel = prefix + entry.name
+            yield rel, entry, depth
+            try:
+                # 不跟随符号链接目录，避免环
+                descend = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                descend = False
+            if descend and (max_depth is None or depth < max_depth):
+                subdirs.append((entry.path, rel + "/", depth + 1))
+        stack.extend(reversed(subdirs))
+
+
+def walk(
+    root: str,
+    max_depth: Optional[int] = None,
+    max_entries: int = DEFAULT_MAX_ENTRIES,
+    ignore: Optional[Iterable[str]] = DEFAULT_IGNORE,
+    with_stat: bool = True
+) -> Tuple[List[dict], bool]:
+    """
+    递归列出目录
+
+    Returns:
+        (条目列表（含path和depth）, 是否因max_entries截断)
+    """
+    if not os.path.isdir(root):
+        if not os.path.exists(root):
+            raise FileNotFoundError(f"目录不存在: {root}")
+        raise NotADirectoryError(f"不是目录: {root}")
+    entries = []
+    for rel, entry, depth in iter_tree(root, max_depth, ignore):
+        if len(entries) >= max_entries:
+            return entries, True
+        info = entry_info(entry, rel, with_stat)
+        info["depth"] = depth
+        entries.append(info)
+    return entries, False
+
+
+def glob(
+    root: str,
+    pattern: str,
+    max_results: int = DEFAULT_MAX_ENTRIES,
+    ignore: Optional[Iterable[str]] = DEFAULT_IGNORE
+) -> Tuple[List[str], bool]:
+    """
+    按路径模式查找（相对root，"/"分隔）
+
+    Returns:
+        (匹配的相对路径（排序）, 是否因max_results截断)
+    """
+    if not os.path.isdir(root):
+        raise NotADirectoryError(f"不是目录: {root}")
+    regex = compile_glob(pattern.strip("/"))
+    # 模式中没有"**"时，匹配项的深度固定，不必遍历更深的目录
+    max_depth = None if "**" in pattern else pattern.strip("/").count("/") + 1
+    matches = []
+    for rel, _, _ in iter_tree(root, max_depth, ignore):
+        if regex.match(rel):
+            if len(matches) >= max_results:
+                return matches, True
+            matches.append(rel)
+    return matches, False
+
+
+def _search_file(path: str, regex: Pattern, max_file_bytes: int, limit: int) -> List[Tuple[int, str]]:
+    """在单个文件中搜索，返回 [(行号, 行文本)]（每行最多一条，跳过二进制文件）"""
+    try:
+        # 不跟随符号链接：遍历后才被换成链接的文件同样打不开
+        fd = os.open(path, os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0) | getattr(os, "O_BINARY", 0))
+        with os.fdopen(fd, "rb") as f:
+            data = f.read(max_file_bytes)
+    except OSError:
+        return []
+    if b"\x00" in data[:_BINARY_SNIFF]:
+        return []
+    results = []
+    line_no, counted = 1, 0
+    pos = 0
+    while len(results) < limit:
+        m = regex.search(data, pos)
+        if m is None:
+            break
+        start = data.rfind(b"\n", 0, m.start()) + 1
+        end = data.find(b"\n", m.end())
+        if end < 0:
+            end = len(data)
+        line_no += data.count(b"\n", counted, start)
+        counted = start
+        text = data[start:end].rstrip(b"\r").decode("utf-8", errors="replace")
+        results.append((line_no, text[:MAX_LINE_CHARS]))
+        pos = end + 1
+    return results
+
+
+async def grep(
+    root: str,
+    pattern: str,
+    path_glob: Optional[str] = None,
+    regex: bool = False,
+    ignore_case: bool = False,
+    max_matches: int = DEFAULT_MAX_MATCHES,
+    max_file_bytes: int = DEFAULT_MAX_FILE_BYTES,
+    concurrency: int = DEFAULT_GREP_CONCURRENCY,
+    ignore: Optional[Iterable[str]] = DEFAULT_IGNORE
+) -> AsyncIterator[dict]:
+    """
+    内容搜索：流式产出 {"path", "line", "text"}
+
+    文件按GREP_BATCH_FILES个一批在线程池中并行读取和匹配（最多concurrency批
+    同时进行），结果按批完成顺序产出；达到max_matches后停止。
+
+    Args:
+        root: 根目录（也可以是单个文件）
+        pattern: 搜索文本（regex=True时为正则表达式）
+        path_glob: 只搜索匹配此路径模式的文件（如"**/*.py"）
+        regex: pattern是否为正则
+        ignore_case: 忽略大小写
+        max_matches: 最多产出的匹配数
+        max_file_bytes: 每个文件只搜索前N字节
+        concurrency: 并行搜索的文件数
+        ignore: 忽略的名称模式
+    """
+    source = pattern if regex else re.escape(pattern)
+    compiled = re.compile(source.encode("utf-8"), re.IGNORECASE if ignore_case else 0)
+    loop = asyncio.get_running_loop()
+
+    if os.path.isfile(root):
+        files = [(os.path.basename(root), root)]
+    else:
+        path_regex = compile_glob(path_glob.strip("/")) if path_glob else None
+
+        def collect():
+            # 只搜索普通文件：符号链接可能指向允许目录之外（只有root经过validate_path）
+            return [
+                (rel, entry.path)
+                for rel, entry, _ in iter_tree(root, None, ignore)
+                if entry.is_file(follow_symlinks=False) and (path_regex is None or path_regex.match(rel))
+            ]
+
+        files = await loop.run_in_executor(None, collect)
+
+    remaining = max_matches
+    batches = iter([files[i:i + GREP_BATCH_FILES] for i in range(0, len(files), GREP_BATCH_FILES)])
+    pending = set()
+
+    def search_batch(batch, limit):
+        results = []
+        for rel, path in batch:
+            found = _search_file(path, compiled, max_file_bytes, limit)
+            if found:
+                results.append((rel, found))
+                limit -= len(found)
+                if limit <= 0:
+                    break
+        return results
+
+    def submit():
+        batch = next(batches, None)
+        if batch is not None:
+            pending.add(loop.run_in_executor(None, search_batch, batch, remaining))
+
+    for _ in range(concurrency):
+        submit()
+    try:
+        while pending and remaining > 0:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                pending.discard(future)
+                for rel, found in future.result():
+                    for line_no, text in found:
+                        if remaining <= 0:
+                            break
+                        remaining -= 1
+                        yield {"path": rel, "line": line_no, "text": text}
+                submit()
+    finally:
+        for future in pending:
+            future.cancel()
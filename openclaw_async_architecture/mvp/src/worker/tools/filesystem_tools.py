@@ -2,15 +2,31 @@
 """文件系统工具 - Phase 2异步优化版"""
 
 import os
+import re
 import asyncio
 import aiofiles
-from typing import Optional
+from typing import List, Optional
+from pydantic import Field
 from .base_tool import BaseTool, ToolInput, ToolOutput
+from .file_reader import BinaryFileError, read_lines, read_range, sniff
+from . import file_search
+
+# 单次读取返回的最大字节数（超出时截断，metadata中给出下一次读取的位置）
+DEFAULT_MAX_READ_BYTES = 4 * 1024 * 1024
 
 
 class ReadFileInput(ToolInput):
-    """读取文件输入"""
+    """读取文件输入
+
+    默认按行读取；指定byte_offset/byte_length时按字节范围读取。
+    """
     path: str
+    offset: int = Field(0, ge=0, description="从第几行开始读取（1开始，0=从第1行开始）")
+    limit: Optional[int] = Field(None, gt=0, description="读取多少行（None=到文件末尾）")
+    byte_offset: Optional[int] = Field(None, ge=0, description="字节范围起点")
+    byte_length: Optional[int] = Field(None, gt=0, description="字节范围长度")
+    encoding: Optional[str] = Field(None, description="文件编码（None=自动检测）")
+    max_bytes: int = Field(DEFAULT_MAX_READ_BYTES, gt=0, description="返回内容的字节上限")
 
 
 class WriteFileInput(ToolInput):
@@ -20,8 +36,35 @@ class WriteFileInput(ToolInput):
 
 
 class ListDirectoryInput(ToolInput):
-    """列出目录输入"""
+    """列出目录输入
+
+    默认只列出一层；recursive=True时递归列出（默认忽略.git、node_modules等）。
+    """
+    path: str
+    recursive: bool = Field(False, description="是否递归列出子目录")
+    max_depth: Optional[int] = Field(None, gt=0, description="递归最大深度（None=不限）")
+    max_entries: int = Field(file_search.DEFAULT_MAX_ENTRIES, gt=0, description="最多返回的条目数")
+    ignore: Optional[List[str]] = Field(None, description="忽略的名称模式（None=默认列表，仅递归时生效）")
+
+
+class GlobInput(ToolInput):
+    """按路径模式查找文件输入"""
     path: str
+    pattern: str = Field(..., description="路径模式，如 **/*.py、src/*/test_?.py")
+    max_results: int = Field(file_search.DEFAULT_MAX_ENTRIES, gt=0, description="最多返回的路径数")
+    ignore: Optional[List[str]] = Field(None, description="忽略的名称模式（None=默认列表）")
+
+
+class GrepInput(ToolInput):
+    """搜索文件内容输入"""
+    path: str
+    pattern: str = Field(..., min_length=1, description="搜索文本（regex=True时为正则表达式）")
+    regex: bool = Field(False, description="pattern是否为正则表达式")
+    ignore_case: bool = Field(False, description="忽略大小写")
+    glob: Optional[str] = Field(None, description="只搜索匹配此路径模式的文件，如 **/*.py")
+    max_matches: int = Field(file_search.DEFAULT_MAX_MATCHES, gt=0, description="最多返回的匹配数")
+    max_file_bytes: int = Field(file_search.DEFAULT_MAX_FILE_BYTES, gt=0, description="每个文件只搜索前N字节")
+    ignore: Optional[List[str]] = Field(None, description="忽略的名称模式（None=默认列表）")
 
 
 class CreateDirectoryInput(ToolInput):
@@ -39,40 +82,43 @@ class FileSystemTools:
             ReadFileTool(),
             WriteFileTool(),
             ListDirectoryTool(),
-            CreateDirectoryTool()
+            CreateDirectoryTool(),
+            GlobTool(),
+            GrepTool()
         ]
 
 
 class ReadFileTool(BaseTool):
-    """读取文件工具（异步I/O）"""
+    """读取文件工具（范围读取）
+
+    - 行范围：持久化的行偏移索引定位起始行，不从头扫描
+    - 字节范围：直接定位
+    - 大文件用mmap，返回内容有上限（max_bytes）
+    - 自动检测编码，二进制文件拒绝按文本读取
+    """
 
     name = "read_file"
-    description = "读取文件内容（异步）"
+    description = "读取文件内容（支持行范围/字节范围，大文件分段读取）"
     input_schema = ReadFileInput
 
     async def execute(self, input_data: ReadFileInput) -> ToolOutput:
         """
-        读取文件内容（使用aiofiles异步I/O）
+        读取文件内容（在线程池中执行）
 
         Args:
-            input_data: 文件路径
+            input_data: 文件路径和读取范围
 
         Returns:
-            ToolOutput: 文件内容
+            ToolOutput: 文件内容，metadata包含行数、字节范围、是否截断
         """
         try:
-            # 使用aiofiles异步读取
-            async with aiofiles.open(input_data.path, mode='r', encoding='utf-8') as f:
-                content = await f.read()
+            loop = asyncio.get_event_loop()
+            content, metadata = await loop.run_in_executor(None, self._read, input_data)
 
             return ToolOutput(
                 success=True,
-                result=content,
-                metadata={
-                    "path": input_data.path,
-                    "size": len(content),
-                    "encoding": "utf-8"
-                }
+                data=content,
+                metadata=metadata
             )
         except FileNotFoundError:
             return ToolOutput(
@@ -86,6 +132,18 @@ class ReadFileTool(BaseTool):
                 error=f"无读取权限: {input_data.path}",
                 metadata={"path": input_data.path}
             )
+        except IsADirectoryError:
+            return ToolOutput(
+                success=False,
+                error=f"不是文件: {input_data.path}",
+                metadata={"path": input_data.path}
+            )
+        except BinaryFileError as e:
+            return ToolOutput(
+                success=False,
+                error=str(e),
+                metadata={"path": input_data.path, "binary": True}
+            )
         except Exception as e:
             return ToolOutput(
                 success=False,
@@ -93,6 +151,52 @@ class ReadFileTool(BaseTool):
                 metadata={"path": input_data.path}
             )
 
+    @staticmethod
+    def _read(input_data: ReadFileInput):
+        """同步读取，返回 (内容, 元数据)"""
+        path = input_data.path
+        if os.path.isdir(path):
+            raise IsADirectoryError(path)
+        file_size = os.path.getsize(path)
+
+        encoding = input_data.encoding
+        if encoding is None:
+            encoding, binary = sniff(path)
+            if binary:
+                raise BinaryFileError(f"二进制文件，无法按文本读取: {path}")
+
+        if input_data.byte_offset is not None or input_data.byte_length is not None:
+            start = input_data.byte_offset or 0
+            wanted = input_data.byte_length or max(file_size - start, 0)
+            raw = read_range(path, start, min(wanted, input_data.max_bytes))
+            end = start + len(raw)
+            info = {
+                "byte_range": [start, end],
+                "truncated": end < min(start + wanted, file_size),
+            }
+            if end < file_size:
+                info["next_byte_offset"] = end
+        else:
+            start_line = max(input_data.offset - 1, 0)
+            raw, info = read_lines(path, start_line, input_data.limit, input_data.max_bytes)
+            next_line = start_line + info["read_lines"]
+            info["start_line"] = start_line + 1
+            if info["truncated"] and not raw.endswith(b"\n"):
+                # 单行超过max_bytes，在行中间截断：从截断处按字节继续读
+                info["next_byte_offset"] = info["byte_range"][1]
+            elif info["truncated"] and next_line < info["total_lines"]:
+                # 截断时给出下一次读取的起始行（1开始）
+                info["next_offset"] = next_line + 1
+
+        content = raw.decode(encoding, errors="replace")
+        return content, {
+            "path": path,
+            "size": len(content),
+            "file_size": file_size,
+            "encoding": encoding,
+            **info
+        }
+
 
 class WriteFileTool(BaseTool):
     """写入文件工具（异步I/O）"""
@@ -144,60 +248,51 @@ class WriteFileTool(BaseTool):
 
 
 class ListDirectoryTool(BaseTool):
-    """列出目录工具（异步I/O）"""
+    """列出目录工具（os.scandir，支持递归）"""
 
     name = "list_directory"
-    description = "列出目录内容（异步）"
+    description = "列出目录内容（可递归，支持深度/数量上限和忽略模式）"
     input_schema = ListDirectoryInput
 
     async def execute(self, input_data: ListDirectoryInput) -> ToolOutput:
         """
-        列出目录内容（使用asyncio异步遍历）
+        列出目录内容（scandir在线程池中执行）
 
         Args:
-            input_data: 目录路径
+            input_data: 目录路径及递归选项
 
         Returns:
-            ToolOutput: 目录列表
+            ToolOutput: 目录列表（递归时每项含相对路径path和深度depth）
         """
         try:
-            # 使用asyncio.to_thread包装同步操作
             loop = asyncio.get_event_loop()
 
             def list_dir():
-                if not os.path.exists(input_data.path):
-                    raise FileNotFoundError(f"目录不存在: {input_data.path}")
-                if not os.path.isdir(input_data.path):
-                    raise NotADirectoryError(f"不是目录: {input_data.path}")
-
-                entries = []
-                for entry in os.listdir(input_data.path):
-                    entry_path = os.path.join(input_data.path, entry)
-                    try:
-                        stat = os.stat(entry_path)
-                        entries.append({
-                            "name": entry,
-                            "type": "dir" if os.path.isdir(entry_path) else "file",
-                            "size": stat.st_size if os.path.isfile(entry_path) else 0,
-                            "modified": stat.st_mtime
-                        })
-                    except OSError:
-                        entries.append({
-                            "name": entry,
-                            "type": "unknown",
-                            "size": 0,
-                            "modified": 0
-                        })
-                return sorted(entries, key=lambda x: x["name"])
-
-            entries = await loop.run_in_executor(None, list_dir)
+                if not input_data.recursive:
+                    entries = file_search.list_directory(input_data.path)
+                    if input_data.ignore:
+                        ignored = file_search.compile_ignore(input_data.ignore)
+                        entries = [e for e in entries if not ignored.match(e["name"])]
+                    truncated = len(entries) > input_data.max_entries
+                    return entries[:input_data.max_entries], truncated
+                ignore = file_search.DEFAULT_IGNORE if input_data.ignore is None else input_data.ignore
+                return file_search.walk(
+                    input_data.path,
+                    max_depth=input_data.max_depth,
+                    max_entries=input_data.max_entries,
+                    ignore=ignore
+                )
+
+            entries, truncated = await loop.run_in_executor(None, list_dir)
 
             return ToolOutput(
                 success=True,
-                result=entries,
+                data=entries,
                 metadata={
                     "path": input_data.path,
-                    "count": len(entries)
+                    "count": len(entries),
+                    "recursive": input_data.recursive,
+                    "truncated": truncated
                 }
             )
         except FileNotFoundError as e:
@@ -220,6 +315,116 @@ class ListDirectoryTool(BaseTool):
             )
 
 
+class GlobTool(BaseTool):
+    """按路径模式查找文件工具"""
+
+    name = "glob_files"
+    description = "按路径模式查找文件（如 **/*.py）"
+    input_schema = GlobInput
+
+    async def execute(self, input_data: GlobInput) -> ToolOutput:
+        """
+        按路径模式查找（模式相对于path，"**"匹配任意层目录）
+
+        Args:
+            input_data: 根目录和路径模式
+
+        Returns:
+            ToolOutput: 匹配的相对路径列表
+        """
+        if not os.path.isdir(input_data.path):
+            return ToolOutput(
+                success=False,
+                error=f"目录不存在: {input_data.path}",
+                metadata={"path": input_data.path}
+            )
+        try:
+            ignore = file_search.DEFAULT_IGNORE if input_data.ignore is None else input_data.ignore
+            matches, truncated = await asyncio.get_event_loop().run_in_executor(
+                None, file_search.glob, input_data.path, input_data.pattern, input_data.max_results, ignore
+            )
+            return ToolOutput(
+                success=True,
+                data=matches,
+                metadata={
+                    "path": input_data.path,
+                    "pattern": input_data.pattern,
+                    "count": len(matches),
+                    "truncated": truncated
+                }
+            )
+        except Exception as e:
+            return ToolOutput(
+                success=False,
+                error=f"查找文件失败: {str(e)}",
+                metadata={"path": input_data.path, "pattern": input_data.pattern}
+            )
+
+
+class GrepTool(BaseTool):
+    """搜索文件内容工具（并行读取文件）"""
+
+    name = "grep_files"
+    description = "在目录下的文件中搜索文本或正则表达式，返回匹配的行"
+    input_schema = GrepInput
+
+    async def execute(self, input_data: GrepInput) -> ToolOutput:
+        """
+        搜索文件内容
+
+        Args:
+            input_data: 根目录（或文件）、搜索模式和过滤条件
+
+        Returns:
+            ToolOutput: 匹配列表 [{"path", "line", "text"}]（按路径、行号排序）
+        """
+        if not os.path.exists(input_data.path):
+            return ToolOutput(
+                success=False,
+                error=f"路径不存在: {input_data.path}",
+                metadata={"path": input_data.path}
+            )
+        try:
+            ignore = file_search.DEFAULT_IGNORE if input_data.ignore is None else input_data.ignore
+            matches = [
+                match async for match in file_search.grep(
+                    input_data.path,
+                    input_data.pattern,
+                    path_glob=input_data.glob,
+                    regex=input_data.regex,
+                    ignore_case=input_data.ignore_case,
+                    max_matches=input_data.max_matches,
+                    max_file_bytes=input_data.max_file_bytes,
+                    ignore=ignore
+                )
+            ]
+        except re.error as e:
+            return ToolOutput(
+                success=False,
+                error=f"正则表达式错误: {str(e)}",
+                metadata={"path": input_data.path, "pattern": input_data.pattern}
+            )
+        except Exception as e:
+            return ToolOutput(
+                success=False,
+                error=f"搜索失败: {str(e)}",
+                metadata={"path": input_data.path, "pattern": input_data.pattern}
+            )
+
+        matches.sort(key=lambda m: (m["path"], m["line"]))
+        return ToolOutput(
+            success=True,
+            data=matches,
+            metadata={
+                "path": input_data.path,
+                "pattern": input_data.pattern,
+                "count": len(matches),
+                "files": len({m["path"] for m in matches}),
+                "truncated": len(matches) >= input_data.max_matches
+            }
+        )
+
+
 class CreateDirectoryTool(BaseTool):
     """创建目录工具（异步I/O）"""
 
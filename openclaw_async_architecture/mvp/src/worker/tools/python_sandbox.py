@@ -0,0 +1,397 @@
+# -*- coding: utf-8 -*-
+"""Python沙箱进程池
+
+ExecPythonTool的执行后端：代码在预先启动的子进程（沙箱）中执行，
+不在Worker进程内exec。
+
+- 预热：沙箱启动时预先导入常用模块，调用时无需冷启动解释器
+- 资源限制（POSIX）：RLIMIT_AS限制内存，RLIMIT_CPU按次限制CPU时间
+- 每次调用独立捕获stdout/stderr（在沙箱进程内，互不干扰，有上限）
+- 超时：杀死沙箱进程组（不会残留线程），下次调用使用新沙箱
+- 回收：每个沙箱执行max_runs次后退出，限制模块级状态的残留
+
+父子进程通过沙箱的stdin/stdout通信（4字节长度 + JSON），沙箱内的
+文件描述符0/1重定向到/dev/null，用户代码无法干扰协议。
+
+本文件同时是沙箱进程的入口（python -I python_sandbox.py <配置JSON>），
+因此只依赖标准库。
+"""
+
+import asyncio
+import atexit
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import threading
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 2  # 常驻的空闲沙箱数
+DEFAULT_MAX_RUNS = 50  # 每个沙箱的执行次数上限
+DEFAULT_MEMORY_BYTES = 512 * 1024 * 1024  # 沙箱地址空间上限（RLIMIT_AS）
+DEFAULT_CPU_SECONDS = 10  # 每次执行的CPU时间上限（RLIMIT_CPU）
+DEFAULT_MAX_OUTPUT_CHARS = 1024 * 1024  # 每个流保留的字符数
+
+# 沙箱启动时预先导入的模块
+DEFAULT_PRELOAD = (
+    "collections", "datetime", "decimal", "fractions", "functools", "itertools",
+    "json", "math", "random", "re", "statistics", "string", "textwrap",
+)
+
+
+class SandboxError(Exception):
+    """沙箱进程意外退出"""
+
+
+class SandboxTimeout(SandboxError):
+    """执行超时，沙箱已被杀死"""
+
+
+# ========== 父进程侧 ==========
+
+class Sandbox:
+    """单个沙箱进程（同一时刻只执行一段代码）"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.process = subprocess.Popen(
+            [sys.executable, "-I", "-u", os.path.abspath(__file__), json.dumps(config)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            # 独立进程组：超时时连同用户代码启动的子进程一起杀死
+            start_new_session=(os.name != "nt")
+        )
+        self.runs = 0
+        self._timed_out = False
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def run(self, request: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """
+        执行一次（阻塞，在线程中调用）
+
+        Raises:
+            SandboxTimeout: 超时（沙箱已被杀死）
+            SandboxError: 沙箱进程退出（例如CPU时间超限）
+        """
+        payload = json.dumps(request).encode("utf-8")
+        self._timed_out = False
+        timer = threading.Timer(timeout, self._expire)
+        timer.start()
+        try:
+            self.process.stdin.write(len(payload).to_bytes(4, "big") + payload)
+            self.process.stdin.flush()
+            header = self.process.stdout.read(4)
+            body = self.process.stdout.read(int.from_bytes(header, "big")) if len(header) == 4 else b""
+        except (BrokenPipeError, OSError, ValueError):
+            header = body = b""
+        finally:
+            timer.cancel()
+
+        self.runs += 1
+        if not body:
+            self.kill()
+            if self._timed_out:
+                raise SandboxTimeout()
+            code = self.process.returncode
+            if os.name != "nt" and code == -signal.SIGXCPU:
+                raise SandboxError("CPU时间超限")
+            raise SandboxError(f"沙箱进程意外退出 (exit={code})")
+        reply = json.loads(body)
+        if reply.get("recycle"):
+            # 沙箱在回复后自行退出，不再放回池中
+            self.kill()
+        return reply
+
+    def _expire(self):
+        self._timed_out = True
+        self.kill()
+
+    def kill(self):
+        """杀死沙箱（整个进程组）并回收"""
+        try:
+            if os.name != "nt":
+                os.killpg(self.process.pid, signal.SIGKILL)
+            else:
+                self.process.kill()
+        except (ProcessLookupError, PermissionError):
+            pass
+        try:
+            self.process.wait(5)
+        except Exception:
+            pass
+        for pipe in (self.process.stdin, self.process.stdout):
+            try:
+                pipe.close()
+            except Exception:
+                pass
+
+
+class SandboxPool:
+    """
+    预启动的沙箱进程池
+
+    用法：
+        pool = SandboxPool(size=2)
+        result = await pool.run("print(1 + 1)", timeout=10)
+        result["stdout"]  # "2\\n"
+        pool.shutdown()
+    """
+
+    def __init__(
+        self,
+        size: int = DEFAULT_POOL_SIZE,
+        max_runs: int = DEFAULT_MAX_RUNS,
+        memory_bytes: Optional[int] = DEFAULT_MEMORY_BYTES,
+        cpu_seconds: Optional[int] = DEFAULT_CPU_SECONDS,
+        max_output_chars: int = DEFAULT_MAX_OUTPUT_CHARS,
+        preload: tuple = DEFAULT_PRELOAD
+    ):
+        """
+        Args:
+            size: 常驻的空闲沙箱数（并发调用超出时临时启动新沙箱）
+            max_runs: 每个沙箱执行多少次后回收
+            memory_bytes: 沙箱地址空间上限，None表示不限
+            cpu_seconds: 每次执行的CPU时间上限，None表示不限
+            max_output_chars: 每个流保留的字符数
+            preload: 预先导入的模块
+        """
+        self.size = size
+        self.max_runs = max_runs
+        self.config = {
+            "memory_bytes": memory_bytes,
+            "cpu_seconds": cpu_seconds,
+            "max_runs": max_runs,
+            "max_output_chars": max_output_chars,
+            "preload": list(preload),
+        }
+        self._idle: List[Sandbox] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stats = {"spawned": 0, "recycled": 0, "timeouts": 0, "crashed": 0, "runs": 0}
+
+    def start(self):
+        """预启动size个沙箱（解释器在后台完成预热）"""
+        with self._lock:
+            while len(self._idle) < self.size and not self._closed:
+                self._idle.append(self._spawn())
+
+    def _spawn(self) -> Sandbox:
+        self._stats["spawned"] += 1
+        return Sandbox(self.config)
+
+    def _acquire(self) -> Sandbox:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("沙箱池已关闭")
+            while self._idle:
+                sandbox = self._idle.pop()
+                if sandbox.alive:
+                    return sandbox
+            return self._spawn()
+
+    def _release(self, sandbox: Sandbox):
+        with self._lock:
+            if sandbox.alive and sandbox.runs < self.max_runs and not self._closed \
+                    and len(self._idle) < self.size:
+                self._idle.append(sandbox)
+                return
+        if sandbox.alive:
+            self._stats["recycled"] += 1
+        sandbox.kill()
+        # 补充预热的沙箱，下一次调用不必等待解释器启动
+        self.start()
+
+    async def run(self, code: str, timeout: float, capture_output: bool = True) -> Dict[str, Any]:
+        """
+        在沙箱中执行代码
+
+        Args:
+            code: Python代码
+            timeout: 超时（秒，墙钟时间）
+            capture_output: 是否返回stdout/stderr
+
+        Returns:
+            {"ok", "stdout", "stderr", "error", "exception", "traceback",
+             "truncated", "cpu_time", "recycle", "pid"}
+
+        Raises:
+            SandboxTimeout: 超时
+            SandboxError: 沙箱进程意外退出（CPU/内存超限等）
+            RuntimeError: 沙箱池已关闭
+        """
+        sandbox = self._acquire()
+        request = {"code": code, "capture_output": capture_output}
+        try:
+            result = await asyncio.to_thread(sandbox.run, request, timeout)
+        except SandboxTimeout:
+            self._stats["timeouts"] += 1
+            logger.warning(f"[Sandbox] 执行超时（{timeout}秒），已杀死沙箱 pid={sandbox.pid}")
+            raise
+        except SandboxError as e:
+            self._stats["crashed"] += 1
+            logger.warning(f"[Sandbox] 沙箱异常退出 pid={sandbox.pid}: {e}")
+            raise
+        except asyncio.CancelledError:
+            # 线程仍在等待沙箱：杀死沙箱使其返回，且不放回池中
+            sandbox.kill()
+            raise
+        finally:
+            self._stats["runs"] += 1
+            self._release(sandbox)
+        result["pid"] = sandbox.pid
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            idle = len(self._idle)
+        return {**self._stats, "idle": idle}
+
+    def shutdown(self):
+        """关闭沙箱池（执行中的沙箱在结束后被杀死）"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for sandbox in idle:
+            sandbox.kill()
+
+
+_default_pool: Optional[SandboxPool] = None
+_default_lock = threading.Lock()
+
+
+def get_sandbox_pool() -> SandboxPool:
+    """进程级默认沙箱池（首次调用时预启动，解释器退出时关闭）"""
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = SandboxPool()
+            _default_pool.start()
+            atexit.register(_default_pool.shutdown)
+        return _default_pool
+
+
+# ========== 沙箱进程侧 ==========
+
+class _CappedWriter:
+    """有上限的文本输出（超出部分只计数）"""
+
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self.parts: List[str] = []
+        self.size = 0
+        self.dropped = 0
+
+    def write(self, text: str) -> int:
+        room = self.max_chars - self.size
+        if room > 0:
+            self.parts.append(text[:room])
+            self.size += min(len(text), room)
+        self.dropped += max(len(text) - max(room, 0), 0)
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def getvalue(self) -> str:
+        return "".join(self.parts)
+
+
+def _cpu_time() -> float:
+    return sum(os.times()[:2])
+
+
+def _child_main(config: Dict[str, Any]):
+    import builtins
+    import importlib
+    import traceback
+
+    try:
+        import resource
+    except ImportError:
+        resource = None
+
+    # 协议使用复制出的描述符；0/1指向/dev/null（input()读到EOF，直接写fd 1的输出被丢弃）
+    proto_in = os.fdopen(os.dup(0), "rb")
+    proto_out = os.fdopen(os.dup(1), "wb")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+
+    cpu_seconds = config.get("cpu_seconds")
+    if resource is not None:
+        if config.get("memory_bytes"):
+            resource.setrlimit(resource.RLIMIT_AS, (config["memory_bytes"], config["memory_bytes"]))
+        if cpu_seconds:
+            # 硬上限覆盖沙箱的整个生命周期（max_runs次），软上限每次执行前重新设置
+            hard = int(_cpu_time()) + cpu_seconds * (config.get("max_runs", 1) + 1) + 5
+            resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+    for name in config.get("preload", []):
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass
+
+    max_chars = config.get("max_output_chars", DEFAULT_MAX_OUTPUT_CHARS)
+    real_stdout, real_stderr = sys.stdout, sys.stderr
+
+    while True:
+        header = proto_in.read(4)
+        if len(header) < 4:
+            return
+        request = json.loads(proto_in.read(int.from_bytes(header, "big")))
+
+        if resource is not None and cpu_seconds:
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            resource.setrlimit(resource.RLIMIT_CPU, (min(int(_cpu_time()) + cpu_seconds, hard), hard))
+
+        stdout, stderr = _CappedWriter(max_chars), _CappedWriter(max_chars)
+        reply = {"ok": True, "error": None, "exception": None, "traceback": None}
+        start = _cpu_time()
+        sys.stdout, sys.stderr = stdout, stderr
+        try:
+            exec(compile(request["code"], "<sandbox>", "exec"),
+                 {"__name__": "__main__", "__builtins__": builtins})
+        except SystemExit as e:
+            if e.code not in (None, 0):
+                reply.update(ok=False, error=f"SystemExit({e.code})", exception="SystemExit")
+        except BaseException as e:
+            reply.update(
+                ok=False,
+                error=str(e) or type(e).__name__,
+                exception=type(e).__name__,
+                traceback=traceback.format_exc()
+            )
+        finally:
+            sys.stdout, sys.stderr = real_stdout, real_stderr
+
+        capture = request.get("capture_output", True)
+        reply.update(
+            stdout=stdout.getvalue() if capture else "",
+            stderr=stderr.getvalue() if capture else "",
+            truncated=bool(stdout.dropped or stderr.dropped),
+            cpu_time=round(_cpu_time() - start, 4),
+            # 内存耗尽后解释器状态不可靠，回复后退出由父进程替换
+            recycle=reply["exception"] == "MemoryError",
+        )
+        payload = json.dumps(reply).encode("utf-8")
+        proto_out.write(len(payload).to_bytes(4, "big") + payload)
+        proto_out.flush()
+
+        if reply["recycle"]:
+            return
+
+
+if __name__ == "__main__":
+    _child_main(json.loads(sys.argv[1]))
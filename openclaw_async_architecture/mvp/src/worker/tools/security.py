@@ -8,6 +8,9 @@
 - 命令白名单
 - 审计日志
 - 超时限制
+
+规则（ALLOWED_PATHS等）编译成SecurityPolicy后使用（见security_policy.py），
+规则变化时自动重新编译；也可通过configure()或SECURITY_POLICY_PATH配置文件热更新。
 """
 
 import os
@@ -16,7 +19,18 @@ import asyncio
 import logging
 from typing import Dict, Any, List, Set, Optional, Callable
 from functools import wraps
-from datetime import datetime
+
+try:
+    from ...middleware.audit_store import (
+        AUDIT_MASKED_FIELDS, get_audit_sink, mask_sensitive_data, record_audit, set_audit_sink
+    )
+except ImportError:
+    # 直接导入（src在sys.path中）
+    from middleware.audit_store import (
+        AUDIT_MASKED_FIELDS, get_audit_sink, mask_sensitive_data, record_audit, set_audit_sink
+    )
+
+from .security_policy import DEFAULT_PATH_CACHE_TTL, SecurityPolicy, load_policy_file
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -37,9 +51,11 @@ def validate_path(path: str) -> str:
     安全检查：
     - 规范化路径（处理 . 和 ..）
     - 检查是否包含 ..
-    - 检查是否在白名单目录内
+    - 检查是否在白名单目录内（按路径分量匹配）
     - 解析符号链接
 
+    判定结果缓存PATH_CACHE_TTL秒（期间符号链接的变化不会被发现）。
+
     Args:
         path: 待验证的路径（绝对或相对）
 
@@ -50,25 +66,7 @@ def validate_path(path: str) -> str:
         PermissionError: 路径不在白名单中
         ValueError: 路径包含非法字符
     """
-    # 转为绝对路径
-    abspath = os.path.abspath(path)
-
-    # 规范化路径
-    normalized = os.path.normpath(abspath)
-
-    # 检查路径遍历攻击
-    if ".." in normalized:
-        raise ValueError(f"Path traversal not allowed: {path}")
-
-    # 解析符号链接
-    real_path = os.path.realpath(normalized)
-
-    # 检查白名单
-    for allowed in ALLOWED_PATHS:
-        if real_path.startswith(allowed):
-            return real_path
-
-    raise PermissionError(f"Path not in allowed directories: {path}")
+    return get_policy().check_path(path)
 
 
 # ============================================================================
@@ -123,34 +121,7 @@ def validate_command(cmd: str) -> bool:
         PermissionError: 命令不在白名单中
         ValueError: 包含危险模式
     """
-    # 转小写（Windows命令不区分大小写）
-    cmd_lower = cmd.lower()
-
-    # 检查危险模式
-    for pattern in BLOCKED_PATTERNS:
-        if pattern.lower() in cmd_lower:
-            raise ValueError(f"Blocked command pattern: {pattern}")
-
-    # 解析命令
-    parts = cmd.split()
-    if not parts:
-        raise ValueError("Empty command")
-
-    base_cmd = parts[0]
-
-    # 检查白名单
-    if base_cmd not in ALLOWED_COMMANDS:
-        raise PermissionError(f"Command not allowed: {base_cmd}")
-
-    # 检查参数
-    allowed_args = ALLOWED_COMMANDS[base_cmd]
-    if allowed_args:
-        for arg in parts[1:]:
-            # 如果参数以-或/开头，检查是否允许
-            if (arg.startswith("-") or arg.startswith("/")) and arg not in allowed_args:
-                raise ValueError(f"Invalid argument for {base_cmd}: {arg}")
-
-    return True
+    return get_policy().check_command(cmd)
 
 
 # ============================================================================
@@ -175,6 +146,8 @@ def validate_python_code(code: str) -> bool:
     """
     验证Python代码是否包含危险函数
 
+    按AST检查函数调用和引用（字符串、注释中的内容不算）；无法解析时按子串检查。
+
     Args:
         code: 待验证的Python代码
 
@@ -184,51 +157,127 @@ def validate_python_code(code: str) -> bool:
     Raises:
         ValueError: 代码包含危险函数
     """
-    code_lower = code.lower()
+    return get_policy().check_python_code(code)
 
-    for func in BLOCKED_PYTHON_FUNCTIONS:
-        if f"{func}(" in code_lower:
-            raise ValueError(f"Python function not allowed: {func}")
 
-    # 检查其他危险模式
-    if "__" in code and "import" in code_lower:
-        raise ValueError("Dangerous import pattern detected")
+# ============================================================================
+# 4. 策略编译与热更新
+# ============================================================================
 
-    return True
+PATH_CACHE_TTL: float = DEFAULT_PATH_CACHE_TTL  # 路径判定缓存秒数（0表示不缓存）
+POLICY_FILE_CHECK_INTERVAL = 1.0  # 检查SECURITY_POLICY_PATH文件是否变化的间隔（秒）
 
+_policy: Optional[SecurityPolicy] = None
+_policy_sources: tuple = ()
+_policy_file_state: Optional[tuple] = None
+_next_policy_file_check = 0.0
 
-# ============================================================================
-# 4. 审计日志
-# ============================================================================
 
-AUDIT_MASKED_FIELDS: Set[str] = {
-    "password",
-    "api_key",
-    "token",
-    "secret",
-    "key",
-}
+def _rule_sources() -> tuple:
+    # 保存规则对象本身：替换（如mock.patch）或增删元素后与编译时不同
+    return (
+        ALLOWED_PATHS, len(ALLOWED_PATHS),
+        ALLOWED_COMMANDS, len(ALLOWED_COMMANDS),
+        BLOCKED_PATTERNS, len(BLOCKED_PATTERNS),
+        BLOCKED_PYTHON_FUNCTIONS, len(BLOCKED_PYTHON_FUNCTIONS),
+        PATH_CACHE_TTL,
+    )
+
+
+def get_policy() -> SecurityPolicy:
+    """
+    获取当前编译后的安全策略
+
+    以下情况自动重新编译：
+    - 规则被替换或增删元素（原地修改元素时请调用reload_policy）
+    - 环境变量SECURITY_POLICY_PATH指定的配置文件发生变化（每秒最多检查一次）
+    """
+    global _policy, _policy_sources, _next_policy_file_check
+    now = time.monotonic()
+    if now >= _next_policy_file_check:
+        _next_policy_file_check = now + POLICY_FILE_CHECK_INTERVAL
+        _check_policy_file()
+
+    sources = _rule_sources()
+    if _policy is None or sources != _policy_sources:
+        _policy = SecurityPolicy(
+            ALLOWED_PATHS,
+            ALLOWED_COMMANDS,
+            BLOCKED_PATTERNS,
+            BLOCKED_PYTHON_FUNCTIONS,
+            path_cache_ttl=PATH_CACHE_TTL,
+        )
+        _policy_sources = sources
+        logger.info(f"Security policy compiled: {len(ALLOWED_PATHS)} paths, "
+                    f"{len(ALLOWED_COMMANDS)} commands, {len(BLOCKED_PATTERNS)} blocked patterns")
+    return _policy
+
+
+def reload_policy() -> SecurityPolicy:
+    """强制重新编译安全策略（同时清空判定缓存）"""
+    global _policy
+    _policy = None
+    return get_policy()
+
 
-def mask_sensitive_data(data: Dict[str, Any]) -> Dict[str, Any]:
+def configure(config: Dict[str, Any]) -> SecurityPolicy:
     """
-    掩码敏感数据
+    更新安全规则并重新编译
+
+    可作为HotReloadService的回调使用（config.yaml中的security节）：
+        hot_reload.add_reload_callback(
+            lambda new, old: security.configure(getattr(new, "security", None) or {}))
 
     Args:
-        data: 原始数据
+        config: 支持allowed_paths、allowed_commands、blocked_patterns、
+                blocked_python_functions、path_cache_ttl，缺省的键保持当前值
 
     Returns:
-        dict: 掩码后的数据
+        SecurityPolicy: 新策略
     """
-    masked = {}
-    for key, value in data.items():
-        key_lower = key.lower()
-        if any(field in key_lower for field in AUDIT_MASKED_FIELDS):
-            masked[key] = "***HIDDEN***"
-        elif isinstance(value, dict):
-            masked[key] = mask_sensitive_data(value)
-        else:
-            masked[key] = value
-    return masked
+    global ALLOWED_PATHS, ALLOWED_COMMANDS, BLOCKED_PATTERNS, BLOCKED_PYTHON_FUNCTIONS, PATH_CACHE_TTL
+    # 先全部校验再替换，避免配置错误时只更新一半
+    paths = [os.path.abspath(p) for p in config.get("allowed_paths", ALLOWED_PATHS)]
+    commands = {str(k): list(v or []) for k, v in config.get("allowed_commands", ALLOWED_COMMANDS).items()}
+    patterns = [str(p) for p in config.get("blocked_patterns", BLOCKED_PATTERNS)]
+    functions = {str(f) for f in config.get("blocked_python_functions", BLOCKED_PYTHON_FUNCTIONS)}
+    ttl = float(config.get("path_cache_ttl", PATH_CACHE_TTL))
+
+    ALLOWED_PATHS, ALLOWED_COMMANDS, BLOCKED_PATTERNS = paths, commands, patterns
+    BLOCKED_PYTHON_FUNCTIONS, PATH_CACHE_TTL = functions, ttl
+    return reload_policy()
+
+
+def _check_policy_file():
+    """SECURITY_POLICY_PATH文件变化时重新加载（加载失败时保留当前规则）"""
+    global _policy_file_state
+    path = os.getenv("SECURITY_POLICY_PATH")
+    if not path:
+        return
+    try:
+        stat = os.stat(path)
+    except OSError as e:
+        if _policy_file_state is not None:
+            logger.warning(f"Security policy file unavailable, keeping current rules: {path} ({e})")
+            _policy_file_state = None
+        return
+    state = (path, stat.st_mtime_ns, stat.st_size)
+    if state == _policy_file_state:
+        return
+    _policy_file_state = state
+    try:
+        configure(load_policy_file(path))
+        logger.info(f"Security policy loaded: {path}")
+    except Exception as e:
+        logger.error(f"Failed to load security policy, keeping current rules: {path} ({e})")
+
+
+# ============================================================================
+# 5. 审计日志
+# ============================================================================
+
+# 脱敏规则和审计sink在middleware/audit_store.py中，与SecurityMiddleware、
+# 插件SandboxedRuntime共用（AUDIT_LOG_PATH指定.db文件时写入可查询的AuditStore）
 
 
 async def audit_log(
@@ -238,36 +287,26 @@ async def audit_log(
     result: Optional[str] = None,
     error: Optional[str] = None,
     user: str = "unknown",
+    duration_ms: Optional[float] = None,
 ) -> None:
     """
     记录审计日志
 
     Args:
-        event_type: 事件类型（call, error, etc.）
+        event_type: 事件类型（call, success, error, denied）
         tool_name: 工具名称
         params: 工具参数
         result: 执行结果（可选）
         error: 错误信息（可选）
         user: 用户标识
+        duration_ms: 执行耗时（可选）
     """
-    log_entry = {
-        "timestamp": datetime.now().isoformat(),
-        "event_type": event_type,
-        "tool_name": tool_name,
-        "params": mask_sensitive_data(params),
-        "result": result[:1000] if result else None,  # 限制长度
-        "error": error[:1000] if error else None,
-        "user": user,
-    }
-
-    # 记录到日志
-    logger.info(f"AUDIT: {log_entry}")
-
-    # TODO: 发送到审计日志存储（文件、数据库、ELK等）
+    # 热路径只做脱敏和截断（敏感值不进入队列），序列化和写入在后台线程
+    record_audit(event_type, tool_name, params, result=result, error=error, user=user, duration_ms=duration_ms)
 
 
 # ============================================================================
-# 5. 超时限制
+# 6. 超时限制
 # ============================================================================
 
 def with_timeout(timeout_seconds: float = 30.0):
@@ -315,7 +354,7 @@ def with_timeout(timeout_seconds: float = 30.0):
 
 
 # ============================================================================
-# 6. 综合安全检查中间件
+# 7. 综合安全检查中间件
 # ============================================================================
 
 class SecurityChecker:
@@ -336,7 +375,8 @@ class SecurityChecker:
         Raises:
             ValueError/PermissionError: 安全检查失败
         """
-        if tool_name in ["read_file", "write_file", "list_directory", "create_directory"]:
+        if tool_name in ["read_file", "write_file", "list_directory", "create_directory",
+                         "glob_files", "grep_files"]:
             if "path" in params:
                 validate_path(params["path"])
         return True
@@ -396,9 +436,13 @@ class SecurityChecker:
         Raises:
             各种安全异常
         """
-        SecurityChecker.check_path_tool(tool_name, params)
-        SecurityChecker.check_command_tool(tool_name, params)
-        SecurityChecker.check_python_tool(tool_name, params)
+        try:
+            SecurityChecker.check_path_tool(tool_name, params)
+            SecurityChecker.check_command_tool(tool_name, params)
+            SecurityChecker.check_python_tool(tool_name, params)
+        except (PermissionError, ValueError) as e:
+            await audit_log(event_type="denied", tool_name=tool_name, params=params, error=str(e))
+            raise
 
         # 记录审计日志
         await audit_log(
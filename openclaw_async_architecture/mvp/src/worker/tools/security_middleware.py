@@ -7,12 +7,13 @@ Security Middleware
 import asyncio
 from typing import Dict, Any, Optional
 
-from middleware import BaseMiddleware, ExecutionContext, MiddlewareResult
+from middleware import BaseMiddleware, ExecutionContext, MiddlewareResult, CONTINUE
 from .security import (
     validate_path,
     validate_command,
     validate_python_code,
     mask_sensitive_data,
+    record_audit,
 )
 
 
@@ -25,13 +26,15 @@ class SecurityMiddleware(BaseMiddleware):
     - 命令白名单验证
     - Python 代码验证
     - 敏感数据掩码（审计日志）
+    - 审计记录（拒绝、成功、错误；与security.audit_log写入同一个审计sink）
     """
 
     def __init__(
         self,
         name: str = "security",
         enabled: bool = True,
-        mask_sensitive: bool = True
+        mask_sensitive: bool = True,
+        audit: bool = True
     ):
         """
         初始化安全中间件。
@@ -40,9 +43,18 @@ class SecurityMiddleware(BaseMiddleware):
             name: 中间件名称
             enabled: 是否启用
             mask_sensitive: 是否掩码敏感数据
+            audit: 是否写审计记录
         """
         super().__init__(name, enabled, priority=1)  # 最高优先级（最先执行）
         self.mask_sensitive = mask_sensitive
+        self.audit = audit
+
+    def _audit(self, ctx: ExecutionContext, event_type: str, error: Optional[str] = None):
+        if self.audit:
+            record_audit(
+                event_type, ctx.tool_name, ctx.original_parameters, error=error,
+                user=ctx.user_id, duration_ms=ctx.duration_ms, source=self.name
+            )
 
     async def pre_process(self, ctx: ExecutionContext) -> MiddlewareResult:
         """
@@ -60,7 +72,8 @@ class SecurityMiddleware(BaseMiddleware):
         # 根据工具类型执行不同的安全检查
         try:
             # 文件系统工具 - 路径验证
-            if tool_name in ["read_file", "write_file", "list_directory", "create_directory"]:
+            if tool_name in ["read_file", "write_file", "list_directory", "create_directory",
+                             "glob_files", "grep_files"]:
                 if "path" in params:
                     validate_path(params["path"])
 
@@ -72,10 +85,11 @@ class SecurityMiddleware(BaseMiddleware):
                     validate_python_code(params["code"])
 
             # 如果所有检查通过
-            return MiddlewareResult()
+            return CONTINUE
 
         except (PermissionError, ValueError) as e:
             # 安全检查失败
+            self._audit(ctx, "denied", error=str(e))
             return MiddlewareResult(
                 success=False,
                 skip_remaining=True,
@@ -105,6 +119,8 @@ class SecurityMiddleware(BaseMiddleware):
         Returns:
             MiddlewareResult（可能修改结果）
         """
+        self._audit(ctx, "success")
+
         # 如果需要掩码且结果包含敏感数据
         if self.mask_sensitive:
             # 对结果进行敏感数据掩码
@@ -113,7 +129,7 @@ class SecurityMiddleware(BaseMiddleware):
                 masked_result = mask_sensitive_data(tool_result)
                 return MiddlewareResult(modified_result=masked_result)
 
-        return MiddlewareResult()
+        return CONTINUE
 
     async def on_error(
         self,
@@ -131,7 +147,7 @@ class SecurityMiddleware(BaseMiddleware):
             MiddlewareResult
         """
         # 记录安全相关的错误
-        print(f"[SecurityMiddleware] Error in tool {ctx.tool_name}: {error}")
+        self._audit(ctx, "error", error=str(error))
 
         # 返回错误信息（不重新抛出）
         return MiddlewareResult(success=False, error=str(error))
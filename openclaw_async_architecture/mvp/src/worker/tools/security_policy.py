@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+"""
+编译后的安全策略
+
+把security.py中的白名单/黑名单规则一次性编译成便于查找的结构，并缓存判定结果：
+- 路径：允许目录编译成按路径分量的前缀树（O(路径深度)，不再逐个startswith）；
+  判定结果按(cwd, path)缓存，TTL内不再调用realpath
+- 命令：危险模式编译成一个正则（一次扫描），参数白名单编译成frozenset；判定结果LRU缓存
+- Python代码：AST分析函数调用（字符串、注释中的"open("不再误报，
+  `f = eval`这类别名也能发现）；判定结果按代码哈希LRU缓存
+
+策略对象不可变，热更新时整体替换（见security.get_policy / reload_policy / configure）。
+"""
+
+import ast
+import hashlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+DEFAULT_CACHE_ENTRIES = 4096
+DEFAULT_PATH_CACHE_TTL = 1.0  # 路径判定缓存秒数（realpath结果可能因符号链接变化而过期）
+
+# 通过内置模块引用危险函数（builtins.eval）
+_BUILTIN_MODULES = {"builtins", "__builtins__"}
+
+
+class DecisionCache:
+    """判定结果缓存（LRU，可选TTL）：缓存返回值或异常（命中时重新抛出同类型异常）"""
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_ENTRIES, ttl: Optional[float] = None):
+        """
+        Args:
+            max_entries: 最大条目数（LRU淘汰）
+            ttl: 过期秒数，None表示不过期，0表示不缓存
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Any, Tuple[float, Any, Optional[Tuple[type, str]]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key) -> Tuple[bool, Any]:
+        """
+        Returns:
+            (是否命中, 缓存的返回值)；缓存的是异常时直接抛出
+        """
+        entry = self._entries.get(key)
+        if entry is None or (self.ttl is not None and entry[0] < time.monotonic()):
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        error = entry[2]
+        if error is not None:
+            raise error[0](error[1])
+        return True, entry[1]
+
+    def store(self, key, value=None, error: Optional[Exception] = None):
+        if self.ttl == 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else 0.0
+        self._entries[key] = (expires_at, value, (type(error), str(error)) if error is not None else None)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def _path_parts(path: str) -> List[str]:
+    return [part for part in os.path.normcase(path).split(os.sep) if part]
+
+
+class PathTrie:
+    """允许目录的前缀树（按路径分量匹配：/ws不会匹配/ws-other）"""
+
+    _END = object()
+
+    def __init__(self, roots: Iterable[str] = ()):
+        self._root: Dict[Any, Any] = {}
+        for root in roots:
+            self.add(root)
+
+    def add(self, path: str):
+        node = self._root
+        for part in _path_parts(path):
+            node = node.setdefault(part, {})
+        node[self._END] = True
+
+    def contains(self, path: str) -> bool:
+        """path是否等于某个允许目录或位于其下"""
+        node = self._root
+        if self._END in node:
+            return True
+        for part in _path_parts(path):
+            node = node.get(part)
+            if node is None:
+                return False
+            if self._END in node:
+                return True
+        return False
+
+
+def find_blocked_python_call(tree: ast.AST, blocked: Set[str]) -> Optional[str]:
+    """
+    在AST中查找危险函数
+
+    检测：
+    - 调用：open(...)、os.open(...)、builtins.eval(...)
+    - 引用：f = eval（代码中未重新绑定的危险名称）、builtins.eval
+    - 导入：from builtins import eval
+
+    Returns:
+        命中的函数名，None表示未发现
+    """
+    bound: Set[str] = set()
+    loaded: List[str] = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            func = node.func
+            if isinstance(func, ast.Name):
+                name = func.id
+            elif isinstance(func, ast.Attribute):
+                name = func.attr
+            else:
+                continue
+            if name in blocked:
+                return name
+        elif isinstance(node, ast.Name):
+            if isinstance(node.ctx, ast.Load):
+                if node.id in blocked:
+                    loaded.append(node.id)
+            else:
+                bound.add(node.id)
+        elif isinstance(node, ast.Attribute):
+            if (node.attr in blocked and isinstance(node.value, ast.Name)
+                    and node.value.id in _BUILTIN_MODULES):
+                return node.attr
+        elif isinstance(node, ast.ImportFrom):
+            for alias in node.names:
+                if alias.name in blocked:
+                    return alias.name
+                bound.add(alias.asname or alias.name)
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                bound.add((alias.asname or alias.name).split(".")[0])
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bound.add(node.name)
+        elif isinstance(node, ast.arg):
+            bound.add(node.arg)
+    for name in loaded:
+        if name not in bound:
+            return name
+    return None
+
+
+class SecurityPolicy:
+    """
+    编译后的安全策略（不可变；规则变化时创建新实例）
+
+    check_*方法与security.validate_*的返回值和异常完全一致。
+    """
+
+    def __init__(
+        self,
+        allowed_paths: Iterable[str],
+        allowed_commands: Dict[str, List[str]],
+        blocked_patterns: Iterable[str],
+        blocked_python_functions: Iterable[str],
+        cache_entries: int = DEFAULT_CACHE_ENTRIES,
+        path_cache_ttl: float = DEFAULT_PATH_CACHE_TTL,
+    ):
+        """
+        Args:
+            allowed_paths: 允许的目录
+            allowed_commands: 命令 -> 允许的选项（空列表表示不限制选项）
+            blocked_patterns: 危险命令模式（不区分大小写的子串）
+            blocked_python_functions: 禁止的Python函数
+            cache_entries: 每类判定缓存的最大条目数
+            path_cache_ttl: 路径判定缓存秒数（0表示不缓存）
+        """
+        # 允许目录同样解析符号链接，与realpath后的待验证路径比较
+        self.allowed_paths = [os.path.realpath(os.path.abspath(p)) for p in allowed_paths]
+        self._path_trie = PathTrie(self.allowed_paths)
+
+        self.allowed_commands = {cmd: frozenset(args) for cmd, args in allowed_commands.items()}
+        self.blocked_patterns = list(blocked_patterns)
+        lowered = [p.lower() for p in self.blocked_patterns if p]
+        self._blocked_re = re.compile("|".join(map(re.escape, lowered))) if lowered else None
+
+        self.blocked_python_functions = frozenset(blocked_python_functions)
+
+        self._path_cache = DecisionCache(cache_entries, ttl=path_cache_ttl)
+        self._command_cache = DecisionCache(cache_entries)
+        self._python_cache = DecisionCache(cache_entries)
+
+    # ------------------------------------------------------------------
+    # 路径
+    # ------------------------------------------------------------------
+
+    def check_path(self, path: str) -> str:
+        """
+        验证路径是否在允许目录内
+
+        Returns:
+            str: 解析符号链接后的绝对路径
+
+        Raises:
+            PermissionError: 路径不在白名单中
+            ValueError: 路径包含..
+        """
+        # 相对路径的结果取决于当前目录
+        key = path if os.path.isabs(path) else (os.getcwd(), path)
+        hit, real_path = self._path_cache.lookup(key)
+        if hit:
+            return real_path
+
+        try:
+            real_path = self._resolve_path(path)
+        except (PermissionError, ValueError) as e:
+            self._path_cache.store(key, error=e)
+            raise
+        self._path_cache.store(key, real_path)
+        return real_path
+
+    def _resolve_path(self, path: str) -> str:
+        normalized = os.path.normpath(os.path.abspath(path))
+
+        # 检查路径遍历攻击
+        if ".." in normalized:
+            raise ValueError(f"Path traversal not allowed: {path}")
+
+        real_path = os.path.realpath(normalized)
+        if self._path_trie.contains(real_path):
+            return real_path
+        raise PermissionError(f"Path not in allowed directories: {path}")
+
+    # ------------------------------------------------------------------
+    # 命令
+    # ------------------------------------------------------------------
+
+    def check_command(self, cmd: str) -> bool:
+        """
+        验证命令是否在白名单中
+
+        Raises:
+            PermissionError: 命令不在白名单中
+            ValueError: 包含危险模式或不允许的参数
+        """
+        hit, _ = self._command_cache.lookup(cmd)
+        if hit:
+            return True
+        try:
+            self._check_command(cmd)
+        except (PermissionError, ValueError) as e:
+            self._command_cache.store(cmd, error=e)
+            raise
+        self._command_cache.store(cmd, True)
+        return True
+
+    def _check_command(self, cmd: str):
+        cmd_lower = cmd.lower()
+        if self._blocked_re is not None and self._blocked_re.search(cmd_lower):
+            # 报告列表中第一个命中的模式（与逐个检查时一致）
+            for pattern in self.blocked_patterns:
+                if pattern and pattern.lower() in cmd_lower:
+                    raise ValueError(f"Blocked command pattern: {pattern}")
+
+        parts = cmd.split()
+        if not parts:
+            raise ValueError("Empty command")
+
+        base_cmd = parts[0]
+        allowed_args = self.allowed_commands.get(base_cmd)
+        if allowed_args is None:
+            raise PermissionError(f"Command not allowed: {base_cmd}")
+
+        if allowed_args:
+            for arg in parts[1:]:
+                if (arg.startswith("-") or arg.startswith("/")) and arg not in allowed_args:
+                    raise ValueError(f"Invalid argument for {base_cmd}: {arg}")
+
+    # ------------------------------------------------------------------
+    # Python代码
+    # ------------------------------------------------------------------
+
+    def check_python_code(self, code: str) -> bool:
+        """
+        验证Python代码是否包含危险函数
+
+        Raises:
+            ValueError: 代码包含危险函数或危险导入模式
+        """
+        key = hashlib.blake2b(code.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        hit, _ = self._python_cache.lookup(key)
+        if hit:
+            return True
+        try:
+            self._check_python_code(code)
+        except ValueError as e:
+            self._python_cache.store(key, error=e)
+            raise
+        self._python_cache.store(key, True)
+        return True
+
+    def _check_python_code(self, code: str):
+        code_lower = code.lower()
+        try:
+            tree = ast.parse(code)
+        except (SyntaxError, ValueError):
+            # 无法解析（执行时同样会失败）：按子串检查
+            for func in self.blocked_python_functions:
+                if f"{func}(" in code_lower:
+                    raise ValueError(f"Python function not allowed: {func}")
+        else:
+            name = find_blocked_python_call(tree, self.blocked_python_functions)
+            if name is not None:
+                raise ValueError(f"Python function not allowed: {name}")
+
+        # 检查其他危险模式
+        if "__" in code and "import" in code_lower:
+            raise ValueError("Dangerous import pattern detected")
+
+    # ------------------------------------------------------------------
+
+    def clear_cache(self):
+        """清空判定缓存（如允许目录下的符号链接发生变化）"""
+        self._path_cache.clear()
+        self._command_cache.clear()
+        self._python_cache.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "path": self._path_cache.get_stats(),
+            "command": self._command_cache.get_stats(),
+            "python": self._python_cache.get_stats(),
+        }
+
+
+def load_policy_file(path: str) -> Dict[str, Any]:
+    """
+    读取安全策略配置文件（JSON或YAML）
+
+    支持的键：allowed_paths、allowed_commands、blocked_patterns、
+    blocked_python_functions、path_cache_ttl（缺省的键保持当前值）。
+    YAML文件中也可以把这些键放在security节下（与config.yaml共用）。
+    """
+    file_path = Path(path)
+    with open(file_path, "r", encoding="utf-8") as f:
+        if file_path.suffix.lower() in (".yaml", ".yml"):
+            import yaml
+            config = yaml.safe_load(f) or {}
+        else:
+            config = json.load(f)
+    if not isinstance(config, dict):
+        raise ValueError(f"Invalid security policy file: {path}")
+    return config.get("security", config)
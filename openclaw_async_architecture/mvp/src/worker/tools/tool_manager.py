@@ -5,11 +5,18 @@
 Phase 2优化：
 - 集成工具结果缓存
 - 连接池优化
+- 文件系统工具的缓存键附加新鲜度标记（文件变化即失效）
+- 批量并发调用（去重 + 按工具限流 + 全局并发预算）
+- 单次输入校验（每个工具缓存编译好的校验器）+ 单次输出序列化（缓存和审计共用）
 """
 
-from typing import Dict, List, Optional, Any
+import asyncio
+import json
+import time
+from typing import Callable, Dict, List, Optional, Any, Tuple
 from .base_tool import BaseTool, ToolInput, ToolOutput
 from .security import SecurityChecker
+from .file_freshness import FileCacheWatcher, freshness_token
 from ...common.tool_cache import tool_cache
 
 
@@ -31,6 +38,8 @@ class ToolManager:
 
     def __init__(self):
         self._tools: Dict[str, BaseTool] = {}
+        # 工具名称 -> (额外的validate_input或None, 编译好的schema校验器)
+        self._validators: Dict[str, Tuple[Optional[Callable[[Dict[str, Any]], bool]], Callable[[Any], ToolInput]]] = {}
         self._whitelist: List[str] = []
         self._sandbox_enabled = True
 
@@ -38,8 +47,28 @@ class ToolManager:
         self._cache_enabled = True
         self._readonly_tools = {
             "read_file",
-            "list_directory"
         }  # 只读工具（更激进的缓存）
+        # 不缓存的工具：list_directory返回每个文件的大小/修改时间，
+        # 而目录自身的stat标记在文件被原地修改时不变，缓存会返回旧值
+        self._uncached_tools = {
+            "list_directory",
+        }
+        self._negative_cache_ttl = 0  # 失败结果缓存时间（0=不缓存）
+        self._path_tools = {
+            "read_file",
+        }  # 参数path指向文件系统的工具（缓存键附加新鲜度标记）
+        self._content_hash = False  # 新鲜度标记是否包含内容哈希
+        self._file_watcher = FileCacheWatcher(tool_cache.delete)
+
+        # 批量调用并发控制
+        self._max_concurrency = 16  # 所有批量调用共享的全局并发预算
+        self._tool_concurrency: Dict[str, int] = {
+            "exec_command": 4,
+            "exec_python": 2,
+        }  # 单个工具的并发上限（未列出的工具只受全局预算限制）
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._global_semaphore: Optional[asyncio.Semaphore] = None
+        self._tool_semaphores: Dict[str, asyncio.Semaphore] = {}
 
     def register_tool(self, tool: BaseTool):
         """
@@ -49,6 +78,7 @@ class ToolManager:
             tool: BaseTool实例
         """
         self._tools[tool.name] = tool
+        self._validators[tool.name] = self._compile_validator(tool)
         print(f"[ToolManager] [OK] 工具注册: {tool.name}")
 
     def get_tool(self, tool_name: str) -> Optional[BaseTool]:
@@ -122,15 +152,191 @@ class ToolManager:
             # 否则拒绝
             pass
 
-        # === Phase 2: 缓存检查（只读工具优先查缓存） ===
+        # === 安全检查（先于新鲜度标记和缓存查找：未验证的路径不stat、不读取，缓存命中也要检查） ===
+        denied = await self._check_security(tool_name, input_data)
+        if denied is not None:
+            return denied
+
+        if tool_name in self._uncached_tools:
+            use_cache = False
+
+        # === Phase 2: 只读工具走两级缓存（合并并发未命中，提前刷新） ===
         if self._cache_enabled and use_cache and tool_name in self._readonly_tools:
-            cached_result = tool_cache.get_by_tool(tool_name, input_data)
-            if cached_result is not None:
-                # 返回缓存结果
-                print(f"[ToolManager] [缓存命中] {tool_name}")
-                return ToolOutput.model_validate(cached_result)
+            computed: List[ToolOutput] = []
+
+            async def compute() -> dict:
+                output, output_dict = await self._execute_tool(tool, tool_name, input_data)
+                computed.append(output)
+                return output_dict
+
+            # 文件系统工具：键中加入stat标记，文件变化后不会命中旧内容
+            cache_args = input_data
+            path = input_data.get("path") if tool_name in self._path_tools else None
+            if isinstance(path, str):
+                token = await freshness_token(path, self._content_hash)
+                cache_args = {**input_data, "__freshness__": token}
+
+            result, source = await tool_cache.get_or_compute(
+                tool_name,
+                cache_args,
+                compute,
+                ttl=3600,  # 只读工具1小时
+                negative_ttl=self._negative_cache_ttl,
+                is_failure=lambda r: not r.get("success")
+            )
+            if source != "compute":
+                print(f"[ToolManager] [缓存命中] {tool_name} ({source})")
+            if isinstance(path, str):
+                self._file_watcher.track(path, tool_cache.make_key(tool_name, cache_args))
+            if computed:
+                # 本次调用自己执行的，直接返回原对象
+                return computed[0]
+            return ToolOutput.model_validate(result)
+
+        output, output_dict = await self._execute_tool(tool, tool_name, input_data)
+
+        # === Phase 2: 写入缓存（成功结果） ===
+        if self._cache_enabled and use_cache and output.success:
+            ttl = 3600 if tool_name in self._readonly_tools else 600  # 只读工具1小时，其他10分钟
+            tool_cache.set_by_tool(tool_name, input_data, output_dict, ttl=ttl)
+
+        return output
+
+    async def call_tools_batch(
+        self,
+        calls: List[Tuple[str, Dict[str, Any]]],
+        use_cache: bool = True,
+        dedupe_all: bool = False
+    ) -> List[ToolOutput]:
+        """
+        批量并发调用工具
+
+        - 相同的（工具, 参数）只执行一次，结果复用（默认只对只读工具去重，
+          dedupe_all=True时对所有工具去重）
+        - 互不依赖的调用并发执行，受单工具并发上限和全局并发预算约束
+        - 结果按输入顺序返回，metadata["batch"]包含每个调用的耗时：
+          index、wait_ms（等待并发名额）、duration_ms（执行耗时）、deduplicated
+
+        Args:
+            calls: [(工具名称, 输入数据), ...]
+            use_cache: 是否使用缓存
+            dedupe_all: 是否对有副作用的工具也去重
+
+        Returns:
+            List[ToolOutput]: 与calls一一对应的输出结果
+        """
+        global_semaphore, tool_semaphores = self._batch_semaphores()
+
+        async def run_one(tool_name: str, input_data: Dict[str, Any]) -> Tuple[ToolOutput, float, float]:
+            queued = time.perf_counter()
+            limit = self._tool_concurrency.get(tool_name)
+            tool_semaphore = None
+            if limit:
+                tool_semaphore = tool_semaphores.get(tool_name)
+                if tool_semaphore is None:
+                    tool_semaphore = tool_semaphores[tool_name] = asyncio.Semaphore(limit)
+                await tool_semaphore.acquire()
+            try:
+                # 先占工具名额再占全局名额，避免等待工具名额时占着全局名额
+                async with global_semaphore:
+                    started = time.perf_counter()
+                    try:
+                        output = await self.call_tool(tool_name, input_data, use_cache=use_cache)
+                    except Exception as e:
+                        output = ToolOutput(
+                            success=False,
+                            error=f"工具执行失败: {str(e)}",
+                            metadata={"tool_name": tool_name, "input_data": input_data}
+                        )
+                    finished = time.perf_counter()
+            finally:
+                if tool_semaphore is not None:
+                    tool_semaphore.release()
+            return output, (started - queued) * 1000, (finished - started) * 1000
+
+        # 去重：相同调用共享同一个任务
+        tasks: Dict[Any, asyncio.Task] = {}
+        plan: List[Tuple[Any, bool]] = []  # (任务键, 是否为重复调用)
+        for index, (tool_name, input_data) in enumerate(calls):
+            if dedupe_all or tool_name in self._readonly_tools:
+                key = (tool_name, json.dumps(input_data, sort_keys=True, default=str))
+            else:
+                key = index
+            duplicate = key in tasks
+            if not duplicate:
+                tasks[key] = asyncio.ensure_future(run_one(tool_name, input_data))
+            plan.append((key, duplicate))
+
+        await asyncio.gather(*tasks.values())
+
+        results = []
+        for index, (key, duplicate) in enumerate(plan):
+            output, wait_ms, duration_ms = tasks[key].result()
+            metadata = dict(output.metadata or {})
+            metadata["batch"] = {
+                "index": index,
+                "wait_ms": round(wait_ms, 3),
+                "duration_ms": round(duration_ms, 3),
+                "deduplicated": duplicate,
+            }
+            results.append(output.model_copy(update={"metadata": metadata}))
+        return results
+
+    def _batch_semaphores(self) -> Tuple[asyncio.Semaphore, Dict[str, asyncio.Semaphore]]:
+        """当前事件循环的并发信号量（换了事件循环则重建）"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore_loop = loop
+            self._global_semaphore = asyncio.Semaphore(self._max_concurrency)
+            self._tool_semaphores = {}
+        return self._global_semaphore, self._tool_semaphores
+
+    def set_max_concurrency(self, limit: int):
+        """
+        设置批量调用的全局并发预算
+
+        Args:
+            limit: 同时执行的工具调用上限
+        """
+        self._max_concurrency = limit
+        self._semaphore_loop = None  # 下次批量调用时按新上限重建
+        print(f"[ToolManager] [批量] 全局并发上限: {limit}")
 
-        # === 安全检查 ===
+    def set_tool_concurrency(self, tool_name: str, limit: Optional[int]):
+        """
+        设置单个工具在批量调用中的并发上限
+
+        Args:
+            tool_name: 工具名称
+            limit: 并发上限（None或0表示只受全局预算限制）
+        """
+        if limit:
+            self._tool_concurrency[tool_name] = limit
+        else:
+            self._tool_concurrency.pop(tool_name, None)
+        self._semaphore_loop = None
+        print(f"[ToolManager] [批量] {tool_name} 并发上限: {limit or '不限'}")
+
+    @staticmethod
+    def _compile_validator(tool: BaseTool):
+        """
+        为工具生成校验器：schema的pydantic-core校验器 + 工具覆盖了的validate_input
+
+        未覆盖validate_input的工具只做一次schema校验
+        """
+        extra_check = None
+        if type(tool).validate_input is not BaseTool.validate_input:
+            extra_check = tool.validate_input
+        return extra_check, tool.input_schema.__pydantic_validator__.validate_python
+
+    @staticmethod
+    async def _check_security(tool_name: str, input_data: Dict[str, Any]) -> Optional[ToolOutput]:
+        """
+        安全检查
+
+        Returns:
+            检查失败时的ToolOutput，通过时返回None
+        """
         try:
             await SecurityChecker.pre_tool_call(tool_name, input_data)
         except (ValueError, PermissionError) as e:
@@ -142,44 +348,51 @@ class ToolManager:
                     "security_error": str(e)
                 }
             )
+        return None
 
-        # 验证输入
-        if not tool.validate_input(input_data):
-            return ToolOutput(
+    async def _execute_tool(
+        self,
+        tool: BaseTool,
+        tool_name: str,
+        input_data: Dict[str, Any]
+    ) -> Tuple[ToolOutput, Dict[str, Any]]:
+        """
+        输入验证并执行工具（不经过缓存；安全检查已在call_tool中完成）
+
+        Args:
+            tool: 工具实例
+            tool_name: 工具名称
+            input_data: 输入数据（字典格式）
+
+        Returns:
+            (ToolOutput, 序列化后的字典)：字典只生成一次，供审计和缓存共用
+        """
+        # 验证输入并转换为ToolInput对象（一次校验）
+        extra_check, validate = self._validators.get(tool_name) or self._compile_validator(tool)
+
+        if extra_check is not None and not extra_check(input_data):
+            output = ToolOutput(
                 success=False,
                 error=f"输入数据无效: {input_data}",
                 metadata={"tool_name": tool_name, "input_data": input_data}
             )
+            return output, output.model_dump()
 
-        # 转换输入数据为ToolInput对象
         try:
-            typed_input = tool.input_schema(**input_data)
+            typed_input = validate(input_data)
         except Exception as e:
-            return ToolOutput(
+            output = ToolOutput(
                 success=False,
                 error=f"输入数据格式错误: {str(e)}",
                 metadata={"tool_name": tool_name, "input_data": input_data}
             )
+            return output, output.model_dump()
 
         # 执行工具
         try:
             output = await tool.execute(typed_input)
-
-            # === Phase 2: 写入缓存（成功结果） ===
-            if self._cache_enabled and output.success:
-                ttl = 3600 if tool_name in self._readonly_tools else 600  # 只读工具1小时，其他10分钟
-                tool_cache.set_by_tool(tool_name, input_data, output.dict(), ttl=ttl)
-
-            # === 审计日志（成功） ===
-            await SecurityChecker.post_tool_call(
-                tool_name,
-                input_data,
-                output.dict()
-            )
-
-            return output
         except Exception as e:
-            error_output = ToolOutput(
+            output = ToolOutput(
                 success=False,
                 error=f"工具执行失败: {str(e)}",
                 metadata={
@@ -188,14 +401,11 @@ class ToolManager:
                 }
             )
 
-            # === 审计日志（失败） ===
-            await SecurityChecker.post_tool_call(
-                tool_name,
-                input_data,
-                error_output.dict()
-            )
+        # === 审计日志（成功/失败） ===
+        output_dict = output.model_dump()
+        await SecurityChecker.post_tool_call(tool_name, input_data, output_dict)
 
-            return error_output
+        return output, output_dict
 
     def set_whitelist(self, whitelist: List[str]):
         """
@@ -235,6 +445,47 @@ class ToolManager:
         status = "启用" if enabled else "禁用"
         print(f"[ToolManager] [缓存] 已{status}")
 
+    def enable_negative_cache(self, ttl: int = 30):
+        """
+        启用/禁用只读工具的失败结果缓存（负缓存）
+
+        Args:
+            ttl: 失败结果缓存时间（秒），0表示禁用
+        """
+        self._negative_cache_ttl = ttl
+        status = f"启用（{ttl}秒）" if ttl > 0 else "禁用"
+        print(f"[ToolManager] [负缓存] 已{status}")
+
+    def enable_content_hash(self, enabled: bool = True):
+        """
+        文件系统工具的新鲜度标记是否包含内容哈希
+
+        stat标记（mtime_ns + size + inode）足以覆盖常规修改；
+        mtime精度不足或文件被还原mtime时开启内容哈希（每次查找需读一遍文件）。
+
+        Args:
+            enabled: 是否启用
+        """
+        self._content_hash = enabled
+        status = "启用" if enabled else "禁用"
+        print(f"[ToolManager] [缓存] 内容哈希已{status}")
+
+    def enable_file_watcher(self, paths: List[str]) -> bool:
+        """
+        监视目录，文件变化时主动删除相关缓存（需要watchdog）
+
+        Args:
+            paths: 需要监视的目录
+
+        Returns:
+            是否启动成功
+        """
+        return self._file_watcher.start(paths)
+
+    def disable_file_watcher(self):
+        """停止目录监视"""
+        self._file_watcher.stop()
+
     def clear_cache(self, tool_name: Optional[str] = None):
         """
         清空缓存
@@ -256,12 +507,16 @@ class ToolManager:
         Returns:
             dict: 缓存统计信息
         """
-        return tool_cache.get_stats()
+        stats = tool_cache.get_stats()
+        stats["file_watcher"] = self._file_watcher.get_stats()
+        return stats
 
     def invalidate_cache_pattern(self, pattern: str) -> int:
         """
         根据模式使缓存失效
 
+        "工具名:*"走工具索引（不扫描Redis键空间），工具名含通配符时退回SCAN。
+
         Args:
             pattern: 匹配模式（如 "read_file:*"）
 
@@ -142,11 +142,11 @@ class ToolManager:
 
         # 定义工具函数
         async def tool_func():
-            # 通过砂箱运行时执行
+            # 通过砂箱运行时执行（使用中间件修改后的参数）
             result = await self.sandbox_runtime.execute_tool(
                 tool,
                 tool_name,
-                parameters,
+                ctx.parameters,
                 skip_validation=True  # 已在 pre_process 中验证
             )
             return result
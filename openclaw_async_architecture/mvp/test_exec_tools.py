@@ -0,0 +1,262 @@
+# test_exec_tools.py
+"""
+Unit Tests for Exec Tools
+=========================
+
+Tests for streaming command execution with bounded output, for the
+background job manager and for the Python sandbox pool.
+"""
+import os
+import sys
+import tempfile
+import time
+import unittest
+import asyncio
+from pathlib import Path
+
+# 确保内置queue模块在sys.modules中（避免与项目queue包冲突）
+import queue as builtin_queue
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from src.tools import exec_jobs
+from src.tools.exec_jobs import JobManager
+from src.tools.exec_self import CappedOutput, ExecTool, execute
+from src.worker.tools.code_executor import ExecPythonInput, ExecPythonTool
+from src.worker.tools.command_executor import ExecCommandInput, ExecCommandTool
+from src.worker.tools.python_sandbox import SandboxError, SandboxPool, SandboxTimeout
+
+
+@unittest.skipIf(os.name == "nt", "POSIX shell commands")
+class TestExecStream(unittest.TestCase):
+    """Test streaming execution"""
+
+    def test_lines_streamed_in_order(self):
+        """stdout/stderr lines are yielded as they arrive"""
+        async def run():
+            stream = ExecTool().stream("echo one; echo two >&2; echo three; exit 3")
+            items = [item async for item in stream]
+            return stream, items
+
+        stream, items = asyncio.run(run())
+        self.assertEqual([line for name, line in items if name == "stdout"], ["one\n", "three\n"])
+        self.assertEqual([line for name, line in items if name == "stderr"], ["two\n"])
+        self.assertEqual(stream.exit_code, 3)
+        self.assertFalse(stream.truncated)
+
+    def test_output_capped(self):
+        """Result keeps the head and the last lines, the middle is counted"""
+        tool = ExecTool(max_output_bytes=100, tail_lines=2)
+        exit_code, stdout, _ = asyncio.run(tool.execute("seq 1 1000"))
+
+        self.assertEqual(exit_code, 0)
+        self.assertTrue(stdout.startswith("1\n2\n"))
+        self.assertTrue(stdout.endswith("999\n1000\n"))
+        self.assertIn("已省略", stdout)
+        self.assertLess(len(stdout), 200)
+
+    def test_long_line_split(self):
+        """A single huge line cannot grow the buffer past its cap"""
+        output = CappedOutput(max_bytes=1000, tail_lines=100)
+        for _ in range(50):
+            output.add("x" * 100, 100)
+        self.assertLessEqual(len(output.text()) - len("\n... [已省略 3000 字节] ...\n"), 2000)
+        self.assertEqual(output.omitted_bytes, 3000)
+
+    def test_timeout_kills_process_group(self):
+        """Timeout kills the shell and its children"""
+        start = time.perf_counter()
+        exit_code, _, stderr = asyncio.run(execute("sleep 5 & sleep 5", timeout=1))
+        self.assertEqual(exit_code, -1)
+        self.assertIn("超时", stderr)
+        self.assertLess(time.perf_counter() - start, 3)
+
+    def test_timeout_with_chatty_command(self):
+        """A command that never stops printing still times out when the consumer awaits per line"""
+        async def run():
+            stream = ExecTool().stream("yes", timeout=1)
+            lines = 0
+            async for _ in stream:
+                lines += 1
+                await asyncio.sleep(0)
+            return stream, lines
+
+        start = time.perf_counter()
+        stream, lines = asyncio.run(run())
+        self.assertTrue(stream.timed_out)
+        self.assertEqual(stream.exit_code, -1)
+        self.assertGreater(lines, 0)
+        self.assertLess(time.perf_counter() - start, 3)
+
+    def test_exec_command_stream_checks_policy(self):
+        """ExecCommandTool.stream applies the same command whitelist as execute"""
+        tool = ExecCommandTool()
+        with self.assertRaises(PermissionError):
+            tool.stream(ExecCommandInput(command="python -c 'print(1)'"))
+        with self.assertRaises(ValueError):
+            tool.stream(ExecCommandInput(command="echo ok; rm -rf /"))
+
+        output = asyncio.run(tool.execute(ExecCommandInput(command="python -c 'print(1)'")))
+        self.assertIn("命令安全检查失败", output.error)
+
+    def test_early_exit_kills(self):
+        """Leaving the loop early terminates the command"""
+        async def run():
+            stream = ExecTool().stream("while true; do echo y; done")
+            async for _ in stream:
+                break
+            return stream
+
+        stream = asyncio.run(run())
+        self.assertIsNone(stream.exit_code)
+
+
+@unittest.skipIf(os.name == "nt", "POSIX shell commands")
+class TestJobManager(unittest.TestCase):
+    """Test managed background jobs"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.jobs = JobManager(output_dir=self.tmpdir.name, poll_interval=0.05)
+
+    def tearDown(self):
+        self.jobs.shutdown()
+        self.tmpdir.cleanup()
+
+    def test_output_and_exit_code(self):
+        """Output is captured to the job log and the exit code is collected"""
+        job = self.jobs.start("echo hello; echo oops >&2; exit 4")
+        self.assertEqual(self.jobs.wait(job.job_id, timeout=5), 4)
+
+        status = self.jobs.status(job.job_id)
+        self.assertEqual(status["status"], exec_jobs.EXITED)
+        self.assertEqual(self.jobs.read_output(job.job_id), "hello\noops\n")
+
+    def test_log_rotation(self):
+        """Logs rotate at max_log_bytes and keep log_backups old files"""
+        jobs = JobManager(output_dir=self.tmpdir.name, max_log_bytes=1000, log_backups=2)
+        job = jobs.start("seq 1 2000")
+        jobs.wait(job.job_id, timeout=5)
+
+        status = jobs.status(job.job_id)
+        self.assertEqual(len(status["log_files"]), 3)
+        self.assertTrue(all(os.path.getsize(p) <= 1000 for p in status["log_files"]))
+        self.assertEqual(status["output_bytes"], len("".join(f"{i}\n" for i in range(1, 2001))))
+        self.assertTrue(jobs.read_output(job.job_id, max_bytes=10).endswith("1999\n2000\n"))
+
+    def test_timeout_and_kill(self):
+        """Timed-out and killed jobs take their process group down"""
+        slow = self.jobs.start("sleep 5 & sleep 5", timeout=0.2)
+        manual = self.jobs.start("sleep 5")
+        self.assertTrue(self.jobs.kill(manual.job_id))
+        self.assertFalse(self.jobs.kill("missing"))
+
+        self.assertIsNotNone(self.jobs.wait(slow.job_id, timeout=3))
+        self.assertIsNotNone(self.jobs.wait(manual.job_id, timeout=3))
+        self.assertEqual(self.jobs.status(slow.job_id)["status"], exec_jobs.TIMEOUT)
+        self.assertEqual(self.jobs.status(manual.job_id)["status"], exec_jobs.KILLED)
+
+    def test_bounded(self):
+        """Running jobs are capped and only recent finished jobs are kept"""
+        jobs = JobManager(output_dir=self.tmpdir.name, max_running=2, max_finished=1)
+        first = jobs.start("true")
+        jobs.wait(first.job_id, timeout=5)
+        running = [jobs.start("sleep 5") for _ in range(2)]
+        with self.assertRaises(RuntimeError):
+            jobs.start("sleep 5")
+
+        jobs.shutdown()
+        self.assertEqual(len(jobs.list_jobs()), 1)
+        self.assertIsNone(jobs.get(first.job_id))
+        self.assertFalse(os.path.exists(first.log_path))
+
+    def test_exec_tool_background(self):
+        """ExecTool background mode registers a job and reports its ID"""
+        tool = ExecTool(job_manager=self.jobs)
+        exit_code, stdout, _ = asyncio.run(tool.execute("echo bg", background=True))
+        self.assertEqual(exit_code, 0)
+
+        job_id = stdout.split("任务ID: ")[1].split(",")[0]
+        self.assertEqual(self.jobs.wait(job_id, timeout=5), 0)
+        self.assertEqual(tool.jobs.read_output(job_id), "bg\n")
+
+
+@unittest.skipIf(os.name == "nt", "POSIX resource limits")
+class TestSandboxPool(unittest.TestCase):
+    """Test process-isolated Python execution"""
+
+    def setUp(self):
+        self.pool = SandboxPool(size=2, max_runs=3)
+        self.pool.start()
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def run_code(self, code, timeout=5, pool=None):
+        return asyncio.run((pool or self.pool).run(code, timeout))
+
+    def test_concurrent_output_isolated(self):
+        """Concurrent calls capture only their own output"""
+        async def run():
+            return await asyncio.gather(*[
+                self.pool.run(f"import time\nfor _ in range(3):\n    print({i}); time.sleep(0.05)", 5)
+                for i in range(4)
+            ])
+
+        results = asyncio.run(run())
+        self.assertEqual([r["stdout"] for r in results], [f"{i}\n" * 3 for i in range(4)])
+        self.assertEqual(len({r["pid"] for r in results}), 4)
+
+    def test_errors_reported(self):
+        """Exceptions come back with a traceback; fd 1 writes cannot break the protocol"""
+        result = self.run_code("import os\nos.write(1, b'junk')\nprint('before')\nraise ValueError('bad')")
+        self.assertFalse(result["ok"])
+        self.assertEqual(result["exception"], "ValueError")
+        self.assertIn("ValueError: bad", result["traceback"])
+        self.assertEqual(result["stdout"], "before\n")
+
+    def test_timeout_kills_sandbox(self):
+        """A runaway call is killed at the deadline and the pool recovers"""
+        start = time.perf_counter()
+        with self.assertRaises(SandboxTimeout):
+            self.run_code("while True:\n    pass", timeout=0.5)
+        self.assertLess(time.perf_counter() - start, 2)
+        self.assertEqual(self.run_code("print('ok')")["stdout"], "ok\n")
+
+    def test_resource_limits(self):
+        """Memory and CPU limits are enforced inside the sandbox"""
+        self.assertEqual(self.run_code("x = bytearray(4 * 1024 ** 3)")["exception"], "MemoryError")
+
+        pool = SandboxPool(size=1, cpu_seconds=1)
+        try:
+            with self.assertRaises(SandboxError):
+                self.run_code("while True:\n    pass", timeout=10, pool=pool)
+        finally:
+            pool.shutdown()
+
+    def test_recycled_after_max_runs(self):
+        """Sandboxes are replaced after max_runs calls"""
+        pids = [self.run_code("import os\nprint(os.getpid())")["stdout"] for _ in range(4)]
+        self.assertEqual(len(set(pids)), 2)
+        self.assertGreaterEqual(self.pool.get_stats()["recycled"], 1)
+
+    def test_exec_python_tool(self):
+        """ExecPythonTool keeps its output format on top of the pool"""
+        tool = ExecPythonTool(pool=self.pool)
+        ok = asyncio.run(tool.execute(ExecPythonInput(code="import json\nprint(json.dumps([1]))")))
+        self.assertTrue(ok.success)
+        self.assertEqual(ok.data["stdout"], "[1]\n")
+
+        failed = asyncio.run(tool.execute(ExecPythonInput(code="1 / 0")))
+        self.assertFalse(failed.success)
+        self.assertIn("代码执行失败", failed.error)
+        self.assertEqual(failed.metadata["exception"], "ZeroDivisionError")
+
+        timed_out = asyncio.run(tool.execute(ExecPythonInput(code="while True:\n    pass", timeout=1)))
+        self.assertIn("代码执行超时", timed_out.error)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,277 @@
+# test_file_tools.py
+"""
+Unit Tests for File Tools
+=========================
+
+Tests for range reads backed by the persisted line index, encoding and
+binary detection, the read_file tool on top of them, and the scandir-based
+listing/glob/grep tools.
+"""
+import os
+import re
+import sys
+import tempfile
+import unittest
+import asyncio
+from pathlib import Path
+
+# 确保内置queue模块在sys.modules中（避免与项目queue包冲突）
+import queue as builtin_queue
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from src.worker.tools import file_reader
+from src.worker.tools.file_reader import LineIndexStore, detect_encoding, iter_chunks, read_lines, read_range
+from src.worker.tools import file_search
+from src.worker.tools.filesystem_tools import (
+    GlobTool, GlobInput, GrepTool, GrepInput, ListDirectoryInput, ListDirectoryTool, ReadFileInput, ReadFileTool
+)
+
+
+def line(i: int) -> str:
+    return f"line {i} " + "x" * (i % 37) + "\n"
+
+
+class TestRangeReads(unittest.TestCase):
+    """Test byte/line range reads"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.tmpdir.name, "big.log")
+        # 大于INDEX_MIN_BYTES：走索引 + mmap
+        cls.lines = [line(i) for i in range(1, 60001)]
+        with open(cls.path, "w", encoding="utf-8") as f:
+            f.writelines(cls.lines)
+        assert os.path.getsize(cls.path) > file_reader.INDEX_MIN_BYTES
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmpdir.cleanup()
+
+    def setUp(self):
+        self.store = LineIndexStore(index_dir=os.path.join(self.tmpdir.name, "index"))
+
+    def test_line_ranges(self):
+        """Any line range matches a plain readlines() slice"""
+        for start, limit in [(0, 5), (12345, 3), (59998, 10), (60000, 1), (30000, None)]:
+            data, info = read_lines(self.path, start, limit, store=self.store)
+            expected = "".join(self.lines[start:start + limit if limit else None])
+            self.assertEqual(data.decode(), expected)
+            self.assertEqual(info["total_lines"], 60000)
+            self.assertEqual(info["read_lines"], len(self.lines[start:start + limit if limit else None]))
+
+    def test_index_built_once_and_persisted(self):
+        """The index is built once per file version and reloaded from disk"""
+        read_lines(self.path, 100, 1, store=self.store)
+        read_lines(self.path, 200, 1, store=self.store)
+        self.assertEqual(self.store.stats["built"], 1)
+
+        other = LineIndexStore(index_dir=self.store.index_dir)
+        data, _ = read_lines(self.path, 50000, 1, store=other)
+        self.assertEqual(data.decode(), self.lines[50000])
+        self.assertEqual(other.stats, {"built": 0, "loaded": 1, "hits": 0})
+
+    def test_max_bytes_cuts_at_line_boundary(self):
+        """Capped reads end on a line boundary and report truncation"""
+        data, info = read_lines(self.path, 0, None, max_bytes=1000, store=self.store)
+        self.assertTrue(info["truncated"])
+        self.assertLessEqual(len(data), 1000)
+        self.assertTrue(data.endswith(b"\n"))
+        self.assertEqual(data.decode(), "".join(self.lines[:info["read_lines"]]))
+
+    def test_byte_range_and_chunks(self):
+        """Byte ranges and chunk iteration return exact bytes"""
+        with open(self.path, "rb") as f:
+            raw = f.read()
+        self.assertEqual(read_range(self.path, 777, 100), raw[777:877])
+        self.assertEqual(read_range(self.path, len(raw) - 5, 100), raw[-5:])
+        chunks = list(iter_chunks(self.path, chunk_size=64 * 1024, start=10, end=200000))
+        self.assertEqual(b"".join(chunks), raw[10:200000])
+        self.assertTrue(all(len(c) <= 64 * 1024 for c in chunks))
+
+    def test_small_file_without_trailing_newline(self):
+        """Small files are read directly; a last line without newline counts"""
+        path = os.path.join(self.tmpdir.name, "small.txt")
+        with open(path, "wb") as f:
+            f.write(b"a\nb\nc")
+        data, info = read_lines(path, 1, 5, store=self.store)
+        self.assertEqual((data, info["total_lines"], info["read_lines"]), (b"b\nc", 3, 2))
+        self.assertEqual(self.store.stats["built"], 0)
+
+
+class TestEncodingDetection(unittest.TestCase):
+    """Test encoding and binary detection"""
+
+    def test_detect(self):
+        self.assertEqual(detect_encoding("héllo".encode("utf-8")), ("utf-8", False))
+        self.assertEqual(detect_encoding("中文测试".encode("gbk")), ("gb18030", False))
+        self.assertEqual(detect_encoding(b"\xef\xbb\xbfhi"), ("utf-8-sig", False))
+        self.assertEqual(detect_encoding(b"\x89PNG\r\n\x1a\n\x00\x00"), (None, True))
+        # 样本末尾被截断的多字节字符
+        self.assertEqual(detect_encoding("中文".encode("utf-8")[:-1]), ("utf-8", False))
+
+
+class TestReadFileTool(unittest.TestCase):
+    """Test read_file on top of the range readers"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.tool = ReadFileTool()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, name, data: bytes) -> str:
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def read(self, path, **kwargs):
+        return asyncio.run(self.tool.execute(ReadFileInput(path=path, **kwargs)))
+
+    def test_content_returned_as_data(self):
+        """Content comes back in data, with line metadata"""
+        path = self.write("a.txt", "一\n二\n三\n".encode("gbk"))
+        output = self.read(path, offset=2, limit=1)
+        self.assertTrue(output.success)
+        self.assertEqual(output.data, "二\n")
+        self.assertEqual(output.metadata["encoding"], "gb18030")
+        self.assertEqual(output.metadata["start_line"], 2)
+        self.assertEqual(output.metadata["total_lines"], 3)
+
+    def test_truncated_read_points_to_next(self):
+        """Oversized reads are capped and say where to continue"""
+        path = self.write("b.txt", b"".join(f"{i}\n".encode() for i in range(1000)))
+        output = self.read(path, max_bytes=100)
+        self.assertTrue(output.metadata["truncated"])
+        follow = self.read(path, offset=output.metadata["next_offset"], limit=1)
+        self.assertEqual(follow.data, f"{output.data.count(chr(10))}\n")
+
+        ranged = self.read(path, byte_offset=4, byte_length=4)
+        self.assertEqual(ranged.data, "2\n3\n")
+        self.assertEqual(ranged.metadata["next_byte_offset"], 8)
+
+    def test_page_through_long_line(self):
+        """A line longer than max_bytes is continued by byte offset, not skipped"""
+        line = "".join(str(i % 10) for i in range(100))
+        path = self.write("long.txt", f"{line}\nnext\n".encode())
+        output = self.read(path, max_bytes=10)
+        self.assertEqual(output.data, line[:10])
+        self.assertNotIn("next_offset", output.metadata)
+
+        pages = [output.data]
+        while "next_byte_offset" in output.metadata:
+            output = self.read(path, byte_offset=output.metadata["next_byte_offset"], max_bytes=10)
+            pages.append(output.data)
+        self.assertEqual("".join(pages), f"{line}\nnext\n")
+
+    def test_errors(self):
+        """Missing files, directories and binary files fail cleanly"""
+        self.assertIn("文件不存在", self.read(os.path.join(self.tmpdir.name, "none")).error)
+        self.assertIn("不是文件", self.read(self.tmpdir.name).error)
+        binary = self.read(self.write("c.bin", b"\x00\x01\x02" * 100))
+        self.assertFalse(binary.success)
+        self.assertTrue(binary.metadata["binary"])
+
+
+class TestFileSearch(unittest.TestCase):
+    """Test recursive listing, glob and grep"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = self.tmpdir.name
+        files = {
+            "a.py": "import os\nprint('hello')\n",
+            "b.txt": "Hello world\nbye\n",
+            "src/c.py": "x = 1\n# TODO: hello\n",
+            "src/pkg/d.py": "def hello():\n    return 1\n",
+            "src/pkg/e.bin": "hello",
+            ".git/config": "hello",
+            "node_modules/m/index.js": "hello",
+        }
+        for rel, text in files.items():
+            path = os.path.join(self.root, rel)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        with open(os.path.join(self.root, "src/pkg/e.bin"), "wb") as f:
+            f.write(b"\x00hello\x00")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def run_tool(self, tool, input_data):
+        return asyncio.run(tool.execute(input_data))
+
+    def test_list_directory(self):
+        """Flat listing keeps the old shape; recursive listing honours limits and ignores"""
+        output = self.run_tool(ListDirectoryTool(), ListDirectoryInput(path=self.root))
+        self.assertTrue(output.success)
+        self.assertEqual([e["name"] for e in output.data], [".git", "a.py", "b.txt", "node_modules", "src"])
+        a = output.data[1]
+        self.assertEqual((a["type"], a["size"]), ("file", len("import os\nprint('hello')\n")))
+
+        output = self.run_tool(ListDirectoryTool(), ListDirectoryInput(path=self.root, recursive=True))
+        self.assertEqual(
+            [e["path"] for e in output.data],
+            ["a.py", "b.txt", "src", "src/c.py", "src/pkg", "src/pkg/d.py", "src/pkg/e.bin"]
+        )
+        self.assertEqual(output.data[-1]["depth"], 3)
+
+        shallow = self.run_tool(ListDirectoryTool(), ListDirectoryInput(path=self.root, recursive=True, max_depth=2))
+        self.assertNotIn("src/pkg/d.py", [e["path"] for e in shallow.data])
+        capped = self.run_tool(ListDirectoryTool(), ListDirectoryInput(path=self.root, recursive=True, max_entries=3))
+        self.assertEqual((capped.metadata["count"], capped.metadata["truncated"]), (3, True))
+
+        missing = self.run_tool(ListDirectoryTool(), ListDirectoryInput(path=os.path.join(self.root, "none")))
+        self.assertIn("目录不存在", missing.error)
+
+    def test_glob(self):
+        """** spans directories, * does not"""
+        self.assertEqual(file_search.glob(self.root, "*.py")[0], ["a.py"])
+        self.assertEqual(file_search.glob(self.root, "**/*.py")[0], ["a.py", "src/c.py", "src/pkg/d.py"])
+        self.assertEqual(file_search.glob(self.root, "src/*/[de].*")[0], ["src/pkg/d.py", "src/pkg/e.bin"])
+        output = self.run_tool(GlobTool(), GlobInput(path=self.root, pattern="**/*.js", ignore=[]))
+        self.assertEqual(output.data, ["node_modules/m/index.js"])
+
+    def test_grep(self):
+        """Matches stream with line numbers; binaries and ignored dirs are skipped"""
+        output = self.run_tool(GrepTool(), GrepInput(path=self.root, pattern="hello"))
+        self.assertEqual(
+            [(m["path"], m["line"]) for m in output.data],
+            [("a.py", 2), ("src/c.py", 2), ("src/pkg/d.py", 1)]
+        )
+        self.assertEqual(output.data[1]["text"], "# TODO: hello")
+
+        output = self.run_tool(GrepTool(), GrepInput(path=self.root, pattern="^h", regex=True, ignore_case=True, glob="*.txt"))
+        self.assertEqual([(m["path"], m["line"]) for m in output.data], [("b.txt", 1)])
+
+        capped = self.run_tool(GrepTool(), GrepInput(path=self.root, pattern="hello", max_matches=2))
+        self.assertEqual((capped.metadata["count"], capped.metadata["truncated"]), (2, True))
+
+        invalid = self.run_tool(GrepTool(), GrepInput(path=self.root, pattern="(", regex=True))
+        self.assertIn("正则表达式错误", invalid.error)
+
+    @unittest.skipIf(os.name == "nt", "symlinks need privileges on Windows")
+    def test_grep_skips_symlinks(self):
+        """Symlinks inside the root cannot be used to read files outside it"""
+        with tempfile.TemporaryDirectory() as outside:
+            secret = os.path.join(outside, "secret.txt")
+            with open(secret, "w", encoding="utf-8") as f:
+                f.write("hello secret\n")
+            os.symlink(secret, os.path.join(self.root, "link.txt"))
+            os.symlink(outside, os.path.join(self.root, "linkdir"))
+
+            output = self.run_tool(GrepTool(), GrepInput(path=self.root, pattern="secret"))
+            self.assertTrue(output.success)
+            self.assertEqual(output.data, [])
+            self.assertEqual(file_search._search_file(os.path.join(self.root, "link.txt"),
+                                                      re.compile(b"secret"), 1024, 10), [])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -102,6 +102,26 @@ class TestToolManagerIntegration(unittest.TestCase):
         else:
             print("[Test] hello_world tool not available")
 
+    def test_middleware_modified_params_reach_tool(self):
+        """测试中间件在pre_process中修改的参数传给工具"""
+        from middleware import BaseMiddleware, MiddlewareResult
+
+        class RenameMiddleware(BaseMiddleware):
+            async def pre_process(self, ctx):
+                return MiddlewareResult(modified_params={"name": "Middleware"})
+
+        tool_manager = ToolManager(self.plugin_dir, self.config_dir, enable_hot_reload=False)
+        self.tool_manager = tool_manager
+        tool_manager.load_plugins()
+        tool_manager.middleware_chain.add_middleware(RenameMiddleware("rename", priority=50))
+
+        result = asyncio.run(tool_manager.execute_tool("hello_world", {"name": "Caller"}))
+
+        if result:
+            self.assertEqual(result, "Hello, Middleware!")
+        else:
+            print("[Test] hello_world tool not available")
+
     def test_execute_tool_read_file(self):
         """测试执行 read_file 工具（来自 filesystem_plugin）"""
         tool_manager = ToolManager(self.plugin_dir, self.config_dir, enable_hot_reload=False)
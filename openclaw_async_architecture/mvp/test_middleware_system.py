@@ -5,7 +5,11 @@ Unit Tests for Middleware System
 
 Tests for middleware chain and built-in middlewares.
 """
+import json
+import os
+import sqlite3
 import sys
+import tempfile
 import unittest
 import asyncio
 from pathlib import Path
@@ -25,8 +29,20 @@ from middleware import (
     MonitoringMiddleware,
     RateLimitMiddleware,
     CacheMiddleware,
+    CacheEngine,
     MiddlewareConfigLoader,
+    AsyncLogSink,
+    JsonlFileWriter,
+    SQLiteWriter,
+    MemoryRateLimiter,
+    RedisRateLimiter,
+    LogHistogram,
+    WindowedHistogram,
+    AuditStore,
+    query_audit,
+    record_audit,
 )
+from middleware import audit_store
 
 
 class TestExecutionContext(unittest.TestCase):
@@ -183,7 +199,7 @@ class TestMiddlewareChain(unittest.TestCase):
             self.chain.get_middleware("mw3"),
             self.chain.get_middleware("mw1"),
         ]
-        expected_list = self.chain._pre_process_middlewares
+        expected_list = self.chain._middlewares
         self.assertEqual(expected_list, middlewares)
 
     def test_execution_flow(self):
@@ -225,6 +241,29 @@ class TestMiddlewareChain(unittest.TestCase):
         self.assertIsNone(ctx.error)
         self.assertEqual(ctx.get_metadata("test"), "value")
 
+    def test_modified_params_reach_tool(self):
+        """Parameters rewritten in pre_process are what the tool receives"""
+        class DefaultsMiddleware(BaseMiddleware):
+            async def pre_process(self, ctx):
+                return MiddlewareResult(modified_params={"limit": 10, "path": "/safe"})
+
+        self.chain.add_middleware(DefaultsMiddleware("defaults"))
+        received = []
+        caller_params = {"path": "/raw"}
+
+        async def execute_test():
+            ctx = ExecutionContext("test_tool", caller_params)
+
+            async def tool_func():
+                received.append(ctx.parameters)
+                return "ok"
+
+            return await self.chain.execute(ctx, tool_func)
+
+        self.assertEqual(asyncio.run(execute_test()), "ok")
+        self.assertEqual(received, [{"path": "/safe", "limit": 10}])
+        self.assertEqual(caller_params, {"path": "/raw"})
+
 
 class TestLoggingMiddleware(unittest.TestCase):
     """Test logging middleware"""
@@ -263,6 +302,177 @@ class TestLoggingMiddleware(unittest.TestCase):
         self.assertEqual(sanitized["api_key"], "*****")
 
 
+class ListWriter:
+    """Collects batches; optionally blocks until released"""
+
+    def __init__(self, gate=None):
+        self.items = []
+        self.gate = gate
+
+    def write_batch(self, items):
+        if self.gate is not None:
+            self.gate.wait()
+        self.items.extend(items)
+
+    def close(self):
+        pass
+
+
+class TestAsyncLogSink(unittest.TestCase):
+    """Test non-blocking log sink"""
+
+    def test_logging_middleware_uses_sink(self):
+        """Records reach the writer from the background thread"""
+        writer = ListWriter()
+        sink = AsyncLogSink(writer)
+        chain = MiddlewareChain()
+        chain.add_middleware(LoggingMiddleware(sink=sink))
+
+        async def tool_func():
+            return "ok"
+
+        asyncio.run(chain.execute(ExecutionContext("test_tool", {"password": "x"}), tool_func))
+        self.assertTrue(sink.flush())
+
+        events = [record["event"] for _, _, record in writer.items]
+        self.assertEqual(events, ["tool_start", "tool_end"])
+        self.assertEqual(writer.items[0][2]["params"]["password"], "*****")
+        sink.close()
+
+    def test_bounded_queue_drops(self):
+        """A full buffer drops new records instead of blocking"""
+        import threading
+        gate = threading.Event()
+        sink = AsyncLogSink(ListWriter(gate), max_queue=10, batch_size=1)
+
+        accepted = sum(sink.emit("test", {"i": i}) for i in range(100))
+        self.assertLess(accepted, 100)
+        self.assertEqual(sink.get_stats()["dropped"], 100 - accepted)
+
+        gate.set()
+        self.assertTrue(sink.flush())
+        self.assertEqual(sink.get_stats()["written"], accepted)
+        sink.close()
+
+    def test_jsonl_rotation(self):
+        """JSONL writer rotates by size"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / "tools.jsonl")
+            sink = AsyncLogSink(JsonlFileWriter(path, max_bytes=2000, backup_count=2), batch_size=10)
+            for i in range(200):
+                sink.emit("logging", {"event": "tool_end", "i": i})
+            sink.close()
+
+            self.assertTrue(Path(path + ".1").exists())
+            self.assertFalse(Path(path + ".3").exists())
+            with open(path + ".1", encoding="utf-8") as f:
+                record = json.loads(f.readline())
+            self.assertEqual(record["source"], "logging")
+            self.assertIn("timestamp", record)
+
+    def test_sqlite_writer(self):
+        """SQLite writer stores queryable rows"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / "audit.db")
+            sink = AsyncLogSink(SQLiteWriter(path))
+            for i in range(5):
+                sink.emit("audit", {"event_type": "call", "tool_name": "read_file", "i": i})
+            sink.close()
+
+            conn = sqlite3.connect(path)
+            rows = conn.execute("SELECT source, event, data FROM logs").fetchall()
+            conn.close()
+            self.assertEqual(len(rows), 5)
+            self.assertEqual(rows[0][:2], ("audit", "call"))
+
+
+class TestAuditStore(unittest.TestCase):
+    """Test the partitioned audit store and the shared audit sink"""
+
+    DAY = 86400
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = str(Path(self.tmp.name) / "audit.db")
+        self.base = 1_700_000_000 // self.DAY * self.DAY
+
+    def write(self, store, rows):
+        store.write_batch([
+            (ts, source, {"event_type": outcome, "tool_name": tool, "user": user, "params": {"i": i}})
+            for i, (ts, source, outcome, tool, user) in enumerate(rows)
+        ])
+
+    def test_partitioned_query(self):
+        """Records land in per-day tables and filters span partitions"""
+        store = AuditStore(self.path, retention_days=None)
+        rows = []
+        for day in range(3):
+            for i in range(10):
+                ts = self.base + day * self.DAY + i
+                rows.append((ts, "audit", "error" if i % 5 == 0 else "success",
+                             "read_file" if i % 2 else "exec_command", f"u{i % 3}"))
+        self.write(store, rows)
+
+        self.assertEqual([p["name"] for p in store.partitions()],
+                         ["audit_20231114", "audit_20231115", "audit_20231116"])
+        self.assertEqual(store.count(), 30)
+        self.assertEqual(store.count(outcome="error"), 6)
+        self.assertEqual(store.count(tool="read_file", user="u1"), 6)
+
+        newest = store.query(limit=12)
+        self.assertEqual(len(newest), 12)
+        self.assertEqual(newest[0]["timestamp"], self.base + 2 * self.DAY + 9)
+        self.assertEqual([r["timestamp"] for r in newest], sorted((r["timestamp"] for r in newest), reverse=True))
+
+        day2 = store.query(start=self.base + self.DAY, end=self.base + 2 * self.DAY, newest_first=False, limit=None)
+        self.assertEqual(len(day2), 10)
+        self.assertEqual(day2[0]["params"], {"i": 10})
+        self.assertEqual(day2[0]["outcome"], "error")
+        store.close()
+
+    def test_retention_drops_partitions(self):
+        """Expired partitions are dropped whole"""
+        store = AuditStore(self.path, retention_days=None)
+        now = self.base + 10 * self.DAY
+        self.write(store, [(self.base + d * self.DAY, "audit", "call", "read_file", "u") for d in range(10)])
+        store.retention_days = 1
+        dropped = store.apply_retention(now=now)
+        self.assertEqual(len(dropped), 9)
+        self.assertEqual(store.count(), 1)
+        store.close()
+
+        conn = sqlite3.connect(self.path)
+        tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        conn.close()
+        self.assertEqual(tables, {"audit_partitions", "audit_20231123"})
+
+    def test_shared_sink(self):
+        """record_audit and the plugin runtime write to the same queryable store"""
+        from plugin_system.plugin_runtime import SandboxedRuntime
+
+        class FailingTool:
+            def execute(self, **kwargs):
+                raise RuntimeError("boom")
+
+        sink = AsyncLogSink(AuditStore(self.path))
+        audit_store.set_audit_sink(sink)
+        self.addCleanup(audit_store.set_audit_sink, None)
+        self.addCleanup(sink.close)
+
+        record_audit("denied", "exec_command", {"command": "rm -rf /", "api_key": "k"},
+                     error="Blocked command pattern: rm -rf", user="alice")
+        SandboxedRuntime().execute_tool(FailingTool(), "plugin_tool", {"x": 1}, skip_validation=True)
+
+        denied = query_audit(outcome="denied", user="alice")
+        self.assertEqual(len(denied), 1)
+        self.assertEqual(denied[0]["params"]["api_key"], "***HIDDEN***")
+        plugin = query_audit(source="plugin")
+        self.assertEqual((plugin[0]["tool"], plugin[0]["outcome"], plugin[0]["error"]),
+                         ("plugin_tool", "error", "boom"))
+        self.assertIsNotNone(plugin[0]["duration_ms"])
+
+
 class TestMonitoringMiddleware(unittest.TestCase):
     """Test monitoring middleware"""
 
@@ -313,6 +523,69 @@ class TestMonitoringMiddleware(unittest.TestCase):
 
         self.assertEqual(stats, {})
 
+    def test_percentiles_per_outcome(self):
+        """Test latency percentiles are tracked per tool and outcome"""
+        mw = MonitoringMiddleware()
+        chain = MiddlewareChain()
+        chain.add_middleware(mw)
+
+        async def ok():
+            return "result"
+
+        async def fail():
+            raise RuntimeError("boom")
+
+        async def execute_test():
+            for _ in range(3):
+                await chain.execute(ExecutionContext("test_tool", {}), ok)
+            with self.assertRaises(RuntimeError):
+                await chain.execute(ExecutionContext("test_tool", {}), fail)
+
+        asyncio.run(execute_test())
+
+        self.assertEqual(mw.get_percentiles("test_tool", "success")["count"], 3)
+        self.assertEqual(mw.get_percentiles("test_tool", "error")["count"], 1)
+        self.assertEqual(mw.get_percentiles("test_tool", "all", window="1h")["count"], 4)
+        self.assertEqual(mw.get_stats("test_tool")["error_count"], 1)
+
+        exported = mw.export()
+        self.assertIn("p999", exported["tools"]["test_tool"]["success"]["5m"])
+        self.assertIn('tool_latency_ms_count{tool="test_tool",outcome="error",window="1m"} 1',
+                      mw.export_prometheus())
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    """Test fixed-memory latency histograms"""
+
+    def test_quantile_accuracy(self):
+        """Test quantiles are within the relative accuracy"""
+        histogram = LogHistogram()
+        for i in range(1, 10001):
+            histogram.record(i / 10)  # 0.1ms .. 1000ms
+
+        p50, p99, p999 = histogram.quantiles((0.5, 0.99, 0.999))
+        self.assertAlmostEqual(p50, 500, delta=500 * 0.01 + 0.1)
+        self.assertAlmostEqual(p99, 990, delta=990 * 0.01 + 0.1)
+        self.assertAlmostEqual(p999, 999, delta=999 * 0.01 + 0.1)
+        self.assertLess(len(histogram.counts), 1000)
+
+    def test_window_rotation(self):
+        """Test old observations leave the window"""
+        now = [1000.0]
+        histogram = WindowedHistogram(clock=lambda: now[0])
+
+        histogram.record(5.0)
+        now[0] += 90
+        histogram.record(50.0)
+
+        self.assertEqual(histogram.summary("1m")["count"], 1)
+        self.assertEqual(histogram.summary("5m")["count"], 2)
+        self.assertEqual(histogram.summary()["count"], 2)
+
+        now[0] += 3600
+        self.assertEqual(histogram.summary("1h")["count"], 0)
+        self.assertEqual(histogram.summary("all")["count"], 2)
+
 
 class TestRateLimitMiddleware(unittest.TestCase):
     """Test rate limiting middleware"""
@@ -404,6 +677,99 @@ class TestRateLimitMiddleware(unittest.TestCase):
         self.assertFalse(limit_hit2)
         self.assertEqual(result3, "result")
 
+    def test_per_tool_limit(self):
+        """Per-tool limits apply on top of the user limit without consuming it"""
+        mw = RateLimitMiddleware(
+            max_requests=5, window_seconds=60,
+            tool_limits={"web_fetch": {"max_requests": 2}}
+        )
+        chain = MiddlewareChain()
+        chain.add_middleware(mw)
+
+        async def tool_func():
+            return "result"
+
+        async def call(tool_name):
+            ctx = ExecutionContext(tool_name, {}, user_id="alice")
+            return await chain.execute(ctx, tool_func), ctx
+
+        results = [asyncio.run(call("web_fetch"))[0] for _ in range(3)]
+        self.assertEqual(results, ["result", "result", None])
+
+        _, ctx = asyncio.run(call("web_fetch"))
+        self.assertIn("2 requests per 60 seconds", ctx.error)
+        self.assertGreater(ctx.get_metadata("retry_after"), 0)
+
+        # Denied web_fetch calls did not use the user budget
+        self.assertEqual(asyncio.run(mw.get_remaining_requests("alice")), 3)
+        self.assertEqual(asyncio.run(mw.get_remaining_requests("alice", "web_fetch")), 0)
+
+
+class TestMemoryRateLimiter(unittest.TestCase):
+    """Test GCRA limiter"""
+
+    def setUp(self):
+        self.now = 1000.0
+        self.limiter = MemoryRateLimiter(clock=lambda: self.now)
+
+    def test_burst_then_steady_rate(self):
+        """Full burst is allowed, then one request per interval"""
+        limit = [("u", 10, 10.0)]
+        allowed = sum(self.limiter.acquire_sync(limit).allowed for _ in range(20))
+        self.assertEqual(allowed, 10)
+
+        decision = self.limiter.acquire_sync(limit)
+        self.assertFalse(decision.allowed)
+        self.assertAlmostEqual(decision.retry_after, 1.0)
+
+        self.now += 1.0
+        self.assertTrue(self.limiter.acquire_sync(limit).allowed)
+        self.assertFalse(self.limiter.acquire_sync(limit).allowed)
+
+    def test_zero_limit_denies_everything(self):
+        """max_requests=0 denies every request instead of dividing by zero"""
+        decision = self.limiter.acquire_sync([("u", 5, 10.0), ("u:tool", 0, 10.0)])
+        self.assertFalse(decision.allowed)
+        self.assertEqual(decision.denied_key, "u:tool")
+        self.assertEqual(self.limiter.remaining_sync("u:tool", 0, 10.0), 0)
+        # Nothing was consumed from the other limit
+        self.assertEqual(self.limiter.remaining_sync("u", 5, 10.0), 5)
+
+    def test_idle_keys_evicted(self):
+        """Keys are forgotten once idle"""
+        for i in range(100):
+            self.limiter.acquire_sync([(f"user{i}", 10, 1.0)])
+        self.assertEqual(len(self.limiter), 100)
+
+        self.now += 2.0
+        for _ in range(10):
+            self.limiter.acquire_sync([("active", 10, 1.0)])
+        self.assertLessEqual(len(self.limiter), 1)
+
+
+@unittest.skipUnless(os.getenv("REDIS_URL"), "needs a Redis server (set REDIS_URL)")
+class TestRedisRateLimiter(unittest.TestCase):
+    """Test the shared GCRA limiter against a real Redis"""
+
+    def test_remaining_matches_consumption(self):
+        import redis.asyncio as aioredis
+
+        async def run():
+            client = aioredis.Redis.from_url(os.environ["REDIS_URL"])
+            limiter = RedisRateLimiter(client, prefix=f"test:ratelimit:{time()}:")
+            mw = RateLimitMiddleware(max_requests=5, window_seconds=60,
+                                     tool_limits={"web_fetch": {"max_requests": 0}}, limiter=limiter)
+            try:
+                before = await mw.get_remaining_requests("alice")
+                for _ in range(3):
+                    await limiter.acquire([("alice", 5, 60)])
+                return before, await mw.get_remaining_requests("alice"), \
+                    await mw.get_remaining_requests("alice", "web_fetch")
+            finally:
+                await client.aclose()
+
+        self.assertEqual(asyncio.run(run()), (5, 2, 0))
+
 
 class TestCacheMiddleware(unittest.TestCase):
     """Test cache middleware"""
@@ -512,6 +878,119 @@ class TestCacheMiddleware(unittest.TestCase):
         self.assertEqual(result2, "result_2")
 
 
+    def test_invalidate_tool(self):
+        """Test invalidating one tool leaves other tools cached"""
+        mw = CacheMiddleware(ttl=10)
+        chain = MiddlewareChain()
+        chain.add_middleware(mw)
+
+        async def tool_func():
+            return "result"
+
+        async def execute(tool_name):
+            ctx = ExecutionContext(tool_name, {"param": "value"})
+            return await chain.execute(ctx, tool_func)
+
+        asyncio.run(execute("tool_a"))
+        asyncio.run(execute("tool_b"))
+        self.assertEqual(mw.get_cache_size(), 2)
+
+        self.assertEqual(mw.invalidate("tool_a"), 1)
+        self.assertEqual(mw.get_cache_size(), 1)
+        self.assertEqual(mw.get_stats()["namespaces"], 1)
+
+    def test_bounded_size(self):
+        """Test cache never grows beyond max_entries"""
+        mw = CacheMiddleware(ttl=10, max_entries=3)
+        chain = MiddlewareChain()
+        chain.add_middleware(mw)
+
+        async def tool_func():
+            return "result"
+
+        async def execute_all():
+            for i in range(10):
+                ctx = ExecutionContext("test_tool", {"param": i})
+                await chain.execute(ctx, tool_func)
+
+        asyncio.run(execute_all())
+        self.assertEqual(mw.get_cache_size(), 3)
+        self.assertEqual(mw.get_stats()["evictions"], 7)
+
+
+class TestCacheEngine(unittest.TestCase):
+    """Test cache engine"""
+
+    def test_lru_eviction_order(self):
+        """Test least recently used entry is evicted"""
+        engine = CacheEngine(max_entries=2)
+        engine.set("t", "a", 1)
+        engine.set("t", "b", 2)
+        engine.get("t", "a")
+        engine.set("t", "c", 3)
+
+        self.assertEqual(engine.get("t", "a"), 1)
+        self.assertIsNone(engine.get("t", "b"))
+        self.assertEqual(engine.get("t", "c"), 3)
+
+    def test_max_bytes(self):
+        """Test byte bound evicts entries and rejects oversized values"""
+        engine = CacheEngine(max_entries=100, max_bytes=1000, sizeof=len)
+        for i in range(5):
+            engine.set("t", i, "x" * 300)
+
+        self.assertLessEqual(engine.bytes, 1000)
+        self.assertEqual(len(engine), 3)
+
+        engine.set("t", "big", "x" * 2000)
+        self.assertIsNone(engine.get("t", "big"))
+        self.assertEqual(engine.stats["rejections"], 1)
+
+    def test_sweep_expires_without_lookup(self):
+        """Test expiry heap removes entries that are never read again"""
+        now = [0.0]
+        engine = CacheEngine(default_ttl=10, clock=lambda: now[0])
+        engine.set("t", "short", 1, ttl=1)
+        engine.set("t", "long", 2)
+        engine.set("t", "short", 3, ttl=5)  # Overwrite leaves a stale heap item
+
+        now[0] = 2.0
+        self.assertEqual(engine.sweep(), 0)
+        now[0] = 6.0
+        self.assertEqual(engine.sweep(), 1)
+        self.assertEqual(len(engine), 1)
+
+    def test_tinylfu_keeps_frequent_entries(self):
+        """Test one-hit scan does not flush frequently used entries"""
+        engine = CacheEngine(max_entries=100, policy="tinylfu")
+        for i in range(50):
+            engine.set("t", f"hot{i}", i)
+        for _ in range(5):
+            for i in range(50):
+                engine.get("t", f"hot{i}")
+
+        # Scan of one-off keys
+        for i in range(1000):
+            engine.set("t", f"scan{i}", i)
+
+        hot_remaining = sum(1 for i in range(50) if engine.get("t", f"hot{i}") is not None)
+        self.assertGreaterEqual(hot_remaining, 45)
+        self.assertLessEqual(len(engine), 100)
+
+    def test_tinylfu_small_or_window_only_config(self):
+        """Tiny max_entries and window_ratio=1.0 still leave room for the main segment"""
+        for engine in (
+            CacheEngine(max_entries=1, policy="tinylfu"),
+            CacheEngine(max_entries=2, policy="tinylfu"),
+            CacheEngine(max_entries=100, policy="tinylfu", window_ratio=1.0),
+        ):
+            for i in range(150):
+                engine.set("t", f"k{i}", i)
+            self.assertEqual(len(engine), engine.max_entries)
+            self.assertEqual(engine.get("t", "k149"), 149)
+        self.assertEqual(CacheEngine(max_entries=1, policy="tinylfu").policy, "lru")
+
+
 class TestConfigLoader(unittest.TestCase):
     """Test config loader"""
 
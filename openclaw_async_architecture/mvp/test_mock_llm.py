@@ -0,0 +1,122 @@
+# test_mock_llm.py
+"""
+Unit Tests for Mock LLM Server
+==============================
+
+Tests for the OpenAI-compatible mock server used by offline load tests.
+"""
+import sys
+import json
+import math
+import unittest
+import asyncio
+from pathlib import Path
+
+# 确保内置queue模块在sys.modules中（避免与项目queue包冲突）
+import queue as builtin_queue
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root / "src"))
+
+import httpx
+
+from mock_llm.server import LatencyDistribution, MockLLMConfig, create_app
+
+
+def fast_config(**overrides) -> MockLLMConfig:
+    """Config with no artificial latency"""
+    config = MockLLMConfig(
+        ttft=LatencyDistribution(kind="fixed", mean=0.0),
+        tokens_per_second=0,
+        output_tokens=8,
+        seed=1,
+    )
+    for key, value in overrides.items():
+        setattr(config, key, value)
+    return config
+
+
+async def request(app, method: str, path: str, **kwargs) -> httpx.Response:
+    """Send a request to the app in-process"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://mock") as client:
+        return await client.request(method, path, **kwargs)
+
+
+CHAT = {"model": "m", "messages": [{"role": "user", "content": "hello"}]}
+
+
+class TestMockLLM(unittest.TestCase):
+    """Test mock endpoints"""
+
+    def test_chat_completion(self):
+        """Non-streaming chat returns OpenAI-shaped response"""
+        response = asyncio.run(request(create_app(fast_config()), "POST", "/v1/chat/completions", json=CHAT))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(data["choices"][0]["message"]["content"])
+        self.assertEqual(data["usage"]["completion_tokens"], 8)
+
+    def test_stream_matches_non_stream(self):
+        """SSE chunks reassemble to the deterministic reply"""
+        app = create_app(fast_config())
+        plain = asyncio.run(request(app, "POST", "/v1/chat/completions", json=CHAT)).json()
+        streamed = asyncio.run(request(app, "POST", "/v1/chat/completions", json={**CHAT, "stream": True}))
+
+        text = ""
+        lines = [line[6:] for line in streamed.text.splitlines() if line.startswith("data: ")]
+        self.assertEqual(lines[-1], "[DONE]")
+        for line in lines[:-1]:
+            text += json.loads(line)["choices"][0]["delta"].get("content", "")
+        self.assertEqual(text, plain["choices"][0]["message"]["content"])
+
+    def test_embeddings_deterministic(self):
+        """Same input yields the same unit vector"""
+        app = create_app(fast_config(embedding_dim=16))
+        body = {"model": "e", "input": ["a", "b", "a"]}
+        data = asyncio.run(request(app, "POST", "/v1/embeddings", json=body)).json()["data"]
+        self.assertEqual(data[0]["embedding"], data[2]["embedding"])
+        self.assertNotEqual(data[0]["embedding"], data[1]["embedding"])
+        self.assertAlmostEqual(math.sqrt(sum(v * v for v in data[0]["embedding"])), 1.0)
+
+    def test_injected_429(self):
+        """rate_limit_rate=1 always returns 429 with Retry-After"""
+        app = create_app(fast_config(rate_limit_rate=1.0))
+        response = asyncio.run(request(app, "POST", "/v1/chat/completions", json=CHAT))
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("retry-after", response.headers)
+
+    def test_rpm_limit(self):
+        """Requests beyond rpm_limit are rejected"""
+        app = create_app(fast_config(rpm_limit=2))
+
+        async def run():
+            return [
+                (await request(app, "POST", "/v1/chat/completions", json=CHAT)).status_code
+                for _ in range(3)
+            ]
+
+        self.assertEqual(asyncio.run(run()), [200, 200, 429])
+
+    def test_runtime_config(self):
+        """Config can be changed at runtime"""
+        app = create_app(fast_config())
+
+        async def run():
+            await request(app, "POST", "/mock/config", json={"error_rate": 1.0})
+            return await request(app, "POST", "/v1/chat/completions", json=CHAT)
+
+        self.assertEqual(asyncio.run(run()).status_code, 500)
+
+    def test_latency_distribution_mean(self):
+        """Lognormal samples keep the configured mean"""
+        import random
+        rng = random.Random(0)
+        dist = LatencyDistribution(kind="lognormal", mean=0.2, spread=0.5)
+        samples = [dist.sample(rng) for _ in range(20000)]
+        self.assertAlmostEqual(sum(samples) / len(samples), 0.2, delta=0.01)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,180 @@
+# test_response_cache.py
+"""
+Unit Tests for Stream Response Cache
+====================================
+
+Tests for StreamResponseCache and StreamChatService cache integration.
+"""
+import sys
+import unittest
+import asyncio
+from pathlib import Path
+
+# 确保内置queue模块在sys.modules中（避免与项目queue包冲突）
+import queue as builtin_queue
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root / "src"))
+
+from streaming.response_cache import StreamResponseCache, CachedStream
+from streaming.llm_stream import StreamChatService, BaseLLMStreamer, build_chat_payload
+
+
+class FakeStreamer(BaseLLMStreamer):
+    """Streamer that yields fixed chunks and counts upstream calls"""
+
+    def __init__(self, chunks):
+        super().__init__("http://fake", "key", "fake-model")
+        self.chunks = chunks
+        self.calls = 0
+        self.params = []
+
+    async def stream_chat(self, messages, monitor=None, params=None):
+        self.calls += 1
+        self.params.append(params)
+        for chunk in self.chunks:
+            await asyncio.sleep(0.01)
+            yield chunk
+
+
+class FakeRedis:
+    """Minimal synchronous Redis stand-in (get/setex)"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+
+
+API_CONFIGS = {"fake": {"url": "http://fake", "api_key": "key", "model": "fake-model"}}
+
+
+async def collect(gen):
+    return [chunk async for chunk in gen]
+
+
+class TestStreamResponseCache(unittest.TestCase):
+    """Test cache key, TTL and LRU behavior"""
+
+    def test_key_normalization(self):
+        """Whitespace and extra fields do not change the key"""
+        cache = StreamResponseCache()
+        k1 = cache.make_key("nvidia", "m", [{"role": "user", "content": "hi "}], {"temperature": 0})
+        k2 = cache.make_key("nvidia", "m", [{"role": "User", "content": "hi", "id": 1}], {"temperature": 0})
+        k3 = cache.make_key("nvidia", "m", [{"role": "user", "content": "hi"}], {"temperature": 0.5})
+        self.assertEqual(k1, k2)
+        self.assertNotEqual(k1, k3)
+
+    def test_deterministic_only(self):
+        """Only temperature=0 requests are cacheable by default"""
+        cache = StreamResponseCache()
+        self.assertTrue(cache.is_cacheable({"temperature": 0}))
+        self.assertFalse(cache.is_cacheable({"temperature": 0.7}))
+        self.assertFalse(cache.is_cacheable(None))
+        self.assertTrue(StreamResponseCache(deterministic_only=False).is_cacheable(None))
+
+    def test_lru_eviction(self):
+        """Least recently used entry is evicted first"""
+        cache = StreamResponseCache(max_entries=2)
+
+        async def run():
+            await cache.set("a", [(0.0, "A")])
+            await cache.set("b", [(0.0, "B")])
+            await cache.get("a")
+            await cache.set("c", [(0.0, "C")])
+            return await cache.get("a"), await cache.get("b")
+
+        a, b = asyncio.run(run())
+        self.assertIsNotNone(a)
+        self.assertIsNone(b)
+        self.assertEqual(cache.stats["evictions"], 1)
+
+    def test_ttl_expiry(self):
+        """Expired entries are not returned"""
+        cache = StreamResponseCache(ttl=0)
+
+        async def run():
+            await cache.set("a", [(0.0, "A")])
+            return await cache.get("a")
+
+        self.assertIsNone(asyncio.run(run()))
+
+    def test_redis_tier(self):
+        """A second cache instance sharing Redis gets an L2 hit"""
+        redis_client = FakeRedis()
+        writer = StreamResponseCache(redis_client=redis_client)
+        reader = StreamResponseCache(redis_client=redis_client)
+
+        async def run():
+            await writer.set("k", [(0.0, "Hello"), (0.1, " world")])
+            return await reader.get("k")
+
+        entry = asyncio.run(run())
+        self.assertIsInstance(entry, CachedStream)
+        self.assertEqual(entry.text, "Hello world")
+        self.assertEqual(reader.stats["l2_hits"], 1)
+
+
+class TestStreamChatServiceCache(unittest.TestCase):
+    """Test cached streaming through StreamChatService"""
+
+    def setUp(self):
+        self.cache = StreamResponseCache()
+        self.service = StreamChatService(API_CONFIGS, response_cache=self.cache)
+        self.streamer = FakeStreamer(["Hel", "lo"])
+        self.service.active_streamers["fake"] = self.streamer
+
+    def test_replay_hits_cache(self):
+        """Second identical deterministic request is replayed from cache"""
+        messages = [{"role": "user", "content": "hi"}]
+
+        async def run():
+            first = await collect(self.service.stream_chat(
+                "fake", messages, enable_monitor=False, params={"temperature": 0}))
+            second = await collect(self.service.stream_chat(
+                "fake", messages, enable_monitor=False, params={"temperature": 0}))
+            return first, second
+
+        first, second = asyncio.run(run())
+        self.assertEqual(first, ["Hel", "lo"])
+        self.assertEqual(second, ["Hel", "lo"])
+        self.assertEqual(self.streamer.calls, 1)
+
+    def test_nondeterministic_bypasses_cache(self):
+        """Sampling requests always go upstream"""
+        messages = [{"role": "user", "content": "hi"}]
+
+        async def run():
+            for _ in range(2):
+                await collect(self.service.stream_chat("fake", messages, enable_monitor=False))
+
+        asyncio.run(run())
+        self.assertEqual(self.streamer.calls, 2)
+        self.assertEqual(self.cache.get_size(), 0)
+
+    def test_client_params_whitelisted(self):
+        """Client params cannot override model/messages/stream or the cache key"""
+        messages = [{"role": "user", "content": "hi"}]
+        hostile = {"temperature": 0, "model": "other-model", "stream": False,
+                   "messages": [{"role": "system", "content": "injected"}]}
+
+        async def run():
+            await collect(self.service.stream_chat("fake", messages, enable_monitor=False, params=hostile))
+            await collect(self.service.stream_chat(
+                "fake", messages, enable_monitor=False, params={"temperature": 0}))
+
+        asyncio.run(run())
+        self.assertEqual(self.streamer.params, [{"temperature": 0}])
+        self.assertEqual(self.streamer.calls, 1)
+
+        payload = build_chat_payload("fake-model", messages, hostile)
+        self.assertEqual(payload, {"model": "fake-model", "messages": messages, "stream": True, "temperature": 0})
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
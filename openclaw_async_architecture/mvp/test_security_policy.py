@@ -0,0 +1,200 @@
+# test_security_policy.py
+"""
+Unit Tests for the Compiled Security Policy
+===========================================
+
+Tests for validate_path / validate_command / validate_python_code on top of
+the compiled SecurityPolicy: component-wise path matching, decision caching,
+AST-based Python checks, and recompilation when the rules change.
+"""
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+# 确保内置queue模块在sys.modules中（避免与项目queue包冲突）
+import queue as builtin_queue
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from src.worker.tools import security
+from src.worker.tools.security_policy import PathTrie, SecurityPolicy
+
+
+class SecurityRulesTestCase(unittest.TestCase):
+    """Restores the module-level rules after each test"""
+
+    def setUp(self):
+        patchers = [
+            mock.patch.object(security, name, getattr(security, name))
+            for name in ("ALLOWED_PATHS", "ALLOWED_COMMANDS", "BLOCKED_PATTERNS",
+                         "BLOCKED_PYTHON_FUNCTIONS", "PATH_CACHE_TTL")
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(security.reload_policy)
+
+
+class TestPathPolicy(SecurityRulesTestCase):
+    """Test path checks"""
+
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.base = os.path.realpath(self.tmpdir.name)
+        self.root = os.path.join(self.base, "ws")
+        os.makedirs(os.path.join(self.root, "sub"))
+        os.makedirs(os.path.join(self.base, "ws-other"))
+        security.ALLOWED_PATHS = [self.root]
+
+    def test_component_matching(self):
+        """Paths under the root pass; a sibling sharing the prefix does not"""
+        self.assertEqual(security.validate_path(os.path.join(self.root, "sub", "a.txt")),
+                         os.path.join(self.root, "sub", "a.txt"))
+        self.assertEqual(security.validate_path(self.root), self.root)
+        with self.assertRaises(PermissionError):
+            security.validate_path(os.path.join(self.base, "ws-other", "a.txt"))
+        with self.assertRaises(PermissionError):
+            security.validate_path(self.base)
+
+        trie = PathTrie(["/"])
+        self.assertTrue(trie.contains("/any/where"))
+
+    def test_symlink_escape(self):
+        """A symlink inside the root pointing outside is rejected"""
+        link = os.path.join(self.root, "escape")
+        os.symlink(os.path.join(self.base, "ws-other"), link)
+        with self.assertRaises(PermissionError):
+            security.validate_path(os.path.join(link, "a.txt"))
+
+    def test_decisions_cached(self):
+        """Repeated checks are served from the cache, errors included"""
+        path = os.path.join(self.root, "sub", "b.txt")
+        outside = os.path.join(self.base, "ws-other")
+        policy = security.get_policy()
+        for _ in range(3):
+            security.validate_path(path)
+            with self.assertRaises(PermissionError):
+                security.validate_path(outside)
+        stats = policy.get_stats()["path"]
+        self.assertEqual((stats["misses"], stats["hits"]), (2, 4))
+
+        # 相对路径按当前目录区分
+        cwd = os.getcwd()
+        try:
+            os.chdir(self.root)
+            self.assertEqual(security.validate_path("sub"), os.path.join(self.root, "sub"))
+            os.chdir(self.base)
+            with self.assertRaises(PermissionError):
+                security.validate_path("sub")
+        finally:
+            os.chdir(cwd)
+
+    def test_rule_changes_recompile(self):
+        """Replacing or extending ALLOWED_PATHS takes effect immediately"""
+        other = os.path.join(self.base, "ws-other")
+        with self.assertRaises(PermissionError):
+            security.validate_path(other)
+        security.ALLOWED_PATHS.append(other)
+        self.assertEqual(security.validate_path(other), other)
+        with mock.patch.object(security, "ALLOWED_PATHS", [self.base]):
+            self.assertEqual(security.validate_path(self.base), self.base)
+        with self.assertRaises(PermissionError):
+            security.validate_path(self.base)
+
+
+class TestCommandPolicy(SecurityRulesTestCase):
+    """Test command checks"""
+
+    def test_rules(self):
+        self.assertTrue(security.validate_command("ls -la"))
+        self.assertTrue(security.validate_command("cat notes.txt"))
+        with self.assertRaisesRegex(PermissionError, "Command not allowed: python"):
+            security.validate_command("python x.py")
+        with self.assertRaisesRegex(ValueError, "Invalid argument for ls: -R"):
+            security.validate_command("ls -R")
+        with self.assertRaisesRegex(ValueError, "Empty command"):
+            security.validate_command("   ")
+
+    def test_blocked_pattern_reported_in_list_order(self):
+        """The first listed pattern is reported, case-insensitively"""
+        with self.assertRaisesRegex(ValueError, "Blocked command pattern: rm -rf"):
+            security.validate_command("echo SHUTDOWN; RM -RF /")
+        # 缓存命中时抛出相同的异常
+        with self.assertRaisesRegex(ValueError, "Blocked command pattern: rm -rf"):
+            security.validate_command("echo SHUTDOWN; RM -RF /")
+        self.assertEqual(security.get_policy().get_stats()["command"]["hits"], 1)
+
+
+class TestPythonPolicy(SecurityRulesTestCase):
+    """Test AST-based Python code checks"""
+
+    def assertBlocked(self, code, name):
+        with self.assertRaisesRegex(ValueError, f"Python function not allowed: {name}"):
+            security.validate_python_code(code)
+
+    def test_calls_and_references(self):
+        self.assertBlocked("open('/etc/passwd').read()", "open")
+        self.assertBlocked("import os\nos.open('x', 0)", "open")
+        self.assertBlocked("f = eval\nf('1 + 1')", "eval")
+        self.assertBlocked("import builtins\nx = builtins.exec", "exec")
+        self.assertBlocked("from builtins import getattr as g", "getattr")
+
+    def test_no_false_positives(self):
+        """Strings, comments and longer names no longer match"""
+        self.assertTrue(security.validate_python_code("print('open(file)')  # eval(x)"))
+        self.assertTrue(security.validate_python_code("import os\nprint(os.listdir('.'))"))
+        self.assertTrue(security.validate_python_code("dir = 'x'\nprint(dir)"))
+
+    def test_dunder_import_and_syntax_errors(self):
+        with self.assertRaisesRegex(ValueError, "Dangerous import pattern"):
+            security.validate_python_code("import os\nprint(os.__file__)")
+        # 无法解析时按子串检查
+        self.assertBlocked("eval('1'", "eval")
+
+    def test_configure_and_policy_file(self):
+        """configure() and SECURITY_POLICY_PATH replace the rules"""
+        security.configure({"blocked_python_functions": ["print"]})
+        self.assertBlocked("print(1)", "print")
+        self.assertTrue(security.validate_python_code("eval('1')"))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "policy.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"blocked_python_functions": ["len"]}, f)
+            with mock.patch.dict(os.environ, {"SECURITY_POLICY_PATH": path}), \
+                    mock.patch.object(security, "_next_policy_file_check", 0.0), \
+                    mock.patch.object(security, "_policy_file_state", None):
+                self.assertBlocked("len([])", "len")
+                self.assertTrue(security.validate_python_code("print(1)"))
+
+
+class TestPolicyObject(unittest.TestCase):
+    """Test SecurityPolicy directly"""
+
+    def test_python_cache_keyed_by_code(self):
+        policy = SecurityPolicy([], {}, [], {"eval"})
+        for _ in range(3):
+            policy.check_python_code("x = 1")
+            with self.assertRaises(ValueError):
+                policy.check_python_code("eval('1')")
+        stats = policy.get_stats()["python"]
+        self.assertEqual((stats["entries"], stats["misses"], stats["hits"]), (2, 2, 4))
+
+    def test_path_cache_disabled(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            policy = SecurityPolicy([tmpdir], {}, [], set(), path_cache_ttl=0)
+            policy.check_path(tmpdir)
+            policy.check_path(tmpdir)
+            self.assertEqual(policy.get_stats()["path"]["entries"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+# test_session_store.py
+"""
+Unit Tests for Server-Side Session History
+==========================================
+
+Tests for ConversationSession trimming/summarization and
+SessionStore Redis spill/reload.
+"""
+import sys
+import time
+import unittest
+import asyncio
+from pathlib import Path
+
+# 确保内置queue模块在sys.modules中（避免与项目queue包冲突）
+import queue as builtin_queue
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root / "src"))
+
+from streaming.session_store import ConversationSession, SessionStore, estimate_tokens
+
+
+class FakeRedis:
+    """Minimal sync Redis stand-in"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+class TestConversationSession(unittest.TestCase):
+    """Test history ring buffer and trimming"""
+
+    def test_history_included_in_order(self):
+        """History is sent before the new message"""
+        session = ConversationSession("s1", system_prompt="be brief")
+        session.append("user", "hi")
+        session.append("assistant", "hello")
+        messages = asyncio.run(session.build_messages("how are you", 10000))
+        self.assertEqual(
+            [m["role"] for m in messages],
+            ["system", "user", "assistant", "user"]
+        )
+        self.assertEqual(messages[-1]["content"], "how are you")
+
+    def test_ring_buffer_tracks_tokens(self):
+        """Oldest messages are overwritten and token count stays consistent"""
+        session = ConversationSession("s1", max_messages=3)
+        for i in range(5):
+            session.append("user", f"message {i}")
+        self.assertEqual(len(session.history), 3)
+        self.assertEqual(session.history_tokens, sum(t for _, t in session.history))
+
+    def test_trim_keeps_stable_prefix(self):
+        """Trimming drops a block at once so following turns share a prefix"""
+        session = ConversationSession("s1")
+        for i in range(40):
+            session.append("user", "x" * 40)
+        budget = estimate_tokens("x" * 40) * 30
+
+        first = asyncio.run(session.build_messages("next", budget))
+        self.assertLessEqual(session.history_tokens, budget // 2)
+
+        session.append("user", "next")
+        session.append("assistant", "ok")
+        second = asyncio.run(session.build_messages("again", budget))
+        # No further trimming: previous request is a prefix of this one
+        self.assertEqual(second[:len(first) - 1], first[:-1])
+
+    def test_summarizer_called_with_dropped(self):
+        """Dropped messages are folded into the summary"""
+        session = ConversationSession("s1")
+        for i in range(20):
+            session.append("user", f"fact {i} " * 10)
+        dropped_seen = []
+
+        async def summarizer(previous, dropped):
+            dropped_seen.extend(dropped)
+            return "summary of earlier facts"
+
+        budget = session.history_tokens // 2
+        messages = asyncio.run(session.build_messages("q", budget, summarizer))
+        self.assertTrue(dropped_seen)
+        self.assertEqual(dropped_seen[0]["content"], "fact 0 " * 10)
+        self.assertIn("summary of earlier facts", messages[0]["content"])
+
+
+class TestSessionStore(unittest.TestCase):
+    """Test session lookup and Redis spill"""
+
+    def test_budget_capped_by_context_window(self):
+        """Budget is the smaller of max_history_tokens and the window minus reserve"""
+        store = SessionStore(max_history_tokens=8000, output_reserve_tokens=2000)
+        self.assertEqual(store.token_budget(), 8000)
+        self.assertEqual(store.token_budget(128000), 8000)
+        self.assertEqual(store.token_budget(6000), 4000)
+
+    def test_spill_and_reload(self):
+        """Idle sessions are written to Redis and restored on next access"""
+        redis = FakeRedis()
+        store = SessionStore(idle_ttl=60, redis_client=redis)
+
+        async def run():
+            session = await store.get("s1")
+            session.append("user", "remember me")
+            session.append("assistant", "ok")
+            session.last_active = time.time() - 120
+
+            self.assertEqual(await store.spill_idle(), 1)
+            self.assertEqual(store.get_active_count(), 0)
+            self.assertIn("stream:session:s1", redis.data)
+
+            restored = await store.get("s1")
+            return [m["content"] for m, _ in restored.history]
+
+        self.assertEqual(asyncio.run(run()), ["remember me", "ok"])
+
+    def test_access_during_spill_keeps_session(self):
+        """A session touched while its snapshot is being written stays in memory"""
+        store = SessionStore(idle_ttl=60)
+
+        class SlowRedis(FakeRedis):
+            async def setex(self, key, ttl, value):
+                # 写入期间有新消息到达
+                session = await store.get("s1")
+                session.append("user", "second")
+                super().setex(key, ttl, value)
+
+        store.redis_client = SlowRedis()
+
+        async def run():
+            session = await store.get("s1")
+            session.append("user", "first")
+            session.last_active = time.time() - 120
+
+            self.assertEqual(await store.spill_idle(), 0)
+            self.assertIs(await store.get("s1"), session)
+
+            store.redis_client = FakeRedis()
+            session.last_active = time.time() - 120
+            self.assertEqual(await store.spill_idle(), 1)
+            restored = await store.get("s1")
+            return [m["content"] for m, _ in restored.history]
+
+        self.assertEqual(asyncio.run(run()), ["first", "second"])
+
+    def test_idle_dropped_without_redis(self):
+        """Without Redis idle sessions are discarded"""
+        store = SessionStore(idle_ttl=60)
+
+        async def run():
+            session = await store.get("s1")
+            session.append("user", "hi")
+            session.last_active = time.time() - 120
+            await store.spill_idle()
+            return await store.get("s1")
+
+        self.assertEqual(len(asyncio.run(run()).history), 0)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
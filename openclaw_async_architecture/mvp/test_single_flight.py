@@ -0,0 +1,162 @@
+# test_single_flight.py
+"""
+Unit Tests for Request Coalescing
+=================================
+
+Tests for SingleFlight (threaded LoadBalancer calls) and
+StreamSingleFlight (StreamChatService fan-out).
+"""
+import sys
+import time
+import unittest
+import asyncio
+import threading
+from pathlib import Path
+
+# 确保内置queue模块在sys.modules中（避免与项目queue包冲突）
+import queue as builtin_queue
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root / "src"))
+
+from common.single_flight import SingleFlight
+from streaming.single_flight import StreamSingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Test threaded single-flight"""
+
+    def test_concurrent_calls_coalesced(self):
+        """Concurrent identical calls execute once and share the result"""
+        sf = SingleFlight()
+        calls = []
+        results = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.1)
+            return {"content": "answer"}
+
+        def worker():
+            results.append(sf.do("k", slow))
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 5)
+        self.assertEqual(sum(1 for _, shared in results if shared), 4)
+        self.assertEqual(sf.in_flight(), 0)
+
+    def test_error_shared(self):
+        """Exceptions propagate and the key is released"""
+        sf = SingleFlight()
+        with self.assertRaises(RuntimeError):
+            sf.do("k", lambda: (_ for _ in ()).throw(RuntimeError("boom")))
+        # Key released after failure
+        self.assertEqual(sf.do("k", lambda: 1), (1, False))
+
+    def test_make_key(self):
+        """Same arguments produce same key"""
+        self.assertEqual(SingleFlight.make_key("p", None), SingleFlight.make_key("p", None))
+        self.assertNotEqual(SingleFlight.make_key("p", None), SingleFlight.make_key("q", None))
+
+
+class TestStreamSingleFlight(unittest.TestCase):
+    """Test streaming fan-out"""
+
+    def test_fan_out_with_late_joiner(self):
+        """One upstream stream serves all subscribers, late joiners replay buffer"""
+        sf = StreamSingleFlight()
+        upstream_calls = []
+
+        async def upstream():
+            upstream_calls.append(1)
+            for chunk in ["a", "b", "c", "d"]:
+                await asyncio.sleep(0.02)
+                yield chunk
+
+        async def collect(delay=0.0):
+            await asyncio.sleep(delay)
+            return [chunk async for chunk in sf.stream("k", upstream)]
+
+        async def run():
+            return await asyncio.gather(collect(), collect(), collect(0.05))
+
+        results = asyncio.run(run())
+        self.assertEqual(len(upstream_calls), 1)
+        for chunks in results:
+            self.assertEqual(chunks, ["a", "b", "c", "d"])
+        self.assertEqual(sf.stats["joined"], 2)
+        self.assertEqual(sf.in_flight(), 0)
+
+    def test_upstream_error_propagates(self):
+        """Upstream error is raised in every subscriber"""
+        sf = StreamSingleFlight()
+
+        async def upstream():
+            yield "a"
+            raise ValueError("upstream failed")
+
+        async def collect():
+            return [chunk async for chunk in sf.stream("k", upstream)]
+
+        async def run():
+            return await asyncio.gather(collect(), collect(), return_exceptions=True)
+
+        for result in asyncio.run(run()):
+            self.assertIsInstance(result, ValueError)
+
+    def test_cancel_when_all_subscribers_leave(self):
+        """Upstream is cancelled when the only subscriber stops reading"""
+        sf = StreamSingleFlight()
+        closed = []
+
+        async def upstream():
+            try:
+                for i in range(100):
+                    await asyncio.sleep(0.01)
+                    yield str(i)
+            finally:
+                closed.append(True)
+
+        async def run():
+            gen = sf.stream("k", upstream)
+            await gen.__anext__()
+            await gen.aclose()
+            await asyncio.sleep(0.05)
+
+        asyncio.run(run())
+        self.assertEqual(closed, [True])
+        self.assertEqual(sf.in_flight(), 0)
+
+    def test_rejoin_after_cancel_starts_new_upstream(self):
+        """A request arriving while the old flight is being cancelled gets a fresh upstream"""
+        sf = StreamSingleFlight()
+        upstream_calls = []
+
+        async def upstream():
+            upstream_calls.append(1)
+            for chunk in ["a", "b", "c"]:
+                await asyncio.sleep(0.01)
+                yield chunk
+
+        async def run():
+            gen = sf.stream("k", upstream)
+            await gen.__anext__()
+            await gen.aclose()
+            # 取消尚未完成时，key已经移除
+            self.assertEqual(sf.in_flight(), 0)
+            return [chunk async for chunk in sf.stream("k", upstream)]
+
+        self.assertEqual(asyncio.run(run()), ["a", "b", "c"])
+        self.assertEqual(len(upstream_calls), 2)
+        self.assertEqual(sf.stats["joined"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
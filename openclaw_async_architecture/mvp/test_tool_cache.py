@@ -0,0 +1,452 @@
+# test_tool_cache.py
+"""
+Unit Tests for Two-Tier Tool Result Cache
+=========================================
+
+Tests for ToolResultCache L1/L2 lookups, miss coalescing,
+probabilistic early refresh and negative caching.
+"""
+import fnmatch
+import os
+import sys
+import tempfile
+import unittest
+import asyncio
+from pathlib import Path
+from unittest import mock
+
+# 确保内置queue模块在sys.modules中（避免与项目queue包冲突）
+import queue as builtin_queue
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from src.common.tool_cache import ToolResultCache
+from src.worker.tools import security, tool_manager
+from src.worker.tools.base_tool import BaseTool, ToolInput, ToolOutput
+from src.worker.tools.filesystem_tools import ListDirectoryTool
+from src.worker.tools.file_freshness import MISSING, WATCHDOG_AVAILABLE, FileCacheWatcher, stat_token
+
+
+class FakeRedis:
+    """Minimal sync Redis stand-in (no expiry, glob via fnmatch)"""
+
+    def __init__(self):
+        self.data = {}
+        self.gets = 0
+        self.keys_calls = 0
+
+    def get(self, key):
+        self.gets += 1
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def unlink(self, *keys):
+        return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    delete = unlink
+
+    def rename(self, src, dst):
+        if src not in self.data:
+            raise KeyError(src)
+        self.data[dst] = self.data.pop(src)
+
+    def keys(self, pattern):
+        self.keys_calls += 1
+        return [key for key in self.data if fnmatch.fnmatchcase(key, pattern)]
+
+    def scan_iter(self, match="*", count=None):
+        return iter([key for key in self.data if fnmatch.fnmatchcase(key, match)])
+
+    def sadd(self, key, *members):
+        self.data.setdefault(key, set()).update(members)
+
+    def smembers(self, key):
+        return set(self.data.get(key, ()))
+
+    def zadd(self, key, mapping):
+        self.data.setdefault(key, {}).update(mapping)
+
+    def zrem(self, key, *members):
+        for member in members:
+            self.data.get(key, {}).pop(member, None)
+
+    def zremrangebyscore(self, key, low, high):
+        zset = self.data.get(key, {})
+        for member in [m for m, score in zset.items() if score <= high]:
+            del zset[member]
+
+    def zcount(self, key, low, high):
+        return sum(1 for score in self.data.get(key, {}).values() if score >= low)
+
+    def zscan_iter(self, key, match=None, count=None):
+        return iter([
+            (member, score) for member, score in self.data.get(key, {}).items()
+            if match is None or fnmatch.fnmatchcase(member, match)
+        ])
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Pipeline executing queued calls against FakeRedis"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        def queue_call(*args, **kwargs):
+            self.calls.append((getattr(self.redis, name), args, kwargs))
+        return queue_call
+
+    def execute(self):
+        return [method(*args, **kwargs) for method, args, kwargs in self.calls]
+
+
+class TestToolResultCache(unittest.TestCase):
+    """Test layered lookups"""
+
+    def test_l1_absorbs_repeat_lookups(self):
+        """Second lookup is served from L1 without touching Redis"""
+        redis = FakeRedis()
+        cache = ToolResultCache(redis_client=redis)
+        cache.set_by_tool("read_file", {"path": "a"}, {"success": True})
+
+        self.assertEqual(cache.get_by_tool("read_file", {"path": "a"}), {"success": True})
+        self.assertEqual(redis.gets, 0)
+
+    def test_l2_fills_l1(self):
+        """A value written by another process is read from Redis once"""
+        redis = FakeRedis()
+        writer = ToolResultCache(redis_client=redis)
+        reader = ToolResultCache(redis_client=redis)
+        writer.set_by_tool("read_file", {"path": "a"}, "content")
+
+        self.assertEqual(reader.get_by_tool("read_file", {"path": "a"}), "content")
+        self.assertEqual(reader.get_by_tool("read_file", {"path": "a"}), "content")
+        self.assertEqual(redis.gets, 1)
+
+    def test_clear_by_tool_clears_l1(self):
+        """Tool invalidation removes L1 copies too"""
+        cache = ToolResultCache(redis_client=FakeRedis())
+        cache.set_by_tool("read_file", {"path": "a"}, "content")
+        cache.set_by_tool("list_directory", {"path": "."}, "listing")
+
+        cache.clear_by_tool("read_file")
+        self.assertIsNone(cache.get_by_tool("read_file", {"path": "a"}))
+        self.assertEqual(cache.get_by_tool("list_directory", {"path": "."}), "listing")
+
+
+class TestInvalidation(unittest.TestCase):
+    """Test index-based invalidation (no KEYS)"""
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.cache = ToolResultCache(redis_client=self.redis, l1_ttl=0)
+        for i in range(5):
+            self.cache.set_by_tool("read_file", {"path": str(i)}, i)
+        for i in range(3):
+            self.cache.set_by_tool("list_directory", {"path": str(i)}, i)
+
+    def tearDown(self):
+        self.assertEqual(self.redis.keys_calls, 0)
+
+    def test_stats_from_index(self):
+        """Per-tool counts come from the index"""
+        stats = self.cache.get_stats()
+        self.assertEqual(stats["tools"], {"list_directory": 3, "read_file": 5})
+        self.assertEqual(stats["total_keys"], 8)
+
+    def test_clear_by_tool(self):
+        """Only the tool's entries and index are removed"""
+        self.cache.clear_by_tool("read_file")
+        self.assertIsNone(self.cache.get_by_tool("read_file", {"path": "0"}))
+        self.assertEqual(self.cache.get_by_tool("list_directory", {"path": "0"}), 0)
+        self.assertEqual(self.cache.get_stats()["tools"], {"list_directory": 3})
+
+    def test_clear(self):
+        """Clearing everything leaves no cache keys behind"""
+        self.cache.clear()
+        self.assertEqual(self.redis.data, {})
+
+    def test_invalidate_tool_pattern(self):
+        """`tool:*` purges through the index"""
+        self.assertEqual(self.cache.invalidate_by_pattern("list_directory:*"), 3)
+        self.assertEqual(self.cache.get_stats()["total_keys"], 5)
+
+    def test_invalidate_cross_tool_pattern(self):
+        """Wildcard tool names fall back to SCAN"""
+        self.assertEqual(self.cache.invalidate_by_pattern("*_directory:*"), 3)
+        self.assertIsNone(self.cache.get_by_tool("list_directory", {"path": "1"}))
+
+    def test_delete_updates_index(self):
+        """Deleting one entry removes it from the index"""
+        self.cache.delete_by_tool("read_file", {"path": "0"})
+        self.assertEqual(self.cache.get_stats()["tools"]["read_file"], 4)
+
+
+class TestGetOrCompute(unittest.TestCase):
+    """Test stampede protection and negative caching"""
+
+    def test_concurrent_misses_coalesced(self):
+        """Concurrent misses on one key compute once"""
+        cache = ToolResultCache(redis_client=FakeRedis())
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {"success": True, "data": "x"}
+
+        async def run():
+            return await asyncio.gather(*(
+                cache.get_or_compute("read_file", {"path": "a"}, compute)
+                for _ in range(20)
+            ))
+
+        results = asyncio.run(run())
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sum(1 for _, source in results if source == "coalesced"), 19)
+
+    def test_early_refresh_near_expiry(self):
+        """Entries close to expiry with slow computes are refreshed early"""
+        cache = ToolResultCache(redis_client=FakeRedis(), l1_ttl=0)
+        key = cache._make_key("read_file", {"path": "a"})
+        # 1 second left, compute took ~11 days: refresh is certain in practice
+        cache._store(key, "old", ttl=1, delta=1e6)
+
+        async def compute():
+            return "new"
+
+        result, source = asyncio.run(cache.get_or_compute("read_file", {"path": "a"}, compute))
+        self.assertEqual((result, source), ("new", "compute"))
+        self.assertEqual(cache.stats["early_refreshes"], 1)
+
+    def test_early_refresh_single_worker(self):
+        """Only one of several workers sharing L2 refreshes early"""
+        redis = FakeRedis()
+        workers = [ToolResultCache(redis_client=redis, l1_ttl=0) for _ in range(3)]
+        workers[0]._store(workers[0]._make_key("read_file", {"path": "a"}), "old", ttl=1, delta=1e6)
+
+        async def compute():
+            return "new"
+
+        async def run():
+            return [
+                await cache.get_or_compute("read_file", {"path": "a"}, compute)
+                for cache in workers
+            ]
+
+        results = asyncio.run(run())
+        self.assertEqual(sum(1 for _, source in results if source == "compute"), 1)
+
+    def test_no_early_refresh_when_fresh(self):
+        """Fresh entries with fast computes are served from cache"""
+        cache = ToolResultCache(redis_client=FakeRedis())
+        key = cache._make_key("read_file", {"path": "a"})
+        cache._store(key, "old", ttl=3600, delta=0.001)
+
+        async def compute():
+            return "new"
+
+        result, _ = asyncio.run(cache.get_or_compute("read_file", {"path": "a"}, compute))
+        self.assertEqual(result, "old")
+
+    def test_negative_cache(self):
+        """Failures are cached only when negative_ttl is set"""
+        cache = ToolResultCache(redis_client=FakeRedis())
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            return {"success": False, "error": "not found"}
+
+        def is_failure(result):
+            return not result["success"]
+
+        async def run(negative_ttl):
+            for _ in range(3):
+                await cache.get_or_compute(
+                    "read_file", {"path": "missing"}, compute,
+                    negative_ttl=negative_ttl, is_failure=is_failure
+                )
+
+        asyncio.run(run(0))
+        self.assertEqual(len(calls), 3)
+
+        calls.clear()
+        asyncio.run(run(30))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats["negative_hits"], 2)
+
+    def test_compute_error_releases_key(self):
+        """Exceptions propagate and are not cached"""
+        cache = ToolResultCache(redis_client=FakeRedis())
+
+        async def failing():
+            raise RuntimeError("boom")
+
+        async def ok():
+            return "value"
+
+        async def run():
+            with self.assertRaises(RuntimeError):
+                await cache.get_or_compute("read_file", {"path": "a"}, failing)
+            return await cache.get_or_compute("read_file", {"path": "a"}, ok)
+
+        self.assertEqual(asyncio.run(run()), ("value", "compute"))
+
+
+class CountingReadInput(ToolInput):
+    path: str
+
+
+class CountingReadTool(BaseTool):
+    """read_file stand-in counting executions"""
+
+    name = "read_file"
+    description = "read"
+    input_schema = CountingReadInput
+
+    def __init__(self):
+        self.calls = 0
+
+    async def execute(self, input_data: CountingReadInput) -> ToolOutput:
+        self.calls += 1
+        with open(input_data.path, encoding="utf-8") as f:
+            return ToolOutput(success=True, data=f.read())
+
+    def validate_input(self, input_data):
+        return True
+
+
+class TestFileFreshness(unittest.TestCase):
+    """Test freshness tokens in filesystem tool cache keys"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = os.path.realpath(self.tmpdir.name)
+        self.path = os.path.join(self.root, "notes.txt")
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("v1")
+
+        self.cache = ToolResultCache(redis_client=FakeRedis())
+        self.patches = [
+            mock.patch.object(tool_manager, "tool_cache", self.cache),
+            mock.patch.object(security, "ALLOWED_PATHS", [self.root]),
+        ]
+        for patch in self.patches:
+            patch.start()
+        self.manager = tool_manager.ToolManager()
+        self.tool = CountingReadTool()
+        self.manager.register_tool(self.tool)
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.tmpdir.cleanup()
+
+    def read(self):
+        return asyncio.run(self.manager.call_tool("read_file", {"path": self.path})).data
+
+    def test_stat_token(self):
+        """Token changes with content and marks missing paths"""
+        before = stat_token(self.path)
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("version 2")
+        self.assertNotEqual(stat_token(self.path), before)
+        self.assertEqual(stat_token(self.path + ".missing"), MISSING)
+
+    def test_unchanged_file_cached(self):
+        """Repeated reads of an unchanged file execute once"""
+        self.assertEqual(self.read(), "v1")
+        self.assertEqual(self.read(), "v1")
+        self.assertEqual(self.tool.calls, 1)
+
+    def test_modified_file_not_stale(self):
+        """A modified file is re-read instead of served from cache"""
+        self.assertEqual(self.read(), "v1")
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("version 2")
+        self.assertEqual(self.read(), "version 2")
+        self.assertEqual(self.tool.calls, 2)
+
+    def test_content_hash(self):
+        """Same-size rewrite with restored mtime is caught by content hash"""
+        self.manager.enable_content_hash(True)
+        st = os.stat(self.path)
+        self.assertEqual(self.read(), "v1")
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("v2")
+        os.utime(self.path, ns=(st.st_atime_ns, st.st_mtime_ns))
+        self.assertEqual(self.read(), "v2")
+
+    def test_security_checked_before_cache(self):
+        """A denied path is neither stat'ed nor served from cache"""
+        self.assertEqual(self.read(), "v1")
+        with mock.patch.object(security, "ALLOWED_PATHS", [os.path.join(self.root, "other")]), \
+                mock.patch.object(tool_manager, "freshness_token") as token:
+            output = asyncio.run(self.manager.call_tool("read_file", {"path": self.path}))
+        self.assertFalse(output.success)
+        self.assertIn("安全检查失败", output.error)
+        token.assert_not_called()
+        self.assertEqual(self.tool.calls, 1)
+
+    def test_list_directory_not_cached(self):
+        """In-place edits change sizes the directory's own stat does not reflect"""
+        self.manager.register_tool(ListDirectoryTool())
+
+        def size():
+            output = asyncio.run(self.manager.call_tool("list_directory", {"path": self.root}))
+            return {e["name"]: e["size"] for e in output.data}["notes.txt"]
+
+        self.assertEqual(size(), 2)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(" and more")
+        self.assertEqual(size(), 11)
+
+    def test_watcher_evicts_tracked_keys(self):
+        """Changes under a watched path evict tracked keys and directory listings"""
+        evicted = []
+        watcher = FileCacheWatcher(evicted.append)
+        watcher._roots.add(self.root)
+        watcher._observer = object()  # tracking only, no real observer
+
+        watcher.track(self.path, "file-key")
+        watcher.track(self.root, "listing-key")
+        watcher.track("/elsewhere/file", "ignored-key")
+
+        self.assertEqual(watcher.invalidate_path(self.path), 2)
+        self.assertEqual(sorted(evicted), ["file-key", "listing-key"])
+
+    @unittest.skipUnless(WATCHDOG_AVAILABLE, "watchdog not installed")
+    def test_watcher_live(self):
+        """Real filesystem events evict cached entries"""
+        self.assertTrue(self.manager.enable_file_watcher([self.root]))
+        try:
+            self.read()
+            self.assertEqual(self.manager.get_cache_stats()["file_watcher"]["tracked_keys"], 1)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("!")
+            for _ in range(50):
+                if self.manager.get_cache_stats()["file_watcher"]["evicted"]:
+                    break
+                asyncio.run(asyncio.sleep(0.05))
+            self.assertGreaterEqual(self.manager.get_cache_stats()["file_watcher"]["evicted"], 1)
+        finally:
+            self.manager.disable_file_watcher()
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
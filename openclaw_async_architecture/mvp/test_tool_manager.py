@@ -0,0 +1,156 @@
+# test_tool_manager.py
+"""
+Unit Tests for ToolManager
+==========================
+
+Tests for call_tools_batch ordering, deduplication, per-tool
+concurrency limits and the global concurrency budget, and for
+single-pass input validation in call_tool.
+"""
+import sys
+import time
+import unittest
+import asyncio
+from pathlib import Path
+
+# 确保内置queue模块在sys.modules中（避免与项目queue包冲突）
+import queue as builtin_queue
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from src.worker.tools import tool_manager
+from src.worker.tools.base_tool import BaseTool, ToolInput, ToolOutput
+
+
+class SleepInput(ToolInput):
+    key: str
+    delay: float = 0.05
+
+
+class SleepTool(BaseTool):
+    """Sleeps, then echoes its key; tracks executions and peak concurrency"""
+
+    description = "sleep"
+    input_schema = SleepInput
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.running = 0
+        self.peak = 0
+
+    async def execute(self, input_data: SleepInput) -> ToolOutput:
+        self.calls += 1
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(input_data.delay)
+            if input_data.key == "boom":
+                raise RuntimeError("boom")
+            return ToolOutput(success=True, data=input_data.key)
+        finally:
+            self.running -= 1
+
+
+class TestCallToolsBatch(unittest.TestCase):
+    """Test parallel batch tool execution"""
+
+    def setUp(self):
+        self.manager = tool_manager.ToolManager()
+        self.manager.enable_cache(False)
+        self.reader = SleepTool("read_file")  # read-only: deduplicated
+        self.writer = SleepTool("write_file")
+        self.manager.register_tool(self.reader)
+        self.manager.register_tool(self.writer)
+
+    def batch(self, calls, **kwargs):
+        return asyncio.run(self.manager.call_tools_batch(calls, **kwargs))
+
+    def test_concurrent_and_ordered(self):
+        """Independent calls overlap and results keep input order"""
+        calls = [("read_file", {"key": f"f{i}", "delay": 0.1}) for i in range(10)]
+        start = time.perf_counter()
+        results = self.batch(calls)
+        elapsed = time.perf_counter() - start
+
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual([r.data for r in results], [f"f{i}" for i in range(10)])
+        self.assertEqual([r.metadata["batch"]["index"] for r in results], list(range(10)))
+        self.assertGreaterEqual(results[0].metadata["batch"]["duration_ms"], 90)
+
+    def test_dedupe_readonly_only(self):
+        """Identical read-only calls run once; side-effecting calls always run"""
+        results = self.batch([
+            ("read_file", {"key": "a"}),
+            ("read_file", {"key": "a"}),
+            ("write_file", {"key": "w"}),
+            ("write_file", {"key": "w"}),
+        ])
+        self.assertEqual(self.reader.calls, 1)
+        self.assertEqual(self.writer.calls, 2)
+        self.assertEqual([r.metadata["batch"]["deduplicated"] for r in results],
+                         [False, True, False, False])
+
+        self.batch([("write_file", {"key": "w"})] * 2, dedupe_all=True)
+        self.assertEqual(self.writer.calls, 3)
+
+    def test_concurrency_limits(self):
+        """Per-tool limits and the global budget cap parallelism"""
+        self.manager.set_tool_concurrency("write_file", 2)
+        self.manager.set_max_concurrency(3)
+        self.batch(
+            [("write_file", {"key": f"w{i}"}) for i in range(6)]
+            + [("read_file", {"key": f"r{i}"}) for i in range(6)]
+        )
+        self.assertEqual(self.writer.peak, 2)
+        self.assertLessEqual(self.reader.peak + self.writer.peak, 5)
+        self.assertLessEqual(self.reader.peak, 3)
+
+    def test_failure_isolated(self):
+        """A failing call does not affect the rest of the batch"""
+        results = self.batch([
+            ("read_file", {"key": "boom"}),
+            ("missing_tool", {}),
+            ("read_file", {"key": "ok"}),
+        ])
+        self.assertEqual([r.success for r in results], [False, False, True])
+        self.assertIn("boom", results[0].error)
+
+
+class TestInputValidation(unittest.TestCase):
+    """Test the single validation pass in call_tool"""
+
+    def setUp(self):
+        self.manager = tool_manager.ToolManager()
+        self.manager.enable_cache(False)
+
+    def call(self, tool_name, input_data):
+        return asyncio.run(self.manager.call_tool(tool_name, input_data))
+
+    def test_schema_only(self):
+        """Tools without validate_input are validated by their schema alone"""
+        tool = SleepTool("write_file")
+        self.manager.register_tool(tool)
+
+        self.assertTrue(self.call("write_file", {"key": "a", "delay": 0}).success)
+        output = self.call("write_file", {"delay": 0})
+        self.assertFalse(output.success)
+        self.assertIn("输入数据格式错误", output.error)
+        self.assertEqual(tool.calls, 1)
+
+    def test_custom_validate_input(self):
+        """An overridden validate_input still runs before the schema"""
+        class PickyTool(SleepTool):
+            def validate_input(self, input_data):
+                return input_data.get("key") != "forbidden"
+
+        self.manager.register_tool(PickyTool("write_file"))
+        output = self.call("write_file", {"key": "forbidden", "delay": 0})
+        self.assertFalse(output.success)
+        self.assertIn("输入数据无效", output.error)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,362 @@
+# test_web_fetch.py
+"""
+Unit Tests for Web Fetch
+========================
+
+Tests for the shared HTTP fetcher (HTTP cache, conditional requests,
+streaming byte limits, per-host concurrency), the single-pass HTML
+extractor, and WebFetchTool on top of them, including fetch_many.
+Requests are served by httpx.MockTransport, no network access needed.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+import asyncio
+from pathlib import Path
+from unittest import mock
+
+# 确保内置queue模块在sys.modules中（避免与项目queue包冲突）
+import queue as builtin_queue
+
+import httpx
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from src.tools.html_extract import FEED_CHUNK_CHARS, MarkdownExtractor, extract
+from src.tools import http_fetch
+from src.tools.http_fetch import HttpCache, HttpFetcher, freshness
+from src.tools.web_crawl import canonicalize_url
+from src.tools.web_fetch_self import WebFetchTool
+
+
+class Server:
+    """MockTransport handler: serves fixed responses and records requests"""
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.requests = []
+        self.started = []
+        self.active = {}
+        self.max_active = {}
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        self.started.append((request.url.path, time.monotonic()))
+        host = request.url.host
+        self.active[host] = self.active.get(host, 0) + 1
+        self.max_active[host] = max(self.max_active.get(host, 0), self.active[host])
+        try:
+            route = self.routes.get(request.url.path)
+            if route is None:
+                return httpx.Response(404)
+            return await route(request)
+        finally:
+            self.active[host] -= 1
+
+
+class TestHttpFetcher(unittest.TestCase):
+    """Test caching and streaming in HttpFetcher"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = HttpCache(path=os.path.join(self.tmpdir.name, "cache.sqlite"))
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmpdir.cleanup()
+
+    def fetcher(self, routes, **kwargs):
+        server = Server(routes)
+        return server, HttpFetcher(cache=self.cache, transport=httpx.MockTransport(server), **kwargs)
+
+    def test_fresh_response_served_from_cache(self):
+        """max-age responses are reused without a request, also from a new cache instance"""
+        async def page(request):
+            return httpx.Response(200, text="<p>doc</p>", headers={
+                "content-type": "text/html", "cache-control": "max-age=600"
+            })
+
+        server, fetcher = self.fetcher({"/doc": page})
+        results = asyncio.run(self.fetch_twice(fetcher, "http://docs.test/doc"))
+        self.assertEqual([r.cache for r in results], ["miss", "hit"])
+        self.assertEqual(results[1].content, b"<p>doc</p>")
+        self.assertEqual(len(server.requests), 1)
+
+        # 缓存在磁盘上，新实例也能命中
+        reopened = HttpCache(path=self.cache.path)
+        self.assertEqual(reopened.get("http://docs.test/doc").body, b"<p>doc</p>")
+        reopened.close()
+
+    def test_revalidation_with_etag(self):
+        """Stale entries are revalidated; a 304 reuses the cached body"""
+        async def page(request):
+            if request.headers.get("if-none-match") == '"v1"':
+                return httpx.Response(304, headers={"etag": '"v1"', "cache-control": "no-cache"})
+            return httpx.Response(200, text="body", headers={
+                "content-type": "text/plain", "etag": '"v1"', "cache-control": "no-cache"
+            })
+
+        server, fetcher = self.fetcher({"/p": page})
+        results = asyncio.run(self.fetch_twice(fetcher, "http://docs.test/p"))
+        self.assertEqual([r.cache for r in results], ["miss", "revalidated"])
+        self.assertEqual(results[1].content, b"body")
+        self.assertEqual(server.requests[1].headers["if-none-match"], '"v1"')
+
+    def test_no_store_not_cached(self):
+        """no-store responses always go to the network"""
+        async def page(request):
+            return httpx.Response(200, text="x", headers={"cache-control": "no-store", "etag": '"a"'})
+
+        server, fetcher = self.fetcher({"/p": page})
+        asyncio.run(self.fetch_twice(fetcher, "http://docs.test/p"))
+        self.assertEqual(len(server.requests), 2)
+        self.assertFalse(freshness({"cache-control": "no-store"})[0])
+
+    def test_stream_stops_at_byte_limit(self):
+        """Downloads stop once max_bytes arrived; the truncated entry is not reused for larger reads"""
+        produced = []
+
+        async def body():
+            for i in range(1000):
+                produced.append(i)
+                yield b"x" * 1024
+
+        async def big(request):
+            return httpx.Response(200, content=body(), headers={
+                "content-type": "text/plain", "cache-control": "max-age=600"
+            })
+
+        server, fetcher = self.fetcher({"/big": big})
+
+        async def run():
+            small = await fetcher.fetch("http://docs.test/big", max_bytes=4096)
+            self.assertLess(len(produced), 10)  # 只生成了前几个数据块
+            again = await fetcher.fetch("http://docs.test/big", max_bytes=2048)
+            full = await fetcher.fetch("http://docs.test/big", max_bytes=None)
+            return small, again, full
+
+        small, again, full = asyncio.run(run())
+        self.assertEqual((len(small.content), small.truncated), (4096, True))
+        self.assertEqual((again.cache, len(again.content)), ("hit", 2048))
+        self.assertEqual((full.cache, len(full.content), full.truncated), ("miss", 1024 * 1000, False))
+        self.assertEqual(len(server.requests), 2)
+
+    def test_cached_entry_respects_content_types(self):
+        """A cache hit stored by an unrestricted fetch is still filtered by content_types"""
+        async def image(request):
+            return httpx.Response(200, content=b"\x89PNG", headers={
+                "content-type": "image/png", "cache-control": "max-age=600"
+            })
+
+        server, fetcher = self.fetcher({"/img": image})
+
+        async def run():
+            await fetcher.fetch("http://docs.test/img")
+            return await fetcher.fetch("http://docs.test/img", content_types=["text/"])
+
+        result = asyncio.run(run())
+        self.assertEqual((result.cache, result.skipped, result.content), ("hit", True, b""))
+        self.assertEqual(len(server.requests), 1)
+
+    @unittest.skipIf(os.name == "nt", "POSIX permissions")
+    def test_default_cache_dir_private(self):
+        """The default cache lives in a per-user 0700 directory; a planted one is refused"""
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.object(tempfile, "tempdir", tmp):
+            cache = HttpCache()
+            directory = os.path.dirname(cache.path)
+            cache.close()
+            self.assertIn(str(os.getuid()), os.path.basename(directory))
+            self.assertEqual(os.stat(directory).st_mode & 0o777, 0o700)
+
+            shutil.rmtree(directory)
+            planted = os.path.join(tmp, "planted")
+            os.mkdir(planted)
+            os.symlink(planted, directory)
+            with self.assertRaises(PermissionError):
+                http_fetch._default_cache_path()
+
+    def test_per_host_limit(self):
+        """At most per_host requests run concurrently against one host"""
+        async def slow(request):
+            await asyncio.sleep(0.02)
+            return httpx.Response(200, text="ok", headers={"cache-control": "no-store"})
+
+        server, fetcher = self.fetcher({"/s": slow}, per_host=2)
+
+        async def run():
+            urls = [f"http://{host}/s?i={i}" for host in ("a.test", "b.test") for i in range(6)]
+            await asyncio.gather(*(fetcher.fetch(url) for url in urls))
+
+        asyncio.run(run())
+        self.assertEqual(len(server.requests), 12)
+        self.assertEqual(server.max_active, {"a.test": 2, "b.test": 2})
+
+    @staticmethod
+    async def fetch_twice(fetcher, url):
+        return [await fetcher.fetch(url), await fetcher.fetch(url)]
+
+
+class TestHtmlExtract(unittest.TestCase):
+    """Test the single-pass HTML extractor"""
+
+    PAGE = """<html><head><title>Guide</title><script>var s = "<p>no</p>";</script></head><body>
+<nav><a href="/">Home</a></nav>
+<main><h2>Install</h2>
+<p>Run   <code>pip install x</code> &amp; read <a href="api.html">the API</a>.</p>
+<ul><li>one</li><li>two<ol><li>a</li></ol></li></ul>
+<pre>x = 1
+  y = 2</pre>
+<div role="contentinfo">footer links</div></main></body></html>"""
+
+    def test_markdown(self):
+        """Headings, inline code, links, nested lists and code blocks; boilerplate dropped"""
+        text, truncated = extract(self.PAGE, base_url="https://docs.test/guide/")
+        self.assertFalse(truncated)
+        self.assertEqual(text, (
+            "## Install\n\n"
+            "Run `pip install x` & read [the API](https://docs.test/guide/api.html).\n\n"
+            "- one\n- two\n  1. a\n\n"
+            "```\nx = 1\n  y = 2\n```"
+        ))
+        plain, _ = extract(self.PAGE, markdown=False)
+        self.assertIn("Run pip install x & read the API.", plain)
+
+    def test_incremental_feed(self):
+        """Feeding in tiny chunks gives the same output (tags, comments, entities split across chunks)"""
+        page = self.PAGE + "<p>a < b &amp; c <!-- <p>x</p> --> d</p>"
+        whole, _ = extract(page)
+        for size in (1, 3, 17):
+            extractor = MarkdownExtractor()
+            for i in range(0, len(page), size):
+                extractor.feed(page[i:i + size])
+            extractor.close()
+            self.assertEqual(extractor.result(), whole)
+            self.assertEqual(extractor.title, "Guide")
+        self.assertTrue(whole.endswith("a < b & c d"))
+
+    def test_malformed_quotes(self):
+        """Quotes not directly after "=" are plain characters; a tag always ends at the next ">" """
+        text, _ = extract("<p><img alt=don't>Hello world.</p><p>It's fine</p>")
+        self.assertEqual(text, "Hello world.\n\nIt's fine")
+        text, _ = extract("<p title=\"a>Unclosed.</p><p class=\"x\">Next \"quoted\"</p>")
+        self.assertIn("Unclosed.", text)
+        self.assertTrue(text.endswith('Next "quoted"'))
+
+    def test_unbalanced_quotes_linear(self):
+        """Many unterminated tags do not make tokenizing quadratic"""
+        for page in ('<a x="' * 100000, "<a x='" * 100000 + ">" + "<p>tail</p>"):
+            start = time.perf_counter()
+            extractor = MarkdownExtractor()
+            for i in range(0, len(page), FEED_CHUNK_CHARS):
+                extractor.feed(page[i:i + FEED_CHUNK_CHARS])
+            extractor.close()
+            self.assertLess(time.perf_counter() - start, 1)
+
+    def test_stops_at_max_chars(self):
+        """Parsing stops once max_chars of output exist"""
+        page = "<p>" + "word " * 200 + "</p>"
+        extractor = MarkdownExtractor(max_chars=50)
+        fed = 0
+        for _ in range(1000):
+            fed += 1
+            if extractor.feed(page):
+                break
+        self.assertEqual(fed, 1)
+        self.assertTrue(extractor.truncated)
+        self.assertEqual(len(extractor.result()), 50)
+
+
+class TestWebFetchTool(unittest.TestCase):
+    """Test WebFetchTool with a mocked fetcher"""
+
+    def setUp(self):
+        async def html(request):
+            return httpx.Response(200, text="<h1>Title</h1>\n<script>x()</script>\n<p>Text</p>",
+                                  headers={"content-type": "text/html; charset=utf-8"})
+
+        async def image(request):
+            return httpx.Response(200, content=b"\x89PNG", headers={"content-type": "image/png"})
+
+        self.server = Server({"/": html, "/img": image})
+        self.tool = WebFetchTool(fetcher=HttpFetcher(transport=httpx.MockTransport(self.server)))
+
+    def test_fetch(self):
+        self.assertEqual(asyncio.run(self.tool.fetch("http://site.test/")), "# Title\n\nText")
+        self.assertEqual(asyncio.run(self.tool.fetch("http://site.test/img")), "URL返回非文本内容: image/png")
+
+
+class TestFetchMany(unittest.TestCase):
+    """Test the multi-URL crawl mode"""
+
+    def setUp(self):
+        async def page(request):
+            if request.url.params.get("slow"):
+                await asyncio.sleep(0.1)
+            return httpx.Response(200, text=f"<p>{request.url.path}</p>",
+                                  headers={"content-type": "text/html", "cache-control": "no-store"})
+
+        async def robots(request):
+            return httpx.Response(200, text="User-agent: *\nDisallow: /private\n",
+                                  headers={"content-type": "text/plain"})
+
+        self.server = Server({"/a": page, "/b": page, "/c": page, "/private": page, "/robots.txt": robots})
+        self.tool = WebFetchTool(fetcher=HttpFetcher(transport=httpx.MockTransport(self.server)))
+
+    def crawl(self, urls, **kwargs):
+        async def run():
+            return [result async for result in self.tool.fetch_many(urls, **kwargs)]
+        return asyncio.run(run())
+
+    def test_canonicalize(self):
+        self.assertEqual(
+            canonicalize_url("HTTPS://Docs.Test:443/a?b=2&utm_source=x&a=1#frag"),
+            "https://docs.test/a?a=1&b=2"
+        )
+        self.assertEqual(canonicalize_url("http://docs.test"), "http://docs.test/")
+        self.assertIsNone(canonicalize_url("ftp://docs.test/x"))
+        self.assertIsNone(canonicalize_url("not a url"))
+
+    def test_dedupe_stream_and_errors(self):
+        """Duplicates are fetched once; results stream in completion order; failures are reported"""
+        results = self.crawl([
+            "http://one.test/a?slow=1",
+            "http://two.test/b",
+            "http://TWO.test/b#section",
+            "http://two.test/b?utm_source=feed",
+            "http://two.test/missing",
+            "http://one.test/private",
+            "nope",
+        ], delay=0)
+        by_url = {r["url"]: r for r in results}
+        self.assertEqual(len(results), 5)
+        self.assertEqual(results[0]["error"], "无效的URL: nope")
+        self.assertEqual(results[-1]["url"], "http://one.test/a?slow=1")  # 慢页面最后产出
+        self.assertEqual(by_url["http://two.test/b"]["content"], "/b")
+        self.assertEqual(by_url["http://two.test/missing"]["status"], 404)
+        self.assertEqual(by_url["http://one.test/private"]["error"], "robots.txt禁止抓取")
+
+        paths = [r.url.path for r in self.server.requests]
+        self.assertEqual(paths.count("/b"), 1)
+        self.assertEqual(paths.count("/robots.txt"), 2)  # 每个主机一次
+        self.assertNotIn("/private", paths)
+
+    def test_host_politeness(self):
+        """Requests to one host start at least `delay` apart; other hosts are not held back"""
+        urls = [f"http://one.test/{p}" for p in "abc"] + ["http://two.test/a"]
+        results = self.crawl(urls, delay=0.05, per_host=4, respect_robots=False)
+        self.assertTrue(all(r["error"] is None for r in results))
+        one = [t for (path, t), r in zip(self.server.started, self.server.requests) if r.url.host == "one.test"]
+        gaps = [b - a for a, b in zip(one, one[1:])]
+        self.assertEqual(len(gaps), 2)
+        self.assertTrue(all(gap >= 0.045 for gap in gaps), gaps)
+        two = [t for (path, t), r in zip(self.server.started, self.server.requests) if r.url.host == "two.test"]
+        self.assertLess(two[0] - self.server.started[0][1], 0.04)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
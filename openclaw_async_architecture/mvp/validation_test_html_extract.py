@@ -0,0 +1,112 @@
+"""
+HTML正文提取基准：旧正则流水线 vs 单遍html.parser提取器
+
+对一组保存的网页（--corpus目录下的*.html/*.htm；不指定时生成合成文档页）：
+1. 旧实现：整体去除script/style，再逐行做4次正则替换（WebFetchTool旧版_extract_html）
+2. 新实现：html_extract.extract 完整提取
+3. 新实现：max_chars=10000（WebFetchTool默认上限，达到后停止解析）
+
+输出每页的耗时和输出大小。
+
+用法：
+    python validation_test_html_extract.py
+    python validation_test_html_extract.py --corpus saved_pages/ --repeat 5
+"""
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+# 确保内置queue模块在sys.modules中（避免与项目queue包冲突）
+import queue as builtin_queue
+
+# Windows UTF-8编码修复
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+
+sys.path.insert(0, str(Path(__file__).parent))
+from src.tools.html_extract import extract
+
+
+def legacy_extract_text(html: str) -> str:
+    """旧版WebFetchTool._extract_text"""
+    html = re.sub(r'<script[^>]*>.*?</script>', '', html, flags=re.IGNORECASE | re.DOTALL)
+    html = re.sub(r'<style[^>]*>.*?</style>', '', html, flags=re.IGNORECASE | re.DOTALL)
+    html = re.sub(r'<[^>]+>', '', html)
+    html = re.sub(r'\s+', ' ', html)
+    return html.strip()
+
+
+def legacy_extract_html(html: str) -> str:
+    """旧版WebFetchTool._extract_html"""
+    html = re.sub(r'<script[^>]*>.*?</script>', '', html, flags=re.IGNORECASE | re.DOTALL)
+    html = re.sub(r'<style[^>]*>.*?</style>', '', html, flags=re.IGNORECASE | re.DOTALL)
+    lines = [legacy_extract_text(line) for line in html.split('\n')]
+    return '\n'.join(line for line in lines if line.strip())
+
+
+def synthetic_page(sections: int) -> str:
+    """合成文档页：导航、内联脚本/样式、标题、段落、列表、代码块、表格、页脚"""
+    nav = "<nav><ul>" + "".join(f'<li><a href="/p{i}">Page {i}</a></li>\n' for i in range(80)) + "</ul></nav>\n"
+    script = "<script>\n" + "var data = {'k': 'v'};\nfunction f(a) { return a < 1; }\n" * 200 + "</script>\n"
+    style = "<style>\n" + ".cls { color: red; margin: 0 auto; }\n" * 200 + "</style>\n"
+    body = []
+    for i in range(sections):
+        body.append(
+            f'<h2 id="s{i}">Section {i}</h2>\n'
+            f'<p>This is <b>section {i}</b> of the guide. It explains the '
+            f'<a href="/api#x{i}">API call {i}</a> and <code>option_{i}</code>\n'
+            f'in detail, with &lt;escaped&gt; text &amp; entities.</p>\n'
+            f'<ul>\n<li>First point {i}</li>\n<li>Second point {i}</li>\n</ul>\n'
+            f'<pre><code>client.call({i})\nresult = client.wait()\n</code></pre>\n'
+            f'<table><tr><th>Key</th><th>Value</th></tr><tr><td>k{i}</td><td>{i}</td></tr></table>\n'
+        )
+    footer = "<footer>" + "<p>Copyright links</p>\n" * 50 + "</footer>"
+    return f"<html><head><title>Guide</title>{style}</head><body>{nav}{script}<main>{''.join(body)}</main>{footer}</body></html>"
+
+
+def load_corpus(corpus):
+    if corpus:
+        paths = sorted(p for p in Path(corpus).iterdir() if p.suffix.lower() in (".html", ".htm"))
+        return [(p.name, p.read_text(encoding="utf-8", errors="ignore")) for p in paths]
+    return [(f"synthetic-{n}", synthetic_page(n)) for n in (20, 200, 2000)]
+
+
+def timed(func, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTML正文提取基准")
+    parser.add_argument("--corpus", help="保存的网页目录（*.html/*.htm）")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数（取最快）")
+    parser.add_argument("--max-chars", type=int, default=10000, help="截断模式的字符上限")
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus)
+    print(f"{'page':<24}{'html KB':>9}{'old ms':>9}{'new ms':>9}{'cap ms':>9}{'old chars':>11}{'new chars':>11}")
+    totals = [0.0, 0.0, 0.0]
+    for name, html in pages:
+        old_time, old_text = timed(lambda: legacy_extract_html(html), args.repeat)
+        new_time, (new_text, _) = timed(lambda: extract(html), args.repeat)
+        cap_time, _ = timed(lambda: extract(html, max_chars=args.max_chars), args.repeat)
+        totals[0] += old_time
+        totals[1] += new_time
+        totals[2] += cap_time
+        print(
+            f"{name[:23]:<24}{len(html) / 1024:>9.0f}{old_time * 1000:>9.1f}{new_time * 1000:>9.1f}"
+            f"{cap_time * 1000:>9.1f}{len(old_text):>11}{len(new_text):>11}"
+        )
+    print(f"{'total':<24}{'':>9}{totals[0] * 1000:>9.1f}{totals[1] * 1000:>9.1f}{totals[2] * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
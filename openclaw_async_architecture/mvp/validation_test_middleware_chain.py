@@ -0,0 +1,113 @@
+"""
+中间件链单次调用开销微基准
+
+测量 MiddlewareChain.execute 相对直接 await tool_func() 的额外开销：
+1. 空链
+2. 5个透传中间件（pre + post，返回共享的CONTINUE）
+3. 5个透传中间件（pre + post，每次新建MiddlewareResult，旧写法）
+4. 5个中间件，其中2个被禁用
+
+用法：
+    python validation_test_middleware_chain.py
+    python validation_test_middleware_chain.py --iterations 200000
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# 确保内置queue模块在sys.modules中（避免与项目queue包冲突）
+import queue as builtin_queue
+
+# Windows UTF-8编码修复
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+
+sys.path.insert(0, str(Path(__file__).parent))
+from src.middleware import (
+    BaseMiddleware,
+    ExecutionContext,
+    MiddlewareChain,
+    MiddlewareResult,
+    CONTINUE,
+)
+
+
+class PassThroughMiddleware(BaseMiddleware):
+    """pre/post都不做事（返回共享CONTINUE）"""
+
+    async def pre_process(self, ctx):
+        return CONTINUE
+
+    async def post_process(self, ctx, tool_result):
+        return CONTINUE
+
+
+class AllocatingMiddleware(BaseMiddleware):
+    """pre/post每次新建MiddlewareResult（旧写法）"""
+
+    async def pre_process(self, ctx):
+        return MiddlewareResult()
+
+    async def post_process(self, ctx, tool_result):
+        return MiddlewareResult()
+
+
+async def tool_func():
+    return "result"
+
+
+def build_chain(middleware_cls, count: int, disabled: int = 0) -> MiddlewareChain:
+    chain = MiddlewareChain()
+    for i in range(count):
+        chain.add_middleware(middleware_cls(f"mw{i}", priority=i))
+    for i in range(disabled):
+        chain.disable_middleware(f"mw{i}")
+    return chain
+
+
+async def measure(chain, iterations: int) -> float:
+    """返回每次调用耗时（纳秒）"""
+    params = {"path": "/tmp/a.txt"}
+    start = time.perf_counter_ns()
+    if chain is None:
+        for _ in range(iterations):
+            ExecutionContext("read_file", params)
+            await tool_func()
+    else:
+        execute = chain.execute
+        for _ in range(iterations):
+            await execute(ExecutionContext("read_file", params), tool_func)
+    return (time.perf_counter_ns() - start) / iterations
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="中间件链开销微基准")
+    parser.add_argument("--iterations", type=int, default=100000, help="每个场景的调用次数")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数（取最小值）")
+    args = parser.parse_args()
+
+    scenarios = [
+        ("直接调用（基线）", None),
+        ("空链", MiddlewareChain()),
+        ("5个透传（CONTINUE）", build_chain(PassThroughMiddleware, 5)),
+        ("5个透传（新建Result）", build_chain(AllocatingMiddleware, 5)),
+        ("5个（2个禁用）", build_chain(PassThroughMiddleware, 5, disabled=2)),
+    ]
+
+    print("=" * 60)
+    print(f"中间件链开销: {args.iterations}次调用 × {args.repeat}轮（取最小值）")
+    print("=" * 60)
+    print(f"{'场景':<24}{'ns/调用':>12}{'额外开销(ns)':>16}")
+
+    baseline = None
+    for label, chain in scenarios:
+        per_call = min([await measure(chain, args.iterations) for _ in range(args.repeat)])
+        if baseline is None:
+            baseline = per_call
+        print(f"{label:<24}{per_call:>12.0f}{per_call - baseline:>16.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
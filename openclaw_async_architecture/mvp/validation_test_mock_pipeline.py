@@ -0,0 +1,237 @@
+"""
+完整链路离线压测（Mock LLM）
+Gateway → Redis队列 → Worker → Store，LLM端点全部指向本地Mock服务器
+
+用法：
+    python validation_test_mock_pipeline.py --tasks 200 --concurrency 20 --workers 4
+    python validation_test_mock_pipeline.py --error-rate 0.05 --rate-limit-rate 0.05 --output result.json
+
+需要本地Redis（与Gateway/Worker使用相同的REDIS_HOST/REDIS_PORT配置）
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+# Windows UTF-8编码修复
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+
+MVP_DIR = Path(__file__).parent
+API_CONFIG_SOURCE = MVP_DIR.parent / "API_CONFIG_FINAL.json"
+
+sys.path.insert(0, str(MVP_DIR))
+from src.mock_llm.server import write_mock_api_config
+
+
+def percentile(values: List[float], p: float) -> float:
+    """计算百分位数（最近秩）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def start_processes(args, mock_url: str, api_config_path: str) -> List[subprocess.Popen]:
+    """启动Mock服务器、Gateway和Worker进程"""
+    env = {
+        **os.environ,
+        "MOCK_LLM_TTFT_MS": str(args.ttft_ms),
+        "MOCK_LLM_TPS": str(args.tps),
+        "MOCK_LLM_OUTPUT_TOKENS": str(args.output_tokens),
+        "MOCK_LLM_ERROR_RATE": str(args.error_rate),
+        "MOCK_LLM_429_RATE": str(args.rate_limit_rate),
+        "MOCK_LLM_SEED": str(args.seed),
+        # Worker的V1路径和LoadBalancer都指向Mock
+        "V1_GATEWAY_URL": mock_url,
+        "API_CONFIG_PATH": api_config_path,
+        "PYTHONIOENCODING": "utf-8",
+    }
+    output = None if args.verbose else subprocess.DEVNULL
+
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "src.mock_llm.server:app",
+             "--host", "127.0.0.1", "--port", str(args.mock_port), "--log-level", "warning"],
+            cwd=MVP_DIR, env=env, stdout=output, stderr=output
+        ),
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "src.gateway.main:app",
+             "--host", "127.0.0.1", "--port", str(args.gateway_port), "--log-level", "warning"],
+            cwd=MVP_DIR, env=env, stdout=output, stderr=output
+        ),
+    ]
+    for _ in range(args.workers):
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "src.worker.main"],
+            cwd=MVP_DIR, env=env, stdout=output, stderr=output
+        ))
+    return processes
+
+
+async def wait_ready(client: httpx.AsyncClient, urls: List[str], timeout: float = 30.0):
+    """等待HTTP服务就绪"""
+    deadline = time.time() + timeout
+    for url in urls:
+        while True:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.time() > deadline:
+                raise RuntimeError(f"服务未就绪: {url}")
+            await asyncio.sleep(0.3)
+
+
+async def run_task(client: httpx.AsyncClient, gateway_url: str, index: int, poll_interval: float, timeout: float) -> Dict:
+    """提交一个任务并轮询到完成"""
+    start = time.perf_counter()
+    response = await client.post(f"{gateway_url}/tasks", json={"content": f"压测任务 #{index}: 总结异步架构的优点"})
+    response.raise_for_status()
+    task_id = response.json()["task_id"]
+    submit_latency = time.perf_counter() - start
+
+    deadline = start + timeout
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(poll_interval)
+        data = (await client.get(f"{gateway_url}/tasks/{task_id}")).json()
+        if data["status"] in ("completed", "failed"):
+            return {
+                "status": data["status"],
+                "submit_latency": submit_latency,
+                "e2e_latency": time.perf_counter() - start,
+            }
+    return {"status": "timeout", "submit_latency": submit_latency, "e2e_latency": timeout}
+
+
+async def run_load(args) -> Dict:
+    """按并发度提交任务并收集结果"""
+    gateway_url = f"http://127.0.0.1:{args.gateway_port}"
+    mock_url = f"http://127.0.0.1:{args.mock_port}"
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async with httpx.AsyncClient(timeout=10.0) as client:
+        await wait_ready(client, [f"{mock_url}/v1/models", f"{gateway_url}/health"])
+        print(f"[OK] Mock服务器和Gateway已就绪，{args.workers}个Worker\n")
+
+        async def bounded(index: int):
+            async with semaphore:
+                return await run_task(client, gateway_url, index, args.poll_interval, args.task_timeout)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(bounded(i) for i in range(args.tasks)))
+        elapsed = time.perf_counter() - start
+
+        mock_stats = (await client.get(f"{mock_url}/mock/stats")).json()
+
+    e2e = [r["e2e_latency"] for r in results if r["status"] == "completed"]
+    submit = [r["submit_latency"] for r in results]
+    statuses: Dict[str, int] = {}
+    for r in results:
+        statuses[r["status"]] = statuses.get(r["status"], 0) + 1
+
+    return {
+        "config": {
+            "tasks": args.tasks,
+            "concurrency": args.concurrency,
+            "workers": args.workers,
+            "ttft_ms": args.ttft_ms,
+            "tps": args.tps,
+            "output_tokens": args.output_tokens,
+            "error_rate": args.error_rate,
+            "rate_limit_rate": args.rate_limit_rate,
+        },
+        "elapsed": elapsed,
+        "throughput": len(e2e) / elapsed if elapsed else 0.0,
+        "statuses": statuses,
+        "e2e_latency": {
+            "p50": percentile(e2e, 50),
+            "p90": percentile(e2e, 90),
+            "p99": percentile(e2e, 99),
+            "max": max(e2e) if e2e else 0.0,
+        },
+        "submit_latency": {
+            "p50": percentile(submit, 50),
+            "p99": percentile(submit, 99),
+        },
+        "mock_stats": mock_stats,
+    }
+
+
+def print_report(report: Dict):
+    """打印压测结果"""
+    print("=" * 60)
+    print("压测结果")
+    print("=" * 60)
+    print(f"耗时: {report['elapsed']:.2f}秒")
+    print(f"吞吐量: {report['throughput']:.2f} 任务/秒")
+    print(f"状态: {report['statuses']}")
+    e2e = report["e2e_latency"]
+    print(f"端到端延迟: p50={e2e['p50']*1000:.0f}ms p90={e2e['p90']*1000:.0f}ms "
+          f"p99={e2e['p99']*1000:.0f}ms max={e2e['max']*1000:.0f}ms")
+    submit = report["submit_latency"]
+    print(f"提交延迟: p50={submit['p50']*1000:.1f}ms p99={submit['p99']*1000:.1f}ms")
+    print(f"Mock统计: {report['mock_stats']}")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="完整链路离线压测（Mock LLM）")
+    parser.add_argument("--tasks", type=int, default=100, help="任务总数")
+    parser.add_argument("--concurrency", type=int, default=10, help="并发提交数")
+    parser.add_argument("--workers", type=int, default=2, help="Worker进程数")
+    parser.add_argument("--mock-port", type=int, default=9000)
+    parser.add_argument("--gateway-port", type=int, default=8000)
+    parser.add_argument("--ttft-ms", type=float, default=200, help="Mock首token延迟均值（毫秒）")
+    parser.add_argument("--tps", type=float, default=50, help="Mock每秒token数")
+    parser.add_argument("--output-tokens", type=int, default=64, help="Mock每次回复token数")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="500错误注入概率")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="429注入概率")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子（结果可复现）")
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--task-timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="结果JSON输出路径（可选，用于CI）")
+    parser.add_argument("--verbose", action="store_true", help="显示子进程输出")
+    args = parser.parse_args()
+
+    print("\n" + "=" * 60)
+    print("完整链路离线压测：Gateway → Redis队列 → Worker → Store → Mock LLM")
+    print("=" * 60 + "\n")
+
+    mock_url = f"http://127.0.0.1:{args.mock_port}"
+    api_config_path = os.path.join(tempfile.mkdtemp(prefix="openclaw_mock_"), "API_CONFIG_MOCK.json")
+    write_mock_api_config(mock_url, str(API_CONFIG_SOURCE), api_config_path)
+
+    processes = start_processes(args, mock_url, api_config_path)
+    try:
+        report = asyncio.run(run_load(args))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入: {args.output}")
+
+    sys.exit(0 if report["statuses"].get("completed") else 1)
+
+
+if __name__ == "__main__":
+    main()
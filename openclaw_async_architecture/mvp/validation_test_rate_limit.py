@@ -0,0 +1,138 @@
+"""
+RateLimitMiddleware限流器压测（10k用户）
+
+对比：
+1. 旧实现：每用户时间戳列表，每次请求用列表推导式重建
+2. GCRA（MemoryRateLimiter）：每个key一个float，空闲key自动淘汰
+
+指标：每次检查耗时（ns）、常驻内存（tracemalloc）、存活key数
+
+用法：
+    python validation_test_rate_limit.py
+    python validation_test_rate_limit.py --users 10000 --requests 500000 --max-requests 100
+    python validation_test_rate_limit.py --redis-url redis://localhost:6379/0
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List
+
+# 确保内置queue模块在sys.modules中（避免与项目queue包冲突）
+import queue as builtin_queue
+
+# Windows UTF-8编码修复
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+
+sys.path.insert(0, str(Path(__file__).parent))
+from src.middleware.rate_limiter import MemoryRateLimiter, RedisRateLimiter
+
+
+class SlidingLogLimiter:
+    """旧实现（RateLimitMiddleware原逻辑，作为对照）"""
+
+    def __init__(self, max_requests: int, window_seconds: float):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self._history: Dict[str, List[float]] = {}
+
+    def allow(self, user_key: str) -> bool:
+        now = time.time()
+        window_start = now - self.window_seconds
+        if user_key not in self._history:
+            self._history[user_key] = []
+        self._history[user_key] = [ts for ts in self._history[user_key] if ts > window_start]
+        if len(self._history[user_key]) >= self.max_requests:
+            return False
+        self._history[user_key].append(now)
+        return True
+
+    def __len__(self):
+        return len(self._history)
+
+
+def make_workload(users: int, requests: int, seed: int) -> List[str]:
+    """80%请求来自20%用户"""
+    rng = random.Random(seed)
+    hot = max(1, users // 5)
+    return [
+        f"user{rng.randrange(hot) if rng.random() < 0.8 else rng.randrange(users)}"
+        for _ in range(requests)
+    ]
+
+
+def run(label: str, factory, workload: List[str]):
+    """计时一轮，再在tracemalloc下用新实例跑一轮测内存（tracemalloc会拖慢计时）"""
+    allow, size = factory()
+    start = time.perf_counter_ns()
+    allowed = sum(1 for key in workload if allow(key))
+    elapsed = time.perf_counter_ns() - start
+
+    allow, size = factory()
+    tracemalloc.start()
+    for key in workload:
+        allow(key)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{label:<22}{elapsed / len(workload):>10.0f}{allowed / len(workload):>10.1%}"
+        f"{current / 1024 / 1024:>12.2f}{peak / 1024 / 1024:>12.2f}{size():>10}"
+    )
+
+
+async def run_redis(args, workload: List[str]):
+    import redis.asyncio as aioredis
+    client = aioredis.from_url(args.redis_url)
+    limiter = RedisRateLimiter(client, prefix=f"bench:ratelimit:{time.time()}:")
+    sample = workload[:args.redis_requests]
+    start = time.perf_counter_ns()
+    allowed = 0
+    for key in sample:
+        allowed += (await limiter.acquire([(key, args.max_requests, args.window)])).allowed
+    elapsed = time.perf_counter_ns() - start
+    print(f"{'GCRA (Redis)':<22}{elapsed / len(sample):>10.0f}{allowed / len(sample):>10.1%}{'-':>12}{'-':>12}{'-':>10}")
+    await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="限流器压测")
+    parser.add_argument("--users", type=int, default=10000, help="用户数")
+    parser.add_argument("--requests", type=int, default=300000, help="请求数")
+    parser.add_argument("--max-requests", type=int, default=100, help="每窗口最大请求数")
+    parser.add_argument("--window", type=float, default=60.0, help="窗口（秒）")
+    parser.add_argument("--redis-url", default=None, help="同时测试Redis后端")
+    parser.add_argument("--redis-requests", type=int, default=20000, help="Redis后端请求数")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    workload = make_workload(args.users, args.requests, args.seed)
+
+    print("=" * 76)
+    print(f"限流器压测: {args.users}用户, {args.requests}次请求, {args.max_requests}次/{args.window}秒")
+    print("=" * 76)
+    print(f"{'实现':<22}{'ns/次':>10}{'放行率':>10}{'内存(MB)':>12}{'峰值(MB)':>12}{'key数':>10}")
+
+    def sliding_log():
+        limiter = SlidingLogLimiter(args.max_requests, args.window)
+        return limiter.allow, limiter.__len__
+
+    def gcra():
+        limiter = MemoryRateLimiter()
+        return (
+            lambda key: limiter.acquire_sync(((key, args.max_requests, args.window),)).allowed,
+            limiter.__len__,
+        )
+
+    run("旧实现（时间戳列表）", sliding_log, workload)
+    run("GCRA（内存）", gcra, workload)
+
+    if args.redis_url:
+        asyncio.run(run_redis(args, workload))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+工具结果缓存压测（L1 + L2两级缓存）
+
+对比：
+1. 仅L2（l1_ttl=0，每次查找都访问Redis）与 L1+L2 的命中率和查找延迟
+2. 冷key惊群：N个并发未命中只计算一次
+3. 热key到期：提前刷新把重算分散到到期前
+
+用法：
+    python validation_test_tool_cache.py
+    python validation_test_tool_cache.py --lookups 50000 --keys 5000 --rtt-ms 0.5
+    python validation_test_tool_cache.py --redis-url redis://localhost:6379/0
+
+默认使用带模拟RTT的内存Redis；指定--redis-url时使用真实Redis。
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+# 确保内置queue模块在sys.modules中（避免与项目queue包冲突）
+import queue as builtin_queue
+
+# Windows UTF-8编码修复
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+
+sys.path.insert(0, str(Path(__file__).parent))
+from src.common.tool_cache import ToolResultCache
+
+
+class SimulatedRedis:
+    """内存Redis，每次调用阻塞固定RTT（模拟网络往返）"""
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.data = {}
+        self.calls = 0
+
+    def _roundtrip(self):
+        self.calls += 1
+        if self.rtt > 0:
+            end = time.perf_counter() + self.rtt
+            while time.perf_counter() < end:
+                pass
+
+    def get(self, key):
+        self._roundtrip()
+        item = self.data.get(key)
+        if item is None or item[1] <= time.time():
+            return None
+        return item[0]
+
+    def setex(self, key, ttl, value):
+        self._roundtrip()
+        self.data[key] = (value, time.time() + ttl)
+
+    def set(self, key, value, nx=False, ex=None):
+        self._roundtrip()
+        item = self.data.get(key)
+        if nx and item is not None and item[1] > time.time():
+            return None
+        self.data[key] = (value, time.time() + (ex or 1e9))
+        return True
+
+    def delete(self, *keys):
+        self._roundtrip()
+        for key in keys:
+            self.data.pop(key, None)
+
+    def unlink(self, *keys):
+        self._roundtrip()
+        return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    def sadd(self, key, *members):
+        self.data.setdefault(key, (set(), float("inf")))[0].update(members)
+
+    def smembers(self, key):
+        self._roundtrip()
+        return set(self.data.get(key, (set(),))[0])
+
+    def zadd(self, key, mapping):
+        self.data.setdefault(key, ({}, float("inf")))[0].update(mapping)
+
+    def zremrangebyscore(self, key, low, high):
+        zset = self.data.get(key, ({},))[0]
+        for member in [m for m, score in zset.items() if score <= high]:
+            del zset[member]
+
+    def rename(self, src, dst):
+        self._roundtrip()
+        self.data[dst] = self.data.pop(src)
+
+    def zscan_iter(self, key, match=None, count=None):
+        self._roundtrip()
+        return iter(list(self.data.get(key, ({},))[0].items()))
+
+    def pipeline(self, transaction=True):
+        return SimulatedPipeline(self)
+
+
+class SimulatedPipeline:
+    """管道：所有命令合计一次RTT"""
+
+    def __init__(self, redis: SimulatedRedis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        def queue_call(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+        return queue_call
+
+    def execute(self):
+        self.redis._roundtrip()
+        rtt, calls = self.redis.rtt, self.redis.calls
+        self.redis.rtt = 0
+        try:
+            return [getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+        finally:
+            self.redis.rtt, self.redis.calls = rtt, calls
+
+
+def percentile(values: List[float], p: float) -> float:
+    """计算百分位数（最近秩）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def make_redis(args):
+    """创建Redis客户端（真实或模拟）"""
+    if args.redis_url:
+        import redis
+        client = redis.Redis.from_url(args.redis_url, decode_responses=True)
+        client.ping()
+        return client
+    return SimulatedRedis(args.rtt_ms / 1000)
+
+
+def zipf_workload(keys: int, lookups: int, skew: float, seed: int) -> List[int]:
+    """生成Zipf分布的key序列"""
+    rng = random.Random(seed)
+    weights = [1.0 / (rank ** skew) for rank in range(1, keys + 1)]
+    return rng.choices(range(keys), weights=weights, k=lookups)
+
+
+async def run_lookups(cache: ToolResultCache, workload: List[int], compute_ms: float) -> dict:
+    """按workload顺序调用get_or_compute，记录每次延迟"""
+    latencies = []
+
+    for key in workload:
+        async def compute(key=key):
+            await asyncio.sleep(compute_ms / 1000)
+            return {"success": True, "data": f"content-{key}"}
+
+        start = time.perf_counter()
+        await cache.get_or_compute("read_file", {"path": f"/data/{key}.txt"}, compute)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    stats = cache.get_stats()["counters"]
+    lookups = len(workload)
+    return {
+        "l1_hits": stats["l1_hits"],
+        "l2_hits": stats["l2_hits"],
+        "computes": stats["computes"],
+        "hit_ratio": (stats["l1_hits"] + stats["l2_hits"]) / lookups,
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "hit_p50": percentile([l for l in latencies if l < compute_ms], 50),
+    }
+
+
+async def bench_tiers(args):
+    """对比仅L2与L1+L2"""
+    workload = zipf_workload(args.keys, args.lookups, args.skew, args.seed)
+    print(f"\n[1] 查找延迟: {args.lookups}次查找, {args.keys}个key, Zipf s={args.skew}, compute={args.compute_ms}ms")
+    print(f"{'配置':<12}{'命中率':>8}{'L1命中':>8}{'L2命中':>8}{'计算':>7}{'Redis调用':>10}{'p50(ms)':>10}{'p99(ms)':>10}{'命中p50':>10}")
+
+    for label, l1_ttl in (("L2 only", 0), ("L1 + L2", 10)):
+        redis = make_redis(args)
+        cache = ToolResultCache(max_size=args.l1_size, redis_client=redis, l1_ttl=l1_ttl, early_refresh_beta=0)
+        cache.prefix = f"bench:{label.replace(' ', '')}:{time.time()}:"
+        result = await run_lookups(cache, workload, args.compute_ms)
+        calls = getattr(redis, "calls", "-")
+        print(
+            f"{label:<12}{result['hit_ratio']:>8.1%}{result['l1_hits']:>8}{result['l2_hits']:>8}"
+            f"{result['computes']:>7}{calls:>10}{result['p50']:>10.3f}{result['p99']:>10.3f}{result['hit_p50']:>10.3f}"
+        )
+        cache.clear()
+
+
+async def bench_stampede(args):
+    """冷key惊群：N个并发未命中"""
+    cache = ToolResultCache(redis_client=make_redis(args))
+    computes = 0
+
+    async def compute():
+        nonlocal computes
+        computes += 1
+        await asyncio.sleep(args.compute_ms / 1000)
+        return {"success": True, "data": "cold"}
+
+    await asyncio.gather(*(
+        cache.get_or_compute("web_fetch", {"url": "https://example.com"}, compute)
+        for _ in range(args.concurrency)
+    ))
+    print(f"\n[2] 冷key惊群: {args.concurrency}个并发未命中 → 计算{computes}次, 合并{cache.stats['coalesced']}次")
+    cache.clear()
+
+
+async def bench_expiry(args):
+    """热key到期：多个Worker共享L2，有/无提前刷新"""
+    workers = 4
+    print(f"\n[3] 热key到期: {workers}个Worker共享L2, TTL=3s, 计算0.3s, 持续7s")
+    for label, beta in (("无提前刷新", 0.0), ("XFetch β=1", 1.0)):
+        redis = make_redis(args)
+        # 每个Worker独立的进程内状态（合并只在进程内生效）
+        caches = [ToolResultCache(redis_client=redis, l1_ttl=0, early_refresh_beta=beta) for _ in range(workers)]
+        for cache in caches:
+            cache.prefix = f"bench:expiry:{beta}:{args.seed}:"
+        computes = 0
+        running = 0
+        peak = 0
+
+        async def compute():
+            nonlocal computes, running, peak
+            computes += 1
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.3)
+            running -= 1
+            return {"success": True, "data": "hot"}
+
+        waits = []
+
+        async def worker(cache):
+            start = time.monotonic()
+            while time.monotonic() - start < 7:
+                t = time.perf_counter()
+                await cache.get_or_compute("web_fetch", {"url": "https://hot"}, compute, ttl=3)
+                waits.append((time.perf_counter() - t) * 1000)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(worker(cache) for cache in caches))
+        blocked = sum(1 for w in waits if w > 100)
+        print(f"  {label:<12} 计算{computes}次, 最大同时计算{peak}, 阻塞查找(>100ms) {blocked}/{len(waits)}")
+        caches[0].clear()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="工具结果缓存压测")
+    parser.add_argument("--lookups", type=int, default=20000, help="查找次数")
+    parser.add_argument("--keys", type=int, default=2000, help="不同key数量")
+    parser.add_argument("--skew", type=float, default=1.0, help="Zipf偏斜系数")
+    parser.add_argument("--l1-size", type=int, default=1000, help="L1条目上限")
+    parser.add_argument("--compute-ms", type=float, default=5.0, help="未命中时计算耗时（毫秒）")
+    parser.add_argument("--rtt-ms", type=float, default=0.3, help="模拟Redis往返延迟（毫秒）")
+    parser.add_argument("--concurrency", type=int, default=100, help="惊群测试并发数")
+    parser.add_argument("--redis-url", default=None, help="使用真实Redis")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-expiry", action="store_true", help="跳过热key到期测试")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("工具结果缓存压测")
+    print("=" * 80)
+    print(f"Redis: {args.redis_url or f'模拟（RTT {args.rtt_ms}ms）'}")
+
+    await bench_tiers(args)
+    await bench_stampede(args)
+    if not args.skip_expiry:
+        await bench_expiry(args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
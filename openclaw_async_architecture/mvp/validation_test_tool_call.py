@@ -0,0 +1,159 @@
+"""
+ToolManager.call_tool单次调用开销微基准
+
+测量廉价工具（list_directory、空操作工具）经ToolManager调用的额外开销：
+1. 直接 await tool.execute(typed_input)（基线）
+2. call_tool，缓存关闭（安全检查 + 输入校验 + 执行 + 审计）
+3. call_tool，只读工具缓存命中（L1，read_file；list_directory不缓存）
+
+Redis用进程内字典代替，只测Python侧开销。
+
+用法：
+    python validation_test_tool_call.py
+    python validation_test_tool_call.py --iterations 20000 --entries 50
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+# 确保内置queue模块在sys.modules中（避免与项目queue包冲突）
+import queue as builtin_queue
+
+# Windows UTF-8编码修复
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+
+sys.path.insert(0, str(Path(__file__).parent))
+from src.common.tool_cache import ToolResultCache
+from src.worker.tools import security, tool_manager
+from src.worker.tools.base_tool import BaseTool, ToolInput, ToolOutput
+from src.worker.tools.filesystem_tools import ListDirectoryInput, ListDirectoryTool, ReadFileTool
+
+
+class DictRedis:
+    """进程内Redis替身（只实现工具缓存用到的命令）"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def pipeline(self, transaction=False):
+        return DictPipeline(self)
+
+
+class DictPipeline:
+    def __init__(self, redis):
+        self.redis = redis
+
+    def setex(self, key, ttl, value):
+        self.redis.setex(key, ttl, value)
+
+    def __getattr__(self, name):
+        # 索引维护命令（zadd/sadd/...）对基准无影响
+        return lambda *args, **kwargs: None
+
+    def execute(self):
+        return []
+
+
+class NoopInput(ToolInput):
+    value: str
+
+
+class NoopTool(BaseTool):
+    """空操作工具：只衡量ToolManager开销"""
+
+    name = "noop"
+    description = "noop"
+    input_schema = NoopInput
+
+    async def execute(self, input_data: NoopInput) -> ToolOutput:
+        return ToolOutput(success=True, data=input_data.value)
+
+
+async def measure(func, iterations: int) -> float:
+    """返回每次调用耗时（纳秒）"""
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        await func()
+    return (time.perf_counter_ns() - start) / iterations
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="call_tool开销微基准")
+    parser.add_argument("--iterations", type=int, default=5000, help="每个场景的调用次数")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数（取最小值）")
+    parser.add_argument("--entries", type=int, default=20, help="测试目录中的文件数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        root = os.path.realpath(tmpdir)
+        for i in range(args.entries):
+            with open(os.path.join(root, f"file{i}.txt"), "w", encoding="utf-8") as f:
+                f.write("x" * i)
+
+        cache = ToolResultCache(redis_client=DictRedis())
+        with mock.patch.object(tool_manager, "tool_cache", cache), \
+                mock.patch.object(security, "ALLOWED_PATHS", [root]):
+            manager = tool_manager.ToolManager()
+            list_tool = ListDirectoryTool()
+            noop_tool = NoopTool()
+            manager.register_tool(list_tool)
+            manager.register_tool(ReadFileTool())
+            manager.register_tool(noop_tool)
+
+            list_args = {"path": root}
+            noop_args = {"value": "x"}
+            read_args = {"path": os.path.join(root, "file1.txt")}
+            list_input = ListDirectoryInput(**list_args)
+            noop_input = NoopInput(**noop_args)
+
+            async def list_uncached():
+                return await manager.call_tool("list_directory", list_args, use_cache=False)
+
+            async def noop_uncached():
+                return await manager.call_tool("noop", noop_args, use_cache=False)
+
+            async def read_cached():
+                return await manager.call_tool("read_file", read_args)
+
+            scenarios = [
+                ("noop: 直接execute", lambda: noop_tool.execute(noop_input)),
+                ("noop: call_tool", noop_uncached),
+                ("list_directory: 直接execute", lambda: list_tool.execute(list_input)),
+                ("list_directory: call_tool", list_uncached),
+                ("read_file: 缓存命中", read_cached),
+            ]
+
+            print("=" * 64)
+            print(f"call_tool开销: {args.iterations}次调用 × {args.repeat}轮（取最小值），"
+                  f"目录{args.entries}个文件")
+            print("=" * 64)
+            print(f"{'场景':<30}{'µs/调用':>12}")
+
+            for label, func in scenarios:
+                # 缓存命中会打印日志，测量期间丢弃stdout
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                    per_call = min([await measure(func, args.iterations) for _ in range(args.repeat)])
+                print(f"{label:<30}{per_call / 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
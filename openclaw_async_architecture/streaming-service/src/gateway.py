@@ -2,8 +2,9 @@
 流式响应Gateway服务
 提供WebSocket端点，实现实时流式LLM对话
 """
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+import hmac
 import logging
 import uuid
 from typing import Optional
@@ -15,7 +16,11 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "mvp", "s
 
 from streaming.stream_server import StreamServer
 from streaming.connection_manager import ConnectionManager
+from streaming.connection_registry import DistributedConnectionManager
 from streaming.llm_stream import StreamChatService
+from streaming.response_cache import StreamResponseCache
+from streaming.single_flight import StreamSingleFlight
+from streaming.session_store import SessionStore
 from streaming.performance_monitor import PerformanceMonitorContext
 
 # 配置日志
@@ -45,22 +50,74 @@ app.add_middleware(
 # 加载API配置
 import json
 workspace_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-config_path = os.path.join(workspace_root, "API_CONFIG_FINAL.json")
+# API_CONFIG_PATH可覆盖（如指向Mock服务器的配置）
+config_path = os.getenv("API_CONFIG_PATH", os.path.join(workspace_root, "API_CONFIG_FINAL.json"))
 with open(config_path, "r", encoding="utf-8") as f:
     api_config = json.load(f)["api_configs"]
 
+
+def _create_redis(env_name: str):
+    """创建Redis客户端（未配置对应环境变量时返回None）"""
+    redis_url = os.getenv(env_name)
+    if not redis_url:
+        return None
+    try:
+        import redis
+        return redis.Redis.from_url(redis_url, decode_responses=True)
+    except ImportError:
+        logger.warning(f"[Gateway] redis包未安装，忽略{env_name}")
+        return None
+
+
+def _create_connection_manager() -> ConnectionManager:
+    """
+    创建连接管理器
+
+    配置CONNECTION_REGISTRY_REDIS_URL时使用Redis共享注册表，
+    多个worker/节点共享连接限制、统计和会话推送
+    """
+    max_connections = int(os.getenv("MAX_CONNECTIONS", "1000"))
+    max_per_ip = int(os.getenv("MAX_CONNECTIONS_PER_IP", "10"))
+    redis_url = os.getenv("CONNECTION_REGISTRY_REDIS_URL")
+    if redis_url:
+        try:
+            import redis.asyncio as aioredis
+            return DistributedConnectionManager(
+                aioredis.Redis.from_url(redis_url, decode_responses=True),
+                max_connections=max_connections,
+                max_per_ip=max_per_ip
+            )
+        except ImportError:
+            logger.warning("[Gateway] redis包未安装，连接限制仅在本进程生效")
+    return ConnectionManager(max_connections=max_connections, max_per_ip=max_per_ip)
+
+
 # 创建组件
-connection_manager = ConnectionManager(max_connections=1000, max_per_ip=10)
-stream_chat_service = StreamChatService(api_config, use_shared_client=True)
+connection_manager = _create_connection_manager()
+response_cache = StreamResponseCache(
+    max_entries=int(os.getenv("STREAM_CACHE_MAX_ENTRIES", "1000")),
+    ttl=int(os.getenv("STREAM_CACHE_TTL", "3600")),
+    redis_client=_create_redis("STREAM_CACHE_REDIS_URL")  # 多副本共享L2（可选）
+)
+stream_chat_service = StreamChatService(
+    api_config,
+    use_shared_client=True,
+    response_cache=response_cache,
+    single_flight=StreamSingleFlight()  # 合并相同的在途请求（节省RPM）
+)
+# 会话历史（服务端保存，客户端只需发送新消息）
+session_store = SessionStore(
+    max_history_tokens=int(os.getenv("SESSION_MAX_HISTORY_TOKENS", "8000")),
+    idle_ttl=int(os.getenv("SESSION_IDLE_TTL", "600")),
+    redis_client=_create_redis("SESSION_REDIS_URL")  # 空闲会话溢出到Redis（可选）
+)
 stream_server = StreamServer(
     connection_manager=connection_manager,
     stream_chat_service=stream_chat_service,
-    default_provider="nvidia2"  # 默认使用nvidia2（更快）
+    default_provider="nvidia2",  # 默认使用nvidia2（更快）
+    session_store=session_store
 )
 
-# 存储活跃连接的provider配置（可选，允许每个连接使用不同的API）
-active_connections_config = {}
-
 
 @app.get("/")
 async def root():
@@ -92,14 +149,65 @@ async def health():
 @app.get("/stats")
 async def stats():
     """统计信息"""
+    cluster = None
+    if isinstance(connection_manager, DistributedConnectionManager):
+        cluster = {
+            **await connection_manager.get_cluster_stats(),
+            **connection_manager.stats
+        }
+
     return {
         "active_connections": connection_manager.get_active_count(),
         "max_connections": connection_manager.max_connections,
+        "cluster": cluster,
+        "response_cache": {
+            "size": response_cache.get_size(),
+            **response_cache.stats
+        },
+        "sessions": {
+            "active": session_store.get_active_count()
+        },
+        "single_flight": {
+            "in_flight": stream_chat_service.single_flight.in_flight(),
+            **stream_chat_service.single_flight.stats
+        },
         "api_providers_available": list(stream_chat_service.api_configs.keys()),
         "default_provider": stream_server.default_provider
     }
 
 
+def _check_push_token(token: Optional[str]):
+    """
+    校验内部推送令牌（GATEWAY_PUSH_TOKEN）
+
+    未配置令牌时推送接口关闭（403），令牌缺失或错误时返回401
+    """
+    expected = os.getenv("GATEWAY_PUSH_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=403, detail="推送接口未启用（未配置GATEWAY_PUSH_TOKEN）")
+    if not token or not hmac.compare_digest(token.encode("utf-8"), expected.encode("utf-8")):
+        raise HTTPException(status_code=401, detail="无效的推送令牌")
+
+
+@app.post("/sessions/{session_id}/push")
+async def push_to_session(
+    session_id: str,
+    payload: dict,
+    x_internal_token: Optional[str] = Header(default=None)
+):
+    """
+    向会话推送消息（会话连接在其他节点时通过Redis转发）
+
+    仅供内部服务调用：请求头X-Internal-Token必须与GATEWAY_PUSH_TOKEN一致
+
+    请求体：{"message": "文本"} 或任意JSON对象（原样推送）
+    """
+    _check_push_token(x_internal_token)
+    message = payload["message"] if set(payload) == {"message"} else payload
+    delivered = await connection_manager.send_to_session(session_id, message)
+    return {"session_id": session_id, "delivered": delivered}
+
+
 @app.websocket("/ws/stream/{session_id}")
 async def websocket_stream(websocket: WebSocket, session_id: str):
     """
@@ -109,10 +217,14 @@ async def websocket_stream(websocket: WebSocket, session_id: str):
     ```json
     {
         "message": "用户消息",
-        "provider": "nvidia2"  // 可选，默认为nvidia2
+        "provider": "nvidia2",  // 可选，默认为nvidia2
+        "params": {"temperature": 0},  // 可选，temperature=0的请求会走响应缓存
+        "reset_session": false  // 可选，true表示先清空该session_id的历史
     }
     ```
 
+    同一session_id的对话历史保存在服务端，超出模型上下文窗口时自动截断
+
     输出格式（服务器→客户端）：
     - 文本块：直接发送文本
     - 完成信号：{"type": "done"}
@@ -130,7 +242,7 @@ async def websocket_stream(websocket: WebSocket, session_id: str):
 
     try:
         # 使用StreamServer处理连接
-        await stream_server.handle_connection(websocket, connection_id, client_ip)
+        await stream_server.handle_connection(websocket, connection_id, client_ip, session_id)
 
     except WebSocketDisconnect:
         logger.info(f"[Gateway] 连接断开: {connection_id}")
@@ -149,11 +261,26 @@ async def websocket_stream(websocket: WebSocket, session_id: str):
         pass
 
 
+@app.on_event("startup")
+async def startup():
+    """启动后台任务"""
+    session_store.start()
+    if isinstance(connection_manager, DistributedConnectionManager):
+        await connection_manager.start()
+
+
 @app.on_event("shutdown")
 async def shutdown():
     """关闭时清理资源"""
     logger.info("[Gateway] 正在关闭...")
 
+    # 停止会话清理任务（配置了Redis时写回所有会话）
+    await session_store.stop()
+
+    # 注销本节点的连接
+    if isinstance(connection_manager, DistributedConnectionManager):
+        await connection_manager.stop()
+
     # 关闭流式聊天服务（关闭共享HTTP客户端）
     await stream_chat_service.close()
 
@@ -167,7 +294,7 @@ if __name__ == "__main__":
     uvicorn.run(
         app,  # 直接传入 app 对象
         host="0.0.0.0",
-        port=8001,
+        port=int(os.getenv("GATEWAY_PORT", "8001")),
         reload=False,
         log_level="info",
         timeout_keep_alive=300,  # 5 分钟（默认 60 秒）
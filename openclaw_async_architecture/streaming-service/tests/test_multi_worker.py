@@ -0,0 +1,149 @@
+"""
+多进程Gateway测试
+启动4个Gateway进程（共享Redis连接注册表），验证：
+1. 单IP连接限制在所有节点之间生效
+2. 任一节点的/stats都能看到集群总连接数
+3. 任一节点都能向其他节点上的会话推送消息
+4. 连接关闭后集群计数归零
+
+需要本地Redis（默认redis://127.0.0.1:6379/15，可用REDIS_URL覆盖）
+"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+import websockets
+
+# 修复Windows编码问题
+if sys.platform == "win32":
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://127.0.0.1:6379/15")
+PORTS = [8101, 8102, 8103, 8104]
+MAX_PER_IP = 6
+PUSH_TOKEN = "test-push-token"
+
+GATEWAY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "gateway.py")
+
+
+def start_workers() -> list:
+    """启动4个Gateway进程"""
+    processes = []
+    for port in PORTS:
+        env = {
+            **os.environ,
+            "GATEWAY_PORT": str(port),
+            "CONNECTION_REGISTRY_REDIS_URL": REDIS_URL,
+            "MAX_CONNECTIONS_PER_IP": str(MAX_PER_IP),
+            "GATEWAY_PUSH_TOKEN": PUSH_TOKEN,
+        }
+        processes.append(subprocess.Popen(
+            [sys.executable, GATEWAY_PATH],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        ))
+    return processes
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 30.0):
+    """等待所有节点就绪"""
+    deadline = time.time() + timeout
+    pending = set(PORTS)
+    while pending and time.time() < deadline:
+        for port in list(pending):
+            try:
+                response = await client.get(f"http://127.0.0.1:{port}/health")
+                if response.status_code == 200:
+                    pending.discard(port)
+            except httpx.HTTPError:
+                pass
+        await asyncio.sleep(0.5)
+    if pending:
+        raise RuntimeError(f"节点未就绪: {sorted(pending)}")
+
+
+async def is_rejected(websocket) -> bool:
+    """连接被服务器关闭即视为被拒绝"""
+    try:
+        await asyncio.wait_for(websocket.recv(), timeout=2.0)
+    except websockets.ConnectionClosed:
+        return True
+    except asyncio.TimeoutError:
+        return False
+    return False
+
+
+async def test_cluster():
+    """集群测试"""
+    results = {}
+
+    async with httpx.AsyncClient(timeout=5.0) as client:
+        await wait_ready(client)
+        print(f"[OK] {len(PORTS)}个节点已就绪")
+
+        # 测试1: 跨节点单IP限制
+        sockets = []
+        for i in range(MAX_PER_IP):
+            port = PORTS[i % len(PORTS)]
+            sockets.append(await websockets.connect(f"ws://127.0.0.1:{port}/ws/stream/session-{i}"))
+        extra = await websockets.connect(f"ws://127.0.0.1:{PORTS[-1]}/ws/stream/session-extra")
+        results["per_ip_limit"] = await is_rejected(extra)
+        print(f"[{'OK' if results['per_ip_limit'] else 'FAIL'}] 第{MAX_PER_IP + 1}个连接被拒绝")
+
+        # 测试2: 集群统计
+        stats = (await client.get(f"http://127.0.0.1:{PORTS[2]}/stats")).json()["cluster"]
+        results["cluster_stats"] = (
+            stats["total_connections"] == MAX_PER_IP and len(stats["nodes"]) == len(PORTS)
+        )
+        print(f"[{'OK' if results['cluster_stats'] else 'FAIL'}] 集群统计: "
+              f"{stats['total_connections']}个连接, {len(stats['nodes'])}个节点")
+
+        # 测试3: 跨节点推送（session-0在PORTS[0]上，从PORTS[1]推送）
+        response = await client.post(
+            f"http://127.0.0.1:{PORTS[1]}/sessions/session-0/push",
+            json={"message": "hello from another node"},
+            headers={"X-Internal-Token": PUSH_TOKEN}
+        )
+        received = await asyncio.wait_for(sockets[0].recv(), timeout=5.0)
+        results["routing"] = received == "hello from another node"
+        print(f"[{'OK' if results['routing'] else 'FAIL'}] 跨节点推送: {response.json()} -> {received!r}")
+
+        # 测试4: 断开后计数归零
+        for websocket in sockets:
+            await websocket.close()
+        await asyncio.sleep(1.0)
+        stats = (await client.get(f"http://127.0.0.1:{PORTS[0]}/stats")).json()["cluster"]
+        results["cleanup"] = stats["total_connections"] == 0
+        print(f"[{'OK' if results['cleanup'] else 'FAIL'}] 断开后连接数: {stats['total_connections']}")
+
+    return results
+
+
+def main():
+    """主函数"""
+    print("\n" + "=" * 70)
+    print("多进程Gateway测试（4个节点 + Redis注册表）")
+    print("=" * 70 + "\n")
+
+    processes = start_workers()
+    try:
+        results = asyncio.run(test_cluster())
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+    passed = sum(1 for ok in results.values() if ok)
+    print(f"\n结果: {passed}/{len(results)} 通过")
+    print(json.dumps(results, indent=2))
+    sys.exit(0 if passed == len(results) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+推送接口鉴权测试
+验证POST /sessions/{session_id}/push只接受携带正确内部令牌的请求：
+1. 未配置GATEWAY_PUSH_TOKEN时接口关闭（403）
+2. 缺少令牌或令牌错误时拒绝（401）
+3. 令牌正确时正常推送
+
+不需要Redis或上游API（使用FastAPI TestClient）
+"""
+import json
+import os
+import sys
+
+# 确保内置queue模块在sys.modules中（避免与项目queue包冲突）
+import queue as builtin_queue
+
+from fastapi.testclient import TestClient
+
+# 修复Windows编码问题
+if sys.platform == "win32":
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+import gateway
+
+PUSH_TOKEN = "test-push-token"
+PUSH_URL = "/sessions/session-0/push"
+
+
+def check_push_auth() -> dict:
+    """推送鉴权测试"""
+    results = {}
+    client = TestClient(gateway.app)
+    body = {"message": "hello"}
+
+    os.environ.pop("GATEWAY_PUSH_TOKEN", None)
+    response = client.post(PUSH_URL, json=body, headers={"X-Internal-Token": PUSH_TOKEN})
+    results["disabled_without_config"] = response.status_code == 403
+    print(f"[{'OK' if results['disabled_without_config'] else 'FAIL'}] 未配置令牌: {response.status_code}")
+
+    os.environ["GATEWAY_PUSH_TOKEN"] = PUSH_TOKEN
+    try:
+        response = client.post(PUSH_URL, json=body)
+        results["missing_token"] = response.status_code == 401
+        print(f"[{'OK' if results['missing_token'] else 'FAIL'}] 缺少令牌: {response.status_code}")
+
+        response = client.post(PUSH_URL, json=body, headers={"X-Internal-Token": "wrong"})
+        results["wrong_token"] = response.status_code == 401
+        print(f"[{'OK' if results['wrong_token'] else 'FAIL'}] 错误令牌: {response.status_code}")
+
+        response = client.post(PUSH_URL, json=body, headers={"X-Internal-Token": PUSH_TOKEN})
+        results["valid_token"] = (
+            response.status_code == 200 and response.json() == {"session_id": "session-0", "delivered": 0}
+        )
+        print(f"[{'OK' if results['valid_token'] else 'FAIL'}] 正确令牌: {response.status_code} {response.json()}")
+    finally:
+        os.environ.pop("GATEWAY_PUSH_TOKEN", None)
+
+    return results
+
+
+def main():
+    """主函数"""
+    print("\n" + "=" * 70)
+    print("推送接口鉴权测试")
+    print("=" * 70 + "\n")
+
+    results = check_push_auth()
+
+    passed = sum(1 for ok in results.values() if ok)
+    print(f"\n结果: {passed}/{len(results)} 通过")
+    print(json.dumps(results, indent=2))
+    sys.exit(0 if passed == len(results) else 1)
+
+
+if __name__ == "__main__":
+    main()